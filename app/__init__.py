@@ -101,6 +101,14 @@ def create_app() -> Flask:
     app.config["SQLALCHEMY_DATABASE_URI"] = database_url
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config["SERIES_ADMIN_PIN"] = os.environ.get("SERIES_ADMIN_PIN", "4321")
+    # Seriais reservados por worker a cada ida ao banco (sobras se perdem no restart)
+    app.config["SERIAL_BLOCO"] = int(os.environ.get("SERIAL_BLOCO", "10"))
+    # BOM multinível: capacidade/reserva/custo sobre a estrutura explodida
+    app.config["BOM_MULTINIVEL"] = os.environ.get("BOM_MULTINIVEL", "0").strip().lower() in (
+        "1",
+        "true",
+        "sim",
+    )
 
     if not app.logger.handlers:
         logging.basicConfig(level=logging.INFO)
@@ -217,6 +225,8 @@ def create_app() -> Flask:
     _try_register(app, "app.routes.estoque_routes.consultar_peca", "consultar_peca_bp")
     _try_register(app, "app.routes.estoque_routes.deletar_peca", "deletar_peca_bp")
     _try_register(app, "app.routes.estoque_routes.autocomplete_pecas", "autocomplete_bp")
+    _try_register(app, "app.routes.estoque_routes.movimentacoes", "movimentacoes_bp")
+    _try_register(app, "app.routes.estoque_routes.importar_pecas", "importar_pecas_bp")
     # ====================================================================
     # [FIM BLOCO] blueprints_estoque
     # ====================================================================
@@ -267,6 +277,9 @@ def create_app() -> Flask:
         "imprimir_etiqueta_bp",
     )
     _try_register(app, "app.routes.producao_routes.maquinas_routes.series", "series_bp")
+    _try_register(
+        app, "app.routes.producao_routes.maquinas_routes.montagens", "montagens_bp"
+    )
     # ====================================================================
     # [FIM BLOCO] blueprints_producao
     # ====================================================================
@@ -384,8 +397,12 @@ def create_app() -> Flask:
             EstruturaMaquina,
             Fornecedor,
             FornecedoresPorPeca,
+            MovimentacaoEstoque,
+            EstoqueSnapshot,
             Montagem,
             LabelReprintLog,
+            ReservaMontagem,
+            ReservaMontagemItem,
             GPChecklistExecution,
             GPChecklistTemplate,
             GPChecklistExecutionItem,
@@ -396,6 +413,9 @@ def create_app() -> Flask:
             GPROPAlert,
             GPHipotRun,
             GPWorkOrder,
+            OmieRequisicao,
+            OmieSyncCheckpoint,
+            CacheVersao,
         )
 
         app.logger.info("[BOOT] Modelos SQLAlchemy importados.")
@@ -405,6 +425,96 @@ def create_app() -> Flask:
     # [FIM BLOCO] models_import
     # ====================================================================
 
+    # -----------------------------------------------------------------
+    # Comandos CLI (rotinas agendadas)
+    # -----------------------------------------------------------------
+    # ====================================================================
+    # [BLOCO] BLOCO_UTIL
+    # [NOME] cli_commands
+    # [RESPONSABILIDADE] Registrar comandos flask <comando> usados por cron/jobs
+    # ====================================================================
+    try:
+        from app.commands import register_commands
+
+        register_commands(app)
+    except Exception as e:
+        app.logger.warning("[BOOT] Comandos CLI indisponíveis: %s", e)
+    # ====================================================================
+    # [FIM BLOCO] cli_commands
+    # ====================================================================
+
+    # -----------------------------------------------------------------
+    # Gatilhos de sessão
+    # -----------------------------------------------------------------
+    # ====================================================================
+    # [BLOCO] BLOCO_UTIL
+    # [NOME] gatilho_rop
+    # [RESPONSABILIDADE] Reavaliar ROP das peças com estoque alterado a cada commit
+    # ====================================================================
+    try:
+        from app.routes.producao_routes.painel_routes.rop_service import (
+            registrar_gatilho_rop,
+        )
+
+        registrar_gatilho_rop()
+    except Exception as e:
+        app.logger.warning("[BOOT] Gatilho de ROP indisponível: %s", e)
+    # ====================================================================
+    # [FIM BLOCO] gatilho_rop
+    # ====================================================================
+
+    # ====================================================================
+    # [BLOCO] BLOCO_UTIL
+    # [NOME] versionamento_cache
+    # [RESPONSABILIDADE] Versionar tabelas alteradas a cada commit (invalida exportações em cache)
+    # ====================================================================
+    try:
+        from app.utils.cache_versoes import registrar_versionamento_cache
+
+        registrar_versionamento_cache()
+    except Exception as e:
+        app.logger.warning("[BOOT] Versionamento de cache indisponível: %s", e)
+    # ====================================================================
+    # [FIM BLOCO] versionamento_cache
+    # ====================================================================
+
+    # ====================================================================
+    # [BLOCO] BLOCO_UTIL
+    # [NOME] indice_pecas
+    # [RESPONSABILIDADE] Manter o índice de autocomplete de peças em memória e pré-carregá-lo
+    # ====================================================================
+    try:
+        from app.services.indice_pecas_service import (
+            reconstruir_indice,
+            registrar_indice_pecas,
+        )
+
+        registrar_indice_pecas()
+        if app.config.get("INDICE_PECAS_AQUECER", True):
+            with app.app_context():
+                reconstruir_indice()
+    except Exception as e:
+        # sem tabela ainda (migração pendente): o índice é montado na 1ª consulta
+        app.logger.warning("[BOOT] Índice de peças não pré-carregado: %s", e)
+    # ====================================================================
+    # [FIM BLOCO] indice_pecas
+    # ====================================================================
+
+    # ====================================================================
+    # [BLOCO] BLOCO_UTIL
+    # [NOME] cache_ordens
+    # [RESPONSABILIDADE] Invalidar o cache serial -> ordem do Painel a cada commit que altera ordens
+    # ====================================================================
+    try:
+        from app.services.producao.ordem_cache import registrar_cache_ordens
+
+        registrar_cache_ordens()
+    except Exception as e:
+        app.logger.warning("[BOOT] Cache de ordens por serial indisponível: %s", e)
+    # ====================================================================
+    # [FIM BLOCO] cache_ordens
+    # ====================================================================
+
     # -----------------------------------------------------------------
     # Context processors
     # -----------------------------------------------------------------
@@ -447,5 +557,10 @@ def create_app() -> Flask:
 # BLOCO_UTIL: blueprints_painel_ao_vivo
 # BLOCO_UTIL: blueprints_omie
 # BLOCO_UTIL: models_import
+# BLOCO_UTIL: cli_commands
+# BLOCO_UTIL: gatilho_rop
+# BLOCO_UTIL: versionamento_cache
+# BLOCO_UTIL: indice_pecas
+# BLOCO_UTIL: cache_ordens
 # FUNÇÃO: inject_now
 # ====================================================================
\ No newline at end of file
@@ -0,0 +1,373 @@
+# app/commands.py
+"""
+Comandos de linha de comando (flask <comando>) para rotinas agendadas.
+
+Uso (cron / Render Cron Job):
+    flask --app run estoque-snapshot
+    flask --app run estoque-diario
+    flask --app run rop-avaliar
+    flask --app run omie-requisicoes-enviar
+    flask --app run omie-sync
+    flask --app run pecas-importar planilha.xlsx
+    flask --app run seriais-importar-auditoria
+    flask --app run seriais-reconciliar --lote 1000
+    flask --app run etiquetas-limpar-cache --dias 30
+"""
+from __future__ import annotations
+
+import logging
+
+import click
+from flask import Flask
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] estoque_snapshot_cmd
+# [RESPONSABILIDADE] Gravar snapshot do estoque de todas as peças (rotina diária)
+# ====================================================================
+@click.command("estoque-snapshot")
+def estoque_snapshot_cmd() -> None:
+    """Fotografa estoque_atual de todas as peças (base de 'saldo em data X')."""
+    from app.services.movimentacao_service import tirar_snapshot
+
+    try:
+        total = tirar_snapshot()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.exception("[estoque] Falha ao gravar snapshot de estoque")
+        raise
+    click.echo(f"Snapshot gravado: {total} peças.")
+
+
+# ====================================================================
+# [FIM BLOCO] estoque_snapshot_cmd
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] estoque_diario_cmd
+# [RESPONSABILIDADE] Gravar a série diária de estoque (só peças alteradas), recuperando dias perdidos
+# ====================================================================
+@click.command("estoque-diario")
+@click.option("--desde", type=click.DateTime(formats=["%Y-%m-%d"]), default=None, help="Regrava de YYYY-MM-DD até hoje (carga inicial).")
+def estoque_diario_cmd(desde) -> None:
+    """Rodar uma vez por dia (fim do expediente); repetir no mesmo dia só atualiza o dia."""
+    from app.services.movimentacao_service import gravar_estoque_diario_pendentes
+
+    try:
+        r = gravar_estoque_diario_pendentes(desde.date() if desde else None)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.exception("[estoque] Falha ao gravar estoque diário")
+        raise
+    click.echo(f"Estoque diário: {r['dias']} dia(s), {r['linhas']} linha(s) gravadas.")
+
+
+# ====================================================================
+# [FIM BLOCO] estoque_diario_cmd
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] rop_avaliar_cmd
+# [RESPONSABILIDADE] Ressincronizar gp_rop_alerts com o estoque de todas as peças
+# ====================================================================
+@click.command("rop-avaliar")
+@click.option("--notificar/--sem-notificar", default=False, help="Disparar e-mails/requisições das entradas em alerta.")
+def rop_avaliar_cmd(notificar: bool) -> None:
+    """Carga inicial/correção do estado de ROP (o dia a dia é incremental, no commit)."""
+    from app.routes.producao_routes.painel_routes.rop_service import (
+        avaliar_rop,
+        despachar_alertas_rop,
+    )
+
+    try:
+        transicoes = avaliar_rop()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.exception("[ROP] Falha ao reavaliar pontos de pedido")
+        raise
+    if notificar and transicoes["entraram"]:
+        despachar_alertas_rop(transicoes["entraram"])
+    click.echo(
+        f"ROP: {len(transicoes['entraram'])} entraram, {len(transicoes['sairam'])} saíram."
+    )
+
+
+# ====================================================================
+# [FIM BLOCO] rop_avaliar_cmd
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] omie_requisicoes_enviar_cmd
+# [RESPONSABILIDADE] Enviar a fila de requisições OMIE pendentes (agrupadas por fornecedor)
+# ====================================================================
+@click.command("omie-requisicoes-enviar")
+@click.option("--reenviar-erros", is_flag=True, help="Volta linhas com erro para 'pendente' antes do envio.")
+@click.option("--timeout-envio", type=int, default=None, help="Segundos até uma linha 'enviando' ser considerada travada.")
+def omie_requisicoes_enviar_cmd(reenviar_erros: bool, timeout_envio) -> None:
+    """Rede de segurança do timer em processo (reinícios, falhas de rede)."""
+    from app.models_sqla import OmieRequisicao
+    from app.services.omie_requisicao_service import (
+        STATUS_ERRO,
+        STATUS_PENDENTE,
+        enviar_requisicoes_pendentes,
+        liberar_envios_travados,
+    )
+
+    try:
+        liberadas = liberar_envios_travados(timeout_envio)
+        db.session.commit()
+        if liberadas:
+            click.echo(f"OMIE: {liberadas} linha(s) presas em 'enviando' voltaram para 'pendente'.")
+        if reenviar_erros:
+            OmieRequisicao.query.filter_by(status=STATUS_ERRO).update(
+                {"status": STATUS_PENDENTE, "erro_msg": None},
+                synchronize_session=False,
+            )
+            db.session.commit()
+        resumo = enviar_requisicoes_pendentes()
+    except Exception:
+        db.session.rollback()
+        logger.exception("[OMIE] Falha ao enviar fila de requisições")
+        raise
+    click.echo(
+        f"OMIE: {resumo['linhas']} linha(s), {resumo['requisicoes']} requisição(ões), "
+        f"{resumo['erros']} erro(s)."
+    )
+
+
+# ====================================================================
+# [FIM BLOCO] omie_requisicoes_enviar_cmd
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] omie_sync_cmd
+# [RESPONSABILIDADE] Sincronizar catálogo e estoque com o OMIE a partir do último checkpoint
+# ====================================================================
+@click.command("omie-sync")
+@click.option("--so", type=click.Choice(["produtos", "estoque"]), default=None, help="Executa só uma das etapas.")
+@click.option("--completo", is_flag=True, help="Ignora o checkpoint e relê tudo.")
+@click.option("--criar-pecas", is_flag=True, help="Cadastra produtos OMIE sem peça correspondente.")
+def omie_sync_cmd(so, completo: bool, criar_pecas: bool) -> None:
+    """Produtos primeiro (vincula codigo_omie), depois saldos de estoque."""
+    from app.services.omie_sync_service import sincronizar_estoque, sincronizar_produtos
+
+    try:
+        if so in (None, "produtos"):
+            r = sincronizar_produtos(completo=completo, criar=criar_pecas)
+            click.echo(f"Produtos: {r}")
+        if so in (None, "estoque"):
+            r = sincronizar_estoque(completo=completo)
+            click.echo(f"Estoque: {r}")
+    except Exception:
+        db.session.rollback()
+        logger.exception("[OMIE-SYNC] Falha na sincronização (checkpoint preservado)")
+        raise
+
+
+# ====================================================================
+# [FIM BLOCO] omie_sync_cmd
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] pecas_importar_cmd
+# [RESPONSABILIDADE] Importar/atualizar peças e fornecedores em lote a partir de planilha Excel
+# ====================================================================
+@click.command("pecas-importar")
+@click.argument("planilha", type=click.Path(exists=True, dir_okay=False))
+@click.option("--simular", is_flag=True, help="Só valida e mostra o que seria gravado.")
+@click.option("--atualizar-estoque", is_flag=True, help="Aplica ESTOQUE ATUAL às peças existentes (com livro-razão).")
+@click.option("--relatorio", type=click.Path(dir_okay=False, writable=True), default=None, help="Grava as linhas com erro em CSV.")
+def pecas_importar_cmd(planilha: str, simular: bool, atualizar_estoque: bool, relatorio) -> None:
+    """Linhas inválidas são ignoradas e listadas; as válidas entram em uma transação."""
+    import os
+
+    from app.services.importacao_pecas_service import importar_pecas, relatorio_erros_csv
+
+    try:
+        r = importar_pecas(
+            planilha,
+            simular=simular,
+            atualizar_estoque=atualizar_estoque,
+            referencia=f"IMPORTACAO {os.path.basename(planilha)}",
+        )
+    except Exception:
+        logger.exception("[IMPORTACAO] Falha ao importar %s", planilha)
+        raise
+    click.echo(
+        f"{'Simulação' if simular else 'Importação'}: {r['linhas']} linha(s), "
+        f"{r['inseridas']} nova(s), {r['atualizadas']} atualizada(s), "
+        f"{r['sem_alteracao']} sem alteração, {r['estoque_ajustado']} ajuste(s) de estoque, "
+        f"fornecedores +{r['fornecedores_inseridos']}/~{r['fornecedores_atualizados']}, "
+        f"{len(r['erros'])} erro(s) em {r['tempo_s']}s."
+    )
+    for e in r["erros"][:20]:
+        click.echo(f"  linha {e['linha']} ({e['codigo'] or '-'}): {'; '.join(e['erros'])}")
+    if len(r["erros"]) > 20:
+        click.echo(f"  ... e mais {len(r['erros']) - 20} (use --relatorio).")
+    if relatorio:
+        with open(relatorio, "w", encoding="utf-8-sig") as fh:
+            fh.write(relatorio_erros_csv(r))
+        click.echo(f"Relatório de erros: {relatorio}")
+
+
+# ====================================================================
+# [FIM BLOCO] pecas_importar_cmd
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] seriais_importar_auditoria_cmd
+# [RESPONSABILIDADE] Importar logs/serials_YYYY.txt antigos para a tabela serial_auditoria
+# ====================================================================
+@click.command("seriais-importar-auditoria")
+@click.option("--pasta", type=click.Path(exists=True, file_okay=False), default=None, help="Pasta dos serials_*.txt (padrão: logs/).")
+def seriais_importar_auditoria_cmd(pasta) -> None:
+    """Carga única; rodar de novo não duplica linhas já importadas."""
+    from app.services.serials import importar_auditoria_arquivos
+
+    try:
+        r = importar_auditoria_arquivos(pasta)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.exception("[seriais] Falha ao importar auditoria dos arquivos")
+        raise
+    click.echo(
+        f"Auditoria de seriais: {r['arquivos']} arquivo(s), {r['importadas']} importada(s), "
+        f"{r['existentes']} já existente(s), {r['invalidas']} inválida(s)."
+    )
+
+
+# ====================================================================
+# [FIM BLOCO] seriais_importar_auditoria_cmd
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] seriais_reconciliar_cmd
+# [RESPONSABILIDADE] Reconciliar montagens com o cadastro de séries em lotes retomáveis
+# ====================================================================
+@click.command("seriais-reconciliar")
+@click.option("--lote", type=int, default=1000, show_default=True, help="Montagens por lote (um commit por lote).")
+@click.option("--do-inicio", is_flag=True, help="Ignora o checkpoint e revê todas as montagens.")
+@click.option("--desde-id", type=int, default=None, help="Começa nas montagens com id maior que este.")
+@click.option("--max-lotes", type=int, default=None, help="Para após N lotes (continua depois do checkpoint).")
+def seriais_reconciliar_cmd(lote, do_inicio, desde_id, max_lotes) -> None:
+    """Cria/atualiza Serial a partir das montagens; interrompido, retoma do último lote."""
+    from app.services.montagem.reconciliacao_seriais import (
+        CadastroSeriesIndisponivel,
+        reconciliar_seriais,
+    )
+
+    def _progresso(r):
+        click.echo(
+            f"  {r['processadas']}/{r['pendentes']} montagem(ns) até id {r['ultimo_id']}: "
+            f"{r['criados']} nova(s), {r['atualizados']} atualizada(s) em {r['tempo_s']}s"
+        )
+
+    try:
+        r = reconciliar_seriais(
+            lote=lote,
+            retomar=not do_inicio,
+            desde_id=desde_id,
+            max_lotes=max_lotes,
+            progresso=_progresso,
+        )
+    except CadastroSeriesIndisponivel as e:
+        raise click.ClickException(str(e))
+    except Exception:
+        db.session.rollback()
+        logger.exception("[seriais] Falha na reconciliação de séries (lotes anteriores mantidos)")
+        raise
+    click.echo(
+        f"Reconciliação de séries {'concluída' if r['concluido'] else 'parcial'}: "
+        f"{r['processadas']} montagem(ns) em {r['lotes']} lote(s), {r['criados']} criada(s), "
+        f"{r['atualizados']} atualizada(s), {r['sem_alteracao']} sem alteração, "
+        f"{r['ignorados']} sem serial; checkpoint id {r['ultimo_id']}."
+    )
+
+
+# ====================================================================
+# [FIM BLOCO] seriais_reconciliar_cmd
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] etiquetas_limpar_cache_cmd
+# [RESPONSABILIDADE] Limpar o cache de etiquetas (layouts antigos e arquivos sem uso)
+# ====================================================================
+@click.command("etiquetas-limpar-cache")
+@click.option("--dias", type=int, default=30, show_default=True, help="Remove etiquetas sem uso há mais de N dias.")
+def etiquetas_limpar_cache_cmd(dias) -> None:
+    """Apaga pastas de layouts que não são o atual e etiquetas não lidas há --dias."""
+    from app.routes.producao_routes.maquinas_routes.imprimir_etiqueta import layout_atual
+    from app.services.producao.etiqueta_cache import limpar_cache_etiquetas
+
+    r = limpar_cache_etiquetas(layout_atual(), dias)
+    click.echo(
+        f"Cache de etiquetas: {r['layouts_removidos']} layout(s) antigo(s) removido(s), "
+        f"{r['arquivos_removidos']} arquivo(s) removido(s), {r['arquivos_mantidos']} mantido(s)."
+    )
+
+
+# ====================================================================
+# [FIM BLOCO] etiquetas_limpar_cache_cmd
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] register_commands
+# [RESPONSABILIDADE] Registrar comandos CLI na aplicação Flask
+# ====================================================================
+def register_commands(app: Flask) -> None:
+    app.cli.add_command(estoque_snapshot_cmd)
+    app.cli.add_command(estoque_diario_cmd)
+    app.cli.add_command(rop_avaliar_cmd)
+    app.cli.add_command(omie_requisicoes_enviar_cmd)
+    app.cli.add_command(omie_sync_cmd)
+    app.cli.add_command(pecas_importar_cmd)
+    app.cli.add_command(seriais_importar_auditoria_cmd)
+    app.cli.add_command(seriais_reconciliar_cmd)
+    app.cli.add_command(etiquetas_limpar_cache_cmd)
+
+
+# ====================================================================
+# [FIM BLOCO] register_commands
+# ====================================================================
+
+# ====================================================================
+# MAPA DO ARQUIVO
+# --------------------------------------------------------------------
+# FUNÇÃO: estoque_snapshot_cmd
+# FUNÇÃO: estoque_diario_cmd
+# FUNÇÃO: rop_avaliar_cmd
+# FUNÇÃO: omie_requisicoes_enviar_cmd
+# FUNÇÃO: omie_sync_cmd
+# FUNÇÃO: pecas_importar_cmd
+# FUNÇÃO: seriais_importar_auditoria_cmd
+# FUNÇÃO: seriais_reconciliar_cmd
+# FUNÇÃO: etiquetas_limpar_cache_cmd
+# FUNÇÃO: register_commands
+# ====================================================================
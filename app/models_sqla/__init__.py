@@ -24,7 +24,9 @@ you may need to recreate them manually.
 """
 
 from flask_sqlalchemy import SQLAlchemy  # type: ignore
+from sqlalchemy import event
 from app import db  # reuse the SQLAlchemy instance from the app
+from app.utils.texto_utils import normalizar_busca
 from datetime import datetime
 
 # --- IMPORTS PARA LOGIN ---
@@ -96,8 +98,8 @@ class Peca(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     tipo = db.Column(db.String(20), nullable=True)
-    descricao = db.Column(db.String(100), nullable=True)
-    codigo_pneumark = db.Column(db.String(50), nullable=True)
+    descricao = db.Column(db.String(100), nullable=True, index=True)
+    codigo_pneumark = db.Column(db.String(50), nullable=True, index=True)
     codigo_omie = db.Column(db.String(50), nullable=True)
     estoque_minimo = db.Column(db.Integer, nullable=True)
     ponto_pedido = db.Column(db.Integer, nullable=True)
@@ -105,6 +107,14 @@ class Peca(db.Model):
     estoque_atual = db.Column(db.Integer, nullable=True)
     margem = db.Column(db.Float, nullable=True)
     custo = db.Column(db.Float, nullable=True)
+    # "código descrição" minúsculo e sem acento (listagem/busca); INSERT em lote
+    # preenche pelo default; UPDATE em lote que muda código/descrição deve enviá-la
+    busca_normalizada = db.Column(
+        db.String(200),
+        nullable=True,
+        index=True,
+        default=lambda ctx: _busca_dos_parametros(ctx.get_current_parameters()),
+    )
 
     def as_dict(self) -> dict:
         return {c.name: getattr(self, c.name) for c in self.__table__.columns}
@@ -115,6 +125,36 @@ class Peca(db.Model):
 # ====================================================================
 
 
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _busca_dos_parametros
+# [RESPONSABILIDADE] Calcular busca_normalizada a partir dos valores de um INSERT
+# ====================================================================
+def _busca_dos_parametros(params: dict) -> str:
+    return normalizar_busca(params.get("codigo_pneumark"), params.get("descricao"))[:200]
+
+
+# ====================================================================
+# [FIM BLOCO] _busca_dos_parametros
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _sincronizar_busca_peca
+# [RESPONSABILIDADE] Manter busca_normalizada em dia nos INSERT/UPDATE via objeto (ORM)
+# ====================================================================
+@event.listens_for(Peca, "before_insert")
+@event.listens_for(Peca, "before_update")
+def _sincronizar_busca_peca(mapper, connection, target) -> None:
+    target.busca_normalizada = normalizar_busca(target.codigo_pneumark, target.descricao)[:200]
+
+
+# ====================================================================
+# [FIM BLOCO] _sincronizar_busca_peca
+# ====================================================================
+
+
 # ====================================================================
 # [BLOCO] CLASSE
 # [NOME] EstruturaMaquina
@@ -176,6 +216,84 @@ class Fornecedor(db.Model):
 # ====================================================================
 
 
+# ====================================================================
+# [BLOCO] CLASSE
+# [NOME] MovimentacaoEstoque
+# [RESPONSABILIDADE] Registrar cada variação de estoque_atual em um livro-razão somente de inserção
+# ====================================================================
+class MovimentacaoEstoque(db.Model):
+    __tablename__ = "movimentacoes_estoque"
+    __table_args__ = (
+        db.Index("ix_mov_estoque_peca_criado", "peca_id", "criado_em"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Sem FK: o histórico sobrevive à exclusão da peça
+    peca_id = db.Column(db.Integer, nullable=False)
+    codigo_peca = db.Column(db.String(50), nullable=True)
+    tipo_mov = db.Column(db.String(20), nullable=False)
+    # Variação com sinal: negativa = saída, positiva = entrada
+    quantidade = db.Column(db.Integer, nullable=False)
+    referencia = db.Column(db.String(120), nullable=True)
+    usuario = db.Column(db.String(64), nullable=True)
+    criado_em = db.Column(
+        db.DateTime, nullable=False, default=datetime.utcnow, index=True
+    )
+
+    def as_dict(self) -> dict:
+        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+
+
+# ====================================================================
+# [FIM BLOCO] MovimentacaoEstoque
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] CLASSE
+# [NOME] EstoqueSnapshot
+# [RESPONSABILIDADE] Guardar fotografias periódicas do estoque como base para consultas "saldo em data X"
+# ====================================================================
+class EstoqueSnapshot(db.Model):
+    __tablename__ = "estoque_snapshots"
+    __table_args__ = (
+        db.Index("ix_estoque_snapshot_tirado_peca", "tirado_em", "peca_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    peca_id = db.Column(db.Integer, nullable=False)
+    estoque = db.Column(db.Integer, nullable=False)
+    # Última movimentação já refletida em `estoque` (as seguintes são delta)
+    ultimo_mov_id = db.Column(db.Integer, nullable=False, default=0)
+    tirado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+# ====================================================================
+# [FIM BLOCO] EstoqueSnapshot
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] CLASSE
+# [NOME] EstoqueDiario
+# [RESPONSABILIDADE] Série diária compacta do estoque: uma linha só quando o saldo da peça muda
+# ====================================================================
+class EstoqueDiario(db.Model):
+    __tablename__ = "estoque_diario"
+    __table_args__ = (db.Index("ix_estoque_diario_dia", "dia"),)
+
+    # Sem FK: o histórico sobrevive à exclusão da peça
+    peca_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    # Vale deste dia até a véspera da próxima linha da mesma peça
+    dia = db.Column(db.Date, primary_key=True)
+    estoque = db.Column(db.Integer, nullable=False)
+
+
+# ====================================================================
+# [FIM BLOCO] EstoqueDiario
+# ====================================================================
+
+
 # ====================================================================
 # [BLOCO] BLOCO_UTIL
 # [NOME] seção_producao_montagem_models
@@ -196,10 +314,17 @@ class Fornecedor(db.Model):
 # ====================================================================
 class Montagem(db.Model):
     __tablename__ = "montagens"
+    __table_args__ = (
+        # histórico paginado por (data_hora, id) com filtros (api/historico)
+        db.Index("ix_montagens_data_hora", "data_hora"),
+        db.Index("ix_montagens_modelo_data_hora", "modelo", "data_hora"),
+        db.Index("ix_montagens_usuario_data_hora", "usuario", "data_hora"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     modelo = db.Column(db.String(32), nullable=False)
-    serial = db.Column(db.String(32), nullable=False)
+    # ix_montagens_serial (único): um serial nunca vale para duas montagens
+    serial = db.Column(db.String(32), nullable=False, unique=True, index=True)
     data_hora = db.Column(db.DateTime, nullable=False)
     usuario = db.Column(db.String(64), nullable=False)
     status = db.Column(db.String(16), nullable=False)
@@ -212,6 +337,8 @@ class Montagem(db.Model):
     label_print_count = db.Column(db.Integer, nullable=False)
     qrcode_path = db.Column(db.String(255), nullable=True)
     label_path = db.Column(db.String(255), nullable=True)
+    # Reserva de componentes do lote que gerou esta montagem (snapshot da BOM)
+    reserva_id = db.Column(db.Integer, nullable=True, index=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(
         db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow
@@ -246,6 +373,101 @@ class LabelReprintLog(db.Model):
 # ====================================================================
 
 
+# ====================================================================
+# [BLOCO] CLASSE
+# [NOME] ReservaMontagem
+# [RESPONSABILIDADE] Cabeçalho da reserva de componentes de um lote de montagem (unidades reservadas/estornadas)
+# ====================================================================
+class ReservaMontagem(db.Model):
+    __tablename__ = "reservas_montagem"
+
+    id = db.Column(db.Integer, primary_key=True)
+    modelo = db.Column(db.String(32), nullable=True)
+    codigo_conjunto = db.Column(db.String(50), nullable=False)
+    unidades = db.Column(db.Integer, nullable=False)
+    unidades_estornadas = db.Column(db.Integer, nullable=False, default=0)
+    referencia = db.Column(db.String(120), nullable=True)
+    usuario = db.Column(db.String(64), nullable=True)
+    criado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def as_dict(self) -> dict:
+        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+
+
+# ====================================================================
+# [FIM BLOCO] ReservaMontagem
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] CLASSE
+# [NOME] ReservaMontagemItem
+# [RESPONSABILIDADE] Linha (peça, quantidade por unidade) efetivamente baixada na reserva do lote
+# ====================================================================
+class ReservaMontagemItem(db.Model):
+    __tablename__ = "reservas_montagem_itens"
+
+    id = db.Column(db.Integer, primary_key=True)
+    reserva_id = db.Column(db.Integer, nullable=False, index=True)
+    peca_id = db.Column(db.Integer, nullable=False)
+    codigo_peca = db.Column(db.String(50), nullable=True)
+    quantidade_por_unidade = db.Column(db.Integer, nullable=False)
+
+
+# ====================================================================
+# [FIM BLOCO] ReservaMontagemItem
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] CLASSE
+# [NOME] SerialContador
+# [RESPONSABILIDADE] Guardar o contador global de números de série (reservado em blocos por worker)
+# ====================================================================
+class SerialContador(db.Model):
+    __tablename__ = "serial_contadores"
+
+    nome = db.Column(db.String(32), primary_key=True)  # 'global'
+    # último número já reservado (entregue ou em bloco de algum worker)
+    valor = db.Column(db.BigInteger, nullable=False, default=0)
+    atualizado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+# ====================================================================
+# [FIM BLOCO] SerialContador
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] CLASSE
+# [NOME] SerialAuditoria
+# [RESPONSABILIDADE] Registrar cada número de série emitido (quem, quando, qual modelo)
+# ====================================================================
+class SerialAuditoria(db.Model):
+    __tablename__ = "serial_auditoria"
+    __table_args__ = (
+        db.Index("ix_serial_auditoria_serial", "serial"),
+        db.Index("ix_serial_auditoria_emitido_em", "emitido_em"),
+        db.Index("ix_serial_auditoria_modelo_emitido", "modelo", "emitido_em"),
+        db.Index("ix_serial_auditoria_usuario_emitido", "usuario", "emitido_em"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    serial = db.Column(db.String(32), nullable=False)
+    modelo = db.Column(db.String(32), nullable=False)
+    usuario = db.Column(db.String(100), nullable=True)
+    emitido_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    origem = db.Column(db.String(20), nullable=False, default="gerador")  # 'gerador' | 'arquivo'
+
+    def as_dict(self):
+        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+
+
+# ====================================================================
+# [FIM BLOCO] SerialAuditoria
+# ====================================================================
+
+
 # ====================================================================
 # [BLOCO] BLOCO_UTIL
 # [NOME] seção_gp_models
@@ -430,7 +652,7 @@ class GPROPAlert(db.Model):
     __tablename__ = "gp_rop_alerts"
 
     id = db.Column(db.Integer, primary_key=True)
-    peca_id = db.Column(db.Integer, nullable=False)
+    peca_id = db.Column(db.Integer, nullable=False, unique=True)
     in_alert = db.Column(db.Boolean, nullable=False)
     last_sent_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -513,7 +735,8 @@ class GPWorkOrder(db.Model):
     __tablename__ = "gp_work_order"
 
     id = db.Column(db.Integer, primary_key=True)
-    serial = db.Column(db.String(64), nullable=False)
+    # ix_gp_work_order_serial (único): uma ordem por serial (upsert em ensure_gp_workorder)
+    serial = db.Column(db.String(64), nullable=False, unique=True, index=True)
     modelo = db.Column(db.String(50), nullable=False)
     current_bench = db.Column(db.String(10), nullable=False)
     status = db.Column(db.String(20), nullable=False)
@@ -538,6 +761,19 @@ class GPWorkOrder(db.Model):
 # ====================================================================
 class OmieRequisicao(db.Model):
     __tablename__ = "omie_requisicoes"
+    __table_args__ = (
+        db.Index("ix_omie_requisicoes_status_created", "status", "created_at"),
+        db.Index("ix_omie_requisicoes_peca_status", "peca_id", "status"),
+        db.Index("ix_omie_requisicoes_status_id", "status", "id"),
+        # no máximo uma requisição em aberto por peça (enfileiramentos concorrentes)
+        db.Index(
+            "uq_omie_requisicoes_peca_aberta",
+            "peca_id",
+            unique=True,
+            postgresql_where=db.text("status IN ('pendente', 'enviando')"),
+            sqlite_where=db.text("status IN ('pendente', 'enviando')"),
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     peca_id = db.Column(db.Integer, nullable=False)
@@ -548,6 +784,8 @@ class OmieRequisicao(db.Model):
     erro_msg = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     sent_at = db.Column(db.DateTime, nullable=True)
+    # momento em que um envio reservou a linha ('enviando'); reserva velha volta a 'pendente'
+    claimed_at = db.Column(db.DateTime, nullable=True)
 
     def as_dict(self):
         return {c.name: getattr(self, c.name) for c in self.__table__.columns}
@@ -558,6 +796,70 @@ class OmieRequisicao(db.Model):
 # ====================================================================
 
 
+# ====================================================================
+# [BLOCO] CLASSE
+# [NOME] OmieSyncCheckpoint
+# [RESPONSABILIDADE] Guardar ponto de retomada das sincronizações incrementais com o OMIE
+# ====================================================================
+class OmieSyncCheckpoint(db.Model):
+    __tablename__ = "omie_sync_checkpoints"
+
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(50), nullable=False, unique=True)  # 'produtos', 'estoque'
+    # início da última execução concluída: a próxima busca só o que mudou desde então
+    marca_desde = db.Column(db.DateTime, nullable=True)
+    # execução em andamento: última página aplicada (retomada após queda)
+    pagina = db.Column(db.Integer, nullable=False, default=0)
+    iniciado_em = db.Column(db.DateTime, nullable=True)
+    concluido_em = db.Column(db.DateTime, nullable=True)
+    resumo = db.Column(db.Text, nullable=True)
+
+
+# ====================================================================
+# [FIM BLOCO] OmieSyncCheckpoint
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] CLASSE
+# [NOME] JobCheckpoint
+# [RESPONSABILIDADE] Guardar até onde cada job em lotes/diário já rodou (retomada sem reprocessar)
+# ====================================================================
+class JobCheckpoint(db.Model):
+    __tablename__ = "job_checkpoints"
+
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(50), nullable=False, unique=True)  # 'estoque_diario', ...
+    # último dia já fechado (jobs diários)
+    ultimo_dia = db.Column(db.Date, nullable=True)
+    # último id já processado (jobs que percorrem uma tabela por id)
+    ultimo_id = db.Column(db.BigInteger, nullable=True)
+    atualizado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+# ====================================================================
+# [FIM BLOCO] JobCheckpoint
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] CLASSE
+# [NOME] CacheVersao
+# [RESPONSABILIDADE] Versionar tabelas de origem de caches em arquivo (incrementa a cada commit que as altera)
+# ====================================================================
+class CacheVersao(db.Model):
+    __tablename__ = "cache_versoes"
+
+    tabela = db.Column(db.String(64), primary_key=True)
+    versao = db.Column(db.Integer, nullable=False, default=1)
+    atualizado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+# ====================================================================
+# [FIM BLOCO] CacheVersao
+# ====================================================================
+
+
 # ====================================================================
 # [BLOCO] BLOCO_UTIL
 # [NOME] exports_publicos
@@ -570,9 +872,16 @@ __all__ = [
     "EstruturaMaquina",
     "Fornecedor",
     "FornecedoresPorPeca",
+    "MovimentacaoEstoque",
+    "EstoqueSnapshot",
+    "EstoqueDiario",
     # Produção/Montagem
     "Montagem",
     "LabelReprintLog",
+    "ReservaMontagem",
+    "ReservaMontagemItem",
+    "SerialContador",
+    "SerialAuditoria",
     # GP
     "GPChecklistExecution",
     "GPChecklistTemplate",
@@ -586,6 +895,10 @@ __all__ = [
     "GPWorkOrder",
     # OMIE
     "OmieRequisicao",
+    "OmieSyncCheckpoint",
+    "JobCheckpoint",
+    # Infra
+    "CacheVersao",
 ]
 
 # ------------------------------------------------------------
@@ -607,12 +920,21 @@ __all__.append("GPWorkOrderHistory")
 # CLASSE: Usuario
 # BLOCO_UTIL: seção_estoque_models
 # CLASSE: Peca
+# FUNÇÃO: _busca_dos_parametros
+# FUNÇÃO: _sincronizar_busca_peca
 # CLASSE: EstruturaMaquina
 # CLASSE: FornecedoresPorPeca
 # CLASSE: Fornecedor
+# CLASSE: MovimentacaoEstoque
+# CLASSE: EstoqueSnapshot
+# CLASSE: EstoqueDiario
 # BLOCO_UTIL: seção_producao_montagem_models
 # CLASSE: Montagem
 # CLASSE: LabelReprintLog
+# CLASSE: ReservaMontagem
+# CLASSE: ReservaMontagemItem
+# CLASSE: SerialContador
+# CLASSE: SerialAuditoria
 # BLOCO_UTIL: seção_gp_models
 # CLASSE: GPChecklistExecution
 # CLASSE: GPChecklistTemplate
@@ -625,5 +947,8 @@ __all__.append("GPWorkOrderHistory")
 # CLASSE: GPHipotRun
 # CLASSE: GPWorkOrder
 # CLASSE: OmieRequisicao
+# CLASSE: OmieSyncCheckpoint
+# CLASSE: JobCheckpoint
+# CLASSE: CacheVersao
 # BLOCO_UTIL: exports_publicos
 # ====================================================================
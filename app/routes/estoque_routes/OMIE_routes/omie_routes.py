@@ -2,7 +2,10 @@
 from __future__ import annotations
 
 import logging
-from flask import Blueprint, render_template, jsonify, Response
+from datetime import datetime, timedelta
+
+from flask import Blueprint, render_template, jsonify, request, send_file, url_for
+from app.services import exportacao_service
 from app.utils import omie_utils
 
 # Logger simples para este módulo
@@ -64,26 +67,230 @@ def listar_requisicoes():
 # ====================================================================
 
 
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _parse_dia
+# [RESPONSABILIDADE] Converter data YYYY-MM-DD em datetime (fim do dia quando 'ate')
+# ====================================================================
+def _parse_dia(valor, fim_do_dia: bool = False):
+    s = (valor or "").strip()
+    if not s:
+        return None
+    dt = datetime.strptime(s, "%Y-%m-%d")
+    return dt + timedelta(days=1) - timedelta(microseconds=1) if fim_do_dia else dt
+
+
+# ====================================================================
+# [FIM BLOCO] _parse_dia
+# ====================================================================
+
+
 # ====================================================================
 # [BLOCO] ROTA
-# [NOME] export_produtos
-# [RESPONSABILIDADE] Exportar catálogo de produtos OMIE para Excel (.xlsx)
+# [NOME] api_listar_requisicoes
+# [RESPONSABILIDADE] Listar requisições com filtros, paginação por cursor e contagem por status
 # ====================================================================
-@estoque_omie_bp.route("/export/produtos", methods=["GET"])
-def export_produtos():
-    """Exporta catálogo de produtos para Excel."""
+@estoque_omie_bp.route("/api/requisicoes/listar", methods=["GET"])
+def api_listar_requisicoes():
+    """
+    GET /estoque/omie/api/requisicoes/listar
+        ?status=&fornecedor=&q=&de=YYYY-MM-DD&ate=YYYY-MM-DD&cursor=<id>&limite=50
+    Resposta: { items: [...], next_cursor: id|null, contagens: {status: n} }
+    """
     try:
-        excel_bytes = omie_utils.exportar_produtos_excel()
-        return Response(
-            excel_bytes,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=produtos.xlsx"},
+        de = _parse_dia(request.args.get("de"))
+        ate = _parse_dia(request.args.get("ate"), fim_do_dia=True)
+        cursor = request.args.get("cursor", type=int)
+        limite = request.args.get("limite", default=50, type=int)
+    except ValueError:
+        return jsonify({"error": "Parâmetros de data inválidos."}), 400
+
+    try:
+        dados = omie_utils.consultar_requisicoes(
+            status=(request.args.get("status") or "").strip() or None,
+            fornecedor=(request.args.get("fornecedor") or "").strip() or None,
+            de=de,
+            ate=ate,
+            q=(request.args.get("q") or "").strip() or None,
+            cursor=cursor,
+            limite=limite,
         )
+        return jsonify(dados)
     except Exception as e:
-        logger.error(f"[OMIE] Erro ao exportar produtos: {e}")
+        logger.error(f"[OMIE] Erro ao listar requisições: {e}")
         return jsonify({"error": str(e)}), 500
 
 
+# ====================================================================
+# [FIM BLOCO] api_listar_requisicoes
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] ROTA
+# [NOME] api_detalhar_requisicao
+# [RESPONSABILIDADE] Retornar cabeçalho e itens de uma requisição OMIE (por cod_int)
+# ====================================================================
+@estoque_omie_bp.route("/api/requisicoes/<string:cod>", methods=["GET"])
+def api_detalhar_requisicao(cod: str):
+    dados = omie_utils.detalhar_requisicao(cod.strip())
+    if dados is None:
+        return jsonify({"error": "Requisição não encontrada."}), 404
+    return jsonify(dados)
+
+
+# ====================================================================
+# [FIM BLOCO] api_detalhar_requisicao
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _job_json
+# [RESPONSABILIDADE] Completar estado do job de exportação com URLs de consulta e download
+# ====================================================================
+def _job_json(job: dict) -> dict:
+    dados = dict(job)
+    dados["status_url"] = url_for(".status_job_exportacao", job_id=job["id"])
+    dados["download_url"] = url_for(".download_job_exportacao", job_id=job["id"])
+    return dados
+
+
+# ====================================================================
+# [FIM BLOCO] _job_json
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _responder_exportacao
+# [RESPONSABILIDADE] Servir arquivo exportado (200) ou devolver job em segundo plano (202)
+# ====================================================================
+def _responder_exportacao(nome: str, formato: str, params: dict | None = None):
+    forcar_job = (request.args.get("async") or "").lower() in ("1", "true", "sim")
+    try:
+        tipo, valor = exportacao_service.preparar(nome, formato, params, forcar_job)
+    except exportacao_service.ExportacaoInvalida as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"[OMIE] Erro ao exportar {nome}.{formato}: {e}")
+        return jsonify({"error": str(e)}), 500
+
+    if tipo == "job":
+        return jsonify(_job_json(valor)), 202
+    return send_file(
+        valor,
+        mimetype=exportacao_service.FORMATOS[formato][1],
+        as_attachment=True,
+        download_name=exportacao_service.nome_download(nome, formato),
+        max_age=0,
+    )
+
+
+# ====================================================================
+# [FIM BLOCO] _responder_exportacao
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] ROTA
+# [NOME] api_exportar
+# [RESPONSABILIDADE] Exportar catálogo (produtos, fornecedores, produto_fornecedor, snapshot) em xlsx/csv
+# ====================================================================
+@estoque_omie_bp.route("/api/export/<string:nome>.<string:formato>", methods=["GET"])
+def api_exportar(nome: str, formato: str):
+    """
+    GET /estoque/omie/api/export/<nome>.<xlsx|csv>[?async=1]
+    200 = arquivo (csv vem compactado, .csv.gz); 202 = job com status_url/download_url.
+    """
+    return _responder_exportacao(nome, formato)
+
+
+# ====================================================================
+# [FIM BLOCO] api_exportar
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] ROTA
+# [NOME] api_exportar_requisicoes
+# [RESPONSABILIDADE] Exportar requisições OMIE com os filtros da listagem
+# ====================================================================
+@estoque_omie_bp.route("/api/requisicoes/export.<string:formato>", methods=["GET"])
+def api_exportar_requisicoes(formato: str):
+    try:
+        de = _parse_dia(request.args.get("de"))
+        ate = _parse_dia(request.args.get("ate"), fim_do_dia=True)
+    except ValueError:
+        return jsonify({"error": "Parâmetros de data inválidos."}), 400
+    params = {
+        "status": request.args.get("status"),
+        "fornecedor": request.args.get("fornecedor"),
+        "q": request.args.get("q"),
+        "de": de.isoformat() if de else None,
+        "ate": ate.isoformat() if ate else None,
+    }
+    return _responder_exportacao("requisicoes", formato, params)
+
+
+# ====================================================================
+# [FIM BLOCO] api_exportar_requisicoes
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] ROTA
+# [NOME] status_job_exportacao
+# [RESPONSABILIDADE] Consultar andamento de um job de exportação
+# ====================================================================
+@estoque_omie_bp.route("/api/export/jobs/<string:job_id>", methods=["GET"])
+def status_job_exportacao(job_id: str):
+    job = exportacao_service.estado_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job não encontrado."}), 404
+    return jsonify(_job_json(job))
+
+
+# ====================================================================
+# [FIM BLOCO] status_job_exportacao
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] ROTA
+# [NOME] download_job_exportacao
+# [RESPONSABILIDADE] Baixar o arquivo de um job de exportação concluído
+# ====================================================================
+@estoque_omie_bp.route("/api/export/jobs/<string:job_id>/download", methods=["GET"])
+def download_job_exportacao(job_id: str):
+    job = exportacao_service.estado_job(job_id)
+    caminho = exportacao_service.arquivo_do_job(job_id)
+    if job is None or caminho is None:
+        return jsonify({"error": "Arquivo ainda não disponível.", "job": job}), 404
+    return send_file(
+        caminho,
+        mimetype=exportacao_service.FORMATOS[job["formato"]][1],
+        as_attachment=True,
+        download_name=exportacao_service.nome_download(job["exportacao"], job["formato"]),
+        max_age=0,
+    )
+
+
+# ====================================================================
+# [FIM BLOCO] download_job_exportacao
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] ROTA
+# [NOME] export_produtos
+# [RESPONSABILIDADE] Exportar catálogo de produtos OMIE para Excel (.xlsx)
+# ====================================================================
+@estoque_omie_bp.route("/export/produtos", methods=["GET"])
+def export_produtos():
+    return _responder_exportacao("produtos", "xlsx")
+
+
 # ====================================================================
 # [FIM BLOCO] export_produtos
 # ====================================================================
@@ -96,17 +303,7 @@ def export_produtos():
 # ====================================================================
 @estoque_omie_bp.route("/export/fornecedores", methods=["GET"])
 def export_fornecedores():
-    """Exporta catálogo de fornecedores para Excel."""
-    try:
-        excel_bytes = omie_utils.exportar_fornecedores_excel()
-        return Response(
-            excel_bytes,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=fornecedores.xlsx"},
-        )
-    except Exception as e:
-        logger.error(f"[OMIE] Erro ao exportar fornecedores: {e}")
-        return jsonify({"error": str(e)}), 500
+    return _responder_exportacao("fornecedores", "xlsx")
 
 
 # ====================================================================
@@ -121,19 +318,7 @@ def export_fornecedores():
 # ====================================================================
 @estoque_omie_bp.route("/export/produtos_fornecedores", methods=["GET"])
 def export_produtos_fornecedores():
-    """Exporta relacionamento produtos x fornecedores para Excel."""
-    try:
-        excel_bytes = omie_utils.exportar_produtos_fornecedores_excel()
-        return Response(
-            excel_bytes,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={
-                "Content-Disposition": "attachment; filename=produtos_fornecedores.xlsx"
-            },
-        )
-    except Exception as e:
-        logger.error(f"[OMIE] Erro ao exportar produtos x fornecedores: {e}")
-        return jsonify({"error": str(e)}), 500
+    return _responder_exportacao("produtos_fornecedores", "xlsx")
 
 
 # ====================================================================
@@ -148,19 +333,7 @@ def export_produtos_fornecedores():
 # ====================================================================
 @estoque_omie_bp.route("/export/snapshot_pp", methods=["GET"])
 def export_snapshot_ponto_pedido():
-    """Exporta snapshot do ponto de pedido para Excel."""
-    try:
-        excel_bytes = omie_utils.exportar_snapshot_ponto_pedido_excel()
-        return Response(
-            excel_bytes,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={
-                "Content-Disposition": "attachment; filename=snapshot_ponto_pedido.xlsx"
-            },
-        )
-    except Exception as e:
-        logger.error(f"[OMIE] Erro ao exportar snapshot ponto de pedido: {e}")
-        return jsonify({"error": str(e)}), 500
+    return _responder_exportacao("snapshot_ponto_pedido", "xlsx")
 
 
 # ====================================================================
@@ -168,14 +341,42 @@ def export_snapshot_ponto_pedido():
 # ====================================================================
 
 
+# ====================================================================
+# [BLOCO] ROTA
+# [NOME] status_cliente_omie
+# [RESPONSABILIDADE] Retornar estado do circuito e métricas de latência das chamadas OMIE
+# ====================================================================
+@estoque_omie_bp.route("/status", methods=["GET"])
+def status_cliente_omie():
+    """Métricas do cliente OMIE deste processo (cada worker tem o seu)."""
+    from app.utils.omie_client import get_omie_client
+
+    return jsonify(get_omie_client().status())
+
+
+# ====================================================================
+# [FIM BLOCO] status_cliente_omie
+# ====================================================================
+
+
 # ====================================================================
 # MAPA DO ARQUIVO
 # --------------------------------------------------------------------
 # BLUEPRINT: estoque_omie_bp
 # ROTA: home_omie
 # ROTA: listar_requisicoes
+# FUNÇÃO: _parse_dia
+# ROTA: api_listar_requisicoes
+# ROTA: api_detalhar_requisicao
+# FUNÇÃO: _job_json
+# FUNÇÃO: _responder_exportacao
+# ROTA: api_exportar
+# ROTA: api_exportar_requisicoes
+# ROTA: status_job_exportacao
+# ROTA: download_job_exportacao
 # ROTA: export_produtos
 # ROTA: export_fornecedores
 # ROTA: export_produtos_fornecedores
 # ROTA: export_snapshot_ponto_pedido
+# ROTA: status_cliente_omie
 # ====================================================================
@@ -1,8 +1,6 @@
 from flask import Blueprint, jsonify, request
 
-# Use the SQLAlchemy models instead of dataclasses. Import from the
-# auto-generated models_sqla package to ensure that ``.query`` is available.
-from app.models_sqla import Peca
+from app.services.indice_pecas_service import LIMITE_PADRAO, sugerir_pecas
 
 # ====================================================================
 # [BLOCO] BLUEPRINT
@@ -19,18 +17,20 @@ autocomplete_bp = Blueprint("autocomplete_bp", __name__)
 # ====================================================================
 @autocomplete_bp.route("/api/pecas_autocomplete")
 def pecas_autocomplete():
-    termo = request.args.get("termo", "").lower()
+    """
+    GET /api/pecas_autocomplete?termo=&limite=10
+    Busca por código ou descrição (sem acento, em qualquer ordem de palavras)
+    no índice em memória; código exato vem primeiro.
+    """
+    termo = request.args.get("termo", "")
+    limite = request.args.get("limite", default=LIMITE_PADRAO, type=int)
 
     # ====================================================================
-    # [BLOCO] BLOCO_DB
-    # [NOME] consulta_pecas_autocomplete_db
-    # [RESPONSABILIDADE] Filtrar peças por descrição com limite de resultados
+    # [BLOCO] BLOCO_UTIL
+    # [NOME] consulta_indice_autocomplete
+    # [RESPONSABILIDADE] Consultar o índice de peças do processo (sem ida ao banco)
     # ====================================================================
-    resultados = Peca.query.filter(Peca.descricao.ilike(f"%{termo}%")).limit(10).all()
-
-    sugestoes = [
-        {"descricao": p.descricao, "codigo": p.codigo_pneumark} for p in resultados
-    ]
+    sugestoes = sugerir_pecas(termo, limite)
     return jsonify(sugestoes)
 
 
@@ -47,5 +47,5 @@ def pecas_autocomplete():
 # --------------------------------------------------------------------
 # BLUEPRINT: autocomplete_bp
 # FUNÇÃO: pecas_autocomplete
-# BLOCO_DB: consulta_pecas_autocomplete_db
+# BLOCO_UTIL: consulta_indice_autocomplete
 # ====================================================================
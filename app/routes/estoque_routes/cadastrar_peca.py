@@ -8,6 +8,12 @@ from app.models_sqla import (
     FornecedoresPorPeca as FornecedorPorPeca,
     EstruturaMaquina,
 )
+from app.services.montagem.bom_service import invalidar_cache_bom
+from app.services.movimentacao_service import (
+    TIPO_CADASTRO,
+    marcar_pecas_tocadas,
+    registrar_ajuste,
+)
 
 
 # ====================================================================
@@ -74,6 +80,10 @@ def cadastrar_peca():
         )
         db.session.add(nova_peca)
         db.session.commit()
+        # estoque inicial entra no livro-razão (commit junto com fornecedores/estrutura)
+        registrar_ajuste(nova_peca, 0, tipo_mov=TIPO_CADASTRO, referencia="CADASTRO")
+        # peça nova já pode nascer abaixo do ponto de pedido (estoque inicial 0)
+        marcar_pecas_tocadas([nova_peca.id])
 
         # === Salvar fornecedores ===
         # ====================================================================
@@ -114,6 +124,8 @@ def cadastrar_peca():
                         db.session.add(estrutura)
 
         db.session.commit()
+        if tipo_item == "conjunto":
+            invalidar_cache_bom()
         return redirect(url_for("cadastrar_peca_bp.cadastrar_peca"))
     # Import ``Fornecedor`` from the SQLAlchemy models.  The original code
     # referenced ``app.models.estoque_models.fornecedor``, which no longer
@@ -3,6 +3,8 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from sqlalchemy.exc import IntegrityError
 from app import db
 from app.models_sqla import Peca, EstruturaMaquina
+from app.services.montagem.bom_service import invalidar_cache_bom
+from app.services.movimentacao_service import registrar_ajuste
 
 # ====================================================================
 # [BLOCO] BLUEPRINT
@@ -52,7 +54,9 @@ def editar_conjunto(conjunto_id):
         conjunto.codigo_pneumark = novo_codigo
         conjunto.descricao = nova_desc
         if novo_estoq is not None and novo_estoq != "":
+            estoque_anterior = conjunto.estoque_atual
             conjunto.estoque_atual = novo_estoq
+            registrar_ajuste(conjunto, estoque_anterior, referencia="EDICAO_CONJUNTO")
 
         # --------- 2) Atualiza ESTRUTURA (BOM) ---------
         # ====================================================================
@@ -83,6 +87,7 @@ def editar_conjunto(conjunto_id):
 
         try:
             db.session.commit()
+            invalidar_cache_bom()
             flash("Conjunto e estrutura salvos com sucesso!", "success")
         except IntegrityError:
             # ====================================================================
@@ -5,6 +5,8 @@ from app import db
 from app.models_sqla import Peca, EstruturaMaquina
 from sqlalchemy.exc import IntegrityError
 from app.routes.producao_routes.painel_routes.rop_service import handle_rop_on_change
+from app.services.montagem.bom_service import invalidar_cache_bom
+from app.services.movimentacao_service import marcar_pecas_tocadas, registrar_ajuste
 
 
 # ====================================================================
@@ -49,9 +51,13 @@ def editar_peca(peca_id):
             peca.estoque_maximo = int(
                 request.form.get("estoque_maximo") or peca.estoque_maximo or 0
             )
+            estoque_anterior = peca.estoque_atual
             peca.estoque_atual = int(
                 request.form.get("estoque_atual") or peca.estoque_atual or 0
             )
+            registrar_ajuste(peca, estoque_anterior, referencia="EDICAO_PECA")
+            # PP/máximo podem ter mudado sem alterar estoque: reavalia ROP no commit
+            marcar_pecas_tocadas([peca.id])
             peca.margem = float(request.form.get("margem") or peca.margem or 0)
             peca.custo = float(request.form.get("custo") or peca.custo or 0)
 
@@ -199,6 +205,7 @@ def salvar_estrutura_conjunto(peca_id):
             inseridos += 1
 
         db.session.commit()
+        invalidar_cache_bom()
 
         # (Opcional) Dispara checagem ROP após salvar a estrutura
         # ====================================================================
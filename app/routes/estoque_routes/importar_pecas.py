@@ -0,0 +1,82 @@
+# app/routes/estoque_routes/importar_pecas.py
+from __future__ import annotations
+
+import logging
+
+from flask import Blueprint, Response, jsonify, request
+
+from app.services.importacao_pecas_service import importar_pecas, relatorio_erros_csv
+from app.services.movimentacao_service import usuario_corrente
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================
+# [BLOCO] BLUEPRINT
+# [NOME] importar_pecas_bp
+# [RESPONSABILIDADE] Registrar API de importação de peças por planilha Excel
+# ====================================================================
+importar_pecas_bp = Blueprint(
+    "importar_pecas_bp",
+    __name__,
+    url_prefix="/estoque/importar_pecas",
+)
+# ====================================================================
+# [FIM BLOCO] importar_pecas_bp
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] ROTA
+# [NOME] api_importar_pecas
+# [RESPONSABILIDADE] Receber planilha (multipart 'arquivo'), importar em lote e devolver relatório
+# ====================================================================
+@importar_pecas_bp.route("/api", methods=["POST"])
+def api_importar_pecas():
+    """
+    POST /estoque/importar_pecas/api  (multipart: arquivo=<.xlsx>)
+        ?simular=1            só valida/conta, não grava
+        &atualizar_estoque=1  aplica ESTOQUE ATUAL às peças existentes
+        &relatorio=csv        devolve só as linhas com erro, em CSV
+    """
+    arquivo = request.files.get("arquivo")
+    if arquivo is None or not arquivo.filename:
+        return jsonify({"ok": False, "erro": "Envie a planilha no campo 'arquivo'."}), 400
+    if not arquivo.filename.lower().endswith((".xlsx", ".xlsm", ".xls")):
+        return jsonify({"ok": False, "erro": "Formato não suportado (use .xlsx)."}), 400
+
+    def flag(nome: str) -> bool:
+        return (request.args.get(nome) or request.form.get(nome) or "").lower() in ("1", "true", "sim", "on")
+
+    try:
+        relatorio = importar_pecas(
+            arquivo.stream,
+            simular=flag("simular"),
+            atualizar_estoque=flag("atualizar_estoque"),
+            usuario=usuario_corrente(),
+            referencia=f"IMPORTACAO {arquivo.filename}"[:120],
+        )
+    except ValueError as e:
+        return jsonify({"ok": False, "erro": str(e)}), 400
+    except Exception as e:
+        logger.exception(f"[IMPORTACAO] Falha ao importar {arquivo.filename}: {e}")
+        return jsonify({"ok": False, "erro": "Falha ao importar planilha."}), 500
+
+    if (request.args.get("relatorio") or "").lower() == "csv":
+        return Response(
+            relatorio_erros_csv(relatorio),
+            mimetype="text/csv",
+            headers={"Content-Disposition": "attachment; filename=importacao_erros.csv"},
+        )
+    return jsonify({"ok": True, **relatorio})
+
+
+# ====================================================================
+# [FIM BLOCO] api_importar_pecas
+# ====================================================================
+
+# ====================================================================
+# MAPA DO ARQUIVO
+# --------------------------------------------------------------------
+# BLUEPRINT: importar_pecas_bp
+# ROTA: api_importar_pecas
+# ====================================================================
@@ -1,11 +1,18 @@
 # app/routes/estoque_routes/listar_pecas.py
-from flask import Blueprint, render_template, request
-from sqlalchemy import or_, case, func
+import base64
+import binascii
+import json
+
+from flask import Blueprint, jsonify, render_template, request, url_for
+from sqlalchemy import and_, case, func, or_
+
+from app import db
 
 # Import from the SQLAlchemy models package.  The ``Peca`` class
 # defined in ``app.models_sqla`` exposes the ``.query`` API that
 # SQLAlchemy constructs rely on.
 from app.models_sqla import Peca
+from app.utils.texto_utils import normalizar_busca
 
 # ====================================================================
 # [BLOCO] BLUEPRINT
@@ -14,49 +21,275 @@ from app.models_sqla import Peca
 # ====================================================================
 listar_pecas_bp = Blueprint("listar_pecas_bp", __name__)
 
+# ====================================================================
+# [BLOCO] BLOCO_UTIL
+# [NOME] ordenacoes_listagem
+# [RESPONSABILIDADE] Colunas aceitas em ?ordem= (lista fechada; nada vem cru do cliente)
+# ====================================================================
+ORDENACOES = {
+    "codigo": Peca.codigo_pneumark,
+    "descricao": Peca.descricao,
+    "estoque_minimo": Peca.estoque_minimo,
+    "estoque_atual": Peca.estoque_atual,
+    "estoque_maximo": Peca.estoque_maximo,
+    "margem": Peca.margem,
+    "custo": Peca.custo,
+}
+POR_PAGINA_PADRAO = 50
+POR_PAGINA_MAX = 200
+# ====================================================================
+# [FIM BLOCO] ordenacoes_listagem
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _chaves_ordenacao
+# [RESPONSABILIDADE] Montar as chaves (expressão, desc, anulável) da ordenação, sempre terminando em id
+# ====================================================================
+def _chaves_ordenacao(ordem: str, desc: bool):
+    if ordem in ORDENACOES:
+        return [(ORDENACOES[ordem], desc, True), (Peca.id, False, False)]
+    # padrão: conjuntos no topo, depois descrição A→Z
+    return [
+        (case((Peca.tipo == "conjunto", 0), else_=1), False, False),
+        (Peca.descricao, False, True),
+        (Peca.id, False, False),
+    ]
+
+
+# ====================================================================
+# [FIM BLOCO] _chaves_ordenacao
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _valores_cursor
+# [RESPONSABILIDADE] Extrair da última linha os valores das chaves de ordenação
+# ====================================================================
+def _valores_cursor(ordem: str, linha) -> list:
+    if ordem in ORDENACOES:
+        return [getattr(linha, ORDENACOES[ordem].key), linha.id]
+    return [0 if linha.tipo == "conjunto" else 1, linha.descricao, linha.id]
+
+
+# ====================================================================
+# [FIM BLOCO] _valores_cursor
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _codificar_cursor
+# [RESPONSABILIDADE] Cursor opaco (base64 de JSON) com a ordenação e os valores da última linha
+# ====================================================================
+def _codificar_cursor(ordem: str, direcao: str, valores: list) -> str:
+    bruto = json.dumps({"o": ordem, "d": direcao, "v": valores}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(bruto.encode("utf-8")).decode("ascii")
+
+
+# ====================================================================
+# [FIM BLOCO] _codificar_cursor
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _ler_cursor
+# [RESPONSABILIDADE] Decodificar o cursor e conferir se é da mesma ordenação
+# ====================================================================
+def _ler_cursor(cursor: str, ordem: str, direcao: str, n_chaves: int) -> list:
+    """Levanta ValueError para cursor inválido ou de outra ordenação."""
+    try:
+        dados = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("Cursor inválido.")
+    if (
+        not isinstance(dados, dict)
+        or dados.get("o") != ordem
+        or dados.get("d") != direcao
+        or not isinstance(dados.get("v"), list)
+        or len(dados["v"]) != n_chaves
+    ):
+        raise ValueError("Cursor inválido.")
+    return dados["v"]
+
+
+# ====================================================================
+# [FIM BLOCO] _ler_cursor
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _depois_do_cursor
+# [RESPONSABILIDADE] Filtro keyset: linhas posteriores à última da página anterior (NULLs por último)
+# ====================================================================
+def _depois_do_cursor(chaves, valores):
+    condicoes, iguais = [], []
+    for (expr, desc, anulavel), valor in zip(chaves, valores):
+        if valor is None:
+            # NULL é o fim desta chave: só empata com outro NULL
+            iguais.append(expr.is_(None))
+            continue
+        depois = expr < valor if desc else expr > valor
+        if anulavel:
+            depois = or_(depois, expr.is_(None))
+        condicoes.append(and_(*iguais, depois))
+        iguais.append(expr == valor)
+    return or_(*condicoes)
+
+
+# ====================================================================
+# [FIM BLOCO] _depois_do_cursor
+# ====================================================================
+
 
 # ====================================================================
 # [BLOCO] FUNÇÃO
 # [NOME] listar_pecas
-# [RESPONSABILIDADE] Listar peças/conjuntos com filtro de busca e ordenação por tipo e descrição
+# [RESPONSABILIDADE] Renderizar a página de listagem (linhas carregadas sob demanda pela API)
 # ====================================================================
 @listar_pecas_bp.route("/listar_pecas")
 def listar_pecas():
-    busca = (request.args.get("busca") or "").strip().lower()
-
-    q = Peca.query
-    if busca:
-        like = f"%{busca}%"
-        # ====================================================================
-        # [BLOCO] BLOCO_DB
-        # [NOME] filtro_busca_pecas_db
-        # [RESPONSABILIDADE] Aplicar filtro de busca por código Pneumark ou descrição (case-insensitive)
-        # ====================================================================
-        q = q.filter(
-            or_(
-                func.lower(Peca.codigo_pneumark).like(like),
-                func.lower(Peca.descricao).like(like),
-            )
-        )
+    return render_template(
+        "estoque_templates/listar_peca.html",
+        busca=request.args.get("busca", ""),
+    )
+
+
+# ====================================================================
+# [FIM BLOCO] listar_pecas
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] api_listar_pecas
+# [RESPONSABILIDADE] Listar peças paginadas no servidor, com busca normalizada e ordenação
+# ====================================================================
+@listar_pecas_bp.route("/api/pecas", methods=["GET"])
+def api_listar_pecas():
+    """
+    GET /api/pecas?q=&ordem=padrao|codigo|descricao|estoque_atual|...&dir=asc|desc
+                  &por_pagina=50&cursor=
+    - Busca: cada palavra precisa aparecer em busca_normalizada (código +
+      descrição, minúsculo e sem acento), em qualquer ordem.
+    - Paginação por cursor (keyset): 'proximo' da resposta vai em ?cursor=
+      da próxima página, com a mesma ordenação; NULLs vêm por último.
+    - 'total' só é calculado na primeira página (sem cursor).
+    """
+    termos = normalizar_busca(request.args.get("q") or request.args.get("busca")).split()
+    ordem = request.args.get("ordem") or "padrao"
+    if ordem not in ORDENACOES:
+        ordem = "padrao"
+    desc = (request.args.get("dir") or "asc").lower() == "desc"
+    direcao = "desc" if desc else "asc"
+    cursor = request.args.get("cursor") or None
+    por_pagina = max(
+        1,
+        min(
+            request.args.get("por_pagina", default=POR_PAGINA_PADRAO, type=int)
+            or POR_PAGINA_PADRAO,
+            POR_PAGINA_MAX,
+        ),
+    )
+
+    # ====================================================================
+    # [BLOCO] BLOCO_DB
+    # [NOME] filtro_busca_pecas_db
+    # [RESPONSABILIDADE] Aplicar cada termo como LIKE na coluna normalizada (indexada)
+    # ====================================================================
+    filtros = [Peca.busca_normalizada.contains(t, autoescape=True) for t in termos]
 
-    # conjuntos no topo, depois descrição A→Z
-    ordem_conjunto = case((Peca.tipo == "conjunto", 0), else_=1)
     # ====================================================================
     # [BLOCO] BLOCO_DB
     # [NOME] consulta_pecas_ordenadas_db
-    # [RESPONSABILIDADE] Buscar peças/conjuntos ordenando conjuntos primeiro e depois por descrição
+    # [RESPONSABILIDADE] Buscar uma página após o cursor (somente colunas exibidas), com id como desempate
     # ====================================================================
-    pecas = q.order_by(ordem_conjunto.asc(), Peca.descricao.asc()).all()
+    chaves = _chaves_ordenacao(ordem, desc)
+    ordenacao = []
+    for expr, d, anulavel in chaves:
+        termo = expr.desc() if d else expr.asc()
+        ordenacao.append(termo.nulls_last() if anulavel else termo)
+    pagina_filtros = list(filtros)
+    if cursor:
+        try:
+            valores = _ler_cursor(cursor, ordem, direcao, len(chaves))
+        except ValueError as e:
+            return jsonify({"ok": False, "erro": str(e)}), 400
+        pagina_filtros.append(_depois_do_cursor(chaves, valores))
 
-    return render_template(
-        "estoque_templates/listar_peca.html",
-        pecas=pecas,
-        busca=request.args.get("busca", ""),
+    linhas = (
+        db.session.query(
+            Peca.id,
+            Peca.tipo,
+            Peca.codigo_pneumark,
+            Peca.descricao,
+            Peca.estoque_minimo,
+            Peca.estoque_atual,
+            Peca.estoque_maximo,
+            Peca.margem,
+            Peca.custo,
+        )
+        .filter(*pagina_filtros)
+        .order_by(*ordenacao)
+        .limit(por_pagina + 1)
+        .all()
+    )
+    tem_mais = len(linhas) > por_pagina
+    linhas = linhas[:por_pagina]
+    proximo = (
+        _codificar_cursor(ordem, direcao, _valores_cursor(ordem, linhas[-1])) if tem_mais else None
+    )
+
+    total = None
+    if not cursor:
+        total = (
+            len(linhas)
+            if not tem_mais
+            else db.session.query(func.count(Peca.id)).filter(*filtros).scalar()
+        )
+
+    itens = []
+    for p in linhas:
+        if p.tipo == "conjunto":
+            editar_url = url_for("editar_conjunto_bp.editar_conjunto", conjunto_id=p.id)
+        else:
+            editar_url = url_for("editar_peca_bp.editar_peca", peca_id=p.id)
+        itens.append(
+            {
+                "id": p.id,
+                "tipo": p.tipo,
+                "codigo": p.codigo_pneumark,
+                "descricao": p.descricao,
+                "estoque_minimo": p.estoque_minimo,
+                "estoque_atual": p.estoque_atual,
+                "estoque_maximo": p.estoque_maximo,
+                "margem": p.margem,
+                "custo": p.custo,
+                "editar_url": editar_url,
+                "consultar_url": url_for("consultar_peca_bp.consultar_peca", peca_id=p.id),
+                "deletar_url": url_for("deletar_peca_bp.deletar_peca", peca_id=p.id),
+            }
+        )
+
+    return jsonify(
+        {
+            "itens": itens,
+            "proximo": proximo,
+            "por_pagina": por_pagina,
+            "tem_mais": tem_mais,
+            "total": total,
+            "ordem": ordem,
+            "dir": direcao,
+        }
     )
 
 
 # ====================================================================
-# [FIM BLOCO] listar_pecas
+# [FIM BLOCO] api_listar_pecas
 # ====================================================================
 
 # ====================================================================
@@ -67,7 +300,14 @@ def listar_pecas():
 # MAPA DO ARQUIVO
 # --------------------------------------------------------------------
 # BLUEPRINT: listar_pecas_bp
+# BLOCO_UTIL: ordenacoes_listagem
+# FUNÇÃO: _chaves_ordenacao
+# FUNÇÃO: _valores_cursor
+# FUNÇÃO: _codificar_cursor
+# FUNÇÃO: _ler_cursor
+# FUNÇÃO: _depois_do_cursor
 # FUNÇÃO: listar_pecas
+# FUNÇÃO: api_listar_pecas
 # BLOCO_DB: filtro_busca_pecas_db
 # BLOCO_DB: consulta_pecas_ordenadas_db
 # ====================================================================
@@ -0,0 +1,199 @@
+# app/routes/estoque_routes/movimentacoes.py
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime, timedelta
+
+from flask import Blueprint, jsonify, request
+
+from app import db
+from app.models_sqla import Peca
+from app.services.movimentacao_service import historico_consumo, saldo_em
+from app.services.tendencia_estoque_service import (
+    JANELA_PADRAO,
+    tendencias_estoque,
+    tendencias_modelo,
+)
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================
+# [BLOCO] BLUEPRINT
+# [NOME] movimentacoes_bp
+# [RESPONSABILIDADE] Registrar APIs de consulta ao livro-razão de estoque (saldo em data, consumo e tendências)
+# ====================================================================
+movimentacoes_bp = Blueprint(
+    "movimentacoes_bp",
+    __name__,
+    url_prefix="/estoque/movimentacoes",
+)
+# ====================================================================
+# [FIM BLOCO] movimentacoes_bp
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _parse_data
+# [RESPONSABILIDADE] Converter parâmetro ISO (YYYY-MM-DD ou YYYY-MM-DDTHH:MM) em datetime
+# ====================================================================
+def _parse_data(valor, padrao: datetime) -> datetime:
+    """Data sem hora vale até o fim do dia (23:59:59)."""
+    s = (valor or "").strip()
+    if not s:
+        return padrao
+    dt = datetime.fromisoformat(s)
+    if len(s) == 10:
+        dt = dt + timedelta(days=1) - timedelta(microseconds=1)
+    return dt
+
+
+# ====================================================================
+# [FIM BLOCO] _parse_data
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] ROTA
+# [NOME] api_saldo_em
+# [RESPONSABILIDADE] Retornar estoque das peças em uma data (snapshot + delta)
+# ====================================================================
+@movimentacoes_bp.route("/api/saldo", methods=["GET"])
+def api_saldo_em():
+    """
+    GET /estoque/movimentacoes/api/saldo?data=2026-01-31[&codigo=X&codigo=Y]
+    Sem 'codigo', retorna todas as peças.
+    """
+    try:
+        momento = _parse_data(request.args.get("data"), datetime.utcnow())
+    except ValueError:
+        return jsonify({"ok": False, "erro": "Parâmetro 'data' inválido."}), 400
+
+    q = db.session.query(Peca.id, Peca.codigo_pneumark)
+    codigos = [c.strip() for c in request.args.getlist("codigo") if c.strip()]
+    if codigos:
+        q = q.filter(Peca.codigo_pneumark.in_(codigos))
+    pecas = q.all()
+
+    saldos = saldo_em(momento, [p.id for p in pecas] if codigos else None)
+    itens = [
+        {"peca_id": p.id, "codigo": p.codigo_pneumark, "estoque": saldos.get(p.id, 0)}
+        for p in pecas
+    ]
+    return jsonify({"ok": True, "data": momento.isoformat(), "itens": itens})
+
+
+# ====================================================================
+# [FIM BLOCO] api_saldo_em
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] ROTA
+# [NOME] api_historico_consumo
+# [RESPONSABILIDADE] Retornar série diária de entradas/saídas/saldo de uma peça
+# ====================================================================
+@movimentacoes_bp.route("/api/<string:codigo>/consumo", methods=["GET"])
+def api_historico_consumo(codigo: str):
+    """
+    GET /estoque/movimentacoes/api/<codigo>/consumo?inicio=2026-01-01&fim=2026-01-31
+    Padrão: últimos 30 dias.
+    """
+    peca = Peca.query.filter_by(codigo_pneumark=codigo.strip()).first()
+    if not peca:
+        return jsonify({"ok": False, "erro": "Peça não encontrada."}), 404
+
+    agora = datetime.utcnow()
+    try:
+        fim = _parse_data(request.args.get("fim"), agora)
+        inicio_raw = (request.args.get("inicio") or "").strip()
+        inicio = (
+            datetime.fromisoformat(inicio_raw) if inicio_raw else fim - timedelta(days=30)
+        )
+    except ValueError:
+        return jsonify({"ok": False, "erro": "Parâmetros de data inválidos."}), 400
+
+    hist = historico_consumo(peca.id, inicio, fim)
+    hist.update(
+        {"ok": True, "codigo": peca.codigo_pneumark, "inicio": inicio.isoformat(), "fim": fim.isoformat()}
+    )
+    return jsonify(hist)
+
+
+# ====================================================================
+# [FIM BLOCO] api_historico_consumo
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] ROTA
+# [NOME] api_tendencias
+# [RESPONSABILIDADE] Retornar tendência, cobertura e giro por peça ou por modelo em um intervalo
+# ====================================================================
+@movimentacoes_bp.route("/api/tendencias", methods=["GET"])
+def api_tendencias():
+    """
+    GET /estoque/movimentacoes/api/tendencias?inicio=2025-01-01&fim=2026-01-31
+        [&codigo=X&codigo=Y | &modelo=PM2100] [&janela=30]
+        [&agrupar=dia|semana|mes] [&serie=0|1]
+    Padrão: últimos 90 dias, todas as peças com histórico (séries só até 50 peças).
+    """
+    hoje = datetime.utcnow().date()
+    try:
+        fim = date.fromisoformat(request.args["fim"]) if request.args.get("fim") else hoje
+        inicio = (
+            date.fromisoformat(request.args["inicio"])
+            if request.args.get("inicio")
+            else fim - timedelta(days=89)
+        )
+    except ValueError:
+        return jsonify({"ok": False, "erro": "Parâmetros de data inválidos."}), 400
+
+    janela = request.args.get("janela", default=JANELA_PADRAO, type=int)
+    agrupar = request.args.get("agrupar") or None
+    serie = request.args.get("serie")
+    com_serie = None if serie is None else serie.lower() in ("1", "true", "sim")
+    modelo = (request.args.get("modelo") or "").strip()
+
+    try:
+        if modelo:
+            resultado = tendencias_modelo(
+                modelo, inicio, fim, janela=janela, agrupar=agrupar, com_serie=com_serie
+            )
+        else:
+            codigos = [c.strip() for c in request.args.getlist("codigo") if c.strip()]
+            ids = None
+            if codigos:
+                ids = [
+                    pid
+                    for (pid,) in db.session.query(Peca.id).filter(
+                        Peca.codigo_pneumark.in_(codigos)
+                    )
+                ]
+                if not ids:
+                    return jsonify({"ok": False, "erro": "Peça não encontrada."}), 404
+            resultado = tendencias_estoque(
+                inicio, fim, ids, janela=janela, agrupar=agrupar, com_serie=com_serie
+            )
+    except LookupError as e:
+        return jsonify({"ok": False, "erro": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"ok": False, "erro": str(e)}), 400
+
+    resultado["ok"] = True
+    return jsonify(resultado)
+
+
+# ====================================================================
+# [FIM BLOCO] api_tendencias
+# ====================================================================
+
+# ====================================================================
+# MAPA DO ARQUIVO
+# --------------------------------------------------------------------
+# BLUEPRINT: movimentacoes_bp
+# FUNÇÃO: _parse_data
+# ROTA: api_saldo_em
+# ROTA: api_historico_consumo
+# ROTA: api_tendencias
+# ====================================================================
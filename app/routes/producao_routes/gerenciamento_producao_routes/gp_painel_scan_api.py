@@ -21,6 +21,7 @@ from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify
 from app import db
 from app.models.producao_models.gp_execucao import GPWorkOrder, GPWorkStage
+from app.services.producao.ordem_cache import ordem_por_serial
 
 logger = logging.getLogger(__name__)
 # logger.setLevel(logging.INFO)
@@ -299,7 +300,7 @@ def _next_bench_for_order(order: GPWorkOrder, from_bench: Optional[str]) -> str:
 # [RESPONSABILIDADE] Buscar ordem de produção GP pelo serial
 # ====================================================================
 def _get_order_by_serial(serial: str) -> Optional[GPWorkOrder]:
-    return GPWorkOrder.query.filter_by(serial=serial).first()
+    return ordem_por_serial(serial)
 
 
 # ====================================================================
@@ -454,7 +455,7 @@ def _flow_set_current_bench_on_scan(session, serial: str, bench: str) -> Dict[st
         return _svc_set(session, serial, bench)
     except Exception as e:
         # Fallback local: posiciona na bancada (respeitando roteiro) e garante etapa
-        order = GPWorkOrder.query.filter_by(serial=serial).first()
+        order = ordem_por_serial(serial)
         if not order:
             return {"ok": "false", "error": "order_not_found", "hint": str(e)}
 
@@ -493,7 +494,7 @@ def _flow_advance_after_finish(session, serial: str) -> Dict[str, str]:
 
         return _svc_adv(session, serial)
     except Exception as e:
-        order = GPWorkOrder.query.filter_by(serial=serial).first()
+        order = ordem_por_serial(serial)
         if not order:
             return {"ok": "false", "error": "order_not_found", "hint": str(e)}
 
@@ -7,7 +7,8 @@ from app.models.producao_models.gp_models.gp_hipot import GPHipotRun
 # ``inspect`` é importado sob demanda nas rotas de depuração para reduzir
 # dependências globais.  Importamos aqui apenas o serviço e os modelos
 from app.services.producao.hipot_service import aplicar_resultado_hipot
-from app.models.producao_models.gp_execucao import GPWorkOrder, GPWorkStage
+from app.models.producao_models.gp_execucao import GPWorkStage
+from app.services.producao.ordem_cache import ordem_por_serial
 from datetime import datetime
 
 
@@ -168,7 +169,7 @@ def save_execucao():
     try:
         status = "APR" if run.final_ok else "REP"
         # Atualiza etapa B5 (result e rework_flag) se existir etapa em aberto
-        order = GPWorkOrder.query.filter_by(serial=serial).first()
+        order = ordem_por_serial(serial)
         if order:
             stage_b5 = GPWorkStage.query.filter_by(
                 order_id=order.id, bench_id="b5", finished_at=None
@@ -369,7 +370,7 @@ def hipot_manual_submit(serial: str):
     try:
         # Atualiza etapa B5 em aberto com resultado e flag de retrabalho
         status = "APR" if run.final_ok else "REP"
-        order = GPWorkOrder.query.filter_by(serial=serial).first()
+        order = ordem_por_serial(serial)
         if order:
             stage_b5 = GPWorkStage.query.filter_by(
                 order_id=order.id, bench_id="b5", finished_at=None
@@ -492,7 +493,7 @@ def hipot_painel_submit():
 
     try:
         # 1. Atualiza a etapa B5 (Hi-Pot) em aberto, se existir
-        order = GPWorkOrder.query.filter_by(serial=serial).first()
+        order = ordem_por_serial(serial)
         if order:
             stage_b5 = GPWorkStage.query.filter_by(
                 order_id=order.id, bench_id="b5", finished_at=None
@@ -4,8 +4,8 @@ from dataclasses import dataclass
 from typing import List, Tuple, Dict, Optional
 import logging
 
-from sqlalchemy import select  # usado para with_for_update e queries
-from sqlalchemy.orm import Session
+from sqlalchemy import case, exists, func, insert, select, update  # with_for_update e updates em lote
+from sqlalchemy.orm import Session, aliased
 
 from app import db
 
@@ -14,19 +14,19 @@ from app.models_sqla import (
     Peca,
 )  # deve ter: codigo_pneumark, tipo ("peca"/"conjunto"), estoque_atual
 
-# Movimentação é opcional. Se você criar depois, basta descomentar o import e os usos.
-try:
-    from app.models_sqla import (
-        MovimentacaoEstoque,
-    )  # id, timestamp, tipo_mov, codigo_peca, quantidade, referencia, usuario
-except Exception:
-    MovimentacaoEstoque = None  # opcional
+# Livro-razão de estoque: toda variação de estoque_atual gera movimentação
+from app.services.movimentacao_service import (
+    TIPO_ENTRADA_PA,
+    TIPO_ESTORNO_PA,
+    TIPO_ESTORNO_RESERVA,
+    TIPO_RESERVA,
+    registrar_movimentacoes,
+)
 
-# === SERVICE QUE VOCÊ JÁ TEM ===
-from app.services.montagem.capacidade_service import calcular_capacidade_modelo
-
-# Onde está a BOM (estrutura por conjunto)
+# Onde está a BOM (estrutura por conjunto) e o snapshot do que foi reservado
 from app.models_sqla import EstruturaMaquina  # BOM está nessa tabela
+from app.models_sqla import ReservaMontagem, ReservaMontagemItem
+from app.services.montagem.bom_service import listar_bom
 
 logger = logging.getLogger(__name__)
 
@@ -81,6 +81,20 @@ class BomIndisponivel(Exception):
 # ====================================================================
 
 
+# ====================================================================
+# [BLOCO] CLASSE
+# [NOME] ReservaInvalida
+# [RESPONSABILIDADE] Exceção para estorno de reserva inexistente ou além das unidades reservadas
+# ====================================================================
+class ReservaInvalida(Exception):
+    pass
+
+
+# ====================================================================
+# [FIM BLOCO] ReservaInvalida
+# ====================================================================
+
+
 # Para a movimentação do produto acabado via mapeamento modelo→conjunto
 # ====================================================================
 # [BLOCO] CLASSE
@@ -129,67 +143,141 @@ def _resolver_conjunto_por_modelo(modelo: str) -> str:
 
 
 # =============================
-# Helpers de BOM / produto acabado
+# Helpers de escrita em lote (estoque_atual)
 # =============================
 # ====================================================================
 # [BLOCO] FUNÇÃO
-# [NOME] _extrair_bom_capacidade
-# [RESPONSABILIDADE] Extrair lista (codigo_peca, qtd_por_unidade) do payload retornado pelo capacidade_service
+# [NOME] _qtd_coluna
+# [RESPONSABILIDADE] Converter quantidade para int quando inteira (estoque_atual é coluna Integer)
 # ====================================================================
-def _extrair_bom_capacidade(data: dict) -> List[Tuple[str, float]]:
+def _qtd_coluna(valor: float):
+    v = float(valor)
+    return int(v) if v.is_integer() else v
+
+
+# ====================================================================
+# [FIM BLOCO] _qtd_coluna
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _agregar_demanda
+# [RESPONSABILIDADE] Somar BOM × unidades por código de peça (códigos repetidos viram uma linha)
+# ====================================================================
+def _agregar_demanda(
+    bom: List[Tuple[str, float]], quantidade_unidades: int
+) -> Dict[str, float]:
+    demanda: Dict[str, float] = {}
+    for codigo_peca, qtd_un in bom:
+        demanda[codigo_peca] = demanda.get(codigo_peca, 0.0) + float(qtd_un) * quantidade_unidades
+    return demanda
+
+
+# ====================================================================
+# [FIM BLOCO] _agregar_demanda
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] _travar_pecas_em_ordem
+# [RESPONSABILIDADE] Resolver id/saldo das peças em UMA query, travando em ordem de id no Postgres
+# ====================================================================
+def _travar_pecas_em_ordem(sess, codigos: List[str]) -> Dict[str, Tuple[int, float]]:
     """
-    Espera:
-    {
-      "produto_acabado": { "modelo": "...", "codigo_conjunto": "7-000", ...},
-      "bom": [ { "codigo_peca": "MTR-001", "quantidade": 2 }, ... ]
-    }
-    Retorna lista [(codigo_peca, qtd_por_unidade), ...]
+    Retorna {codigo_pneumark: (id, estoque_atual)}.
+    - Postgres: SELECT ... ORDER BY id FOR UPDATE -> ordem de travamento
+      determinística entre montagens concorrentes (sem deadlock).
+    - SQLite: o dialeto não emite FOR UPDATE; a segurança vem do UPDATE
+      condicional em _baixar_estoque_em_lote.
+    Códigos duplicados em Peca são rejeitados (a baixa ficaria ambígua).
     """
-    if not data or "bom" not in data:
-        raise BomIndisponivel("Payload de capacidade sem 'bom'.")
-
-    bom_raw = data["bom"]
-    out: List[Tuple[str, float]] = []
-    for item in bom_raw:
-        cod = str(item.get("codigo_peca") or "").strip()
-        qtd = float(item.get("quantidade") or 0)
-        if cod and qtd > 0:
-            out.append((cod, qtd))
-    if not out:
-        raise BomIndisponivel("BOM vazia após parse.")
+    rows = sess.execute(
+        select(Peca.id, Peca.codigo_pneumark, Peca.estoque_atual)
+        .where(Peca.codigo_pneumark.in_(codigos))
+        .order_by(Peca.id)
+        .with_for_update()
+    ).all()
+
+    out: Dict[str, Tuple[int, float]] = {}
+    for pid, codigo, estoque in rows:
+        if codigo in out:
+            raise BomIndisponivel(
+                f"Código '{codigo}' cadastrado mais de uma vez em Peca; corrija o cadastro."
+            )
+        out[codigo] = (pid, float(estoque or 0))
     return out
 
 
 # ====================================================================
-# [FIM BLOCO] _extrair_bom_capacidade
+# [FIM BLOCO] _travar_pecas_em_ordem
 # ====================================================================
 
 
 # ====================================================================
-# [BLOCO] FUNÇÃO
-# [NOME] _extrair_codigo_conjunto
-# [RESPONSABILIDADE] Extrair codigo_conjunto do payload de capacidade com fallback para compatibilidade
+# [BLOCO] BLOCO_DB
+# [NOME] _baixar_estoque_em_lote
+# [RESPONSABILIDADE] Abater estoque de todas as linhas em UM UPDATE condicional tudo-ou-nada
 # ====================================================================
-def _extrair_codigo_conjunto(data: dict, modelo: str) -> str:
+def _baixar_estoque_em_lote(sess, deltas: Dict[int, float]) -> bool:
     """
-    Pega produto_acabado.codigo_conjunto; fallback: usa 'modelo' (não ideal).
-    (Mantido para compatibilidade com suas reservas/estornos de componentes.)
+    UPDATE pecas SET estoque_atual = estoque_atual - CASE id ... END
+     WHERE id IN (...)
+       AND NOT EXISTS (peça do lote com saldo < demanda)
+
+    Ou todas as linhas são abatidas, ou nenhuma: o número de linhas afetadas
+    diz se houve falta (rowcount < len(deltas)).
     """
-    try:
-        pac = data.get("produto_acabado") or {}
-        cod = str(pac.get("codigo_conjunto") or "").strip()
-        if cod:
-            return cod
-    except Exception:
-        pass
-    logger.warning(
-        "Não achei produto_acabado.codigo_conjunto; usando modelo como fallback."
+    ids = list(deltas.keys())
+    valores = {pid: _qtd_coluna(q) for pid, q in deltas.items()}
+    outra = aliased(Peca)
+
+    falta_algum = exists().where(
+        outra.id.in_(ids),
+        func.coalesce(outra.estoque_atual, 0) < case(valores, value=outra.id),
     )
-    return (modelo or "").strip()
+    stmt = (
+        update(Peca)
+        .where(Peca.id.in_(ids), ~falta_algum)
+        .values(
+            estoque_atual=func.coalesce(Peca.estoque_atual, 0)
+            - case(valores, value=Peca.id)
+        )
+        .execution_options(synchronize_session=False)
+    )
+    res = sess.execute(stmt)
+    return (res.rowcount or 0) == len(ids)
 
 
 # ====================================================================
-# [FIM BLOCO] _extrair_codigo_conjunto
+# [FIM BLOCO] _baixar_estoque_em_lote
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] _repor_estoque_em_lote
+# [RESPONSABILIDADE] Devolver quantidades ao estoque de várias peças em UM UPDATE
+# ====================================================================
+def _repor_estoque_em_lote(sess, deltas: Dict[int, float]) -> int:
+    if not deltas:
+        return 0
+    valores = {pid: _qtd_coluna(q) for pid, q in deltas.items()}
+    stmt = (
+        update(Peca)
+        .where(Peca.id.in_(list(valores.keys())))
+        .values(
+            estoque_atual=func.coalesce(Peca.estoque_atual, 0)
+            + case(valores, value=Peca.id)
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return sess.execute(stmt).rowcount or 0
+
+
+# ====================================================================
+# [FIM BLOCO] _repor_estoque_em_lote
 # ====================================================================
 
 
@@ -207,98 +295,145 @@ def reservar_componentes_para_montagem(
     usuario: str = "Sistema",
     referencia: Optional[str] = None,
     session: Optional[Session] = None,
-) -> None:
+    explodir: bool = False,
+) -> Optional[ReservaMontagem]:
     """
     Na abertura da ordem/serial: baixa do estoque os componentes da BOM × quantidade_unidades.
     NÃO depende da chave 'bom' do capacidade_service.
     Lê a BOM direto da tabela EstruturaMaquina usando o codigo_conjunto.
+    explodir=True baixa as peças folha da BOM multinível (bom_service) em vez
+    dos subconjuntos do primeiro nível.
+    Retorna a ReservaMontagem (snapshot das linhas baixadas), usada no estorno.
     """
     if quantidade_unidades <= 0:
-        return
+        return None
 
     sess = session or db.session
 
-    # 1) Descobrir o código do conjunto (produto acabado) via capacidade_service
-    #    Se não vier, caímos no fallback usando o próprio 'modelo' como código.
-    try:
-        data_cap = calcular_capacidade_modelo(
-            modelo
-        )  # pode não ter 'bom', só queremos o codigo_conjunto
-        codigo_conjunto = _extrair_codigo_conjunto(data_cap, modelo)
-    except Exception:
-        codigo_conjunto = (modelo or "").strip()
+    # 1) Descobrir o código do conjunto (produto acabado) pelo mapeamento local.
+    #    api_montar já passa o código do conjunto; sem mapeamento, usamos o próprio valor.
+    modelo_norm = (modelo or "").strip()
+    codigo_conjunto = MODEL_TO_CONJUNTO.get(modelo_norm, modelo_norm)
 
     if not codigo_conjunto:
         raise BomIndisponivel(
             f"Não foi possível identificar o código do conjunto para o modelo '{modelo}'."
         )
 
-    # 2) Carregar a BOM direto no DB: todas as linhas de EstruturaMaquina para esse conjunto
-    itens_bom = (
-        sess.execute(
-            select(EstruturaMaquina).where(
-                EstruturaMaquina.codigo_maquina == codigo_conjunto
+    # 2) Carregar a BOM: explodida (memoizada no bom_service) ou direto no DB,
+    #    todas as linhas de EstruturaMaquina para esse conjunto
+    bom: List[Tuple[str, float]] = []
+    if explodir:
+        bom = [
+            (cod, float(qtd))
+            for cod, qtd in listar_bom(codigo_conjunto, explodir=True)
+        ]
+        if not bom:
+            raise BomIndisponivel(
+                f"Nenhum item de BOM encontrado em EstruturaMaquina para '{codigo_conjunto}' (modelo '{modelo}')."
             )
+    else:
+        itens_bom = (
+            sess.execute(
+                select(EstruturaMaquina).where(
+                    EstruturaMaquina.codigo_maquina == codigo_conjunto
+                )
+            )
+            .scalars()
+            .all()
         )
-        .scalars()
-        .all()
-    )
 
-    if not itens_bom:
-        raise BomIndisponivel(
-            f"Nenhum item de BOM encontrado em EstruturaMaquina para '{codigo_conjunto}' (modelo '{modelo}')."
-        )
+        if not itens_bom:
+            raise BomIndisponivel(
+                f"Nenhum item de BOM encontrado em EstruturaMaquina para '{codigo_conjunto}' (modelo '{modelo}')."
+            )
 
-    # Monta lista [(codigo_peca, qtd_por_unidade)]
-    bom: List[Tuple[str, float]] = []
-    for it in itens_bom:
-        try:
-            qtd = float(it.quantidade or 0)
-        except Exception:
-            qtd = 0.0
-        cod = (it.codigo_peca or "").strip()
-        if cod and qtd > 0:
-            bom.append((cod, qtd))
+        # Monta lista [(codigo_peca, qtd_por_unidade)]
+        for it in itens_bom:
+            try:
+                qtd = float(it.quantidade or 0)
+            except Exception:
+                qtd = 0.0
+            cod = (it.codigo_peca or "").strip()
+            if cod and qtd > 0:
+                bom.append((cod, qtd))
 
     if not bom:
         raise BomIndisponivel(
             f"BOM vazia em EstruturaMaquina para '{codigo_conjunto}'."
         )
 
-    # 3) Carregar e travar as peças necessárias
-    pecas_locked: Dict[str, Peca] = {}
-    for codigo_peca, _ in bom:
-        p: Optional[Peca] = sess.execute(
-            select(Peca).where(Peca.codigo_pneumark == codigo_peca).with_for_update()
-        ).scalar_one_or_none()
-        if not p:
+    # 3) Resolver e travar as peças necessárias (uma query, ordem por id)
+    por_unidade = _agregar_demanda(bom, 1)
+    demanda = {cod: qtd * quantidade_unidades for cod, qtd in por_unidade.items()}
+    pecas = _travar_pecas_em_ordem(sess, list(demanda.keys()))
+    for codigo_peca in demanda:
+        if codigo_peca not in pecas:
             raise BomIndisponivel(
                 f"Peça '{codigo_peca}' não cadastrada (Peca.codigo_pneumark)."
             )
-        pecas_locked[codigo_peca] = p  # type: ignore
 
-    # 4) Validar saldos
-    faltas: List[FaltaItem] = []
-    for codigo_peca, qtd_un in bom:
-        total = float(qtd_un) * quantidade_unidades
-        disponivel = float(pecas_locked[codigo_peca].estoque_atual or 0)
-        if disponivel < total:
-            faltas.append(
-                FaltaItem(
-                    codigo_peca=codigo_peca, necessario=total, disponivel=disponivel
-                )
+    # 4) Abater do estoque: um único UPDATE condicional para toda a BOM.
+    #    Linhas afetadas < linhas da BOM => falta; nada foi abatido.
+    deltas = {pecas[cod][0]: total for cod, total in demanda.items()}
+    if not _baixar_estoque_em_lote(sess, deltas):
+        atuais = dict(
+            sess.execute(
+                select(Peca.id, Peca.estoque_atual).where(Peca.id.in_(list(deltas)))
+            ).all()
+        )
+        faltas = [
+            FaltaItem(
+                codigo_peca=cod,
+                necessario=total,
+                disponivel=float(atuais.get(pecas[cod][0]) or 0),
             )
-    if faltas:
+            for cod, total in demanda.items()
+            if float(atuais.get(pecas[cod][0]) or 0) < total
+        ]
         raise EstoqInsuficiente(faltas)
 
-    # 5) Abater do estoque
-    for codigo_peca, qtd_un in bom:
-        total = float(qtd_un) * quantidade_unidades
-        p = pecas_locked[codigo_peca]
-        p.estoque_atual = float(p.estoque_atual or 0) - total
-        sess.add(p)
+    # 5) Livro-razão: uma saída por peça, em um único INSERT
+    registrar_movimentacoes(
+        (
+            {
+                "peca_id": pecas[cod][0],
+                "codigo_peca": cod,
+                "tipo_mov": TIPO_RESERVA,
+                "quantidade": -total,
+                "referencia": referencia,
+                "usuario": usuario,
+            }
+            for cod, total in demanda.items()
+        ),
+        session=sess,
+    )
 
-        # Se você tiver MovimentacaoEstoque no futuro, pode registrar aqui.
+    # 6) Snapshot da reserva: cabeçalho + linhas em um único INSERT.
+    #    O estorno repete exatamente estas linhas, mesmo que a BOM mude depois.
+    reserva = ReservaMontagem(
+        modelo=modelo_norm[:32],
+        codigo_conjunto=codigo_conjunto,
+        unidades=int(quantidade_unidades),
+        unidades_estornadas=0,
+        referencia=referencia[:120] if referencia else None,
+        usuario=usuario,
+    )
+    sess.add(reserva)
+    sess.flush()
+    sess.execute(
+        insert(ReservaMontagemItem),
+        [
+            {
+                "reserva_id": reserva.id,
+                "peca_id": pecas[cod][0],
+                "codigo_peca": cod,
+                "quantidade_por_unidade": int(round(qtd)),
+            }
+            for cod, qtd in por_unidade.items()
+        ],
+    )
+    return reserva
 
 
 # ====================================================================
@@ -312,58 +447,72 @@ def reservar_componentes_para_montagem(
 # [RESPONSABILIDADE] Estornar a reserva de componentes da BOM no estoque quando a ordem/serial for cancelada
 # ====================================================================
 def estornar_reserva_componentes(
-    modelo: str,
-    quantidade_unidades: int,
+    reserva_id: int,
+    quantidade_unidades: int = 1,
     usuario: str = "Sistema",
     referencia: Optional[str] = None,
     session: Optional[Session] = None,
-) -> None:
+) -> Dict[str, int]:
     """
     Caso a ordem/serial seja cancelada antes da conclusão: devolve a reserva ao estoque.
-    - Soma BOM × quantidade_unidades em estoque_atual.
-    - (Opcional) registra movimentação tipo 'entrada' motivo 'ESTORNO_RESERVA'.
+    - Repete o snapshot gravado na reserva (não recalcula a BOM).
+    - Soma linhas × quantidade_unidades em estoque_atual com um único UPDATE.
+    - Registra movimentação 'estorno_reserva' no livro-razão.
+    - Não faz commit aqui.
+    Retorna {codigo_peca: quantidade_devolvida}.
     """
     if quantidade_unidades <= 0:
-        return
+        return {}
 
     sess = session or db.session
-    cap = calcular_capacidade_modelo(modelo)
-    bom = _extrair_bom_capacidade(cap)
-
-    pecas_locked: Dict[str, Peca] = {}
-    for codigo_peca, _ in bom:
-        p: Optional[Peca] = sess.execute(
-            select(Peca).where(Peca.codigo_pneumark == codigo_peca).with_for_update()
-        ).scalar_one_or_none()
-        if not p:
-            logger.warning(
-                f"Peça '{codigo_peca}' não encontrada no estorno; ignorando."
-            )
-            continue
-        pecas_locked[codigo_peca] = p  # type: ignore
 
-    for codigo_peca, qtd_un in bom:
-        total = float(qtd_un) * quantidade_unidades
-        p = pecas_locked.get(codigo_peca)
-        if not p:
-            continue
-        p.estoque_atual = float(p.estoque_atual or 0) + total
-        sess.add(p)
-
-        if MovimentacaoEstoque is not None:
-            try:
-                mov = MovimentacaoEstoque(
-                    tipo_mov="entrada",
-                    codigo_peca=codigo_peca,
-                    quantidade=total,
-                    referencia=referencia,
-                    usuario=usuario,
-                )
-                sess.add(mov)
-            except Exception as e:
-                logger.warning(
-                    f"Falha ao registrar movimentação de entrada (estorno) para {codigo_peca}: {e}"
-                )
+    # trava o cabeçalho: dois cancelamentos do mesmo lote não estornam em dobro
+    reserva: Optional[ReservaMontagem] = sess.execute(
+        select(ReservaMontagem)
+        .where(ReservaMontagem.id == reserva_id)
+        .with_for_update()
+    ).scalar_one_or_none()
+    if not reserva:
+        raise ReservaInvalida(f"Reserva {reserva_id} não encontrada.")
+
+    restantes = int(reserva.unidades or 0) - int(reserva.unidades_estornadas or 0)
+    if quantidade_unidades > restantes:
+        raise ReservaInvalida(
+            f"Reserva {reserva_id}: {quantidade_unidades} unidade(s) para estornar, "
+            f"{restantes} ainda reservada(s)."
+        )
+
+    itens = sess.execute(
+        select(
+            ReservaMontagemItem.peca_id,
+            ReservaMontagemItem.codigo_peca,
+            ReservaMontagemItem.quantidade_por_unidade,
+        ).where(ReservaMontagemItem.reserva_id == reserva.id)
+    ).all()
+
+    devolver = {
+        peca_id: int(qpu or 0) * quantidade_unidades for peca_id, _, qpu in itens
+    }
+    # Devolve tudo em um único UPDATE
+    _repor_estoque_em_lote(sess, devolver)
+    reserva.unidades_estornadas = int(reserva.unidades_estornadas or 0) + quantidade_unidades
+
+    registrar_movimentacoes(
+        (
+            {
+                "peca_id": peca_id,
+                "codigo_peca": codigo_peca,
+                "tipo_mov": TIPO_ESTORNO_RESERVA,
+                "quantidade": devolver[peca_id],
+                "referencia": referencia or reserva.referencia,
+                "usuario": usuario,
+            }
+            for peca_id, codigo_peca, _ in itens
+        ),
+        session=sess,
+    )
+
+    return {codigo_peca: devolver[peca_id] for peca_id, codigo_peca, _ in itens}
 
 
 # ====================================================================
@@ -419,21 +568,19 @@ def registrar_conclusao_produto_acabado(
     fg.estoque_atual = float(fg.estoque_atual or 0) + float(int(quantidade))
     sess.add(fg)
 
-    # (Opcional) registrar movimentação
-    if MovimentacaoEstoque is not None:
-        try:
-            mov = MovimentacaoEstoque(
-                tipo_mov="entrada",
-                codigo_peca=codigo_conjunto,
-                quantidade=float(int(quantidade)),
-                referencia=referencia,
-                usuario=usuario,
-            )
-            sess.add(mov)
-        except Exception as e:
-            logger.warning(
-                f"Falha ao registrar movimentação de entrada (FG) para {codigo_conjunto}: {e}"
-            )
+    registrar_movimentacoes(
+        [
+            {
+                "peca_id": fg.id,
+                "codigo_peca": codigo_conjunto,
+                "tipo_mov": TIPO_ENTRADA_PA,
+                "quantidade": int(quantidade),
+                "referencia": referencia,
+                "usuario": usuario,
+            }
+        ],
+        session=sess,
+    )
 
     return codigo_conjunto
 
@@ -484,26 +631,26 @@ def estornar_conclusao_produto_acabado(
             f"Conjunto '{codigo_conjunto}' (modelo {modelo}) não encontrado (tipo='conjunto')."
         )
 
-    novo = float(fg.estoque_atual or 0) - float(int(quantidade))
+    anterior = float(fg.estoque_atual or 0)
+    novo = anterior - float(int(quantidade))
     # Política: não deixar negativo. Se preferir, troque por raise ProdutoAcabadoInvalido(...)
     fg.estoque_atual = novo if novo >= 0 else 0.0
     sess.add(fg)
 
-    # (Opcional) registrar movimentação
-    if MovimentacaoEstoque is not None:
-        try:
-            mov = MovimentacaoEstoque(
-                tipo_mov="estorno",
-                codigo_peca=codigo_conjunto,
-                quantidade=float(int(quantidade)),
-                referencia=referencia,
-                usuario=usuario,
-            )
-            sess.add(mov)
-        except Exception as e:
-            logger.warning(
-                f"Falha ao registrar movimentação de estorno (FG) para {codigo_conjunto}: {e}"
-            )
+    # registra o que de fato saiu (o piso em zero pode reduzir o estorno)
+    registrar_movimentacoes(
+        [
+            {
+                "peca_id": fg.id,
+                "codigo_peca": codigo_conjunto,
+                "tipo_mov": TIPO_ESTORNO_PA,
+                "quantidade": fg.estoque_atual - anterior,
+                "referencia": referencia,
+                "usuario": usuario,
+            }
+        ],
+        session=sess,
+    )
 
     return codigo_conjunto
 
@@ -518,10 +665,14 @@ def estornar_conclusao_produto_acabado(
 # CLASSE: FaltaItem
 # CLASSE: EstoqInsuficiente
 # CLASSE: BomIndisponivel
+# CLASSE: ReservaInvalida
 # CLASSE: ProdutoAcabadoInvalido
 # FUNÇÃO: _resolver_conjunto_por_modelo
-# FUNÇÃO: _extrair_bom_capacidade
-# FUNÇÃO: _extrair_codigo_conjunto
+# FUNÇÃO: _qtd_coluna
+# FUNÇÃO: _agregar_demanda
+# BLOCO_DB: _travar_pecas_em_ordem
+# BLOCO_DB: _baixar_estoque_em_lote
+# BLOCO_DB: _repor_estoque_em_lote
 # FUNÇÃO: reservar_componentes_para_montagem
 # FUNÇÃO: estornar_reserva_componentes
 # FUNÇÃO: registrar_conclusao_produto_acabado
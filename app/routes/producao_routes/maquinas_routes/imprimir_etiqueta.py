@@ -1,18 +1,30 @@
 # app/routes/producao_routes/maquinas_routes/imprimir_etiqueta.py
 from __future__ import annotations
 
+import hashlib
 import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
-from flask import Blueprint, request, jsonify, send_file, abort
+from flask import Blueprint, current_app, request, jsonify, send_file, abort
+from sqlalchemy import select, update
 
 from app import db
 
 # Use the SQLAlchemy models instead of the dataclasses. Import from the
 # auto-generated models_sqla package to ensure that ``.query`` is available.
 from app.models_sqla import Montagem, LabelReprintLog
+from app.services.producao.etiqueta_cache import (
+    chave_etiqueta,
+    gravar_etiqueta,
+    ler_etiqueta,
+)
 
 # Dependências de imagem/QR
 from PIL import Image, ImageDraw, ImageFont
@@ -22,6 +34,7 @@ import qrcode.constants
 # PDF é opcional; se não tiver reportlab, seguimos com PNG
 try:
     from reportlab.lib.pagesizes import mm
+    from reportlab.lib.utils import ImageReader
     from reportlab.pdfgen import canvas as pdf_canvas
 
     REPORTLAB_OK = True
@@ -56,6 +69,10 @@ SAVE_1BIT_BW = True
 TEXT_OFFSET_MM = -1.0
 TEXT_OFFSET_PX = round(TEXT_OFFSET_MM / 25.4 * DPI_DEFAULT)
 
+# Suba ao mudar o desenho em _compose_png/_output_pdf_from_png: invalida o
+# cache de etiquetas (as constantes acima já entram no hash do layout)
+LABEL_LAYOUT_VERSION = 1
+
 # ----------------------------------------------------------------------
 # PASTAS DE SAÍDA (CORRIGIDO: sem depender do cwd)
 # ----------------------------------------------------------------------
@@ -264,6 +281,213 @@ def _output_pdf_from_png(label_png: Path) -> bytes:
     return buffer.getvalue()
 
 
+# ----------------------------------------------------------------------
+# CACHE DE ETIQUETAS RENDERIZADAS
+# ----------------------------------------------------------------------
+def layout_atual() -> str:
+    """
+    Hash curto do layout: versão + constantes de desenho. Nomeia a pasta do
+    cache; qualquer mudança aqui deixa as etiquetas antigas de fora.
+    """
+    partes = (
+        LABEL_LAYOUT_VERSION,
+        DPI_DEFAULT,
+        LABEL_W_MM,
+        LABEL_H_MM,
+        QR_SIZE_PX,
+        MARGIN_PX,
+        FONT_PX,
+        SAVE_1BIT_BW,
+        TEXT_OFFSET_PX,
+    )
+    return hashlib.sha256(repr(partes).encode("utf-8")).hexdigest()[:12]
+
+
+def render_label(modelo: str, serial: str, dt_obj: datetime) -> Tuple[str, dict]:
+    """
+    Devolve (chave, {"png": bytes, "pdf": bytes|None}). A chave cobre o layout
+    e o que é impresso (data/hora com minuto, como em _compose_png) e serve de
+    ETag; no acerto nada é redesenhado nem regravado em static/.
+    """
+    layout = layout_atual()
+    chave = chave_etiqueta(layout, modelo, serial, dt_obj.strftime("%d/%m/%Y %H:%M"))
+    dados = ler_etiqueta(layout, chave)
+    if dados and (dados["pdf"] is not None or not REPORTLAB_OK):
+        return chave, dados
+
+    _, label_png = _output_png(modelo, serial, dt_obj)
+    dados = {
+        "png": label_png.read_bytes(),
+        "pdf": _output_pdf_from_png(label_png) if REPORTLAB_OK else None,
+    }
+    gravar_etiqueta(layout, chave, dados["png"], dados["pdf"])
+    return chave, dados
+
+
+# ----------------------------------------------------------------------
+# LOTE: RENDERIZAÇÃO EM PARALELO + PDF DE VÁRIAS PÁGINAS
+# ----------------------------------------------------------------------
+# Máximo de etiquetas por pedido e abaixo de quantas (não cacheadas) o
+# desenho fica no próprio worker web (subir o pool custaria mais)
+ETIQUETA_LOTE_MAX = 500
+ETIQUETA_LOTE_PARALELO_MIN = 8
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _render_bytes(modelo: str, serial: str, dt_obj: datetime) -> Tuple[bytes, Optional[bytes]]:
+    """
+    Desenha a etiqueta só em memória (sem static/): (png, pdf|None).
+    Função de módulo para rodar nos processos do pool.
+    """
+    etq = _compose_png(modelo, serial, dt_obj)
+    if SAVE_1BIT_BW:
+        etq = etq.convert("1")
+    buf = io.BytesIO()
+    etq.save(buf, "PNG", optimize=True, dpi=(DPI_DEFAULT, DPI_DEFAULT))
+    png = buf.getvalue()
+    return png, (_pdf_paginas([png]) if REPORTLAB_OK else None)
+
+
+def _pdf_paginas(pngs: List[bytes]) -> bytes:
+    """
+    Um PDF com uma página de 40x25 mm por etiqueta (um único trabalho de
+    impressão). Sem reportlab, o PDF sai pelo próprio PIL no DPI da etiqueta.
+    """
+    buffer = io.BytesIO()
+    if REPORTLAB_OK:
+        w_pt = LABEL_W_MM * mm
+        h_pt = LABEL_H_MM * mm
+        c = pdf_canvas.Canvas(buffer, pagesize=(w_pt, h_pt))
+        for png in pngs:
+            c.drawImage(
+                ImageReader(io.BytesIO(png)),
+                0,
+                0,
+                width=w_pt,
+                height=h_pt,
+                preserveAspectRatio=False,
+                mask="auto",
+            )
+            c.showPage()
+        c.save()
+        return buffer.getvalue()
+
+    paginas = [Image.open(io.BytesIO(png)) for png in pngs]
+    paginas[0].save(
+        buffer,
+        "PDF",
+        save_all=True,
+        append_images=paginas[1:],
+        resolution=float(DPI_DEFAULT),
+    )
+    return buffer.getvalue()
+
+
+def _processos() -> int:
+    """ETIQUETA_PROCESSOS da configuração (padrão: até 4, limitado às CPUs)."""
+    return max(1, int(current_app.config.get("ETIQUETA_PROCESSOS", min(4, os.cpu_count() or 1))))
+
+
+def _obter_pool() -> ProcessPoolExecutor:
+    """Pool de processos do worker (spawn: filhos não herdam conexões/threads)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=_processos(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _descartar_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def render_lote(itens: List[dict]) -> bytes:
+    """
+    itens: dicts com modelo/serial/dt_obj, na ordem de impressão. Etiquetas
+    já no cache não são redesenhadas; as demais vão para o pool de processos
+    (ou são desenhadas aqui em lotes pequenos) e entram no cache.
+    Devolve o PDF com uma página por item.
+    """
+    layout = layout_atual()
+    pngs: List[Optional[bytes]] = []
+    faltam = []
+    for pos, it in enumerate(itens):
+        chave = chave_etiqueta(
+            layout, it["modelo"], it["serial"], it["dt_obj"].strftime("%d/%m/%Y %H:%M")
+        )
+        dados = ler_etiqueta(layout, chave)
+        pngs.append(dados["png"] if dados else None)
+        if dados is None:
+            faltam.append((pos, chave))
+
+    argumentos = [
+        (itens[pos]["modelo"], itens[pos]["serial"], itens[pos]["dt_obj"]) for pos, _ in faltam
+    ]
+    processos = _processos()
+    if processos > 1 and len(faltam) >= ETIQUETA_LOTE_PARALELO_MIN:
+        try:
+            desenhadas = list(
+                _obter_pool().map(
+                    _render_bytes,
+                    *zip(*argumentos),
+                    chunksize=max(1, len(argumentos) // (processos * 4)),
+                )
+            )
+        except BrokenProcessPool:
+            # processo do pool morreu: recria na próxima vez e desenha aqui
+            current_app.logger.warning("[ETIQUETA] Pool de renderização quebrado; desenhando no worker")
+            _descartar_pool()
+            desenhadas = [_render_bytes(*a) for a in argumentos]
+    else:
+        desenhadas = [_render_bytes(*a) for a in argumentos]
+
+    for (pos, chave), (png, pdf) in zip(faltam, desenhadas):
+        gravar_etiqueta(layout, chave, png, pdf)
+        pngs[pos] = png
+    return _pdf_paginas(pngs)
+
+
+def _montagens_do_pedido(payload: dict) -> Tuple[List[Montagem], List[str]]:
+    """
+    Lê 'ids' ou 'seriais' do JSON e busca as montagens em um SELECT só.
+    Devolve (montagens na ordem pedida, identificadores não encontrados).
+    """
+    ids = payload.get("ids") or []
+    seriais = payload.get("seriais") or []
+    if ids:
+        try:
+            chaves = [int(i) for i in ids]
+        except (TypeError, ValueError):
+            abort(400, "ids devem ser inteiros.")
+        coluna = Montagem.id
+    else:
+        chaves = [str(s).strip() for s in seriais if str(s).strip()]
+        coluna = Montagem.serial
+    chaves = list(dict.fromkeys(chaves))
+    if not chaves:
+        abort(400, "Informe 'ids' ou 'seriais'.")
+    if len(chaves) > ETIQUETA_LOTE_MAX:
+        abort(400, f"Máximo de {ETIQUETA_LOTE_MAX} etiquetas por lote.")
+
+    achadas = {
+        getattr(m, coluna.key): m
+        for m in db.session.scalars(select(Montagem).where(coluna.in_(chaves)))
+    }
+    return (
+        [achadas[c] for c in chaves if c in achadas],
+        [str(c) for c in chaves if c not in achadas],
+    )
+
+
 # ----------------------------------------------------------------------
 # ROTAS
 # ----------------------------------------------------------------------
@@ -278,25 +502,26 @@ def preview_label(assembly_id):
     serial = data["serial"]
     dt_obj = data["dt_obj"]
 
-    # Gera PNG base
-    _, label_png = _output_png(modelo, serial, dt_obj)
+    # PNG/PDF vêm do cache quando a mesma etiqueta já foi desenhada
+    chave, dados = render_label(modelo, serial, dt_obj)
 
     # 🔥 PRIORIDADE: sempre gerar PDF físico 40x25mm
-    if REPORTLAB_OK:
-        pdf_bytes = _output_pdf_from_png(label_png)
-
+    if dados["pdf"] is not None:
         return send_file(
-            io.BytesIO(pdf_bytes),
+            io.BytesIO(dados["pdf"]),
             mimetype="application/pdf",
             download_name=f"{modelo}_{serial}.pdf",
             as_attachment=False,
+            etag=chave,
         )
 
     # Fallback caso reportlab não exista
     return send_file(
-        str(label_png),
+        io.BytesIO(dados["png"]),
         mimetype="image/png",
+        download_name=f"{modelo}_{serial}.png",
         as_attachment=False,
+        etag=chave,
     )
 
 
@@ -365,3 +590,83 @@ def reimprimir_label(assembly_id):
     return jsonify(
         {"ok": True, "message": "Reimpressão registrada.", "assembly_id": m.id}
     )
+
+
+@imprimir_etiqueta_bp.route("/lote", methods=["POST"])
+def preview_lote():
+    """
+    POST {"ids": [...]} ou {"seriais": [...]} -> um PDF (40x25 mm por página)
+    com as etiquetas na ordem pedida. Montagens canceladas ficam de fora
+    (contadas em X-Etiquetas-Ignoradas). Não confirma impressão.
+    """
+    montagens, nao_encontradas = _montagens_do_pedido(request.get_json() or {})
+    if nao_encontradas:
+        return (
+            jsonify({"ok": False, "erro": "Montagem não encontrada.", "itens": nao_encontradas}),
+            404,
+        )
+    validas = [m for m in montagens if m.status != "CANCELADA"]
+    if not validas:
+        return abort(409, "Todas as montagens do lote estão canceladas.")
+
+    pdf_bytes = render_lote(
+        [{"modelo": m.modelo, "serial": m.serial, "dt_obj": m.data_hora} for m in validas]
+    )
+    resp = send_file(
+        io.BytesIO(pdf_bytes),
+        mimetype="application/pdf",
+        download_name=f"etiquetas_{validas[0].serial}_{len(validas)}.pdf",
+        as_attachment=False,
+    )
+    resp.headers["X-Etiquetas"] = str(len(validas))
+    resp.headers["X-Etiquetas-Ignoradas"] = str(len(montagens) - len(validas))
+    return resp
+
+
+@imprimir_etiqueta_bp.route("/lote/confirmar", methods=["POST"])
+def confirmar_lote():
+    """
+    POST {"ids"|"seriais": [...], "usuario": "..."}: confirma a primeira
+    impressão de todo o lote em um UPDATE. Já confirmadas e canceladas são
+    ignoradas e listadas na resposta.
+    """
+    payload = request.get_json() or {}
+    usuario = (payload.get("usuario") or "Operador").strip()
+    montagens, nao_encontradas = _montagens_do_pedido(payload)
+
+    pendentes = [m.id for m in montagens if m.status != "CANCELADA" and not m.label_printed]
+    ja_confirmadas = [m.id for m in montagens if m.label_printed]
+    canceladas = [m.id for m in montagens if m.status == "CANCELADA" and not m.label_printed]
+
+    confirmadas = 0
+    if pendentes:
+        agora = datetime.utcnow()
+        # mesmo guarda do UPDATE: outra aba pode ter confirmado no meio do caminho
+        confirmadas = db.session.execute(
+            update(Montagem)
+            .where(
+                Montagem.id.in_(pendentes),
+                Montagem.label_printed.is_(False),
+                Montagem.status != "CANCELADA",
+            )
+            .values(
+                label_printed=True,
+                label_printed_at=agora,
+                label_printed_by=usuario,
+                label_print_count=db.func.coalesce(Montagem.label_print_count, 0) + 1,
+                updated_at=agora,
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+
+    return jsonify(
+        {
+            "ok": True,
+            "message": f"{confirmadas} impressão(ões) confirmada(s).",
+            "confirmadas": confirmadas,
+            "ja_confirmadas": ja_confirmadas,
+            "canceladas": canceladas,
+            "nao_encontradas": nao_encontradas,
+        }
+    )
@@ -1,7 +1,7 @@
 # app/routes/producao_routes/maquinas_routes/montagens.py
 from __future__ import annotations
 from datetime import datetime
-from flask import Blueprint, Response, request, jsonify, abort
+from flask import Blueprint, request, jsonify, abort
 from app import db
 
 # Use the SQLAlchemy models instead of the dataclasses. Import from the
@@ -11,11 +11,8 @@ from app.routes.producao_routes.maquinas_routes.consumo_service import (
     estornar_reserva_componentes,
 )
 
-# Use the real serial generator from app.services.serials instead of the stub.
-from app.services.serials import generate_serials
-from sqlalchemy import select  # precisa para as queries com with_for_update
+from sqlalchemy import select, update  # precisa para as queries com with_for_update
 from app.models_sqla import EstruturaMaquina  # BOM está nessa tabela
-from app.routes.producao_routes.painel_routes.order_api import ensure_gp_workorder
 
 
 import logging
@@ -63,101 +60,47 @@ def listar_montagens():
 # ====================================================================
 # [FIM BLOCO] listar_montagens
 # ====================================================================
-@montagens_bp.route("/criar", methods=["POST"])
-# ====================================================================
-# [BLOCO] FUNÇÃO
-# [NOME] criar_montagens
-# [RESPONSABILIDADE] Criar montagens em lote, gerar seriais e garantir ordens no painel
-# ====================================================================
-def criar_montagens():
-    """
-    Espera JSON: { modelo: "PM2100", quantidade: 3, usuario: "Operador" }
-    Gera 'quantidade' de linhas, cada uma com serial único (a sua lógica de serial entra aqui).
-    """
-    data = request.get_json() or {}
-    modelo = (data.get("modelo") or "").strip()
-    qtd = int(data.get("quantidade") or 0)
-    usuario = (data.get("usuario") or "Operador").strip()
-    if not modelo or qtd <= 0:
-        return abort(400, "Informe modelo e quantidade > 0.")
-
-    criadas = []
-    for _ in range(qtd):
-        # TODO: chame seu gerador real de serial (ex.: app.services.serials.next_serial(modelo))
-        serial = gerar_serial_stub(modelo)  # SUBSTITUA PELO SEU GERADOR
-        # Preenche campos obrigatórios de Montagem (status, label_printed, label_print_count, created_at, updated_at)
-        m = Montagem(
-            modelo=modelo,
-            serial=serial,
-            data_hora=datetime.utcnow(),
-            usuario=usuario,
-            status="OK",
-            label_printed=False,
-            label_print_count=0,
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow(),
-        )
-        db.session.add(m)
-        criadas.append(m)
-
-    # Commit das montagens
-    try:
-        db.session.commit()
-    except Exception as e:
-        db.session.rollback()
-        return abort(400, f"Erro ao salvar (serial pode já existir): {e}")
-
-    # --- Enfileira no Painel (bancada SEP) para cada serial criado (idempotente) ---
-    # --- Garantir ordens no Painel (idempotente via ensure_gp_workorder) ---
-    warn = None
-    try:
-        for m in criadas:
-            ensure_gp_workorder(db.session, serial=str(m.serial), modelo=str(m.modelo))
-        db.session.commit()
-    except Exception as e:
-        db.session.rollback()
-        # Não derruba a montagem; apenas reporta aviso no JSON
-        warn = f"Falha ao garantir/enfileirar no Painel: {e}"
-
-    resp = {"ok": True, "itens": [m.as_dict() for m in criadas]}
-    if warn:
-        resp["warning"] = warn
-    return jsonify(resp)
-
-
-# ====================================================================
-# [FIM BLOCO] criar_montagens
-# ====================================================================
 
 
+@montagens_bp.route("/api/historico", methods=["GET"])
 # ====================================================================
 # [BLOCO] FUNÇÃO
-# [NOME] gerar_serial_stub
-# [RESPONSABILIDADE] Gerar serial unitário usando o serviço de geração e aplicar fallback em falha
+# [NOME] api_historico
+# [RESPONSABILIDADE] Histórico de montagens paginado por cursor, com filtros e seleção de campos
 # ====================================================================
-def gerar_serial_stub(modelo: str) -> str:
+def api_historico():
     """
-    Gera um único número de série para o modelo informado usando o gerador
-    real de números de série (``app.services.serials.generate_serials``).
-
-    Este wrapper mantém a mesma assinatura do stub original. Ele delega ao
-    gerador de números de série configurado no serviço ``serials`` e
-    retorna somente o primeiro serial da lista.
+    GET /producao/montagem/api/historico?modelo=&status=&usuario=
+        &inicio=YYYY-MM-DD|ISO&fim=YYYY-MM-DD|ISO&limite=50&cursor=&campos=id,serial,...
+    Mais recentes primeiro; datas em ISO 8601 UTC. 'proximo' vai em ?cursor=.
     """
+    from app.services.montagem.historico_service import (
+        consultar_historico,
+        instante_utc,
+    )
+
     try:
-        serials = generate_serials(modelo, 1)
-        return serials[0] if serials else ""
-    except Exception as e:
-        # fallback: timestamp modulo in case the generator fails
-        base = int(datetime.utcnow().timestamp()) % 1000000
-        return f"{base}"
+        inicio = request.args.get("inicio")
+        fim = request.args.get("fim")
+        resultado = consultar_historico(
+            modelo=(request.args.get("modelo") or "").strip() or None,
+            status=(request.args.get("status") or "").strip() or None,
+            usuario=(request.args.get("usuario") or "").strip() or None,
+            inicio=instante_utc(inicio) if inicio else None,
+            fim=instante_utc(fim, fim_do_dia=True) if fim else None,
+            limite=request.args.get("limite", type=int),
+            cursor=request.args.get("cursor") or None,
+            campos=(request.args.get("campos") or "").split(","),
+        )
+    except ValueError as e:
+        return jsonify({"ok": False, "erro": str(e)}), 400
+    resultado["ok"] = True
+    return jsonify(resultado)
 
 
 # ====================================================================
-# [FIM BLOCO] gerar_serial_stub
+# [FIM BLOCO] api_historico
 # ====================================================================
-
-
 @montagens_bp.route("/cancelar/<int:montagem_id>", methods=["POST"])
 # ====================================================================
 # [BLOCO] FUNÇÃO
@@ -167,7 +110,8 @@ def gerar_serial_stub(modelo: str) -> str:
 def cancelar_montagem(montagem_id: int):
     """
     Marca como CANCELADA. NÃO apaga nem permite repetir serial.
-    Não estorna peças ao estoque (apenas marca status).
+    Estorna ao estoque uma unidade do snapshot da reserva do lote
+    (montagens anteriores ao snapshot só têm o status alterado).
 
     Body: { motivo: "...", usuario: "..." }
     """
@@ -177,12 +121,27 @@ def cancelar_montagem(montagem_id: int):
     if not motivo:
         return abort(400, "Motivo é obrigatório.")
 
-    m = Montagem.query.get_or_404(montagem_id)
+    # trava a linha: dois cancelamentos simultâneos não estornam em dobro
+    m = db.session.execute(
+        select(Montagem).where(Montagem.id == montagem_id).with_for_update()
+    ).scalar_one_or_none()
+    if not m:
+        return abort(404)
 
     if m.status == "CANCELADA":
         return jsonify({"ok": True, "message": "Já estava cancelada."})
 
     try:
+        estorno = {}
+        if m.reserva_id:
+            estorno = estornar_reserva_componentes(
+                m.reserva_id,
+                1,
+                usuario=usuario,
+                referencia=f"CANCEL-{m.serial}",
+                session=db.session,
+            )
+
         m.status = "CANCELADA"
         m.cancel_reason = motivo
         m.cancel_at = datetime.utcnow()
@@ -190,7 +149,10 @@ def cancelar_montagem(montagem_id: int):
         db.session.add(m)
         db.session.commit()
 
-        return jsonify({"ok": True, "message": "Montagem cancelada."})
+        resp = {"ok": True, "message": "Montagem cancelada.", "estorno": estorno}
+        if not m.reserva_id:
+            resp["warning"] = "Montagem sem snapshot de reserva; componentes não estornados."
+        return jsonify(resp)
 
     except Exception as e:
         db.session.rollback()
@@ -203,6 +165,78 @@ def cancelar_montagem(montagem_id: int):
 # ====================================================================
 
 
+@montagens_bp.route("/cancelar-lote/<int:reserva_id>", methods=["POST"])
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] cancelar_lote
+# [RESPONSABILIDADE] Cancelar todas as montagens ativas de um lote e estornar a reserva em um único lote de escrita
+# ====================================================================
+def cancelar_lote(reserva_id: int):
+    """
+    Cancela as montagens ainda ativas do lote (mesma reserva) e devolve ao
+    estoque as unidades correspondentes do snapshot, com um UPDATE de estoque
+    e um UPDATE de status, independentemente do tamanho do lote.
+
+    Body: { motivo: "...", usuario: "..." }
+    """
+    data = request.get_json() or {}
+    motivo = (data.get("motivo") or "").strip()
+    usuario = (data.get("usuario") or "Operador").strip()
+    if not motivo:
+        return abort(400, "Motivo é obrigatório.")
+
+    try:
+        ids = (
+            db.session.execute(
+                select(Montagem.id)
+                .where(Montagem.reserva_id == reserva_id, Montagem.status != "CANCELADA")
+                .order_by(Montagem.id)
+                .with_for_update()
+            )
+            .scalars()
+            .all()
+        )
+        if not ids:
+            return jsonify({"ok": True, "message": "Nenhuma montagem ativa no lote.", "canceladas": 0})
+
+        estorno = estornar_reserva_componentes(
+            reserva_id,
+            len(ids),
+            usuario=usuario,
+            referencia=f"CANCEL-LOTE-{reserva_id}",
+            session=db.session,
+        )
+
+        agora = datetime.utcnow()
+        db.session.execute(
+            update(Montagem)
+            .where(Montagem.id.in_(ids))
+            .values(
+                status="CANCELADA",
+                cancel_reason=motivo,
+                cancel_at=agora,
+                cancel_by=usuario,
+                updated_at=agora,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+        return jsonify(
+            {"ok": True, "message": "Lote cancelado.", "canceladas": len(ids), "estorno": estorno}
+        )
+
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Erro ao cancelar lote")
+        return jsonify({"ok": False, "erro": str(e)}), 500
+
+
+# ====================================================================
+# [FIM BLOCO] cancelar_lote
+# ====================================================================
+
+
 @montagens_bp.route("/reprints/<int:montagem_id>", methods=["GET"])
 # ====================================================================
 # [BLOCO] FUNÇÃO
@@ -266,8 +300,21 @@ def exportar_montagens_csv():
       - date_to=YYYY-MM-DD
       - modelo=PM2100 (opcional)
       - status=OK|CANCELADA (opcional)
+      - gzip=1 (opcional: baixa montagens.csv.gz)
+    Linhas saem em fluxo direto do cursor (memória constante em qualquer período).
     """
-    q = Montagem.query
+    from app.services.exportacao_service import resposta_csv_em_fluxo
+
+    stmt = select(
+        Montagem.id,
+        Montagem.modelo,
+        Montagem.serial,
+        Montagem.data_hora,
+        Montagem.usuario,
+        Montagem.status,
+        Montagem.label_printed,
+        Montagem.label_print_count,
+    )
 
     # Datas
     df = request.args.get("date_from")
@@ -275,14 +322,14 @@ def exportar_montagens_csv():
     if df:
         try:
             dt_from = datetime.strptime(df, "%Y-%m-%d")
-            q = q.filter(Montagem.data_hora >= dt_from)
+            stmt = stmt.where(Montagem.data_hora >= dt_from)
         except Exception:
             pass
     if dt:
         try:
             dt_to = datetime.strptime(dt, "%Y-%m-%d")
             # incluir o dia todo
-            q = q.filter(
+            stmt = stmt.where(
                 Montagem.data_hora < dt_to.replace(hour=23, minute=59, second=59)
             )
         except Exception:
@@ -292,37 +339,31 @@ def exportar_montagens_csv():
     modelo = (request.args.get("modelo") or "").strip()
     status = (request.args.get("status") or "").strip().upper()
     if modelo:
-        q = q.filter(Montagem.modelo == modelo)
+        stmt = stmt.where(Montagem.modelo == modelo)
     if status in ("OK", "CANCELADA"):
-        q = q.filter(Montagem.status == status)
-
-    itens = q.order_by(Montagem.id.desc()).all()
-
-    # Monta CSV
-    lines = [
-        "id;modelo;serial;data_hora;usuario;status;label_printed;label_print_count"
-    ]
-    for m in itens:
-        lines.append(
-            ";".join(
-                [
-                    str(m.id),
-                    m.modelo,
-                    m.serial,
-                    m.data_hora.strftime("%Y-%m-%d %H:%M"),
-                    m.usuario or "",
-                    m.status,
-                    "1" if m.label_printed else "0",
-                    str(m.label_print_count or 0),
-                ]
-            )
-        )
-    csv_data = "\n".join(lines)
+        stmt = stmt.where(Montagem.status == status)
+
+    def _formatar(r):
+        return [
+            r.id,
+            r.modelo,
+            r.serial,
+            r.data_hora.strftime("%Y-%m-%d %H:%M") if r.data_hora else "",
+            r.usuario or "",
+            r.status,
+            "1" if r.label_printed else "0",
+            r.label_print_count or 0,
+        ]
 
-    return Response(
-        csv_data.encode("utf-8"),
-        mimetype="text/csv; charset=utf-8",
-        headers={"Content-Disposition": 'attachment; filename="montagens.csv"'},
+    return resposta_csv_em_fluxo(
+        stmt.order_by(Montagem.id.desc()),
+        cabecalho=[
+            "id", "modelo", "serial", "data_hora", "usuario",
+            "status", "label_printed", "label_print_count",
+        ],
+        nome_arquivo="montagens.csv",
+        compactar=request.args.get("gzip") in ("1", "true", "sim"),
+        formatar=_formatar,
     )
 
 
@@ -336,9 +377,9 @@ def exportar_montagens_csv():
 # BLOCO_UTIL: logger
 # BLOCO_UTIL: montagens_bp
 # FUNÇÃO: listar_montagens
-# FUNÇÃO: criar_montagens
-# FUNÇÃO: gerar_serial_stub
+# FUNÇÃO: api_historico
 # FUNÇÃO: cancelar_montagem
+# FUNÇÃO: cancelar_lote
 # FUNÇÃO: listar_reprints_por_id
 # FUNÇÃO: listar_reprints_por_serial
 # FUNÇÃO: exportar_montagens_csv
@@ -1,16 +1,15 @@
 # app/routes/producao_routes/maquinas_routes/montar_maquinas.py
 from __future__ import annotations
-from datetime import datetime, timezone, timedelta
+from datetime import timezone, timedelta
 import logging
 
-from flask import Blueprint, render_template, jsonify, request
-from sqlalchemy import inspect
+from flask import Blueprint, render_template, jsonify, request, current_app
 from flask_login import login_required
 
 from app import db
 from app.services.serials import generate_serials
 from app.services.montagem import capacidade_service
-from app.models_sqla import Montagem, GPWorkOrder, EstruturaMaquina, Peca
+from app.models_sqla import Montagem, GPWorkOrder, EstruturaMaquina
 
 import app.services.montagem.capacidade_service as cap_srv
 from app.services.montagem.capacidade_service import (
@@ -18,16 +17,18 @@ from app.services.montagem.capacidade_service import (
     calcular_todas_capacidades,
     calcular_otimizacao,
 )
+from app.services.montagem.bom_service import calcular_custo_bom, BomCicloDetectado
+from app.services.montagem.projecao_service import projetar_estoque
+from app.services.montagem.lote_service import (
+    criar_montagens_em_lote,
+    garantir_ordens_em_lote,
+)
 
 from app.routes.producao_routes.maquinas_routes.consumo_service import (
     reservar_componentes_para_montagem,
     EstoqInsuficiente,
 )
 
-from app.routes.producao_routes.painel_routes.order_api import ensure_gp_workorder
-
-# Integração com ROP
-from app.routes.producao_routes.painel_routes import rop_service
 
 # ============================================================
 # Logger
@@ -115,6 +116,20 @@ def _assert_bom_existe(codigo_conjunto: str) -> bool:
 # ====================================================================
 
 
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _bom_multinivel
+# [RESPONSABILIDADE] Indicar se capacidade/reserva/custo devem usar a BOM explodida (config BOM_MULTINIVEL)
+# ====================================================================
+def _bom_multinivel() -> bool:
+    return bool(current_app.config.get("BOM_MULTINIVEL", False))
+
+
+# ====================================================================
+# [FIM BLOCO] _bom_multinivel
+# ====================================================================
+
+
 # ============================================================
 # Views / APIs
 # ============================================================
@@ -142,7 +157,7 @@ def pagina_montagem():
 # ====================================================================
 def api_capacidade():
     try:
-        capacidades = calcular_todas_capacidades(MODELOS)
+        capacidades = calcular_todas_capacidades(MODELOS, explodir=_bom_multinivel())
         resumo = ", ".join(
             [f"{k}: {v.get('capacidade')}" for k, v in capacidades["modelos"].items()]
         )
@@ -166,7 +181,9 @@ def api_capacidade():
 # ====================================================================
 def api_otimizacao():
     try:
-        capacidades = calcular_todas_capacidades(MODELOS)["modelos"]
+        capacidades = calcular_todas_capacidades(MODELOS, explodir=_bom_multinivel())[
+            "modelos"
+        ]
         plano = calcular_otimizacao(capacidades)
         return jsonify(plano)
     except Exception as e:
@@ -179,6 +196,71 @@ def api_otimizacao():
 # ====================================================================
 
 
+@maquinas_bp.route("/api/custo", methods=["GET"])
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] api_custo
+# [RESPONSABILIDADE] Retornar custo consolidado da BOM por modelo (um nível ou explodida)
+# ====================================================================
+def api_custo():
+    explodir = request.args.get("explodir")
+    explodir = _bom_multinivel() if explodir is None else explodir in ("1", "true")
+    try:
+        custos = {}
+        for modelo in MODELOS:
+            codigo_conjunto = MODEL_TO_CONJUNTO.get(modelo)
+            if codigo_conjunto:
+                custos[modelo] = calcular_custo_bom(codigo_conjunto, explodir=explodir)
+        return jsonify({"explodida": explodir, "modelos": custos})
+    except BomCicloDetectado as e:
+        return jsonify({"ok": False, "erro": str(e), "caminho": e.caminho}), 409
+    except Exception as e:
+        logger.exception("Erro ao calcular custo da BOM")
+        return jsonify({"ok": False, "erro": str(e)}), 500
+
+
+# ====================================================================
+# [FIM BLOCO] api_custo
+# ====================================================================
+
+
+@maquinas_bp.route("/api/projecao", methods=["GET", "POST"])
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] api_projecao
+# [RESPONSABILIDADE] Retornar estoque projetado por peça (ordens na fila + lotes planejados) com datas de ruptura
+# ====================================================================
+def api_projecao():
+    """
+    GET  ?horizonte=14&todos=1
+    POST { "horizonte": 14, "todos": false,
+           "lotes": [ { "modelo": "PM2100", "quantidade": 5, "dia": 0 }, ... ] }
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        horizonte = int(data.get("horizonte") or request.args.get("horizonte") or 14)
+    except (TypeError, ValueError):
+        horizonte = 14
+    todos = bool(data.get("todos")) or request.args.get("todos") in ("1", "true")
+    lotes = data.get("lotes") if isinstance(data.get("lotes"), list) else []
+
+    try:
+        proj = projetar_estoque(
+            lotes=lotes, horizonte=horizonte, explodir=_bom_multinivel(), todos=todos
+        )
+        return jsonify(proj)
+    except BomCicloDetectado as e:
+        return jsonify({"ok": False, "erro": str(e), "caminho": e.caminho}), 409
+    except Exception as e:
+        logger.exception("Erro ao projetar estoque")
+        return jsonify({"ok": False, "erro": str(e)}), 500
+
+
+# ====================================================================
+# [FIM BLOCO] api_projecao
+# ====================================================================
+
+
 @maquinas_bp.route("/api/validar", methods=["POST"])
 # ====================================================================
 # [BLOCO] FUNÇÃO
@@ -338,36 +420,31 @@ def api_montar():
             500,
         )
 
-    criadas = []
-    for s in seriais:
-        m = Montagem(
-            modelo=modelo,
-            serial=s,
-            usuario=usuario,
-            data_hora=datetime.utcnow(),
-            status="OK",
-            label_printed=False,
-            label_print_count=0,
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow(),
-        )
-        db.session.add(m)
-        criadas.append(m)
-
     try:
         referencia = (
             f"LOTE-{modelo}-{codigo_conjunto}-{seriais[0]}..{seriais[-1]}"
             if len(seriais) > 1
             else f"{codigo_conjunto}-{seriais[0]}"
         )
-        reservar_componentes_para_montagem(
+        reserva = reservar_componentes_para_montagem(
             modelo=codigo_conjunto,
             quantidade_unidades=quantidade,
             usuario=usuario,
             referencia=referencia,
             session=db.session,
+            explodir=_bom_multinivel(),
+        )
+        # lote inteiro em uma transação: montagens (vinculadas ao snapshot da
+        # reserva, para estorno no cancelamento) e ordens do Painel em executemany
+        criadas = criar_montagens_em_lote(
+            modelo, seriais, usuario, reserva_id=reserva.id, session=db.session
         )
+        garantir_ordens_em_lote(((s, modelo) for s in seriais), session=db.session)
+        itens = [m.as_dict() for m in criadas]  # antes do commit (que expira os objetos)
         db.session.commit()
+
+        # ROP dos componentes baixados: avaliado no commit da reserva
+        # (rop_service.registrar_gatilho_rop), só para as peças tocadas.
     except EstoqInsuficiente as e:
         db.session.rollback()
         faltas = [
@@ -384,97 +461,13 @@ def api_montar():
         )
     except Exception as e:
         db.session.rollback()
-        logger.exception("Erro ao salvar montagens/reserva")
+        logger.exception("Erro ao salvar montagens/reserva/ordens do lote")
         return (
             jsonify({"ok": False, "erros": [{"modelo": modelo, "motivo": str(e)}]}),
             400,
         )
 
-    warn = None
-    try:
-        insp = inspect(db.engine)
-        if not insp.has_table("gp_work_order"):
-            db.create_all()
-
-        for m in criadas:
-            order = ensure_gp_workorder(
-                db.session, serial=str(m.serial), modelo=str(m.modelo)
-            )
-            if not getattr(order, "current_bench", None):
-                order.current_bench = "sep"
-
-        db.session.commit()
-
-        # 5) (novo passo) Atualiza alertas ROP de produção (conjuntos)
-        try:
-            conjunto = (
-                db.session.query(Peca)
-                .filter_by(codigo_pneumark=codigo_conjunto)
-                .one_or_none()
-            )
-            if conjunto:
-                rop_service.handle_rop_on_change(conjunto, db.session)
-                logger.info(
-                    f"[ROP] Estoque do conjunto {codigo_conjunto} atualizado; verificação de ROP realizada."
-                )
-            else:
-                logger.error(
-                    f"[ROP] Peça conjunto {codigo_conjunto} não encontrada para verificar ROP."
-                )
-        except Exception as e:
-            logger.exception(
-                f"[ROP] Erro ao atualizar alerta de Ponto de Pedido para {codigo_conjunto}: {e}"
-            )
-
-        # 6) (novo passo) Verifica ROP de peças consumidas e integra com OMIE
-        try:
-            # Obter lista de componentes da BOM do conjunto e seus estoques atualizados
-            componentes = (
-                db.session.query(EstruturaMaquina)
-                .filter_by(codigo_maquina=codigo_conjunto)
-                .all()
-            )
-            for comp in componentes:
-                peca_consumida = (
-                    db.session.query(Peca)
-                    .filter_by(codigo_pneumark=comp.codigo_peca)
-                    .one_or_none()
-                )
-                if peca_consumida and peca_consumida.ponto_pedido is not None:
-                    estoque = peca_consumida.estoque_atual or 0
-                    ponto = peca_consumida.ponto_pedido or 0
-                    if estoque <= ponto:
-                        # Gera requisição de compra no OMIE
-                        from app.utils import omie_utils
-
-                        try:
-                            quantidade_sugerida = (
-                                peca_consumida.estoque_maximo or estoque
-                            ) - estoque
-                            if quantidade_sugerida > 0:
-                                omie_utils.solicitar_requisicao_compra(
-                                    peca_consumida, quantidade_sugerida
-                                )
-                                logger.info(
-                                    f"[OMIE] Requisição de compra gerada para peça {peca_consumida.codigo_pneumark} (estoque {estoque} <= PP {ponto})."
-                                )
-                        except Exception as e:
-                            logger.error(
-                                f"[OMIE] Falha ao solicitar compra para peça {peca_consumida.codigo_pneumark}: {e}"
-                            )
-            # (nenhum commit aqui, omie_utils deve tratar persistência em sua implementação)
-        except Exception as e:
-            logger.exception(f"Erro ao verificar ROP de peças após montagem: {e}")
-
-    except Exception as e:
-        db.session.rollback()
-        warn = f"Falha ao garantir/enfileirar ordens no Painel: {e}"
-        logger.exception("[painel] Erro ao garantir/enfileirar ordens no Painel")
-
-    resp = {"ok": True, "itens": [m.as_dict() for m in criadas]}
-    if warn:
-        resp["warning"] = warn
-    return jsonify(resp)
+    return jsonify({"ok": True, "itens": itens})
 
 
 # ====================================================================
@@ -488,9 +481,12 @@ def api_montar():
 # BLOCO_UTIL: maquinas_bp
 # FUNÇÃO: _resolver_codigo_conjunto
 # FUNÇÃO: _assert_bom_existe
+# FUNÇÃO: _bom_multinivel
 # FUNÇÃO: pagina_montagem
 # FUNÇÃO: api_capacidade
 # FUNÇÃO: api_otimizacao
+# FUNÇÃO: api_custo
+# FUNÇÃO: api_projecao
 # FUNÇÃO: api_validar
 # FUNÇÃO: api_montadas
 # FUNÇÃO: api_montar
@@ -11,9 +11,7 @@ from flask import (
     url_for,
 )
 from sqlalchemy import or_
-from datetime import datetime
-import csv
-from io import StringIO
+from datetime import date, datetime
 from app import db  # usado em ações/rotas dev
 from app.routes.producao_routes.painel_routes.order_api import ensure_gp_workorder
 
@@ -302,36 +300,47 @@ def api_invalidate(serial_id):
 # ====================================================================
 @series_bp.route("/api/export", methods=["GET"])
 def api_export():
+    """CSV das séries filtradas, em fluxo direto do cursor (?gzip=1 baixa .csv.gz)."""
+    from app.services.exportacao_service import resposta_csv_em_fluxo
+
     qry, Serial = _build_query_from_args()
-    rows = qry.order_by(Serial.created_at.desc()).all()
-    data = [_serialize_serial(s) for s in rows]
-
-    buf = StringIO()
-    writer = csv.DictWriter(
-        buf,
-        fieldnames=(
-            list(data[0].keys())
-            if data
-            else [
-                "id",
-                "montagem_id",
-                "modelo",
-                "numero_serie",
-                "status",
-                "printed_count",
-                "created_at",
-                "created_by",
-            ]
-        ),
+    stmt = (
+        qry.with_entities(
+            Serial.id,
+            Serial.montagem_id,
+            Serial.modelo,
+            Serial.numero_serie,
+            Serial.status,
+            Serial.printed_count,
+            Serial.created_at,
+            Serial.created_by,
+        )
+        .order_by(Serial.created_at.desc())
+        .statement
     )
-    writer.writeheader()
-    for r in data:
-        writer.writerow(r)
-    buf.seek(0)
-    return current_app.response_class(
-        buf.read(),
-        mimetype="text/csv",
-        headers={"Content-Disposition": "attachment; filename=series_export.csv"},
+
+    def _formatar(r):
+        return [
+            r.id,
+            r.montagem_id,
+            r.modelo,
+            r.numero_serie,
+            r.status,
+            r.printed_count or 0,
+            r.created_at.strftime("%Y-%m-%d %H:%M:%S") if r.created_at else "",
+            r.created_by or "",
+        ]
+
+    return resposta_csv_em_fluxo(
+        stmt,
+        cabecalho=[
+            "id", "montagem_id", "modelo", "numero_serie",
+            "status", "printed_count", "created_at", "created_by",
+        ],
+        nome_arquivo="series_export.csv",
+        compactar=request.args.get("gzip") in ("1", "true", "sim"),
+        delimitador=",",
+        formatar=_formatar,
     )
 
 
@@ -340,6 +349,43 @@ def api_export():
 # ====================================================================
 
 
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] api_auditoria
+# [RESPONSABILIDADE] Consultar a auditoria de emissão de seriais por serial, modelo, usuário e data
+# ====================================================================
+@series_bp.route("/api/auditoria", methods=["GET"])
+def api_auditoria():
+    """
+    GET /producao/series/api/auditoria?serial=&modelo=&usuario=
+        &inicio=YYYY-MM-DD&fim=YYYY-MM-DD&limite=100&cursor=
+    Mais recentes primeiro; 'proximo' da resposta vai em ?cursor= da próxima página.
+    """
+    from app.services.serials import consultar_auditoria
+
+    try:
+        inicio = request.args.get("inicio")
+        fim = request.args.get("fim")
+        resultado = consultar_auditoria(
+            serial=(request.args.get("serial") or "").strip() or None,
+            modelo=(request.args.get("modelo") or "").strip() or None,
+            usuario=(request.args.get("usuario") or "").strip() or None,
+            inicio=date.fromisoformat(inicio) if inicio else None,
+            fim=date.fromisoformat(fim) if fim else None,
+            limite=request.args.get("limite", type=int),
+            cursor=request.args.get("cursor") or None,
+        )
+    except ValueError as e:
+        return jsonify({"ok": False, "erro": str(e)}), 400
+    resultado["ok"] = True
+    return jsonify(resultado)
+
+
+# ====================================================================
+# [FIM BLOCO] api_auditoria
+# ====================================================================
+
+
 # ---------------------------
 # Rotas DEV (diagnóstico)
 # ---------------------------
@@ -423,68 +469,27 @@ def dev_seed():
 # ====================================================================
 @series_bp.route("/dev/backfill", methods=["GET"])
 def dev_backfill_serials():
-    from app.models.producao_models.montagem import Montagem  # import tardio
-    from app.models.producao_models.seriais import Serial, SerialEvent  # import tardio
-
-    created, updated, skipped = 0, 0, 0
-    monts = Montagem.query.order_by(Montagem.data_hora.asc()).all()
-
-    for m in monts:
-        s = Serial.query.filter_by(numero_serie=m.serial).first()
-        if s:
-            changed = False
-            if s.montagem_id is None:
-                s.montagem_id = m.id
-                changed = True
-            if not s.modelo:
-                s.modelo = m.modelo
-                changed = True
-            new_status = "valid" if m.status == "OK" else "invalid"
-            if s.status != new_status:
-                s.status = new_status
-                changed = True
-            desired_count = m.label_print_count or (1 if m.label_printed else 0)
-            if (s.printed_count or 0) < desired_count:
-                s.printed_count = desired_count
-                changed = True
-            if changed:
-                updated += 1
-            else:
-                skipped += 1
-            continue
-
-        s = Serial(
-            montagem_id=m.id,
-            modelo=m.modelo,
-            numero_serie=m.serial,
-            status="valid" if m.status == "OK" else "invalid",
-            printed_count=m.label_print_count or (1 if m.label_printed else 0),
-            created_at=m.created_at or m.data_hora or datetime.utcnow(),
-            created_by=m.usuario or "Operador",
-        )
-        db.session.add(s)
-        db.session.flush()
-        db.session.add(
-            SerialEvent(
-                serial_id=s.id,
-                kind="mounted",
-                payload={
-                    "from": "backfill",
-                    "montagem_id": m.id,
-                    "data_hora": (
-                        m.data_hora.strftime("%Y-%m-%d %H:%M:%S")
-                        if m.data_hora
-                        else None
-                    ),
-                },
-                created_by=s.created_by,
-            )
-        )
-        created += 1
+    """
+    Atalho de desenvolvimento para o job em lotes; em bases grandes use
+    `flask --app run seriais-reconciliar` (retomável, com progresso).
+    """
+    from app.services.montagem.reconciliacao_seriais import (
+        CadastroSeriesIndisponivel,
+        reconciliar_seriais,
+    )
 
-    db.session.commit()
+    try:
+        r = reconciliar_seriais(retomar=False)
+    except CadastroSeriesIndisponivel as e:
+        return jsonify({"ok": False, "erro": str(e)}), 503
     return jsonify(
-        {"ok": True, "created": created, "updated": updated, "skipped": skipped}
+        {
+            "ok": True,
+            "created": r["criados"],
+            "updated": r["atualizados"],
+            "skipped": r["sem_alteracao"],
+            "lotes": r["lotes"],
+        }
     )
 
 
@@ -539,6 +544,7 @@ def dev_debug_serials():
 # FUNÇÃO: api_reprint
 # FUNÇÃO: api_invalidate
 # FUNÇÃO: api_export
+# FUNÇÃO: api_auditoria
 # FUNÇÃO: dev_init_serials
 # FUNÇÃO: dev_seed
 # FUNÇÃO: dev_backfill_serials
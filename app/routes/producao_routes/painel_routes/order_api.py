@@ -5,6 +5,8 @@ from typing import Optional
 from flask import Blueprint, jsonify, request
 
 from app import db
+from app.services.producao.ordem_cache import metricas_cache_ordens, ordem_por_serial
+from app.utils.db_utils import upsert
 
 # Tenta usar o caminho atual (models_sqla). Se não existir, cai no caminho antigo.
 try:
@@ -47,6 +49,22 @@ def ping():
 # ====================================================================
 
 
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] cache_metricas
+# [RESPONSABILIDADE] Expor acertos/buscas do cache serial -> ordem deste worker
+# ====================================================================
+@gp_painel_order_api_bp.get("/cache")
+def cache_metricas():
+    """Métricas do cache serial -> ordem (por processo; cada worker tem o seu)."""
+    return jsonify({"ok": True, **metricas_cache_ordens()})
+
+
+# ====================================================================
+# [FIM BLOCO] cache_metricas
+# ====================================================================
+
+
 # -----------------------------------------------------------------------------
 # Serviço: garante que exista um GPWorkOrder para o serial informado.
 # Agora cria já com current_bench = 'sep' para aparecer no card ESTOQUE.
@@ -65,30 +83,40 @@ def ensure_gp_workorder(
     Garante que exista um GPWorkOrder para o serial informado.
     - Se não existir, cria com status 'queued' e current_bench='sep' (entra em ESTOQUE).
     - Se existir, apenas retorna.
+    Sem corrida: INSERT ... ON CONFLICT (serial) DO NOTHING sobre o índice
+    único ix_gp_work_order_serial; quem perde a corrida lê a ordem do outro.
     """
     serial = (serial or "").strip()
     modelo = (modelo or "").strip()
     if not serial:
         raise ValueError("serial vazio em ensure_gp_workorder")
 
-    order = GPWorkOrder.query.filter_by(serial=serial).first()
+    order = ordem_por_serial(serial, session)
     if order:
         return order
 
+    agora = datetime.utcnow()
     # NOTA: hipot_status é NOT NULL no schema. Usamos string vazia como default seguro.
-    order = GPWorkOrder(
-        serial=serial,
-        modelo=modelo,
-        status="queued",
-        current_bench="sep",  # obrigatório para o board mostrar no ESTOQUE
-        hipot_flag=False,
-        hipot_status="",  # HOTFIX: evitar IntegrityError (NOT NULL)
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow(),
+    upsert(
+        GPWorkOrder,
+        [
+            {
+                "serial": serial,
+                "modelo": modelo,
+                "status": "queued",
+                "current_bench": "sep",  # obrigatório para o board mostrar no ESTOQUE
+                "hipot_flag": False,
+                "hipot_status": "",  # HOTFIX: evitar IntegrityError (NOT NULL)
+                "created_at": agora,
+                "updated_at": agora,
+            }
+        ],
+        chaves=["serial"],
+        atualizar={},
+        session=session,
     )
-    session.add(order)
     # commit fica a cargo do chamador
-    return order
+    return ordem_por_serial(serial, session)
 
 
 # ====================================================================
@@ -111,7 +139,7 @@ from app.models.producao_models.gp_execucao import GPWorkStage
 @gp_painel_order_api_bp.get("/timeline/<serial>")
 def timeline(serial):
     """Retorna histórico completo de um serial, com etapas por bancada."""
-    order = GPWorkOrder.query.filter_by(serial=serial).first()
+    order = ordem_por_serial(serial)
     if not order:
         return jsonify({"ok": False, "error": f"serial não encontrado: {serial}"}), 404
 
@@ -161,6 +189,7 @@ def timeline(serial):
 # --------------------------------------------------------------------
 # BLOCO_CONFIG: gp_painel_order_api_bp
 # FUNÇÃO: ping
+# FUNÇÃO: cache_metricas
 # FUNÇÃO: ensure_gp_workorder
 # FUNÇÃO: timeline
 # ====================================================================
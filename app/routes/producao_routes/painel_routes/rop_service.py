@@ -1,10 +1,17 @@
 from __future__ import annotations
 
 import logging
+import threading
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import and_, case, event, false, func, or_
 
 from app import db
+from app.models_sqla import JobCheckpoint
+from app.services.movimentacao_service import INFO_PECAS_TOCADAS, marcar_pecas_tocadas
+from app.utils.db_utils import upsert
 
 # ⚠️ Usar sempre os MODELOS ORM (SQLAlchemy)
 try:
@@ -19,6 +26,15 @@ except Exception:
 
 logger = logging.getLogger(__name__)
 
+# Transições "entrou em alerta" aguardando o commit para notificação
+INFO_TRANSICOES_ROP = "rop_transicoes_pendentes"
+
+# Tamanho máximo da lista IN por consulta de avaliação
+_LOTE_IDS = 500
+
+# job_checkpoints: existe depois da primeira avaliação completa (flask rop-avaliar)
+CHECKPOINT_ROP = "rop_avaliacao"
+
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
@@ -122,22 +138,175 @@ def _eval_rop_for_conjunto(peca: "Peca") -> Dict[str, Any]:
 # ---------------------------------------------------------------------------
 
 
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _expr_em_alerta
+# [RESPONSABILIDADE] Expressão SQL do critério de ROP (conjuntos e peças com ponto de pedido)
+# ====================================================================
+def _expr_em_alerta():
+    """
+    Mesmo critério usado até aqui:
+    - conjunto: estoque_atual <= ponto_pedido (nulos como 0)
+    - peça: só entra com ponto_pedido definido
+    """
+    return case(
+        (
+            and_(
+                or_(Peca.tipo == "conjunto", Peca.ponto_pedido.isnot(None)),
+                func.coalesce(Peca.estoque_atual, 0)
+                <= func.coalesce(Peca.ponto_pedido, 0),
+            ),
+            True,
+        ),
+        else_=False,
+    )
+
+
+# ====================================================================
+# [FIM BLOCO] _expr_em_alerta
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] avaliar_rop
+# [RESPONSABILIDADE] Avaliar ROP das peças informadas em uma consulta e gravar só as transições
+# ====================================================================
+def avaliar_rop(
+    peca_ids: Optional[Iterable[int]] = None, session=None
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Compara o estado calculado (estoque x ponto de pedido) com gp_rop_alerts
+    e devolve apenas quem mudou:
+      { "entraram": [estado...], "sairam": [estado...] }
+    - peca_ids=None avalia todas as peças (ressincronização completa) e
+      marca o checkpoint CHECKPOINT_ROP: daí em diante gp_rop_alerts é a
+      fonte de list_rop_needs.
+    - Transições gravadas com um upsert em lote; não faz commit.
+    """
+    sess = session or db.session
+    resultado: Dict[str, List[Dict[str, Any]]] = {"entraram": [], "sairam": []}
+    if Peca is None or GPRopAlert is None:
+        logger.warning("[ROP] Modelos indisponíveis; avaliação ignorada.")
+        return resultado
+
+    em_alerta = _expr_em_alerta()
+    anterior = func.coalesce(GPRopAlert.in_alert, false())
+    base = (
+        sess.query(
+            Peca.id,
+            Peca.tipo,
+            Peca.codigo_pneumark,
+            Peca.descricao,
+            Peca.estoque_atual,
+            Peca.estoque_minimo,
+            Peca.estoque_maximo,
+            Peca.ponto_pedido,
+            em_alerta.label("em_alerta"),
+        )
+        .outerjoin(GPRopAlert, GPRopAlert.peca_id == Peca.id)
+        .filter(em_alerta != anterior)
+    )
+
+    if peca_ids is None:
+        linhas = base.all()
+        upsert(
+            JobCheckpoint,
+            [{"nome": CHECKPOINT_ROP, "atualizado_em": datetime.utcnow()}],
+            chaves=["nome"],
+            session=sess,
+        )
+    else:
+        ids = sorted({int(i) for i in peca_ids if i is not None})
+        linhas = []
+        for i in range(0, len(ids), _LOTE_IDS):
+            linhas.extend(base.filter(Peca.id.in_(ids[i : i + _LOTE_IDS])).all())
+
+    if not linhas:
+        return resultado
+
+    agora = datetime.utcnow()
+    entradas, saidas = [], []
+    for ln in linhas:
+        st = _eval_rop_for_conjunto(ln)
+        st["tipo"] = (ln.tipo or "").lower()
+        st["in_alert"] = bool(ln.em_alerta)
+        if st["in_alert"]:
+            resultado["entraram"].append(st)
+            entradas.append(
+                {
+                    "peca_id": ln.id,
+                    "in_alert": True,
+                    "last_sent_at": agora,
+                    "created_at": agora,
+                    "updated_at": agora,
+                }
+            )
+        else:
+            resultado["sairam"].append(st)
+            saidas.append(
+                {
+                    "peca_id": ln.id,
+                    "in_alert": False,
+                    "created_at": agora,
+                    "updated_at": agora,
+                }
+            )
+
+    if entradas:
+        upsert(
+            GPRopAlert,
+            entradas,
+            chaves=["peca_id"],
+            atualizar=["in_alert", "last_sent_at", "updated_at"],
+            session=sess,
+        )
+    if saidas:
+        upsert(
+            GPRopAlert,
+            saidas,
+            chaves=["peca_id"],
+            atualizar=["in_alert", "updated_at"],
+            session=sess,
+        )
+
+    logger.info(
+        "[ROP] Transições: %d entraram, %d saíram.", len(entradas), len(saidas)
+    )
+    return resultado
+
+
+# ====================================================================
+# [FIM BLOCO] avaliar_rop
+# ====================================================================
+
+
 # ====================================================================
 # [BLOCO] FUNÇÃO
 # [NOME] list_rop_needs
 # [RESPONSABILIDADE] Listar necessidades de montagem por conjuntos em ROP (sugerido > 0)
 # ====================================================================
 def list_rop_needs(session) -> List[Dict[str, Any]]:
+    """
+    Lê apenas os conjuntos marcados em gp_rop_alerts (mantido por avaliar_rop),
+    em vez de reavaliar todos os conjuntos a cada polling do painel.
+    Enquanto a avaliação completa (flask rop-avaliar) nunca rodou,
+    gp_rop_alerts está incompleto: calcula direto do estoque, como antes.
+    """
     needs: List[Dict[str, Any]] = []
-    if Peca is None:
-        logger.warning("[ROP] Model Peca indisponível; retornando lista vazia.")
+    if Peca is None or GPRopAlert is None:
+        logger.warning("[ROP] Modelos indisponíveis; retornando lista vazia.")
         return needs
 
-    conjuntos: List[Peca] = (
-        session.query(Peca)
-        .filter(Peca.tipo == "conjunto")  # type: ignore[attr-defined]
-        .all()
-    )
+    avaliado = session.query(JobCheckpoint.id).filter_by(nome=CHECKPOINT_ROP).first()
+    consulta = session.query(Peca).filter(Peca.tipo == "conjunto")
+    if avaliado:
+        consulta = consulta.join(GPRopAlert, GPRopAlert.peca_id == Peca.id).filter(
+            GPRopAlert.in_alert.is_(True)  # type: ignore[attr-defined]
+        )
+    else:
+        consulta = consulta.filter(_expr_em_alerta().is_(True))
+    conjuntos = consulta.all()
 
     for conj in conjuntos:
         st = _eval_rop_for_conjunto(conj)
@@ -204,64 +373,193 @@ def get_rop_needs_and_banner(session) -> Dict[str, Any]:
 # ====================================================================
 # [BLOCO] FUNÇÃO
 # [NOME] handle_rop_on_change
-# [RESPONSABILIDADE] Atualizar estado de alerta ROP e disparar e-mail de notificação com deduplicação
+# [RESPONSABILIDADE] Compatibilidade: reavaliar ROP de uma peça e notificar se entrou em alerta
 # ====================================================================
 def handle_rop_on_change(
     peca_conjunto: "Peca", session, force_email: bool = False
 ) -> None:
-    if GPRopAlert is None:
-        logger.warning(
-            "[ROP] GPRopAlert indisponível; enviando e-mail sem deduplicacao."
-        )
-    st = _eval_rop_for_conjunto(peca_conjunto)
+    """
+    Marca a peça e faz commit; a avaliação roda no gatilho de commit
+    (registrar_gatilho_rop). force_email reenvia o alerta de quem já está em ROP.
+    """
+    try:
+        marcar_pecas_tocadas([getattr(peca_conjunto, "id")], session)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        logger.exception(f"[ROP] Erro ao atualizar estado/dispatch de e-mail: {e}")
+        return
+
+    if force_email:
+        st = _eval_rop_for_conjunto(peca_conjunto)
+        if st["in_alert"]:
+            _send_rop_email(peca_conjunto, st)
 
+
+# ====================================================================
+# [FIM BLOCO] handle_rop_on_change
+# ====================================================================
+
+
+# ---------------------------------------------------------------------------
+# Gatilho de commit e notificações
+# ---------------------------------------------------------------------------
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _antes_do_commit
+# [RESPONSABILIDADE] Avaliar ROP das peças tocadas na transação, dentro da própria transação
+# ====================================================================
+def _antes_do_commit(session) -> None:
+    ids = session.info.get(INFO_PECAS_TOCADAS)
+    if not ids:
+        return
+    # erros do flush do próprio chamador sobem normalmente (fora do savepoint)
+    session.flush()
+    ids = session.info.pop(INFO_PECAS_TOCADAS, None)
     try:
-        alert_obj = None
-        if GPRopAlert:
-            alert_obj = (
-                session.query(GPRopAlert)
-                .filter_by(peca_id=getattr(peca_conjunto, "id"))
-                .one_or_none()
-            )
-            if alert_obj is None:
-                alert_obj = GPRopAlert(
-                    peca_id=getattr(peca_conjunto, "id"), in_alert=False
-                )
-                session.add(alert_obj)
-                session.flush()
+        with session.begin_nested():
+            transicoes = avaliar_rop(ids, session)
     except Exception as e:
-        logger.exception(f"[ROP] Falha ao consultar/criar GPRopAlert: {e}")
-        alert_obj = None
+        # falha de ROP não pode derrubar a baixa de estoque
+        logger.exception(f"[ROP] Falha ao avaliar ROP de {len(ids)} peça(s): {e}")
+        return
+    if transicoes["entraram"]:
+        session.info.setdefault(INFO_TRANSICOES_ROP, []).extend(
+            transicoes["entraram"]
+        )
+
+
+# ====================================================================
+# [FIM BLOCO] _antes_do_commit
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _depois_do_commit
+# [RESPONSABILIDADE] Disparar notificações das transições já confirmadas, fora da requisição
+# ====================================================================
+def _depois_do_commit(session) -> None:
+    entraram = session.info.pop(INFO_TRANSICOES_ROP, None)
+    if not entraram:
+        return
+    if not has_app_context():
+        logger.warning(
+            "[ROP] %d alerta(s) sem contexto de aplicação; notificação ignorada.",
+            len(entraram),
+        )
+        return
+    app = current_app._get_current_object()
+    threading.Thread(
+        target=_despachar_em_contexto,
+        args=(app, entraram),
+        name="rop-notificacoes",
+        daemon=True,
+    ).start()
+
+
+# ====================================================================
+# [FIM BLOCO] _depois_do_commit
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _descartar_pendencias
+# [RESPONSABILIDADE] Limpar marcações da sessão quando a transação é desfeita
+# ====================================================================
+def _descartar_pendencias(session, previous_transaction) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop(INFO_PECAS_TOCADAS, None)
+        session.info.pop(INFO_TRANSICOES_ROP, None)
+
+
+# ====================================================================
+# [FIM BLOCO] _descartar_pendencias
+# ====================================================================
 
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _despachar_em_contexto
+# [RESPONSABILIDADE] Executar despacho de alertas em thread própria com app context
+# ====================================================================
+def _despachar_em_contexto(app, entraram: List[Dict[str, Any]]) -> None:
+    with app.app_context():
+        despachar_alertas_rop(entraram)
+
+
+# ====================================================================
+# [FIM BLOCO] _despachar_em_contexto
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] despachar_alertas_rop
+# [RESPONSABILIDADE] Notificar entradas em ROP: e-mail para conjuntos, fila de requisição OMIE para peças
+# ====================================================================
+def despachar_alertas_rop(entraram: List[Dict[str, Any]]) -> None:
+    """
+    Peças vão para a fila de requisições OMIE (agrupada por fornecedor ao fim
+    da janela), em vez de uma chamada HTTP por peça.
+    """
+    itens = []
+    for st in entraram:
+        if st.get("tipo") == "conjunto":
+            _send_rop_email(None, st)
+            continue
+        sugerido = max(0, (st.get("max") or st.get("atual") or 0) - st["atual"])
+        if sugerido > 0:
+            itens.append({"peca_id": st["peca_id"], "quantidade": sugerido})
+
+    if not itens:
+        return
     try:
-        entered_alert = bool(st["in_alert"])
-        should_email = False
-
-        if alert_obj is not None:
-            if entered_alert and not bool(getattr(alert_obj, "in_alert", False)):
-                alert_obj.in_alert = True
-                alert_obj.updated_at = datetime.utcnow()
-                should_email = True
-            elif entered_alert and force_email:
-                should_email = True
-            elif not entered_alert and bool(getattr(alert_obj, "in_alert", False)):
-                alert_obj.in_alert = False
-                alert_obj.updated_at = datetime.utcnow()
-                should_email = False
-
-            session.commit()
-        else:
-            should_email = entered_alert or force_email
+        from app.services.omie_requisicao_service import (
+            agendar_envio,
+            enfileirar_requisicoes,
+        )
 
-        if should_email:
-            _send_rop_email(peca_conjunto, st)
+        criadas = enfileirar_requisicoes(itens)
+        db.session.commit()
+        if criadas:
+            agendar_envio()
+            logger.info(f"[OMIE] {len(criadas)} peça(s) em ROP enfileiradas para compra.")
     except Exception as e:
-        session.rollback()
-        logger.exception(f"[ROP] Erro ao atualizar estado/dispatch de e-mail: {e}")
+        db.session.rollback()
+        logger.error(f"[OMIE] Falha ao enfileirar requisições de compra: {e}")
 
 
 # ====================================================================
-# [FIM BLOCO] handle_rop_on_change
+# [FIM BLOCO] despachar_alertas_rop
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] registrar_gatilho_rop
+# [RESPONSABILIDADE] Ligar a avaliação incremental de ROP aos commits da sessão (idempotente)
+# ====================================================================
+def registrar_gatilho_rop() -> None:
+    """
+    Qualquer caminho que grave no livro-razão (registrar_movimentacoes) ou chame
+    marcar_pecas_tocadas tem o ROP reavaliado apenas para aquelas peças no commit.
+    """
+    alvo = db.session
+    for nome, fn in (
+        ("before_commit", _antes_do_commit),
+        ("after_commit", _depois_do_commit),
+        ("after_soft_rollback", _descartar_pendencias),
+    ):
+        if not event.contains(alvo, nome, fn):
+            event.listen(alvo, nome, fn)
+
+
+# ====================================================================
+# [FIM BLOCO] registrar_gatilho_rop
 # ====================================================================
 
 
@@ -275,14 +573,14 @@ def handle_rop_on_change(
 # [NOME] _send_rop_email
 # [RESPONSABILIDADE] Enviar e-mail de alerta ROP com detalhes de estoque e sugestão de montagem
 # ====================================================================
-def _send_rop_email(peca_conjunto: "Peca", st: Dict[str, Any]) -> None:
+def _send_rop_email(peca_conjunto: Optional["Peca"], st: Dict[str, Any]) -> None:
     try:
         from app.services.montagem.notifications.email_service import send_email  # type: ignore
     except Exception as e:
         logger.error(f"[ROP][EMAIL] Serviço de e-mail indisponível: {e}")
         return
 
-    model_code = st.get("model_code") or _infer_model_code_from_peca(peca_conjunto)
+    model_code = st.get("model_code") or st.get("codigo_conjunto")
     capacidade = _get_capacidade(model_code)
     cap_line = ""
     if capacidade is not None and capacidade <= 0:
@@ -321,9 +619,17 @@ def _send_rop_email(peca_conjunto: "Peca", st: Dict[str, Any]) -> None:
 # FUNÇÃO: _infer_model_code_from_peca
 # FUNÇÃO: _get_capacidade
 # FUNÇÃO: _eval_rop_for_conjunto
+# FUNÇÃO: _expr_em_alerta
+# BLOCO_DB: avaliar_rop
 # FUNÇÃO: list_rop_needs
 # FUNÇÃO: build_needs_banner
 # FUNÇÃO: get_rop_needs_and_banner
 # FUNÇÃO: handle_rop_on_change
+# FUNÇÃO: _antes_do_commit
+# FUNÇÃO: _depois_do_commit
+# FUNÇÃO: _descartar_pendencias
+# FUNÇÃO: _despachar_em_contexto
+# FUNÇÃO: despachar_alertas_rop
+# FUNÇÃO: registrar_gatilho_rop
 # FUNÇÃO: _send_rop_email
 # ====================================================================
@@ -6,7 +6,8 @@ from datetime import datetime
 import re
 
 # models de execução (ordens/etapas)
-from app.models.producao_models.gp_execucao import GPWorkOrder, GPWorkStage
+from app.models.producao_models.gp_execucao import GPWorkStage
+from app.services.producao.ordem_cache import ordem_por_serial
 
 # “receita” por modelo
 from app.models.producao_models.gp_modelos import GPModel, GPBenchConfig
@@ -366,7 +367,7 @@ def scan():
             serial=serial,
         )
 
-    order = GPWorkOrder.query.filter_by(serial=serial).first()
+    order = ordem_por_serial(serial)
     if not order:
         return _err(
             404,
@@ -555,7 +556,7 @@ def scan_undo():
     if not serial:
         return _err(400, "serial_requerido", "Informe o serial para desfazer.")
 
-    order = GPWorkOrder.query.filter_by(serial=serial).first()
+    order = ordem_por_serial(serial)
     if not order:
         return _err(
             404, "serial_nao_encontrado", "Serial não encontrado.", serial=serial
@@ -4,8 +4,8 @@ from flask import Blueprint, jsonify
 from sqlalchemy import select, desc
 from datetime import datetime
 from app import db
+from app.services.producao.ordem_cache import ordem_por_serial
 from app.models_sqla import (
-    GPWorkOrder,
     GPWorkStage,
     GPChecklistExecution,
     GPChecklistExecutionItem,
@@ -48,9 +48,7 @@ def _iso(dt):
 # ====================================================================
 def get_trace_timeline(serial):
     try:
-        work_order = db.session.scalars(
-            select(GPWorkOrder).where(GPWorkOrder.serial == str(serial))
-        ).first()
+        work_order = ordem_por_serial(str(serial))
         if not work_order:
             return jsonify({"error": f"Número de série {serial} não encontrado"}), 404
 
@@ -208,9 +206,7 @@ def get_trace_timeline(serial):
 # ====================================================================
 def get_trace_summary(serial):
     try:
-        work_order = db.session.scalars(
-            select(GPWorkOrder).where(GPWorkOrder.serial == str(serial))
-        ).first()
+        work_order = ordem_por_serial(str(serial))
         if not work_order:
             return jsonify({"error": f"Número de série {serial} não encontrado"}), 404
 
@@ -4,6 +4,7 @@ import logging
 from datetime import datetime
 from sqlalchemy import func
 from app.models_sqla import db, Peca
+from app.services.movimentacao_service import TIPO_ENTRADA_PA, registrar_movimentacoes
 
 # ====================================================================
 # [BLOCO] CONFIG_LOGGER
@@ -55,6 +56,18 @@ def update_stock_after_finish(model_code: str):
         peca.updated_at = datetime.utcnow()
 
         db.session.add(peca)
+        registrar_movimentacoes(
+            [
+                {
+                    "peca_id": peca.id,
+                    "codigo_peca": peca.codigo_pneumark,
+                    "tipo_mov": TIPO_ENTRADA_PA,
+                    "quantidade": 1,
+                    "referencia": f"GP-FINALIZADO-{model_code}",
+                    "usuario": "Sistema",
+                }
+            ]
+        )
         db.session.commit()
 
         logger.info(
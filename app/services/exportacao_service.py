@@ -0,0 +1,830 @@
+# app/services/exportacao_service.py
+"""
+Exportações em arquivo (xlsx / csv.gz) com memória constante e cache em disco.
+
+- Linhas vêm do banco por cursor de servidor (yield_per) direto para o escritor:
+  openpyxl em modo write-only ou csv dentro de gzip. Nada de DataFrame/BytesIO.
+- O arquivo fica em <instance>/exports com nome derivado de (exportação,
+  parâmetros, versões das tabelas de origem); enquanto nenhuma tabela de origem
+  muda (ver app.utils.cache_versoes), o mesmo arquivo é devolvido sem consultar.
+- Exportações grandes (acima de EXPORT_LIMITE_SINCRONO linhas) rodam em job de
+  segundo plano; o id do job é a própria chave do cache, então pedidos iguais
+  reaproveitam o mesmo job/arquivo.
+- Exportações simples de tela (montagens, séries) saem em fluxo direto na
+  resposta HTTP (resposta_csv_em_fluxo), sem arquivo intermediário.
+"""
+from __future__ import annotations
+
+import csv
+import glob
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flask import Response, current_app, stream_with_context
+from sqlalchemy import case, func, literal, select
+
+from app import db
+from app.models_sqla import Fornecedor, FornecedoresPorPeca, OmieRequisicao, Peca
+from app.utils.cache_versoes import versoes
+
+logger = logging.getLogger(__name__)
+
+FORMATOS = {
+    "xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("csv.gz", "application/gzip"),
+}
+
+JOB_EXECUTANDO = "executando"
+JOB_CONCLUIDO = "concluido"
+JOB_ERRO = "erro"
+# job 'executando' mais velho que isso (ou de processo que morreu) é refeito
+JOB_TIMEOUT_PADRAO_SEG = 1800
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+# ====================================================================
+# [BLOCO] CLASSE
+# [NOME] ExportacaoInvalida
+# [RESPONSABILIDADE] Exportação ou formato desconhecido (vira HTTP 400 nas rotas)
+# ====================================================================
+class ExportacaoInvalida(ValueError):
+    pass
+
+
+# ====================================================================
+# [FIM BLOCO] ExportacaoInvalida
+# ====================================================================
+
+
+# ---------------------------------------------------------------------------
+# Consultas (cabeçalho + SELECT Core; nada é carregado como objeto ORM)
+# ---------------------------------------------------------------------------
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _consulta_produtos
+# [RESPONSABILIDADE] Catálogo de peças
+# ====================================================================
+def _consulta_produtos(params: Dict[str, str]):
+    cabecalho = [
+        "ID", "Tipo", "Descrição", "Código Pneumark", "Código OMIE", "Estoque Atual",
+        "Estoque Mínimo", "Ponto de Pedido", "Estoque Máximo", "Custo", "Margem",
+    ]
+    stmt = select(
+        Peca.id, Peca.tipo, Peca.descricao, Peca.codigo_pneumark, Peca.codigo_omie,
+        Peca.estoque_atual, Peca.estoque_minimo, Peca.ponto_pedido, Peca.estoque_maximo,
+        Peca.custo, Peca.margem,
+    ).order_by(Peca.id)
+    return cabecalho, stmt
+
+
+# ====================================================================
+# [FIM BLOCO] _consulta_produtos
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _consulta_fornecedores
+# [RESPONSABILIDADE] Catálogo de fornecedores
+# ====================================================================
+def _consulta_fornecedores(params: Dict[str, str]):
+    cabecalho = ["ID", "Nome Empresa", "Nome Contato", "Telefone 1", "Telefone 2", "Email 1", "Email 2"]
+    stmt = select(
+        Fornecedor.id, Fornecedor.nome_empresa, Fornecedor.nome_contato,
+        Fornecedor.telefone1, Fornecedor.telefone2, Fornecedor.email1, Fornecedor.email2,
+    ).order_by(Fornecedor.id)
+    return cabecalho, stmt
+
+
+# ====================================================================
+# [FIM BLOCO] _consulta_fornecedores
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _consulta_produtos_fornecedores
+# [RESPONSABILIDADE] Relacionamento peças x fornecedores (JOIN)
+# ====================================================================
+def _consulta_produtos_fornecedores(params: Dict[str, str]):
+    cabecalho = ["Código Peça", "Descrição", "Fornecedor", "Etapa", "Preço"]
+    stmt = (
+        select(
+            Peca.codigo_pneumark, Peca.descricao, FornecedoresPorPeca.fornecedor,
+            FornecedoresPorPeca.etapa, FornecedoresPorPeca.preco,
+        )
+        .join(FornecedoresPorPeca, Peca.id == FornecedoresPorPeca.peca_id)
+        .order_by(Peca.id, FornecedoresPorPeca.id)
+    )
+    return cabecalho, stmt
+
+
+# ====================================================================
+# [FIM BLOCO] _consulta_produtos_fornecedores
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _consulta_snapshot_pp
+# [RESPONSABILIDADE] Snapshot de ponto de pedido com status calculado no SQL
+# ====================================================================
+def _consulta_snapshot_pp(params: Dict[str, str]):
+    # sem coluna de data/hora: o arquivo em cache é reaproveitado enquanto pecas
+    # não muda, e um "agora" gravado nele ficaria velho (a data vai no nome do download)
+    cabecalho = [
+        "Código", "Descrição", "Tipo", "Estoque Atual", "Ponto de Pedido",
+        "Estoque Máximo", "Status",
+    ]
+    status = case(
+        (
+            Peca.estoque_atual.isnot(None) & (Peca.estoque_atual <= Peca.ponto_pedido),
+            literal("ALERTA"),
+        ),
+        else_=literal("OK"),
+    )
+    stmt = (
+        select(
+            Peca.codigo_pneumark, Peca.descricao, Peca.tipo, Peca.estoque_atual,
+            Peca.ponto_pedido, Peca.estoque_maximo, status,
+        )
+        .where(Peca.ponto_pedido.isnot(None))
+        .order_by(Peca.id)
+    )
+    return cabecalho, stmt
+
+
+# ====================================================================
+# [FIM BLOCO] _consulta_snapshot_pp
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _consulta_requisicoes
+# [RESPONSABILIDADE] Requisições OMIE com os mesmos filtros da listagem da tela
+# ====================================================================
+def _consulta_requisicoes(params: Dict[str, str]):
+    from app.utils.omie_utils import _filtros_requisicoes
+
+    de = datetime.fromisoformat(params["de"]) if params.get("de") else None
+    ate = datetime.fromisoformat(params["ate"]) if params.get("ate") else None
+    cabecalho = [
+        "ID", "Data/Hora", "Fornecedor", "Cód. Integração", "Código Peça", "Descrição",
+        "Quantidade", "Status", "Erro",
+    ]
+    stmt = (
+        select(
+            OmieRequisicao.id, OmieRequisicao.created_at, OmieRequisicao.fornecedor,
+            OmieRequisicao.cod_int, Peca.codigo_pneumark, Peca.descricao,
+            OmieRequisicao.quantidade, OmieRequisicao.status, OmieRequisicao.erro_msg,
+        )
+        .outerjoin(Peca, Peca.id == OmieRequisicao.peca_id)
+        .where(
+            *_filtros_requisicoes(
+                params.get("status"), params.get("fornecedor"), de, ate, params.get("q")
+            )
+        )
+        .order_by(OmieRequisicao.id.desc())
+    )
+    return cabecalho, stmt
+
+
+# ====================================================================
+# [FIM BLOCO] _consulta_requisicoes
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_UTIL
+# [NOME] EXPORTACOES
+# [RESPONSABILIDADE] Registro das exportações: aba, consulta e tabelas que invalidam o cache
+# ====================================================================
+EXPORTACOES: Dict[str, Dict[str, Any]] = {
+    "produtos": {
+        "aba": "Produtos",
+        "consulta": _consulta_produtos,
+        "tabelas": ("pecas",),
+    },
+    "fornecedores": {
+        "aba": "Fornecedores",
+        "consulta": _consulta_fornecedores,
+        "tabelas": ("fornecedores",),
+    },
+    "produtos_fornecedores": {
+        "aba": "Produtos x Fornecedores",
+        "consulta": _consulta_produtos_fornecedores,
+        "tabelas": ("pecas", "fornecedores_por_peca"),
+    },
+    "snapshot_ponto_pedido": {
+        "aba": "Snapshot Ponto de Pedido",
+        "consulta": _consulta_snapshot_pp,
+        "tabelas": ("pecas",),
+    },
+    "requisicoes": {
+        "aba": "Requisições OMIE",
+        "consulta": _consulta_requisicoes,
+        "tabelas": ("omie_requisicoes", "pecas"),
+    },
+}
+
+# Nomes usados pela tela/rotas antigas
+APELIDOS = {
+    "produto_fornecedor": "produtos_fornecedores",
+    "snapshot_pp": "snapshot_ponto_pedido",
+    "snapshot_pontopedido": "snapshot_ponto_pedido",
+}
+# ====================================================================
+# [FIM BLOCO] EXPORTACOES
+# ====================================================================
+
+
+# ---------------------------------------------------------------------------
+# Escrita em arquivo
+# ---------------------------------------------------------------------------
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _linhas
+# [RESPONSABILIDADE] Iterar o SELECT em lotes por cursor de servidor (memória constante)
+# ====================================================================
+def _linhas(stmt, lote: int = 1000):
+    resultado = db.session.execute(stmt.execution_options(yield_per=lote))
+    try:
+        for particao in resultado.partitions():
+            for row in particao:
+                yield row
+    finally:
+        resultado.close()
+
+
+# ====================================================================
+# [FIM BLOCO] _linhas
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _escrever_xlsx
+# [RESPONSABILIDADE] Gravar linhas em xlsx com openpyxl write-only (uma linha por vez)
+# ====================================================================
+def _escrever_xlsx(caminho: str, aba: str, cabecalho: List[str], linhas) -> int:
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=aba[:31])
+    ws.append(cabecalho)
+    total = 0
+    for row in linhas:
+        ws.append(list(row))
+        total += 1
+    wb.save(caminho)
+    return total
+
+
+# ====================================================================
+# [FIM BLOCO] _escrever_xlsx
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _escrever_csv_gz
+# [RESPONSABILIDADE] Gravar linhas em CSV (';', UTF-8 com BOM) compactado com gzip
+# ====================================================================
+def _escrever_csv_gz(caminho: str, aba: str, cabecalho: List[str], linhas) -> int:
+    total = 0
+    nome_interno = f"{aba}.csv"  # nome gravado no cabeçalho gzip (não o .tmp)
+    with open(caminho, "wb") as bruto, gzip.GzipFile(
+        filename=nome_interno, mode="wb", fileobj=bruto
+    ) as gz, io.TextIOWrapper(gz, encoding="utf-8-sig", newline="") as fh:
+        writer = csv.writer(fh, delimiter=";")
+        writer.writerow(cabecalho)
+        for row in linhas:
+            writer.writerow(["" if v is None else v for v in row])
+            total += 1
+    return total
+
+
+# ====================================================================
+# [FIM BLOCO] _escrever_csv_gz
+# ====================================================================
+
+ESCRITORES: Dict[str, Callable[..., int]] = {"xlsx": _escrever_xlsx, "csv": _escrever_csv_gz}
+
+
+# ---------------------------------------------------------------------------
+# Resposta HTTP em fluxo (sem arquivo nem cache)
+# ---------------------------------------------------------------------------
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] csv_em_fluxo
+# [RESPONSABILIDADE] Gerar o CSV em pedaços de bytes (opcionalmente gzip) à medida que as linhas chegam
+# ====================================================================
+def csv_em_fluxo(
+    cabecalho: List[str],
+    linhas,
+    delimitador: str = ";",
+    compactar: bool = False,
+    formatar: Optional[Callable[[Any], List[Any]]] = None,
+    tamanho_pedaco: int = 64 * 1024,
+):
+    """
+    O cabeçalho sai sozinho no primeiro pedaço (primeiro byte imediato); depois
+    as linhas são agrupadas em pedaços de ~tamanho_pedaco. Com compactar=True
+    cada pedaço é um trecho do mesmo fluxo gzip (Z_SYNC_FLUSH).
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=delimitador, lineterminator="\n")
+    comp = zlib.compressobj(6, zlib.DEFLATED, 31) if compactar else None  # 31 = gzip
+
+    def _pedaco() -> bytes:
+        dados = buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+        if comp is not None:
+            dados = comp.compress(dados) + comp.flush(zlib.Z_SYNC_FLUSH)
+        return dados
+
+    writer.writerow(cabecalho)
+    yield _pedaco()
+    for row in linhas:
+        valores = formatar(row) if formatar else row
+        writer.writerow(["" if v is None else v for v in valores])
+        if buf.tell() >= tamanho_pedaco:
+            yield _pedaco()
+    if buf.tell():
+        yield _pedaco()
+    if comp is not None:
+        yield comp.flush()
+
+
+# ====================================================================
+# [FIM BLOCO] csv_em_fluxo
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] resposta_csv_em_fluxo
+# [RESPONSABILIDADE] Devolver Response que lê o SELECT por cursor de servidor e envia o CSV em fluxo
+# ====================================================================
+def resposta_csv_em_fluxo(
+    stmt,
+    cabecalho: List[str],
+    nome_arquivo: str,
+    compactar: bool = False,
+    delimitador: str = ";",
+    formatar: Optional[Callable[[Any], List[Any]]] = None,
+    lote: int = 1000,
+) -> Response:
+    """
+    Memória constante: uma partição de `lote` linhas por vez (yield_per). O
+    contexto da requisição (e a sessão) vive até o último pedaço ser enviado.
+    compactar=True entrega '<nome_arquivo>.gz' (application/gzip).
+    """
+    corpo = csv_em_fluxo(
+        cabecalho, _linhas(stmt, lote), delimitador=delimitador,
+        compactar=compactar, formatar=formatar,
+    )
+    if compactar:
+        nome_arquivo, mimetype = f"{nome_arquivo}.gz", "application/gzip"
+    else:
+        mimetype = "text/csv"
+    return Response(
+        stream_with_context(corpo),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f'attachment; filename="{nome_arquivo}"',
+            "X-Accel-Buffering": "no",  # proxy não segura o fluxo
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+# ====================================================================
+# [FIM BLOCO] resposta_csv_em_fluxo
+# ====================================================================
+
+
+# ---------------------------------------------------------------------------
+# Cache e jobs
+# ---------------------------------------------------------------------------
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] diretorio_exportacoes
+# [RESPONSABILIDADE] Resolver (e criar) a pasta dos arquivos exportados e dos jobs
+# ====================================================================
+def diretorio_exportacoes() -> str:
+    pasta = current_app.config.get("EXPORT_DIR") or os.path.join(
+        current_app.instance_path, "exports"
+    )
+    os.makedirs(os.path.join(pasta, "jobs"), exist_ok=True)
+    return pasta
+
+
+# ====================================================================
+# [FIM BLOCO] diretorio_exportacoes
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] resolver
+# [RESPONSABILIDADE] Validar nome/formato e normalizar parâmetros (valores vazios descartados)
+# ====================================================================
+def resolver(nome: str, formato: str, params: Optional[Dict[str, Any]] = None):
+    nome = APELIDOS.get(nome, nome)
+    if nome not in EXPORTACOES:
+        raise ExportacaoInvalida(f"Exportação desconhecida: {nome}")
+    if formato not in FORMATOS:
+        raise ExportacaoInvalida(f"Formato inválido: {formato} (use xlsx ou csv)")
+    limpos = {k: str(v).strip() for k, v in (params or {}).items() if str(v or "").strip()}
+    return nome, formato, dict(sorted(limpos.items()))
+
+
+# ====================================================================
+# [FIM BLOCO] resolver
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] chave_cache
+# [RESPONSABILIDADE] Montar id estável do arquivo: nome + hash dos parâmetros + hash das versões
+# ====================================================================
+def chave_cache(nome: str, formato: str, params: Dict[str, str]) -> Tuple[str, str]:
+    """Retorna (prefixo, chave). Mesmo prefixo = mesma exportação com outra versão."""
+    h_params = hashlib.sha1(
+        json.dumps([formato, params], sort_keys=True).encode("utf-8")
+    ).hexdigest()[:10]
+    h_versoes = hashlib.sha1(
+        json.dumps(versoes(EXPORTACOES[nome]["tabelas"]), sort_keys=True).encode("utf-8")
+    ).hexdigest()[:10]
+    prefixo = f"{nome}-{h_params}"
+    return prefixo, f"{prefixo}-{h_versoes}"
+
+
+# ====================================================================
+# [FIM BLOCO] chave_cache
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] caminho_arquivo
+# [RESPONSABILIDADE] Caminho do arquivo final de uma chave de cache
+# ====================================================================
+def caminho_arquivo(chave: str, formato: str) -> str:
+    return os.path.join(diretorio_exportacoes(), f"{chave}.{FORMATOS[formato][0]}")
+
+
+# ====================================================================
+# [FIM BLOCO] caminho_arquivo
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] contar_linhas
+# [RESPONSABILIDADE] Contar linhas da exportação (decide entre resposta direta e job)
+# ====================================================================
+def contar_linhas(nome: str, params: Dict[str, str]) -> int:
+    _, stmt = EXPORTACOES[nome]["consulta"](params)
+    sub = stmt.order_by(None).subquery()
+    return int(db.session.execute(select(func.count()).select_from(sub)).scalar() or 0)
+
+
+# ====================================================================
+# [FIM BLOCO] contar_linhas
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] gerar_arquivo
+# [RESPONSABILIDADE] Gerar o arquivo da exportação (ou reaproveitar o cache) e devolver o caminho
+# ====================================================================
+def gerar_arquivo(nome: str, formato: str = "xlsx", params: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Grava em '<arquivo>.tmp' e renomeia no fim (leitores nunca veem arquivo
+    parcial). Versões antigas da mesma exportação/parâmetros são removidas.
+    """
+    nome, formato, params = resolver(nome, formato, params)
+    prefixo, chave = chave_cache(nome, formato, params)
+    caminho = caminho_arquivo(chave, formato)
+    if os.path.exists(caminho):
+        return caminho
+
+    spec = EXPORTACOES[nome]
+    cabecalho, stmt = spec["consulta"](params)
+    tmp = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    inicio = datetime.now()
+    try:
+        total = ESCRITORES[formato](tmp, spec["aba"], cabecalho, _linhas(stmt))
+        os.replace(tmp, caminho)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    for antigo in glob.glob(os.path.join(os.path.dirname(caminho), f"{prefixo}-*")):
+        if antigo != caminho and not antigo.endswith(".tmp"):
+            try:
+                os.remove(antigo)
+            except OSError:
+                pass
+    logger.info(
+        "[EXPORT] %s.%s: %d linha(s) em %.2fs -> %s",
+        nome, formato, total, (datetime.now() - inicio).total_seconds(), os.path.basename(caminho),
+    )
+    return caminho
+
+
+# ====================================================================
+# [FIM BLOCO] gerar_arquivo
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _caminho_job
+# [RESPONSABILIDADE] Caminho do JSON de estado de um job (visível a todos os workers)
+# ====================================================================
+def _caminho_job(job_id: str) -> str:
+    return os.path.join(diretorio_exportacoes(), "jobs", f"{job_id}.json")
+
+
+# ====================================================================
+# [FIM BLOCO] _caminho_job
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _gravar_job
+# [RESPONSABILIDADE] Persistir estado do job de forma atômica
+# ====================================================================
+def _gravar_job(job_id: str, dados: Dict[str, Any]) -> None:
+    caminho = _caminho_job(job_id)
+    tmp = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(dados, fh, ensure_ascii=False)
+    os.replace(tmp, caminho)
+
+
+# ====================================================================
+# [FIM BLOCO] _gravar_job
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] estado_job
+# [RESPONSABILIDADE] Ler estado do job (None se desconhecido)
+# ====================================================================
+def estado_job(job_id: str) -> Optional[Dict[str, Any]]:
+    if not job_id or os.sep in job_id or "/" in job_id or job_id.startswith("."):
+        return None
+    try:
+        with open(_caminho_job(job_id), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+# ====================================================================
+# [FIM BLOCO] estado_job
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _job_abandonado
+# [RESPONSABILIDADE] Dizer se um job 'executando' passou do timeout ou perdeu o processo dono
+# ====================================================================
+def _job_abandonado(dados: Dict[str, Any]) -> bool:
+    timeout = int(current_app.config.get("EXPORT_JOB_TIMEOUT_SEG", JOB_TIMEOUT_PADRAO_SEG))
+    iniciado = dados.get("iniciado_ts")
+    if not iniciado or time.time() - float(iniciado) > timeout:
+        return True  # sem marca (formato antigo) ou além do timeout
+    pid = dados.get("pid")
+    if not pid or dados.get("host") != socket.gethostname() or os.name == "nt":
+        return False  # outro servidor (ou Windows, onde kill(pid, 0) encerra): só o timeout vale
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        return False  # existe, mas de outro usuário
+    return False
+
+
+# ====================================================================
+# [FIM BLOCO] _job_abandonado
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _executar_job
+# [RESPONSABILIDADE] Gerar o arquivo do job dentro de um contexto de aplicação próprio
+# ====================================================================
+def _executar_job(app, job_id: str, nome: str, formato: str, params: Dict[str, str]) -> None:
+    with app.app_context():
+        dados = estado_job(job_id) or {}
+        try:
+            caminho = gerar_arquivo(nome, formato, params)
+            dados.update(
+                status=JOB_CONCLUIDO,
+                arquivo=os.path.basename(caminho),
+                bytes=os.path.getsize(caminho),
+                concluido_em=datetime.now().isoformat(timespec="seconds"),
+            )
+        except Exception as e:
+            logger.exception(f"[EXPORT] Job {job_id} falhou: {e}")
+            dados.update(status=JOB_ERRO, erro=str(e))
+        finally:
+            db.session.remove()
+        _gravar_job(job_id, dados)
+
+
+# ====================================================================
+# [FIM BLOCO] _executar_job
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] iniciar_job
+# [RESPONSABILIDADE] Enfileirar a geração em segundo plano (reaproveita job igual em andamento, refaz abandonado)
+# ====================================================================
+def iniciar_job(nome: str, formato: str = "xlsx", params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    global _executor
+    nome, formato, params = resolver(nome, formato, params)
+    _, chave = chave_cache(nome, formato, params)
+    job_id = f"{chave}.{formato}"
+
+    atual = estado_job(job_id)
+    if os.path.exists(caminho_arquivo(chave, formato)):
+        atual = {
+            "id": job_id,
+            "status": JOB_CONCLUIDO,
+            "exportacao": nome,
+            "formato": formato,
+            "arquivo": os.path.basename(caminho_arquivo(chave, formato)),
+        }
+        _gravar_job(job_id, atual)
+        return atual
+    if atual and atual.get("status") == JOB_EXECUTANDO:
+        if not _job_abandonado(atual):
+            return atual
+        logger.warning(
+            f"[EXPORT] Job {job_id} abandonado (pid {atual.get('pid')}, "
+            f"desde {atual.get('criado_em')}); reiniciando."
+        )
+
+    dados = {
+        "id": job_id,
+        "status": JOB_EXECUTANDO,
+        "exportacao": nome,
+        "formato": formato,
+        "params": params,
+        "criado_em": datetime.now().isoformat(timespec="seconds"),
+        "iniciado_ts": time.time(),
+        "pid": os.getpid(),
+        "host": socket.gethostname(),
+    }
+    _gravar_job(job_id, dados)
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(current_app.config.get("EXPORT_WORKERS", 2)),
+                thread_name_prefix="export",
+            )
+    _executor.submit(
+        _executar_job, current_app._get_current_object(), job_id, nome, formato, params
+    )
+    return dados
+
+
+# ====================================================================
+# [FIM BLOCO] iniciar_job
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] preparar
+# [RESPONSABILIDADE] Decidir entre arquivo pronto (cache ou geração imediata) e job em segundo plano
+# ====================================================================
+def preparar(
+    nome: str,
+    formato: str = "xlsx",
+    params: Optional[Dict[str, Any]] = None,
+    forcar_job: bool = False,
+) -> Tuple[str, Any]:
+    """
+    Retorna ("arquivo", caminho) ou ("job", estado).
+    - Cache válido: sempre "arquivo", sem tocar nas tabelas de origem.
+    - Até EXPORT_LIMITE_SINCRONO linhas: gera na própria requisição (streaming).
+    - Acima disso (ou forcar_job): job em segundo plano.
+    """
+    nome, formato, params = resolver(nome, formato, params)
+    _, chave = chave_cache(nome, formato, params)
+    caminho = caminho_arquivo(chave, formato)
+    if os.path.exists(caminho):
+        return "arquivo", caminho
+    limite = int(current_app.config.get("EXPORT_LIMITE_SINCRONO", 20000))
+    if not forcar_job and contar_linhas(nome, params) <= limite:
+        return "arquivo", gerar_arquivo(nome, formato, params)
+    return "job", iniciar_job(nome, formato, params)
+
+
+# ====================================================================
+# [FIM BLOCO] preparar
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] arquivo_do_job
+# [RESPONSABILIDADE] Caminho do arquivo de um job concluído (None se não pronto/inexistente)
+# ====================================================================
+def arquivo_do_job(job_id: str) -> Optional[str]:
+    dados = estado_job(job_id)
+    if not dados or dados.get("status") != JOB_CONCLUIDO:
+        return None
+    caminho = os.path.join(diretorio_exportacoes(), dados["arquivo"])
+    return caminho if os.path.exists(caminho) else None
+
+
+# ====================================================================
+# [FIM BLOCO] arquivo_do_job
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] nome_download
+# [RESPONSABILIDADE] Nome amigável do arquivo baixado (ex.: produtos_20261019.xlsx)
+# ====================================================================
+def nome_download(nome: str, formato: str) -> str:
+    nome = APELIDOS.get(nome, nome)
+    return f"{nome}_{datetime.now():%Y%m%d}.{FORMATOS[formato][0]}"
+
+
+# ====================================================================
+# [FIM BLOCO] nome_download
+# ====================================================================
+
+# ====================================================================
+# MAPA DO ARQUIVO
+# --------------------------------------------------------------------
+# CLASSE: ExportacaoInvalida
+# FUNÇÃO: _consulta_produtos
+# FUNÇÃO: _consulta_fornecedores
+# FUNÇÃO: _consulta_produtos_fornecedores
+# FUNÇÃO: _consulta_snapshot_pp
+# FUNÇÃO: _consulta_requisicoes
+# BLOCO_UTIL: EXPORTACOES
+# FUNÇÃO: _linhas
+# FUNÇÃO: _escrever_xlsx
+# FUNÇÃO: _escrever_csv_gz
+# FUNÇÃO: csv_em_fluxo
+# FUNÇÃO: resposta_csv_em_fluxo
+# FUNÇÃO: diretorio_exportacoes
+# FUNÇÃO: resolver
+# FUNÇÃO: chave_cache
+# FUNÇÃO: caminho_arquivo
+# FUNÇÃO: contar_linhas
+# FUNÇÃO: gerar_arquivo
+# FUNÇÃO: _caminho_job
+# FUNÇÃO: _gravar_job
+# FUNÇÃO: estado_job
+# FUNÇÃO: _job_abandonado
+# FUNÇÃO: _executar_job
+# FUNÇÃO: iniciar_job
+# FUNÇÃO: preparar
+# FUNÇÃO: arquivo_do_job
+# FUNÇÃO: nome_download
+# ====================================================================
@@ -0,0 +1,494 @@
+# app/services/importacao_pecas_service.py
+"""
+Importação em lote de peças a partir de planilha Excel (layout do
+PopularBancoDeDados.xlsx: CODIGO, DESCRIÇÃO, FORNECEDOR, ..., ESTOQUE MÍNIMO,
+PONTO DE PEDIDO, ESTOQUE MÁXIMO, ESTOQUE ATUAL, UNIDADE (valor unitário),
+nCodForn, nCodProd).
+
+- Leitura com pandas; validação e normalização por coluna (vetorizadas).
+- Diferença contra 'pecas' calculada com uma consulta e um merge em memória.
+- Gravação em lote: INSERT ... RETURNING (executemany) para peças novas,
+  UPDATE por chave primária em lote para as existentes, e o mesmo para
+  fornecedores_por_peca. Tudo em uma transação.
+- Linhas inválidas não bloqueiam as demais: saem no relatório com o número
+  da linha na planilha e os motivos.
+
+Uso: flask --app run pecas-importar planilha.xlsx [--simular] [--atualizar-estoque]
+"""
+from __future__ import annotations
+
+import logging
+import time
+from collections import defaultdict
+from typing import IO, Any, Dict, List, Optional, Union
+
+import pandas as pd
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models_sqla import FornecedoresPorPeca, Peca
+from app.services.movimentacao_service import (
+    TIPO_AJUSTE,
+    TIPO_CADASTRO,
+    marcar_pecas_tocadas,
+    registrar_movimentacoes,
+)
+from app.utils.texto_utils import normalizar_busca, sem_acento
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================
+# [BLOCO] BLOCO_UTIL
+# [NOME] constantes_importacao
+# [RESPONSABILIDADE] Mapear cabeçalhos aceitos para os campos de Peca e limites de validação
+# ====================================================================
+# cabeçalho normalizado (maiúsculo, sem acento) -> campo
+CABECALHOS = {
+    "CODIGO": "codigo_pneumark",
+    "CODIGO PNEUMARK": "codigo_pneumark",
+    "DESCRICAO": "descricao",
+    "FORNECEDOR": "fornecedor",
+    "TIPO": "tipo",
+    "ESTOQUE MINIMO": "estoque_minimo",
+    "PONTO DE PEDIDO": "ponto_pedido",
+    "ESTOQUE MAXIMO": "estoque_maximo",
+    "ESTOQUE ATUAL": "estoque_atual",
+    "UNIDADE": "valor_unitario",  # a planilha original traz o valor unitário nesta coluna
+    "VALOR UNITARIO": "valor_unitario",
+    "PRECO": "valor_unitario",
+    "MARGEM": "margem",
+    "NCODPROD": "codigo_omie",
+    "CODIGO OMIE": "codigo_omie",
+}
+OBRIGATORIOS = ("codigo_pneumark", "descricao")
+INTEIROS = ("estoque_minimo", "ponto_pedido", "estoque_maximo", "estoque_atual")
+# parâmetros calculados por fórmula na planilha (ex.: 117,33): arredondados, não rejeitados
+ARREDONDADOS = ("estoque_minimo", "ponto_pedido", "estoque_maximo")
+DECIMAIS = ("valor_unitario", "margem")
+TAMANHOS = {"codigo_pneumark": 50, "descricao": 100, "codigo_omie": 50, "fornecedor": 100}
+TIPOS_VALIDOS = ("peca", "conjunto")
+
+MARGEM_PADRAO = 5.0  # % sobre o valor unitário (mesma regra do script antigo)
+ETAPA_PADRAO = "principal"
+LINHAS_CABECALHO = 5  # procura o cabeçalho nas primeiras linhas da planilha
+# ====================================================================
+# [FIM BLOCO] constantes_importacao
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _norm_cabecalho
+# [RESPONSABILIDADE] Normalizar texto de cabeçalho (maiúsculo, sem acento, espaços simples)
+# ====================================================================
+def _norm_cabecalho(valor: Any) -> str:
+    return " ".join(sem_acento(valor).upper().split())
+
+
+# ====================================================================
+# [FIM BLOCO] _norm_cabecalho
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] ler_planilha
+# [RESPONSABILIDADE] Ler a planilha como texto, localizar o cabeçalho e renomear colunas conhecidas
+# ====================================================================
+def ler_planilha(origem: Union[str, IO[bytes]]) -> pd.DataFrame:
+    """
+    Retorna DataFrame com as colunas de CABECALHOS (faltantes = vazias) e a
+    coluna 'linha' com o número da linha no Excel (para o relatório).
+    """
+    bruto = pd.read_excel(origem, header=None, dtype=str)
+    for pos in range(min(LINHAS_CABECALHO, len(bruto))):
+        nomes = [_norm_cabecalho(v) for v in bruto.iloc[pos]]
+        campos = {i: CABECALHOS[n] for i, n in enumerate(nomes) if n in CABECALHOS}
+        if set(OBRIGATORIOS) <= set(campos.values()):
+            break
+    else:
+        raise ValueError(
+            "Cabeçalho não encontrado: a planilha precisa das colunas CODIGO e DESCRIÇÃO."
+        )
+
+    df = bruto.iloc[pos + 1 :]
+    usados = {}
+    for i, campo in campos.items():
+        usados.setdefault(campo, i)  # primeira ocorrência vence
+    df = df[list(usados.values())].copy()
+    df.columns = list(usados.keys())
+    for campo in set(CABECALHOS.values()) - set(df.columns):
+        df[campo] = None
+    df["linha"] = df.index + 1  # índice 0 = linha 1 do Excel
+    # linhas totalmente vazias (fim da planilha) não são erro
+    vazias = df.drop(columns="linha").isna().all(axis=1)
+    return df[~vazias].reset_index(drop=True)
+
+
+# ====================================================================
+# [FIM BLOCO] ler_planilha
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] validar
+# [RESPONSABILIDADE] Normalizar tipos e apontar erros por linha com operações por coluna
+# ====================================================================
+def validar(df: pd.DataFrame):
+    """Retorna (df normalizado, {índice: [mensagens]})."""
+    df = df.copy()
+    regras: List[tuple] = []
+
+    for col in ("codigo_pneumark", "descricao", "fornecedor", "codigo_omie", "tipo"):
+        df[col] = df[col].fillna("").astype(str).str.strip()
+    # nCodProd lido de célula numérica pode vir como '3268959880.0'
+    df["codigo_omie"] = df["codigo_omie"].str.replace(r"\.0$", "", regex=True)
+    df["tipo"] = df["tipo"].str.lower()  # vazio: 'peca' na inclusão, mantém na atualização
+
+    regras.append((df["codigo_pneumark"].eq(""), "código vazio"))
+    regras.append((df["descricao"].eq(""), "descrição vazia"))
+    for col, limite in TAMANHOS.items():
+        regras.append((df[col].str.len() > limite, f"{col} com mais de {limite} caracteres"))
+    regras.append(
+        (df["tipo"].ne("") & ~df["tipo"].isin(TIPOS_VALIDOS), "tipo deve ser 'peca' ou 'conjunto'")
+    )
+
+    for col in INTEIROS + DECIMAIS:
+        texto = df[col].fillna("").astype(str).str.strip().str.replace(",", ".", regex=False)
+        num = pd.to_numeric(texto, errors="coerce")
+        regras.append((texto.ne("") & num.isna(), f"{col} não é número"))
+        regras.append((num < 0, f"{col} negativo"))
+        if col in ARREDONDADOS:
+            num = num.round()
+        elif col in INTEIROS:
+            regras.append((num.notna() & (num % 1 != 0), f"{col} deve ser inteiro"))
+        df[col] = num
+
+    mx = df["estoque_maximo"]
+    regras.append(
+        (mx.gt(0) & df["ponto_pedido"].gt(mx), "ponto de pedido maior que o estoque máximo")
+    )
+    regras.append(
+        (mx.gt(0) & df["estoque_minimo"].gt(mx), "estoque mínimo maior que o estoque máximo")
+    )
+    regras.append(
+        (
+            df["codigo_pneumark"].ne("") & df["codigo_pneumark"].duplicated(keep="last"),
+            "código repetido na planilha (vale a última ocorrência)",
+        )
+    )
+
+    erros: Dict[int, List[str]] = defaultdict(list)
+    for mascara, msg in regras:
+        for idx in df.index[mascara.fillna(False).astype(bool)]:
+            erros[idx].append(msg)
+    return df, dict(erros)
+
+
+# ====================================================================
+# [FIM BLOCO] validar
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _valor
+# [RESPONSABILIDADE] Converter célula do pandas em valor Python (NaN -> None, float inteiro -> int)
+# ====================================================================
+def _valor(v: Any, inteiro: bool = False) -> Any:
+    if v is None or (isinstance(v, float) and pd.isna(v)) or v is pd.NA:
+        return None
+    if inteiro:
+        return int(v)
+    return float(v) if isinstance(v, (int, float)) else v
+
+
+# ====================================================================
+# [FIM BLOCO] _valor
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] importar_pecas
+# [RESPONSABILIDADE] Validar, comparar com o banco e gravar peças/fornecedores em lote, com relatório
+# ====================================================================
+def importar_pecas(
+    origem: Union[str, IO[bytes]],
+    simular: bool = False,
+    atualizar_estoque: bool = False,
+    usuario: str = "importacao",
+    referencia: str = "IMPORTACAO PLANILHA",
+    session: Optional[Session] = None,
+) -> Dict[str, Any]:
+    """
+    - Peça nova: cadastrada com os valores da planilha (estoque inicial no
+      livro-razão como 'cadastro').
+    - Peça existente (mesmo codigo_pneumark): células preenchidas sobrescrevem
+      o cadastro; vazias mantêm o valor atual. estoque_atual só é aplicado com
+      atualizar_estoque=True (diferença vira 'ajuste' no livro-razão).
+    - custo = valor unitário + margem (padrão 5%).
+    - Fornecedor: vínculo (peça, fornecedor) criado com etapa 'principal' ou
+      preço atualizado se já existir.
+    - simular=True só valida e conta, sem gravar.
+    Faz commit (exceto ao simular).
+    """
+    inicio = time.perf_counter()
+    sess = session or db.session
+
+    df, erros = validar(ler_planilha(origem))
+    validos = df.drop(index=list(erros)).reset_index(drop=True)
+
+    # ---------------- diferença contra o banco (uma consulta) ----------------
+    campos_peca = ("descricao", "codigo_omie", "tipo") + INTEIROS + ("margem", "custo")
+    atuais = pd.DataFrame(
+        sess.execute(
+            select(Peca.id, Peca.codigo_pneumark, *[getattr(Peca, c) for c in campos_peca])
+            .where(Peca.codigo_pneumark.isnot(None))
+            .order_by(Peca.id)
+        ).all(),
+        columns=["id", "codigo_pneumark"] + [f"{c}_atual" for c in campos_peca],
+    )
+    atuais["codigo_pneumark"] = atuais["codigo_pneumark"].astype(str).str.strip()
+    atuais = atuais.drop_duplicates("codigo_pneumark", keep="first")
+    plano = validos.merge(atuais, on="codigo_pneumark", how="left")
+
+    margem = plano["margem"].fillna(plano["margem_atual"]).fillna(MARGEM_PADRAO)
+    plano["custo"] = (plano["valor_unitario"] * (1 + margem / 100)).round(4)
+    plano["margem"] = margem
+
+    existentes = plano[plano["id"].notna()]
+    novas = plano[plano["id"].isna()]
+
+    # existentes: células vazias mantêm o atual; só linhas com diferença são gravadas
+    campos_update = [
+        "descricao", "codigo_omie", "tipo", "estoque_minimo", "ponto_pedido",
+        "estoque_maximo", "margem", "custo",
+    ]
+    final = pd.DataFrame(index=existentes.index)
+    mudou = pd.Series(False, index=existentes.index)
+    for c in campos_update:
+        novo = existentes[c]
+        if c in ("descricao", "codigo_omie", "tipo"):
+            novo = novo.mask(novo.eq(""))
+        final[c] = novo.where(novo.notna(), existentes[f"{c}_atual"])
+        atual = existentes[f"{c}_atual"]
+        mudou |= novo.notna() & (atual.isna() | (novo != atual))
+    estoque_muda = pd.Series(False, index=existentes.index)
+    if atualizar_estoque:
+        estoque_muda = existentes["estoque_atual"].notna() & (
+            existentes["estoque_atual"] != existentes["estoque_atual_atual"].fillna(0)
+        )
+    a_atualizar = existentes[mudou | estoque_muda]
+
+    # fornecedores: vínculos já existentes das peças afetadas (uma consulta)
+    com_forn = plano[plano["fornecedor"].ne("")]
+    ids_existentes = [int(i) for i in com_forn["id"].dropna().unique()]
+    vinculos: Dict[tuple, Dict[str, Any]] = {}
+    if ids_existentes:
+        for vid, pid, forn, preco in sess.execute(
+            select(
+                FornecedoresPorPeca.id,
+                FornecedoresPorPeca.peca_id,
+                FornecedoresPorPeca.fornecedor,
+                FornecedoresPorPeca.preco,
+            ).where(FornecedoresPorPeca.peca_id.in_(ids_existentes))
+        ):
+            vinculos.setdefault((pid, _norm_cabecalho(forn)), {"id": vid, "preco": preco})
+
+    forn_atualizar: List[Dict[str, Any]] = []
+    forn_inserir: List[Dict[str, Any]] = []  # peca_id resolvido após inserir as peças novas
+    for row in com_forn.itertuples(index=False):
+        preco = _valor(row.valor_unitario)
+        pid = None if pd.isna(row.id) else int(row.id)
+        atual = vinculos.get((pid, _norm_cabecalho(row.fornecedor))) if pid else None
+        if atual is None:
+            forn_inserir.append(
+                {
+                    "codigo": row.codigo_pneumark,
+                    "peca_id": pid,
+                    "fornecedor": row.fornecedor,
+                    "etapa": ETAPA_PADRAO,
+                    "preco": preco or 0.0,
+                }
+            )
+        elif preco is not None and preco != atual["preco"]:
+            forn_atualizar.append({"id": atual["id"], "preco": preco})
+
+    relatorio: Dict[str, Any] = {
+        "linhas": int(len(df)),
+        "validas": int(len(validos)),
+        "inseridas": int(len(novas)),
+        "atualizadas": int(len(a_atualizar)),
+        "sem_alteracao": int(len(existentes) - len(a_atualizar)),
+        "estoque_ajustado": 0,
+        "fornecedores_inseridos": len(forn_inserir),
+        "fornecedores_atualizados": len(forn_atualizar),
+        "simulacao": bool(simular),
+        "erros": [
+            {
+                "linha": int(df.at[idx, "linha"]),
+                "codigo": df.at[idx, "codigo_pneumark"] or None,
+                "erros": msgs,
+            }
+            for idx, msgs in sorted(erros.items())
+        ],
+    }
+    if simular:
+        relatorio["estoque_ajustado"] = int(estoque_muda.sum())
+        relatorio["tempo_s"] = round(time.perf_counter() - inicio, 3)
+        return relatorio
+
+    # ---------------- gravação em lote ----------------
+    try:
+        movimentos: List[Dict[str, Any]] = []
+        ids_por_codigo: Dict[str, int] = {}
+
+        if len(novas):
+            linhas_novas = [
+                {
+                    "codigo_pneumark": r.codigo_pneumark,
+                    "descricao": r.descricao,
+                    "codigo_omie": r.codigo_omie or None,
+                    "tipo": r.tipo or "peca",
+                    "estoque_minimo": _valor(r.estoque_minimo, True) or 0,
+                    "ponto_pedido": _valor(r.ponto_pedido, True) or 0,
+                    "estoque_maximo": _valor(r.estoque_maximo, True) or 0,
+                    "estoque_atual": _valor(r.estoque_atual, True) or 0,
+                    "margem": _valor(r.margem),
+                    "custo": _valor(r.custo) or 0.0,
+                }
+                for r in novas.itertuples(index=False)
+            ]
+            for pid, cod in sess.execute(
+                insert(Peca).returning(Peca.id, Peca.codigo_pneumark), linhas_novas
+            ):
+                ids_por_codigo[cod] = pid
+            movimentos.extend(
+                {
+                    "peca_id": ids_por_codigo[ln["codigo_pneumark"]],
+                    "codigo_peca": ln["codigo_pneumark"],
+                    "tipo_mov": TIPO_CADASTRO,
+                    "quantidade": ln["estoque_atual"],
+                    "referencia": referencia,
+                    "usuario": usuario,
+                }
+                for ln in linhas_novas
+                if ln["estoque_atual"]
+            )
+
+        if len(a_atualizar):
+            ids_upd = [int(i) for i in a_atualizar["id"]]
+            linhas_upd = []
+            for idx, r in a_atualizar.iterrows():
+                f = final.loc[idx]
+                linhas_upd.append(
+                    {
+                        "id": int(r["id"]),
+                        "descricao": f["descricao"],
+                        "busca_normalizada": normalizar_busca(r["codigo_pneumark"], f["descricao"])[:200],
+                        "codigo_omie": f["codigo_omie"] or None,
+                        "tipo": f["tipo"],
+                        "estoque_minimo": _valor(f["estoque_minimo"], True),
+                        "ponto_pedido": _valor(f["ponto_pedido"], True),
+                        "estoque_maximo": _valor(f["estoque_maximo"], True),
+                        "margem": _valor(f["margem"]),
+                        "custo": _valor(f["custo"]),
+                    }
+                )
+            sess.execute(update(Peca), linhas_upd)
+            marcar_pecas_tocadas(ids_upd, sess)
+
+            alvo_estoque = {
+                int(r.id): int(r.estoque_atual)
+                for r in a_atualizar[estoque_muda.loc[a_atualizar.index]].itertuples(index=False)
+            }
+            if alvo_estoque:
+                # relê o saldo com trava (ordem de id) para o delta do livro-razão
+                travadas = sess.execute(
+                    select(Peca.id, Peca.codigo_pneumark, Peca.estoque_atual)
+                    .where(Peca.id.in_(sorted(alvo_estoque)))
+                    .order_by(Peca.id)
+                    .with_for_update()
+                ).all()
+                upd_estoque = []
+                for pid, cod, atual in travadas:
+                    delta = alvo_estoque[pid] - int(atual or 0)
+                    if delta:
+                        upd_estoque.append({"id": pid, "estoque_atual": alvo_estoque[pid]})
+                        movimentos.append(
+                            {
+                                "peca_id": pid,
+                                "codigo_peca": cod,
+                                "tipo_mov": TIPO_AJUSTE,
+                                "quantidade": delta,
+                                "referencia": referencia,
+                                "usuario": usuario,
+                            }
+                        )
+                if upd_estoque:
+                    sess.execute(update(Peca), upd_estoque)
+                relatorio["estoque_ajustado"] = len(upd_estoque)
+
+        if forn_inserir:
+            for ln in forn_inserir:
+                if ln["peca_id"] is None:
+                    ln["peca_id"] = ids_por_codigo[ln["codigo"]]
+            sess.execute(
+                insert(FornecedoresPorPeca),
+                [{k: v for k, v in ln.items() if k != "codigo"} for ln in forn_inserir],
+            )
+        if forn_atualizar:
+            sess.execute(update(FornecedoresPorPeca), forn_atualizar)
+
+        registrar_movimentacoes(movimentos, session=sess)
+        # peça nova pode nascer abaixo do ponto de pedido
+        marcar_pecas_tocadas(ids_por_codigo.values(), sess)
+        sess.commit()
+    except Exception:
+        sess.rollback()
+        raise
+
+    relatorio["tempo_s"] = round(time.perf_counter() - inicio, 3)
+    logger.info(
+        "[IMPORTACAO] %s",
+        {k: v for k, v in relatorio.items() if k != "erros"} | {"erros": len(relatorio["erros"])},
+    )
+    return relatorio
+
+
+# ====================================================================
+# [FIM BLOCO] importar_pecas
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] relatorio_erros_csv
+# [RESPONSABILIDADE] Converter a lista de erros do relatório em CSV (linha;codigo;erros)
+# ====================================================================
+def relatorio_erros_csv(relatorio: Dict[str, Any]) -> str:
+    linhas = ["linha;codigo;erros"]
+    for e in relatorio.get("erros", []):
+        codigo = (e.get("codigo") or "").replace(";", ",")
+        linhas.append(f"{e['linha']};{codigo};{' | '.join(e['erros'])}")
+    return "\n".join(linhas) + "\n"
+
+
+# ====================================================================
+# [FIM BLOCO] relatorio_erros_csv
+# ====================================================================
+
+# ====================================================================
+# MAPA DO ARQUIVO
+# --------------------------------------------------------------------
+# BLOCO_UTIL: constantes_importacao
+# FUNÇÃO: _norm_cabecalho
+# FUNÇÃO: ler_planilha
+# FUNÇÃO: validar
+# FUNÇÃO: _valor
+# FUNÇÃO: importar_pecas
+# FUNÇÃO: relatorio_erros_csv
+# ====================================================================
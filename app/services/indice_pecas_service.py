@@ -0,0 +1,505 @@
+# app/services/indice_pecas_service.py
+"""
+Índice em memória (por processo) para o autocomplete de peças.
+
+- Cada peça vira um documento com código e descrição normalizados
+  (minúsculo, sem acento — texto_utils.normalizar_busca).
+- Listas de postagem por trigrama e por prefixo de palavra (1 a 3 letras;
+  termos de 1-2 letras casam só no início de palavra). A lista mais curta da consulta é
+  percorrida já ordenada e cada candidato é conferido por substring, então
+  a busca para assim que junta o limite de sugestões.
+- Ranking: código exato > código começa com a consulta > cada termo inicia
+  uma palavra > só contém os termos; empate pela descrição mais curta.
+
+Atualização (só conta o que muda o índice: inclusão, exclusão ou alteração
+de codigo_pneumark/descricao; baixa de estoque não invalida nada):
+- commits que gravam Peca pelo ORM atualizam o índice na hora (after_commit);
+- insert()/update()/delete() em lote na tabela pecas marcam o índice para
+  reconstrução na próxima consulta;
+- outros processos (workers) são percebidos pela versão própria do índice
+  (chave 'indice_pecas' em cache_versoes), conferida no máximo a cada
+  INDICE_PECAS_VERIFICAR_S segundos.
+"""
+from __future__ import annotations
+
+import bisect
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from flask import current_app
+from sqlalchemy import event, inspect
+
+from app import db
+from app.models_sqla import Peca
+from app.utils.texto_utils import normalizar_busca
+
+logger = logging.getLogger(__name__)
+
+# Chaves em session.info com as alterações de peças ainda não commitadas
+INFO_PECAS_ALTERADAS = "indice_pecas_alteradas"  # {id: (codigo, descricao) | None}
+INFO_PECAS_RECARREGAR = "indice_pecas_recarregar"
+
+# Chave de versão do índice em cache_versoes e colunas que ele usa
+VERSAO_INDICE = "indice_pecas"
+COLUNAS_INDICE = frozenset({"codigo_pneumark", "descricao"})
+
+LIMITE_PADRAO = 10
+LIMITE_MAX = 50
+VERIFICAR_S_PADRAO = 30
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _trigramas
+# [RESPONSABILIDADE] Gerar os trigramas de um texto já normalizado
+# ====================================================================
+def _trigramas(texto: str) -> Set[str]:
+    return {texto[i : i + 3] for i in range(len(texto) - 2)}
+
+
+# ====================================================================
+# [FIM BLOCO] _trigramas
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _chaves_documento
+# [RESPONSABILIDADE] Listar chaves de postagem de um documento (trigramas + prefixos de 1-3 letras)
+# ====================================================================
+def _chaves_documento(texto: str) -> Set[str]:
+    chaves = _trigramas(texto)
+    for palavra in texto.split():
+        for n in range(1, min(len(palavra), 3) + 1):
+            chaves.add("^" + palavra[:n])
+    return chaves
+
+
+# ====================================================================
+# [FIM BLOCO] _chaves_documento
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] CLASSE
+# [NOME] IndicePecas
+# [RESPONSABILIDADE] Guardar documentos e postagens e responder buscas ranqueadas
+# ====================================================================
+class IndicePecas:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # id -> (codigo, descricao, codigo_norm, " " + texto_norm)
+        self._docs: Dict[int, Tuple[str, str, str, str]] = {}
+        self._postagens: Dict[str, Set[int]] = {}
+        # postagens já ordenadas pelo critério de desempate (montadas sob demanda)
+        self._ordenadas: Dict[str, List[int]] = {}
+        # (codigo_norm, id) em ordem alfabética: código exato e prefixo via bisect
+        self._codigos: List[Tuple[str, int]] = []
+        self.construido = False
+        self.sujo = False
+        self.geracao = 0
+        self.versao: Optional[int] = None
+        self.verificado_em = 0.0
+
+    # ----------------------------------------------------------------
+    # escrita
+    # ----------------------------------------------------------------
+    def _remover(self, peca_id: int) -> None:
+        doc = self._docs.pop(peca_id, None)
+        if doc is None:
+            return
+        i = bisect.bisect_left(self._codigos, (doc[2], peca_id))
+        if i < len(self._codigos) and self._codigos[i] == (doc[2], peca_id):
+            del self._codigos[i]
+        for chave in _chaves_documento(doc[3][1:]):
+            self._ordenadas.pop(chave, None)
+            ids = self._postagens.get(chave)
+            if ids is not None:
+                ids.discard(peca_id)
+                if not ids:
+                    del self._postagens[chave]
+
+    def _incluir(self, peca_id: int, codigo, descricao, ordenar: bool = True) -> None:
+        codigo, descricao = codigo or "", descricao or ""
+        texto = normalizar_busca(codigo, descricao)
+        cod_norm = normalizar_busca(codigo)
+        self._docs[peca_id] = (codigo, descricao, cod_norm, " " + texto)
+        if ordenar:
+            bisect.insort(self._codigos, (cod_norm, peca_id))
+        else:
+            self._codigos.append((cod_norm, peca_id))
+        for chave in _chaves_documento(texto):
+            self._ordenadas.pop(chave, None)
+            self._postagens.setdefault(chave, set()).add(peca_id)
+
+    def aplicar(self, alteracoes: Dict[int, Optional[Tuple[str, str]]]) -> None:
+        """Aplica {id: (codigo, descricao)} ou {id: None} (peça removida)."""
+        with self._lock:
+            for peca_id, valores in alteracoes.items():
+                self._remover(peca_id)
+                if valores is not None:
+                    self._incluir(peca_id, *valores)
+
+    def carregar(self, linhas, versao: Optional[int]) -> None:
+        """Substitui todo o conteúdo por linhas (id, codigo, descricao)."""
+        novo = IndicePecas()
+        for peca_id, codigo, descricao in linhas:
+            novo._incluir(peca_id, codigo, descricao, ordenar=False)
+        novo._codigos.sort()
+        for chave in novo._postagens:
+            if chave.startswith("^"):
+                novo._ordenada(chave)
+        with self._lock:
+            self._docs, self._postagens = novo._docs, novo._postagens
+            self._ordenadas, self._codigos = {}, novo._codigos
+            self.construido, self.geracao = True, self.geracao + 1
+            self.versao, self.verificado_em = versao, time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # ----------------------------------------------------------------
+    # leitura
+    # ----------------------------------------------------------------
+    def _ordem(self, peca_id: int):
+        # desempate: descrição mais curta primeiro, depois alfabética
+        doc = self._docs[peca_id]
+        return (len(doc[1]), doc[3])
+
+    def _mais_rara(self, chaves: List[str]) -> Optional[str]:
+        """Chave com a menor postagem (None se alguma não existe: nada casa)."""
+        melhor = None
+        for chave in chaves:
+            n = len(self._postagens.get(chave, ()))
+            if n == 0:
+                return None
+            if melhor is None or n < melhor[0]:
+                melhor = (n, chave)
+        return melhor[1]
+
+    def _ordenada(self, chave: str) -> List[int]:
+        lista = self._ordenadas.get(chave)
+        if lista is None:
+            lista = sorted(self._postagens[chave], key=self._ordem)
+            self._ordenadas[chave] = lista
+        return lista
+
+    def buscar(self, consulta: str, limite: int = LIMITE_PADRAO) -> List[Dict[str, str]]:
+        q = normalizar_busca(consulta)
+        termos = q.split()
+        if not termos:
+            return []
+        with self._lock:
+            # 1) código exato e 2) código que começa com a consulta (o exato vem antes no bisect)
+            escolhidos: List[int] = []
+            i = bisect.bisect_left(self._codigos, (q, -1))
+            while i < len(self._codigos) and len(escolhidos) < limite:
+                cod_norm, peca_id = self._codigos[i]
+                if not cod_norm.startswith(q):
+                    break
+                escolhidos.append(peca_id)
+                i += 1
+
+            # 3) cada termo inicia uma palavra: percorre a menor postagem de
+            #    prefixo (já ordenada) e para ao completar o limite
+            vistos = set(escolhidos)
+            prefixos = [" " + t for t in termos]
+            chave = self._mais_rara(["^" + t[:3] for t in termos])
+            if chave is not None:
+                for peca_id in self._ordenada(chave):
+                    if len(escolhidos) >= limite:
+                        break
+                    if peca_id not in vistos and all(p in self._docs[peca_id][3] for p in prefixos):
+                        escolhidos.append(peca_id)
+                        vistos.add(peca_id)
+
+            # 4) só contém os termos (meio de palavra): mesma ideia com trigramas
+            if len(escolhidos) < limite:
+                chave = self._mais_rara(
+                    [c for t in termos for c in (_trigramas(t) if len(t) >= 3 else ["^" + t])]
+                )
+                for peca_id in self._ordenada(chave) if chave else ():
+                    if len(escolhidos) >= limite:
+                        break
+                    if peca_id not in vistos and all(t in self._docs[peca_id][3] for t in termos):
+                        escolhidos.append(peca_id)
+
+            return [
+                {"descricao": self._docs[pid][1], "codigo": self._docs[pid][0], "id": pid}
+                for pid in escolhidos
+            ]
+
+
+# ====================================================================
+# [FIM BLOCO] IndicePecas
+# ====================================================================
+
+# Instância única do processo
+INDICE = IndicePecas()
+_lock_reconstrucao = threading.Lock()
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] _versao_indice
+# [RESPONSABILIDADE] Ler a versão do índice em cache_versoes (None se indisponível)
+# ====================================================================
+def _versao_indice() -> Optional[int]:
+    try:
+        from app.utils.cache_versoes import versoes
+
+        return versoes([VERSAO_INDICE])[VERSAO_INDICE]
+    except Exception as e:
+        logger.warning(f"[INDICE_PECAS] Versão do índice indisponível: {e}")
+        db.session.rollback()
+        return None
+
+
+# ====================================================================
+# [FIM BLOCO] _versao_indice
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] reconstruir_indice
+# [RESPONSABILIDADE] Carregar todas as peças (id, código, descrição) no índice
+# ====================================================================
+def reconstruir_indice() -> int:
+    inicio = time.perf_counter()
+    # limpo antes de ler: um commit em lote durante a leitura volta a sujar
+    INDICE.sujo = False
+    versao = _versao_indice()
+    linhas = (
+        db.session.query(Peca.id, Peca.codigo_pneumark, Peca.descricao)
+        .execution_options(yield_per=5000)
+        .all()
+    )
+    INDICE.carregar(linhas, versao)
+    logger.info(
+        f"[INDICE_PECAS] {len(INDICE)} peça(s) indexadas em "
+        f"{(time.perf_counter() - inicio) * 1000:.0f} ms"
+    )
+    return len(INDICE)
+
+
+# ====================================================================
+# [FIM BLOCO] reconstruir_indice
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _garantir_atualizado
+# [RESPONSABILIDADE] Reconstruir se nunca construído, sujo ou com versão de outro processo
+# ====================================================================
+def _garantir_atualizado() -> None:
+    if INDICE.construido and not INDICE.sujo:
+        intervalo = current_app.config.get("INDICE_PECAS_VERIFICAR_S", VERIFICAR_S_PADRAO)
+        if not intervalo or time.monotonic() - INDICE.verificado_em < intervalo:
+            return
+        INDICE.verificado_em = time.monotonic()
+        versao = _versao_indice()
+        if versao is None or versao == INDICE.versao:
+            return
+    geracao = INDICE.geracao
+    with _lock_reconstrucao:
+        if INDICE.geracao != geracao:
+            return  # outra thread acabou de reconstruir
+        reconstruir_indice()
+
+
+# ====================================================================
+# [FIM BLOCO] _garantir_atualizado
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] sugerir_pecas
+# [RESPONSABILIDADE] Responder o autocomplete a partir do índice em memória
+# ====================================================================
+def sugerir_pecas(termo: str, limite: int = LIMITE_PADRAO) -> List[Dict[str, str]]:
+    _garantir_atualizado()
+    return INDICE.buscar(termo, max(1, min(int(limite or LIMITE_PADRAO), LIMITE_MAX)))
+
+
+# ====================================================================
+# [FIM BLOCO] sugerir_pecas
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _depois_do_flush
+# [RESPONSABILIDADE] Guardar código/descrição das peças gravadas pelo ORM neste flush
+# ====================================================================
+def _depois_do_flush(session, flush_context) -> None:
+    alteradas = {}
+    for obj in session.new:
+        if isinstance(obj, Peca) and obj.id is not None:
+            alteradas[obj.id] = (obj.codigo_pneumark, obj.descricao)
+    for obj in session.dirty:
+        if isinstance(obj, Peca) and obj.id is not None:
+            attrs = inspect(obj).attrs
+            if any(attrs[c].history.has_changes() for c in COLUNAS_INDICE):
+                alteradas[obj.id] = (obj.codigo_pneumark, obj.descricao)
+    for obj in session.deleted:
+        if isinstance(obj, Peca) and obj.id is not None:
+            alteradas[obj.id] = None
+    if alteradas:
+        session.info.setdefault(INFO_PECAS_ALTERADAS, {}).update(alteradas)
+        _marcar_versao(session)
+
+
+# ====================================================================
+# [FIM BLOCO] _depois_do_flush
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _marcar_versao
+# [RESPONSABILIDADE] Incrementar a versão do índice no commit (avisa os outros processos)
+# ====================================================================
+def _marcar_versao(session) -> None:
+    from app.utils.cache_versoes import marcar_alterado
+
+    marcar_alterado(session, VERSAO_INDICE)
+
+
+# ====================================================================
+# [FIM BLOCO] _marcar_versao
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _colunas_do_update
+# [RESPONSABILIDADE] Nomes das colunas gravadas por um update() (None se não der para saber)
+# ====================================================================
+def _colunas_do_update(estado) -> Optional[Set[str]]:
+    colunas: Set[str] = set()
+    valores = getattr(estado.statement, "_values", None) or {}
+    for chave in valores:
+        colunas.add(getattr(chave, "key", None) or str(chave))
+    parametros = estado.parameters
+    if isinstance(parametros, dict):
+        parametros = [parametros]
+    for linha in parametros or ():
+        if not isinstance(linha, dict):
+            return None
+        colunas.update(getattr(c, "key", None) or str(c) for c in linha)
+    # update em lote por PK: a chave primária não é coluna gravada
+    colunas.discard("id")
+    return colunas or None
+
+
+# ====================================================================
+# [FIM BLOCO] _colunas_do_update
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _ao_executar
+# [RESPONSABILIDADE] Marcar reconstrução quando pecas recebe insert/delete em lote ou update do código/descrição
+# ====================================================================
+def _ao_executar(estado) -> None:
+    if not (estado.is_insert or estado.is_update or estado.is_delete):
+        return
+    tabela = getattr(estado.statement, "table", None)
+    if getattr(tabela, "name", None) != Peca.__tablename__:
+        return
+    if estado.is_update:
+        colunas = _colunas_do_update(estado)
+        if colunas is not None and not (colunas & COLUNAS_INDICE):
+            return  # ex.: baixa/reposição de estoque
+    estado.session.info[INFO_PECAS_RECARREGAR] = True
+    _marcar_versao(estado.session)
+
+
+# ====================================================================
+# [FIM BLOCO] _ao_executar
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _depois_do_commit
+# [RESPONSABILIDADE] Aplicar no índice o que a transação gravou (sem acessar o banco)
+# ====================================================================
+def _depois_do_commit(session) -> None:
+    alteracoes = session.info.pop(INFO_PECAS_ALTERADAS, None)
+    if session.info.pop(INFO_PECAS_RECARREGAR, False) or (
+        alteracoes and _lock_reconstrucao.locked()
+    ):
+        # em lote, ou durante uma reconstrução que pode não ter visto o commit
+        INDICE.sujo = True
+    elif alteracoes and INDICE.construido:
+        INDICE.aplicar(alteracoes)
+
+
+# ====================================================================
+# [FIM BLOCO] _depois_do_commit
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _descartar_pendencias
+# [RESPONSABILIDADE] Esquecer alterações anotadas quando a transação externa é desfeita
+# ====================================================================
+def _descartar_pendencias(session, previous_transaction) -> None:
+    # savepoint desfeito não desfaz as peças gravadas pela transação externa
+    if previous_transaction.parent is None:
+        session.info.pop(INFO_PECAS_ALTERADAS, None)
+        session.info.pop(INFO_PECAS_RECARREGAR, None)
+
+
+# ====================================================================
+# [FIM BLOCO] _descartar_pendencias
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] registrar_indice_pecas
+# [RESPONSABILIDADE] Ligar os eventos de sessão que mantêm o índice (idempotente)
+# ====================================================================
+def registrar_indice_pecas() -> None:
+    alvo = db.session
+    for nome, fn in (
+        ("after_flush", _depois_do_flush),
+        ("do_orm_execute", _ao_executar),
+        ("after_commit", _depois_do_commit),
+        ("after_soft_rollback", _descartar_pendencias),
+    ):
+        if not event.contains(alvo, nome, fn):
+            event.listen(alvo, nome, fn)
+
+
+# ====================================================================
+# [FIM BLOCO] registrar_indice_pecas
+# ====================================================================
+
+# ====================================================================
+# MAPA DO ARQUIVO
+# --------------------------------------------------------------------
+# FUNÇÃO: _trigramas
+# FUNÇÃO: _chaves_documento
+# CLASSE: IndicePecas
+# BLOCO_DB: _versao_indice
+# BLOCO_DB: reconstruir_indice
+# FUNÇÃO: _garantir_atualizado
+# FUNÇÃO: sugerir_pecas
+# FUNÇÃO: _depois_do_flush
+# FUNÇÃO: _marcar_versao
+# FUNÇÃO: _colunas_do_update
+# FUNÇÃO: _ao_executar
+# FUNÇÃO: _depois_do_commit
+# FUNÇÃO: _descartar_pendencias
+# FUNÇÃO: registrar_indice_pecas
+# ====================================================================
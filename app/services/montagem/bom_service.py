@@ -0,0 +1,311 @@
+# app/services/montagem/bom_service.py
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app import db
+from app.models_sqla import Peca, EstruturaMaquina
+
+# ====================================================================
+# [BLOCO] CONFIG_LOGGER
+# [NOME] logger
+# [RESPONSABILIDADE] Inicializar logger do módulo para rastreamento da explosão de BOM
+# ====================================================================
+logger = logging.getLogger(__name__)
+# ====================================================================
+# [FIM BLOCO] logger
+# ====================================================================
+
+# ====================================================================
+# [BLOCO] BLOCO_UTIL
+# [NOME] cache_bom
+# [RESPONSABILIDADE] Manter estrutura (BOM) e explosões memoizadas no processo, com TTL de segurança
+# ====================================================================
+# A invalidação explícita (invalidar_cache_bom) cobre o worker que editou a
+# estrutura; o TTL limita a defasagem nos demais workers do gunicorn.
+BOM_CACHE_TTL_S = 300
+
+_LOCK = threading.RLock()
+_estrutura_cache: Optional[Dict[str, List[Tuple[str, int]]]] = None
+_explosao_cache: Dict[str, Dict[str, int]] = {}
+_carregado_em: float = 0.0
+# ====================================================================
+# [FIM BLOCO] cache_bom
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] CLASSE
+# [NOME] BomCicloDetectado
+# [RESPONSABILIDADE] Exceção para indicar ciclo na estrutura (conjunto que contém a si mesmo)
+# ====================================================================
+class BomCicloDetectado(Exception):
+    def __init__(self, caminho: List[str]):
+        self.caminho = caminho
+        super().__init__("Ciclo na estrutura (BOM): " + " -> ".join(caminho))
+
+
+# ====================================================================
+# [FIM BLOCO] BomCicloDetectado
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _carregar_estrutura
+# [RESPONSABILIDADE] Carregar toda a tabela de estruturas em uma única query como lista de adjacência
+# ====================================================================
+def _carregar_estrutura() -> Dict[str, List[Tuple[str, int]]]:
+    """
+    Retorna {codigo_maquina: [(codigo_peca, quantidade), ...]}.
+    Linhas repetidas da mesma peça são somadas; quantidades <= 0 são ignoradas.
+    """
+    rows = db.session.query(
+        EstruturaMaquina.codigo_maquina,
+        EstruturaMaquina.codigo_peca,
+        EstruturaMaquina.quantidade,
+    ).all()
+
+    agregado: Dict[str, Dict[str, int]] = {}
+    for codigo_maquina, codigo_peca, quantidade in rows:
+        pai = (codigo_maquina or "").strip()
+        filho = (codigo_peca or "").strip()
+        qtd = int(quantidade or 0)
+        if not pai or not filho or qtd <= 0:
+            continue
+        linhas = agregado.setdefault(pai, {})
+        linhas[filho] = linhas.get(filho, 0) + qtd
+
+    return {pai: list(linhas.items()) for pai, linhas in agregado.items()}
+
+
+# ====================================================================
+# [FIM BLOCO] _carregar_estrutura
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _obter_estrutura
+# [RESPONSABILIDADE] Retornar estrutura em cache, recarregando quando invalidada ou vencida (TTL)
+# ====================================================================
+def _obter_estrutura() -> Dict[str, List[Tuple[str, int]]]:
+    global _estrutura_cache, _carregado_em
+    with _LOCK:
+        agora = time.monotonic()
+        if _estrutura_cache is None or agora - _carregado_em > BOM_CACHE_TTL_S:
+            _estrutura_cache = _carregar_estrutura()
+            _explosao_cache.clear()
+            _carregado_em = agora
+        return _estrutura_cache
+
+
+# ====================================================================
+# [FIM BLOCO] _obter_estrutura
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _explodir
+# [RESPONSABILIDADE] Percorrer a estrutura em profundidade acumulando folhas e detectando ciclos
+# ====================================================================
+def _explodir(
+    codigo: str,
+    estrutura: Dict[str, List[Tuple[str, int]]],
+    memo: Dict[str, Dict[str, int]],
+    caminho: List[str],
+) -> Dict[str, int]:
+    if codigo in memo:
+        return memo[codigo]
+    if codigo in caminho:
+        raise BomCicloDetectado(caminho[caminho.index(codigo):] + [codigo])
+
+    caminho.append(codigo)
+    folhas: Dict[str, int] = {}
+    for filho, qtd in estrutura.get(codigo, []):
+        if filho in estrutura:
+            # subconjunto com estrutura própria: multiplica as folhas dele
+            for folha, qtd_folha in _explodir(filho, estrutura, memo, caminho).items():
+                folhas[folha] = folhas.get(folha, 0) + qtd * qtd_folha
+        else:
+            folhas[filho] = folhas.get(filho, 0) + qtd
+    caminho.pop()
+
+    memo[codigo] = folhas
+    return folhas
+
+
+# ====================================================================
+# [FIM BLOCO] _explodir
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_UTIL
+# [NOME] __all__
+# [RESPONSABILIDADE] Definir API pública do módulo (exports)
+# ====================================================================
+__all__ = [
+    "BomCicloDetectado",
+    "explodir_bom",
+    "listar_bom",
+    "calcular_custo_bom",
+    "invalidar_cache_bom",
+]
+# ====================================================================
+# [FIM BLOCO] __all__
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] explodir_bom
+# [RESPONSABILIDADE] Achatar a estrutura multinível de um conjunto em peças folha com quantidades multiplicadas
+# ====================================================================
+def explodir_bom(codigo_conjunto: str) -> Dict[str, int]:
+    """
+    Explode a BOM de um conjunto (ex.: '7-000') até as peças folha.
+
+    Um item é considerado subconjunto quando possui linhas próprias em
+    EstruturaMaquina (codigo_maquina == codigo_peca do item).
+
+    Retorna {codigo_peca_folha: quantidade_por_unidade}; dict vazio se o
+    conjunto não tiver estrutura. Levanta BomCicloDetectado se houver ciclo.
+    O resultado é memoizado por raiz até a próxima edição de estrutura.
+    """
+    codigo = (codigo_conjunto or "").strip()
+    if not codigo:
+        return {}
+
+    with _LOCK:
+        estrutura = _obter_estrutura()
+        folhas = _explodir(codigo, estrutura, _explosao_cache, [])
+        return dict(folhas)
+
+
+# ====================================================================
+# [FIM BLOCO] explodir_bom
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] listar_bom
+# [RESPONSABILIDADE] Retornar linhas (codigo_peca, quantidade) da BOM em um nível ou explodida
+# ====================================================================
+def listar_bom(codigo_conjunto: str, explodir: bool = False) -> List[Tuple[str, int]]:
+    """
+    Lista [(codigo_peca, qtd_por_unidade), ...] do conjunto, ordenada por código.
+    - explodir=False: apenas o primeiro nível (comportamento histórico).
+    - explodir=True: peças folha, com subconjuntos achatados.
+    """
+    codigo = (codigo_conjunto or "").strip()
+    if explodir:
+        return sorted(explodir_bom(codigo).items())
+    return sorted(_obter_estrutura().get(codigo, []))
+
+
+# ====================================================================
+# [FIM BLOCO] listar_bom
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] calcular_custo_bom
+# [RESPONSABILIDADE] Consolidar custo de um conjunto somando custo × quantidade das linhas da BOM
+# ====================================================================
+def calcular_custo_bom(codigo_conjunto: str, explodir: bool = False) -> Dict:
+    """
+    Soma Peca.custo × quantidade das linhas da BOM (um nível ou explodida).
+    Busca todas as peças em uma única query.
+
+    Retorna:
+      {
+        "codigo_conjunto": str,
+        "custo_total": float,
+        "itens": [ { "codigo": str, "descricao": str, "quantidade": int,
+                     "custo_unitario": float, "custo_total": float }, ... ],
+        "sem_cadastro": [str, ...]
+      }
+    """
+    linhas = listar_bom(codigo_conjunto, explodir=explodir)
+    codigos = [cod for cod, _ in linhas]
+
+    pecas: Dict[str, Peca] = {}
+    if codigos:
+        for p in Peca.query.filter(Peca.codigo_pneumark.in_(codigos)).all():
+            pecas.setdefault((p.codigo_pneumark or "").strip(), p)
+
+    itens: List[Dict] = []
+    sem_cadastro: List[str] = []
+    total = 0.0
+    for cod, qtd in linhas:
+        p = pecas.get(cod)
+        if not p:
+            sem_cadastro.append(cod)
+            continue
+        unit = float(p.custo or 0)
+        subtotal = unit * qtd
+        total += subtotal
+        itens.append(
+            {
+                "codigo": cod,
+                "descricao": p.descricao,
+                "quantidade": qtd,
+                "custo_unitario": unit,
+                "custo_total": subtotal,
+            }
+        )
+
+    return {
+        "codigo_conjunto": (codigo_conjunto or "").strip(),
+        "custo_total": round(total, 2),
+        "itens": itens,
+        "sem_cadastro": sem_cadastro,
+    }
+
+
+# ====================================================================
+# [FIM BLOCO] calcular_custo_bom
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] invalidar_cache_bom
+# [RESPONSABILIDADE] Descartar estrutura e explosões memoizadas após edição de estrutura
+# ====================================================================
+def invalidar_cache_bom() -> None:
+    """Deve ser chamada após qualquer alteração em EstruturaMaquina (commit já feito)."""
+    global _estrutura_cache, _carregado_em
+    with _LOCK:
+        _estrutura_cache = None
+        _explosao_cache.clear()
+        _carregado_em = 0.0
+    logger.info("[bom] Cache de estrutura invalidado.")
+
+
+# ====================================================================
+# [FIM BLOCO] invalidar_cache_bom
+# ====================================================================
+
+# ====================================================================
+# MAPA DO ARQUIVO
+# --------------------------------------------------------------------
+# CONFIG_LOGGER: logger
+# BLOCO_UTIL: cache_bom
+# CLASSE: BomCicloDetectado
+# FUNÇÃO: _carregar_estrutura
+# FUNÇÃO: _obter_estrutura
+# FUNÇÃO: _explodir
+# BLOCO_UTIL: __all__
+# FUNÇÃO: explodir_bom
+# FUNÇÃO: listar_bom
+# FUNÇÃO: calcular_custo_bom
+# FUNÇÃO: invalidar_cache_bom
+# ====================================================================
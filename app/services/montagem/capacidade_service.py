@@ -7,6 +7,7 @@ import logging
 # ``app.models_sqla`` package defines ``Peca`` and ``EstruturaMaquina``
 # with a ``query`` attribute, which is required by this service.
 from app.models_sqla import Peca, EstruturaMaquina
+from app.services.montagem.bom_service import listar_bom
 
 # ====================================================================
 # [BLOCO] CONFIG_LOGGER
@@ -62,10 +63,10 @@ def _norm_model_key(s: str) -> str:
 
 # ====================================================================
 # [BLOCO] FUNÇÃO
-# [NOME] _to_codigo_maquina
+# [NOME] to_codigo_maquina
 # [RESPONSABILIDADE] Converter modelo/código informado para código de conjunto (codigo_maquina)
 # ====================================================================
-def _to_codigo_maquina(modelo_ou_codigo: str) -> str:
+def to_codigo_maquina(modelo_ou_codigo: str) -> str:
     """
     Aceita 'PM2100', 'PM-2100', 'pm 2100' ou o código '7-000'.
     Retorna SEMPRE o código do conjunto (ex.: '7-000') ou '' se não mapear.
@@ -85,7 +86,7 @@ def _to_codigo_maquina(modelo_ou_codigo: str) -> str:
 
 
 # ====================================================================
-# [FIM BLOCO] _to_codigo_maquina
+# [FIM BLOCO] to_codigo_maquina
 # ====================================================================
 
 # ====================================================================
@@ -98,6 +99,7 @@ __all__ = [
     "calcular_capacidade_modelo",
     "calcular_todas_capacidades",
     "calcular_otimizacao",
+    "to_codigo_maquina",
 ]
 # ====================================================================
 # [FIM BLOCO] __all__
@@ -109,11 +111,14 @@ __all__ = [
 # [NOME] calcular_capacidade_modelo
 # [RESPONSABILIDADE] Calcular capacidade máxima e gargalos de produção para um modelo/código via estrutura e estoque
 # ====================================================================
-def calcular_capacidade_modelo(modelo_ou_codigo: str) -> Dict:
+def calcular_capacidade_modelo(modelo_ou_codigo: str, explodir: bool = False) -> Dict:
     """
     Calcula a capacidade máxima para um modelo (ex.: 'PM2100') OU para um
     código de conjunto (ex.: '7-000'), com base no estoque e na estrutura.
 
+    explodir=True usa a BOM multinível (subconjuntos achatados até as peças
+    folha, via bom_service); o padrão mantém a leitura de um único nível.
+
     Retorna:
       {
         "capacidade": int,
@@ -124,44 +129,53 @@ def calcular_capacidade_modelo(modelo_ou_codigo: str) -> Dict:
         ]
       }
     """
-    codigo_maquina = _to_codigo_maquina(modelo_ou_codigo)
+    codigo_maquina = to_codigo_maquina(modelo_ou_codigo)
     if not codigo_maquina:
         return {"capacidade": 0, "gargalos": []}
 
-    estrutura: List[EstruturaMaquina] = EstruturaMaquina.query.filter_by(
-        codigo_maquina=codigo_maquina
-    ).all()
-    if not estrutura:
+    if explodir:
+        linhas = listar_bom(codigo_maquina, explodir=True)
+    else:
+        estrutura: List[EstruturaMaquina] = EstruturaMaquina.query.filter_by(
+            codigo_maquina=codigo_maquina
+        ).all()
+        linhas = [(item.codigo_peca, int(item.quantidade or 0)) for item in estrutura]
+
+    if not linhas:
         logger.info(
             f"[capacidade] Sem estrutura para codigo_maquina='{codigo_maquina}'"
         )
         return {"capacidade": 0, "gargalos": []}
 
+    # Uma única query para todas as peças da estrutura
+    pecas_por_codigo: Dict[str, Peca] = {}
+    for p in Peca.query.filter(
+        Peca.codigo_pneumark.in_({cod for cod, _ in linhas})
+    ).all():
+        pecas_por_codigo.setdefault(p.codigo_pneumark, p)
+
     gargalos: List[Dict] = []
     capacidade_total = None
 
-    for item in estrutura:
-        peca: Peca | None = Peca.query.filter_by(
-            codigo_pneumark=item.codigo_peca
-        ).first()
+    for codigo_peca, consumo in linhas:
+        peca: Peca | None = pecas_por_codigo.get(codigo_peca)
 
         if not peca:
             gargalos.append(
                 {
-                    "codigo": item.codigo_peca,
+                    "codigo": codigo_peca,
                     "descricao": "NÃO ENCONTRADA",
                     "cap_local": 0,
                     "estoque": 0,
-                    "consumo": int(item.quantidade or 0),
+                    "consumo": consumo,
                 }
             )
             capacidade_total = 0
             logger.warning(
-                f"[capacidade] Peça não encontrada: {item.codigo_peca} (consumo={item.quantidade})"
+                f"[capacidade] Peça não encontrada: {codigo_peca} (consumo={consumo})"
             )
             continue
 
-        consumo = int(item.quantidade or 0)
         estoque = int(peca.estoque_atual or 0)
         cap_local = (estoque // consumo) if consumo > 0 else 0
 
@@ -195,12 +209,12 @@ def calcular_capacidade_modelo(modelo_ou_codigo: str) -> Dict:
 # [NOME] calcular_todas_capacidades
 # [RESPONSABILIDADE] Calcular capacidade/gargalos para uma lista de modelos/códigos
 # ====================================================================
-def calcular_todas_capacidades(modelos: List[str]) -> Dict:
+def calcular_todas_capacidades(modelos: List[str], explodir: bool = False) -> Dict:
     """
     Calcula capacidade/gargalos para cada item da lista.
     Cada item pode ser NOME do modelo (PM2100) ou CÓDIGO (7-000).
     """
-    modelos_dict = {m: calcular_capacidade_modelo(m) for m in modelos}
+    modelos_dict = {m: calcular_capacidade_modelo(m, explodir=explodir) for m in modelos}
     return {"modelos": modelos_dict}
 
 
@@ -236,7 +250,7 @@ def calcular_otimizacao(capacidades: Dict) -> Dict:
 # CONFIG_LOGGER: logger
 # BLOCO_UTIL: _MODELO_TO_CONJUNTO_NORM
 # FUNÇÃO: _norm_model_key
-# FUNÇÃO: _to_codigo_maquina
+# FUNÇÃO: to_codigo_maquina
 # BLOCO_UTIL: __all__
 # FUNÇÃO: calcular_capacidade_modelo
 # FUNÇÃO: calcular_todas_capacidades
@@ -0,0 +1,195 @@
+# app/services/montagem/historico_service.py
+"""
+Histórico de montagens paginado por cursor (keyset), com campos selecionáveis.
+
+- Ordem: data_hora desc, id desc; o cursor "<data_hora ISO>|<id>" continua
+  exatamente depois da última linha da página (sem OFFSET, custo constante
+  em qualquer profundidade do histórico).
+- Só as colunas pedidas saem do banco (SELECT Core, nada de as_dict()).
+- data_hora é gravada em UTC (datetime.utcnow); sai em ISO 8601 com offset
+  (+00:00) e o cliente converte para o fuso local.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, or_, select
+
+from app import db
+from app.models_sqla import Montagem
+
+# ====================================================================
+# [BLOCO] BLOCO_UTIL
+# [NOME] config_historico
+# [RESPONSABILIDADE] Limites de página e campos liberados para o histórico de montagens
+# ====================================================================
+HISTORICO_LIMITE_PADRAO = 50
+HISTORICO_LIMITE_MAX = 500
+CAMPOS_HISTORICO = (
+    "id",
+    "modelo",
+    "serial",
+    "data_hora",
+    "usuario",
+    "status",
+    "label_printed",
+    "label_print_count",
+    "label_printed_at",
+    "cancel_reason",
+    "cancel_at",
+    "cancel_by",
+    "reserva_id",
+)
+CAMPOS_PADRAO = (
+    "id",
+    "modelo",
+    "serial",
+    "data_hora",
+    "usuario",
+    "status",
+    "label_printed",
+    "label_print_count",
+)
+_CAMPOS_DATA = {"data_hora", "label_printed_at", "cancel_at"}
+# ====================================================================
+# [FIM BLOCO] config_historico
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _iso_utc
+# [RESPONSABILIDADE] Formatar datetime UTC ingênuo como ISO 8601 com offset
+# ====================================================================
+def _iso_utc(dt: Optional[datetime]) -> Optional[str]:
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.isoformat()
+
+
+# ====================================================================
+# [FIM BLOCO] _iso_utc
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] instante_utc
+# [RESPONSABILIDADE] Converter data ou data/hora ISO (com ou sem offset) em datetime UTC ingênuo
+# ====================================================================
+def instante_utc(valor: str, fim_do_dia: bool = False) -> datetime:
+    """
+    'YYYY-MM-DD' vale o dia inteiro em UTC (fim_do_dia=True devolve o início
+    do dia seguinte, para filtro exclusivo). Com offset, converte para UTC.
+    Levanta ValueError para valor inválido.
+    """
+    valor = (valor or "").strip()
+    if len(valor) == 10:
+        dia = date.fromisoformat(valor)
+        return datetime.combine(dia + timedelta(days=1) if fim_do_dia else dia, time.min)
+    dt = datetime.fromisoformat(valor.replace("Z", "+00:00"))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+# ====================================================================
+# [FIM BLOCO] instante_utc
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _campos
+# [RESPONSABILIDADE] Validar a seleção de campos (padrão compacto quando vazia)
+# ====================================================================
+def _campos(campos: Optional[Iterable[str]]) -> List[str]:
+    pedidos = [c.strip() for c in (campos or ()) if c and c.strip()]
+    if not pedidos:
+        return list(CAMPOS_PADRAO)
+    invalidos = [c for c in pedidos if c not in CAMPOS_HISTORICO]
+    if invalidos:
+        raise ValueError(f"Campo(s) inválido(s): {', '.join(invalidos)}.")
+    return list(dict.fromkeys(pedidos))
+
+
+# ====================================================================
+# [FIM BLOCO] _campos
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] consultar_historico
+# [RESPONSABILIDADE] Página do histórico de montagens por cursor, com filtros e campos escolhidos
+# ====================================================================
+def consultar_historico(
+    modelo: Optional[str] = None,
+    status: Optional[str] = None,
+    usuario: Optional[str] = None,
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    limite: int = HISTORICO_LIMITE_PADRAO,
+    cursor: Optional[str] = None,
+    campos: Optional[Iterable[str]] = None,
+) -> Dict:
+    """
+    Filtros exatos (modelo, status, usuario) e período [inicio, fim) em UTC.
+    'cursor' é o 'proximo' da página anterior. Levanta ValueError para
+    cursor ou campo inválido.
+    """
+    M = Montagem
+    nomes = _campos(campos)
+    limite = max(1, min(int(limite or HISTORICO_LIMITE_PADRAO), HISTORICO_LIMITE_MAX))
+    colunas = list(dict.fromkeys(nomes + ["id", "data_hora"]))  # o cursor precisa dos dois
+    stmt = select(*(getattr(M, c) for c in colunas))
+    if modelo:
+        stmt = stmt.where(M.modelo == modelo)
+    if status:
+        stmt = stmt.where(M.status == status.upper())
+    if usuario:
+        stmt = stmt.where(M.usuario == usuario)
+    if inicio:
+        stmt = stmt.where(M.data_hora >= inicio)
+    if fim:
+        stmt = stmt.where(M.data_hora < fim)
+    if cursor:
+        try:
+            marca, ultimo_id = cursor.rsplit("|", 1)
+            marca, ultimo_id = datetime.fromisoformat(marca), int(ultimo_id)
+        except ValueError:
+            raise ValueError("Cursor inválido.")
+        stmt = stmt.where(
+            or_(M.data_hora < marca, and_(M.data_hora == marca, M.id < ultimo_id))
+        )
+
+    linhas = db.session.execute(
+        stmt.order_by(M.data_hora.desc(), M.id.desc()).limit(limite + 1)
+    ).all()
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo = f"{linhas[-1].data_hora.isoformat()}|{linhas[-1].id}"
+    itens = [
+        {c: (_iso_utc(ln._mapping[c]) if c in _CAMPOS_DATA else ln._mapping[c]) for c in nomes}
+        for ln in linhas
+    ]
+    return {"itens": itens, "proximo": proximo}
+
+
+# ====================================================================
+# [FIM BLOCO] consultar_historico
+# ====================================================================
+
+# ====================================================================
+# MAPA DO ARQUIVO
+# --------------------------------------------------------------------
+# BLOCO_UTIL: config_historico
+# FUNÇÃO: _iso_utc
+# FUNÇÃO: instante_utc
+# FUNÇÃO: _campos
+# BLOCO_DB: consultar_historico
+# ====================================================================
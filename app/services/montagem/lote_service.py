@@ -0,0 +1,138 @@
+# app/services/montagem/lote_service.py
+"""
+Criação de lotes de montagem em massa: montagens e ordens do Painel gravadas
+com poucos statements (executemany), na transação de quem chama.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models_sqla import GPWorkOrder, Montagem
+from app.utils.db_utils import upsert
+
+# ====================================================================
+# [BLOCO] BLOCO_UTIL
+# [NOME] __all__
+# [RESPONSABILIDADE] Definir API pública do módulo (exports)
+# ====================================================================
+__all__ = ["criar_montagens_em_lote", "garantir_ordens_em_lote"]
+# ====================================================================
+# [FIM BLOCO] __all__
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] criar_montagens_em_lote
+# [RESPONSABILIDADE] Inserir as montagens de um lote em um único executemany e devolvê-las (com id)
+# ====================================================================
+def criar_montagens_em_lote(
+    modelo: str,
+    seriais: Sequence[str],
+    usuario: str,
+    reserva_id: Optional[int] = None,
+    session: Optional[Session] = None,
+) -> List[Montagem]:
+    """
+    Uma linha por serial (status OK, etiqueta não impressa). Não faz commit.
+    Serial repetido falha no índice único ix_montagens_serial.
+    """
+    if not seriais:
+        return []
+    sess = session or db.session
+    agora = datetime.utcnow()
+    linhas = [
+        {
+            "modelo": modelo,
+            "serial": s,
+            "usuario": usuario,
+            "data_hora": agora,
+            "status": "OK",
+            "label_printed": False,
+            "label_print_count": 0,
+            "reserva_id": reserva_id,
+            "created_at": agora,
+            "updated_at": agora,
+        }
+        for s in seriais
+    ]
+    # executemany simples + um SELECT: sem depender de RETURNING em lote do dialeto
+    sess.execute(insert(Montagem), linhas)
+    return list(
+        sess.scalars(
+            select(Montagem).where(Montagem.serial.in_(list(seriais))).order_by(Montagem.id)
+        )
+    )
+
+
+# ====================================================================
+# [FIM BLOCO] criar_montagens_em_lote
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] garantir_ordens_em_lote
+# [RESPONSABILIDADE] Criar de uma vez as ordens do Painel que ainda não existem para os seriais
+# ====================================================================
+def garantir_ordens_em_lote(
+    itens: Iterable[Tuple[str, str]], session: Optional[Session] = None
+) -> int:
+    """
+    itens: pares (serial, modelo). Mesmo padrão de ensure_gp_workorder
+    (status 'queued', bancada 'sep'), mas com um SELECT ... IN e um
+    INSERT ... ON CONFLICT (serial) DO NOTHING para o lote inteiro.
+    Não faz commit. Retorna quantas ordens eram novas.
+    """
+    por_serial: Dict[str, str] = {}
+    for serial, modelo in itens:
+        serial = (serial or "").strip()
+        if not serial:
+            raise ValueError("serial vazio em garantir_ordens_em_lote")
+        por_serial.setdefault(serial, (modelo or "").strip())
+    if not por_serial:
+        return 0
+
+    sess = session or db.session
+    existentes = set(
+        sess.scalars(
+            select(GPWorkOrder.serial).where(GPWorkOrder.serial.in_(list(por_serial)))
+        )
+    )
+    agora = datetime.utcnow()
+    novas = [
+        {
+            "serial": serial,
+            "modelo": modelo,
+            "status": "queued",
+            "current_bench": "sep",  # entra no card ESTOQUE do Painel
+            "hipot_flag": False,
+            "hipot_status": "",  # NOT NULL no schema
+            "created_at": agora,
+            "updated_at": agora,
+        }
+        for serial, modelo in por_serial.items()
+        if serial not in existentes
+    ]
+    if novas:
+        # ON CONFLICT DO NOTHING: ordem criada por outra transação no meio do caminho
+        upsert(GPWorkOrder, novas, chaves=["serial"], atualizar={}, session=sess)
+    return len(novas)
+
+
+# ====================================================================
+# [FIM BLOCO] garantir_ordens_em_lote
+# ====================================================================
+
+# ====================================================================
+# MAPA DO ARQUIVO
+# --------------------------------------------------------------------
+# BLOCO_UTIL: __all__
+# BLOCO_DB: criar_montagens_em_lote
+# BLOCO_DB: garantir_ordens_em_lote
+# ====================================================================
@@ -0,0 +1,454 @@
+# app/services/montagem/projecao_service.py
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import exists, func, select
+
+from app import db
+from app.models_sqla import (
+    EstruturaMaquina,
+    GPWorkOrder,
+    Montagem,
+    MovimentacaoEstoque,
+    Peca,
+    ReservaMontagem,
+)
+from app.services.montagem.bom_service import listar_bom
+from app.services.montagem.capacidade_service import to_codigo_maquina
+
+# ====================================================================
+# [BLOCO] CONFIG_LOGGER
+# [NOME] logger
+# [RESPONSABILIDADE] Inicializar logger do módulo para rastreamento da projeção de estoque
+# ====================================================================
+logger = logging.getLogger(__name__)
+# ====================================================================
+# [FIM BLOCO] logger
+# ====================================================================
+
+# ====================================================================
+# [BLOCO] BLOCO_UTIL
+# [NOME] config_projecao
+# [RESPONSABILIDADE] Parâmetros da projeção (horizonte, vazão e cache)
+# ====================================================================
+PROJECAO_HORIZONTE_DIAS = 14
+# Janela usada para medir a vazão da linha (ordens finalizadas por dia)
+PROJECAO_JANELA_VAZAO_DIAS = 14
+# Vazão mínima assumida quando não há histórico (unidades/dia)
+PROJECAO_VAZAO_MINIMA = 1.0
+# Ordens no painel que ainda vão gerar entrada de produto acabado
+STATUS_ABERTOS = ("queued", "in_progress")
+# Montagem cancelada: a ordem pode seguir aberta no painel, mas não produz nada
+STATUS_MONTAGEM_CANCELADA = "CANCELADA"
+# Segurança: mudanças sem rastro (ex.: edição de ponto_pedido) expiram por tempo
+PROJECAO_CACHE_TTL_S = 300
+
+_LOCK = threading.Lock()
+_cache: Dict[str, object] = {"assinatura": None, "base": None, "em": 0.0}
+# ====================================================================
+# [FIM BLOCO] config_projecao
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_UTIL
+# [NOME] __all__
+# [RESPONSABILIDADE] Definir API pública do módulo (exports)
+# ====================================================================
+__all__ = [
+    "PROJECAO_HORIZONTE_DIAS",
+    "projetar_estoque",
+    "invalidar_cache_projecao",
+]
+# ====================================================================
+# [FIM BLOCO] __all__
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _filtros_ordens
+# [RESPONSABILIDADE] Condições SQL de ordem ativa (montagem não cancelada) e de ordem com reserva vigente
+# ====================================================================
+def _filtros_ordens():
+    """
+    (cancelada, reservada) correlacionadas a GPWorkOrder pelo serial:
+    - cancelada: a montagem do serial foi cancelada;
+    - reservada: componentes já baixados no api_montar e a reserva do lote
+      ainda não foi totalmente estornada.
+    """
+    cancelada = exists().where(
+        Montagem.serial == GPWorkOrder.serial,
+        Montagem.status == STATUS_MONTAGEM_CANCELADA,
+    )
+    reservada = exists().where(
+        Montagem.serial == GPWorkOrder.serial,
+        ReservaMontagem.id == Montagem.reserva_id,
+        func.coalesce(ReservaMontagem.unidades_estornadas, 0) < ReservaMontagem.unidades,
+    )
+    return cancelada, reservada
+
+
+# ====================================================================
+# [FIM BLOCO] _filtros_ordens
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] _assinatura
+# [RESPONSABILIDADE] Ler em uma query os marcadores que mudam quando estoque, ordens ou BOM mudam
+# ====================================================================
+def _assinatura(sess, explodir: bool, horizonte: int) -> tuple:
+    """
+    - último id do livro-razão (toda variação de estoque gera movimentação)
+    - quantidade e último updated_at das ordens abertas
+    - quantas delas têm a montagem cancelada (cancelar sem reserva não
+      gera movimentação)
+    - quantidade e último id de EstruturaMaquina (edição de BOM recria linhas)
+    """
+    abertas = GPWorkOrder.status.in_(STATUS_ABERTOS)
+    cancelada, _ = _filtros_ordens()
+    row = sess.execute(
+        select(
+            select(func.max(MovimentacaoEstoque.id)).scalar_subquery(),
+            select(func.count(GPWorkOrder.id)).where(abertas).scalar_subquery(),
+            select(func.max(GPWorkOrder.updated_at)).where(abertas).scalar_subquery(),
+            select(func.count(GPWorkOrder.id)).where(abertas, cancelada).scalar_subquery(),
+            select(func.count(EstruturaMaquina.id)).scalar_subquery(),
+            select(func.max(EstruturaMaquina.id)).scalar_subquery(),
+        )
+    ).one()
+    return tuple(row) + (date.today(), bool(explodir), int(horizonte))
+
+
+# ====================================================================
+# [FIM BLOCO] _assinatura
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _carregar_base
+# [RESPONSABILIDADE] Montar matrizes da projeção (estoque inicial, BOM e movimentos das ordens na fila)
+# ====================================================================
+def _carregar_base(sess, explodir: bool, horizonte: int) -> Dict:
+    """
+    Retorna as estruturas NumPy reutilizadas por todas as chamadas até a
+    próxima mudança de estoque/ordens:
+      estoque0 (P,), ponto_pedido (P,), delta (P, D) e bom (C, P).
+    """
+    dias = horizonte + 1  # dia 0 = hoje
+
+    # 1) Peças (uma query)
+    pecas = sess.execute(
+        select(
+            Peca.id,
+            Peca.codigo_pneumark,
+            Peca.descricao,
+            Peca.tipo,
+            Peca.estoque_atual,
+            Peca.ponto_pedido,
+        ).order_by(Peca.id)
+    ).all()
+    idx_peca: Dict[str, int] = {}
+    for i, p in enumerate(pecas):
+        idx_peca.setdefault((p.codigo_pneumark or "").strip(), i)
+    estoque0 = np.array([float(p.estoque_atual or 0) for p in pecas], dtype=float)
+    ponto_pedido = np.array([float(p.ponto_pedido or 0) for p in pecas], dtype=float)
+
+    # 2) Vazão da linha: ordens finalizadas por dia na janela recente
+    desde = datetime.utcnow() - timedelta(days=PROJECAO_JANELA_VAZAO_DIAS)
+    finalizadas = sess.execute(
+        select(func.count(GPWorkOrder.id)).where(GPWorkOrder.finished_at >= desde)
+    ).scalar() or 0
+    vazao = max(PROJECAO_VAZAO_MINIMA, finalizadas / float(PROJECAO_JANELA_VAZAO_DIAS))
+
+    # 3) Ordens abertas em FIFO, sem as de montagens canceladas
+    cancelada, reservada = _filtros_ordens()
+    ordens = sess.execute(
+        select(GPWorkOrder.modelo, reservada.label("reservada"))
+        .where(GPWorkOrder.status.in_(STATUS_ABERTOS), ~cancelada)
+        .order_by(GPWorkOrder.created_at, GPWorkOrder.id)
+    ).all()
+
+    # 4) BOM por conjunto envolvido (bom_service memoiza a estrutura)
+    cod_por_modelo = {
+        m: to_codigo_maquina(m) or (m or "").strip() for m in {m for m, _ in ordens}
+    }
+    idx_conj: Dict[str, int] = {}
+    for cod in cod_por_modelo.values():
+        idx_conj.setdefault(cod, len(idx_conj))
+    bom = _matriz_bom(idx_conj, idx_peca, len(pecas), explodir)
+
+    # 5) Movimentos das ordens: entrada do conjunto no dia previsto de término;
+    #    ordens sem reserva ainda devem os componentes (demanda hoje).
+    conj_ordem = np.array([idx_conj[cod_por_modelo[m]] for m, _ in ordens], dtype=int)
+    sem_reserva = np.array([not bool(r) for _, r in ordens], dtype=bool)
+    dia_termino = np.floor(np.arange(len(ordens)) / vazao).astype(int)
+
+    entradas = np.zeros((len(idx_conj), dias), dtype=float)
+    demanda = np.zeros((len(idx_conj), dias), dtype=float)
+    no_horizonte = dia_termino < dias
+    np.add.at(entradas, (conj_ordem[no_horizonte], dia_termino[no_horizonte]), 1.0)
+    np.add.at(demanda, (conj_ordem[sem_reserva], 0), 1.0)
+
+    delta = np.zeros((len(pecas), dias), dtype=float)
+    delta -= bom.T @ demanda
+    _somar_entradas_conjuntos(delta, entradas, idx_conj, idx_peca)
+
+    return {
+        "pecas": pecas,
+        "idx_peca": idx_peca,
+        "idx_conj": idx_conj,
+        "estoque0": estoque0,
+        "ponto_pedido": ponto_pedido,
+        "delta": delta,
+        "bom": bom,
+        "vazao": vazao,
+        "fila": len(ordens),
+        "dias": dias,
+        "explodir": explodir,
+    }
+
+
+# ====================================================================
+# [FIM BLOCO] _carregar_base
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _matriz_bom
+# [RESPONSABILIDADE] Converter a BOM dos conjuntos em matriz densa (conjunto × peça)
+# ====================================================================
+def _matriz_bom(
+    idx_conj: Dict[str, int], idx_peca: Dict[str, int], n_pecas: int, explodir: bool
+) -> np.ndarray:
+    bom = np.zeros((len(idx_conj), n_pecas), dtype=float)
+    for cod, c in idx_conj.items():
+        for codigo_peca, qtd in listar_bom(cod, explodir=explodir):
+            p = idx_peca.get(codigo_peca)
+            if p is not None:
+                bom[c, p] += float(qtd)
+    return bom
+
+
+# ====================================================================
+# [FIM BLOCO] _matriz_bom
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _somar_entradas_conjuntos
+# [RESPONSABILIDADE] Lançar na matriz de peças as entradas de produto acabado por conjunto/dia
+# ====================================================================
+def _somar_entradas_conjuntos(
+    delta: np.ndarray,
+    entradas: np.ndarray,
+    idx_conj: Dict[str, int],
+    idx_peca: Dict[str, int],
+) -> None:
+    for cod, c in idx_conj.items():
+        p = idx_peca.get(cod)
+        if p is not None:
+            delta[p] += entradas[c]
+
+
+# ====================================================================
+# [FIM BLOCO] _somar_entradas_conjuntos
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _obter_base
+# [RESPONSABILIDADE] Retornar base em cache enquanto a assinatura (estoque/ordens/BOM) não mudar
+# ====================================================================
+def _obter_base(sess, explodir: bool, horizonte: int) -> Dict:
+    assinatura = _assinatura(sess, explodir, horizonte)
+    with _LOCK:
+        vencido = time.monotonic() - float(_cache["em"]) > PROJECAO_CACHE_TTL_S
+        if _cache["base"] is None or _cache["assinatura"] != assinatura or vencido:
+            _cache["base"] = _carregar_base(sess, explodir, horizonte)
+            _cache["assinatura"] = assinatura
+            _cache["em"] = time.monotonic()
+        return _cache["base"]  # type: ignore[return-value]
+
+
+# ====================================================================
+# [FIM BLOCO] _obter_base
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _aplicar_lotes_planejados
+# [RESPONSABILIDADE] Somar ao delta base a demanda de componentes e a entrada de conjuntos dos lotes planejados
+# ====================================================================
+def _aplicar_lotes_planejados(base: Dict, lotes: Sequence[Dict]) -> np.ndarray:
+    """
+    Lote planejado: { "modelo": "PM2100", "quantidade": 5, "dia": 0 }.
+    Componentes saem no 'dia' (offset a partir de hoje); as unidades entram
+    como conjunto após a fila atual, na vazão medida.
+    """
+    delta = base["delta"]
+    if not lotes:
+        return delta
+
+    delta = delta.copy()
+    dias = base["dias"]
+    idx_peca = base["idx_peca"]
+    posicao_fila = base["fila"]
+    for lote in lotes:
+        qtd = int(lote.get("quantidade") or 0)
+        if qtd <= 0:
+            continue
+        cod = to_codigo_maquina(str(lote.get("modelo") or "")) or str(
+            lote.get("modelo") or ""
+        ).strip()
+        dia = min(max(int(lote.get("dia") or 0), 0), dias - 1)
+
+        c = base["idx_conj"].get(cod)
+        if c is not None:
+            linha_bom = base["bom"][c]
+        else:
+            linha_bom = _matriz_bom({cod: 0}, idx_peca, delta.shape[0], base["explodir"])[0]
+        delta[:, dia] -= linha_bom * qtd
+
+        p = idx_peca.get(cod)
+        if p is not None:
+            termino = np.floor(
+                (posicao_fila + np.arange(qtd)) / base["vazao"]
+            ).astype(int)
+            termino = np.maximum(termino, dia)
+            termino = termino[termino < dias]
+            np.add.at(delta[p], termino, 1.0)
+        posicao_fila += qtd
+
+    return delta
+
+
+# ====================================================================
+# [FIM BLOCO] _aplicar_lotes_planejados
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] projetar_estoque
+# [RESPONSABILIDADE] Projetar estoque por peça no horizonte e indicar data de ruptura e de ponto de pedido
+# ====================================================================
+def projetar_estoque(
+    lotes: Optional[Sequence[Dict]] = None,
+    horizonte: int = PROJECAO_HORIZONTE_DIAS,
+    explodir: bool = False,
+    todos: bool = False,
+    session=None,
+) -> Dict:
+    """
+    Estoque projetado = estoque_atual + soma acumulada (np.cumsum) dos
+    movimentos previstos por dia:
+      - ordens abertas no painel, exceto de montagens canceladas (entrada do
+        conjunto no término previsto, componentes das ordens sem reserva
+        vigente);
+      - lotes planejados (ver _aplicar_lotes_planejados).
+
+    Retorna:
+      {
+        "datas": ["YYYY-MM-DD", ...],
+        "vazao_dia": float, "fila": int,
+        "itens": [ { "peca_id", "codigo", "descricao", "tipo", "atual",
+                     "ponto_pedido", "projetado": [..], "ruptura_em", "rop_em" }, ... ]
+      }
+    Por padrão só lista peças com movimento previsto ou que rompem no horizonte.
+    """
+    sess = session or db.session
+    horizonte = max(1, min(int(horizonte or PROJECAO_HORIZONTE_DIAS), 90))
+    base = _obter_base(sess, explodir, horizonte)
+
+    delta = _aplicar_lotes_planejados(base, lotes or [])
+    projetado = base["estoque0"][:, None] + np.cumsum(delta, axis=1)
+
+    ruptura = projetado < 0
+    abaixo_pp = projetado <= base["ponto_pedido"][:, None]
+    dia_ruptura = np.where(ruptura.any(axis=1), ruptura.argmax(axis=1), -1)
+    dia_rop = np.where(abaixo_pp.any(axis=1), abaixo_pp.argmax(axis=1), -1)
+
+    hoje = date.today()
+    datas = [(hoje + timedelta(days=d)).isoformat() for d in range(base["dias"])]
+    relevantes = np.arange(len(base["pecas"])) if todos else np.flatnonzero(
+        np.any(delta != 0, axis=1) | (dia_ruptura >= 0)
+    )
+
+    itens: List[Dict] = []
+    for i in relevantes:
+        p = base["pecas"][i]
+        itens.append(
+            {
+                "peca_id": p.id,
+                "codigo": p.codigo_pneumark,
+                "descricao": p.descricao,
+                "tipo": p.tipo,
+                "atual": float(base["estoque0"][i]),
+                "ponto_pedido": float(base["ponto_pedido"][i]),
+                "projetado": [round(float(v), 2) for v in projetado[i]],
+                "ruptura_em": datas[dia_ruptura[i]] if dia_ruptura[i] >= 0 else None,
+                "rop_em": datas[dia_rop[i]] if dia_rop[i] >= 0 else None,
+            }
+        )
+
+    # rupturas mais próximas primeiro
+    itens.sort(key=lambda x: (x["ruptura_em"] or "9999", x["rop_em"] or "9999", x["codigo"] or ""))
+    return {
+        "datas": datas,
+        "vazao_dia": round(float(base["vazao"]), 2),
+        "fila": int(base["fila"]),
+        "itens": itens,
+    }
+
+
+# ====================================================================
+# [FIM BLOCO] projetar_estoque
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] invalidar_cache_projecao
+# [RESPONSABILIDADE] Descartar base da projeção (ex.: após editar ponto de pedido)
+# ====================================================================
+def invalidar_cache_projecao() -> None:
+    with _LOCK:
+        _cache["base"] = None
+        _cache["assinatura"] = None
+        _cache["em"] = 0.0
+
+
+# ====================================================================
+# [FIM BLOCO] invalidar_cache_projecao
+# ====================================================================
+
+# ====================================================================
+# MAPA DO ARQUIVO
+# --------------------------------------------------------------------
+# CONFIG_LOGGER: logger
+# BLOCO_UTIL: config_projecao
+# BLOCO_UTIL: __all__
+# FUNÇÃO: _filtros_ordens
+# BLOCO_DB: _assinatura
+# FUNÇÃO: _carregar_base
+# FUNÇÃO: _matriz_bom
+# FUNÇÃO: _somar_entradas_conjuntos
+# FUNÇÃO: _obter_base
+# FUNÇÃO: _aplicar_lotes_planejados
+# FUNÇÃO: projetar_estoque
+# FUNÇÃO: invalidar_cache_projecao
+# ====================================================================
@@ -0,0 +1,324 @@
+# app/services/montagem/reconciliacao_seriais.py
+"""
+Reconciliação montagens -> cadastro de séries (Serial / SerialEvent), em lotes.
+
+- Percorre montagens por id (keyset), `lote` por vez; cada lote faz um SELECT
+  dos seriais já cadastrados, calcula inserções/atualizações em memória e
+  grava com executemany (INSERT de séries e eventos, UPDATE em lote por PK).
+- Cada lote é uma transação própria e grava o último montagem.id processado
+  em job_checkpoints (nome CHECKPOINT); interrompido, o job continua dali.
+- Regras iguais às do antigo /producao/series/dev/backfill: status 'valid'
+  para montagem OK, modelo/montagem_id só preenchem vazio, impressões nunca
+  diminuem, série nova ganha evento 'mounted'.
+- O cadastro de séries (app.models.producao_models.seriais) não faz parte
+  desta base: sem ele o job para antes do primeiro lote com
+  CadastroSeriesIndisponivel, sem tocar no checkpoint.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models_sqla import JobCheckpoint, Montagem
+from app.utils.db_utils import upsert
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================
+# [BLOCO] BLOCO_UTIL
+# [NOME] config_reconciliacao
+# [RESPONSABILIDADE] Tamanho de lote padrão e nome do checkpoint em job_checkpoints
+# ====================================================================
+LOTE_PADRAO = 1000
+CHECKPOINT = "reconciliacao_seriais"  # ultimo_id = último montagem.id processado
+# ====================================================================
+# [FIM BLOCO] config_reconciliacao
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] CLASSE
+# [NOME] CadastroSeriesIndisponivel
+# [RESPONSABILIDADE] Exceção para base sem os modelos Serial/SerialEvent do cadastro de séries
+# ====================================================================
+class CadastroSeriesIndisponivel(Exception):
+    pass
+
+
+# ====================================================================
+# [FIM BLOCO] CadastroSeriesIndisponivel
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _modelos_series
+# [RESPONSABILIDADE] Importar Serial/SerialEvent ou falhar com mensagem clara
+# ====================================================================
+def _modelos_series():
+    try:
+        from app.models.producao_models.seriais import Serial, SerialEvent  # import tardio
+    except ImportError as e:
+        raise CadastroSeriesIndisponivel(
+            "Cadastro de séries indisponível: os modelos Serial/SerialEvent "
+            "(app.models.producao_models.seriais) não existem nesta base; "
+            "nada foi reconciliado."
+        ) from e
+    return Serial, SerialEvent
+
+
+# ====================================================================
+# [FIM BLOCO] _modelos_series
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] ler_checkpoint
+# [RESPONSABILIDADE] Ler o último montagem.id já reconciliado (0 se nunca rodou)
+# ====================================================================
+def ler_checkpoint(session: Optional[Session] = None) -> int:
+    sess = session or db.session
+    valor = sess.execute(
+        select(JobCheckpoint.ultimo_id).where(JobCheckpoint.nome == CHECKPOINT)
+    ).scalar()
+    return int(valor or 0)
+
+
+# ====================================================================
+# [FIM BLOCO] ler_checkpoint
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _gravar_checkpoint
+# [RESPONSABILIDADE] Gravar o último montagem.id do lote na transação do próprio lote
+# ====================================================================
+def _gravar_checkpoint(ultimo_id: int, sess: Session) -> None:
+    upsert(
+        JobCheckpoint,
+        [{"nome": CHECKPOINT, "ultimo_id": int(ultimo_id), "atualizado_em": datetime.utcnow()}],
+        chaves=["nome"],
+        session=sess,
+    )
+
+
+# ====================================================================
+# [FIM BLOCO] _gravar_checkpoint
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _reconciliar_lote
+# [RESPONSABILIDADE] Comparar um lote de montagens com as séries e gravar as diferenças em lote
+# ====================================================================
+def _reconciliar_lote(linhas, Serial, SerialEvent, sess: Session) -> Dict[str, int]:
+    r = {"criados": 0, "atualizados": 0, "sem_alteracao": 0, "ignorados": 0}
+    por_serial = {}
+    for m in linhas:
+        if not (m.serial or "").strip():
+            r["ignorados"] += 1
+            continue
+        por_serial.setdefault(m.serial, m)
+
+    existentes = {
+        s.numero_serie: s
+        for s in sess.execute(
+            select(
+                Serial.id,
+                Serial.numero_serie,
+                Serial.montagem_id,
+                Serial.modelo,
+                Serial.status,
+                Serial.printed_count,
+            ).where(Serial.numero_serie.in_(list(por_serial)))
+        )
+    }
+
+    novos: List[Dict[str, Any]] = []
+    alteracoes: List[Dict[str, Any]] = []
+    for serial, m in por_serial.items():
+        status = "valid" if m.status == "OK" else "invalid"
+        impressoes = m.label_print_count or (1 if m.label_printed else 0)
+        s = existentes.get(serial)
+        if s is None:
+            novos.append(
+                {
+                    "montagem_id": m.id,
+                    "modelo": m.modelo,
+                    "numero_serie": serial,
+                    "status": status,
+                    "printed_count": impressoes,
+                    "created_at": m.created_at or m.data_hora or datetime.utcnow(),
+                    "created_by": m.usuario or "Operador",
+                }
+            )
+            continue
+        mudancas: Dict[str, Any] = {}
+        if s.montagem_id is None:
+            mudancas["montagem_id"] = m.id
+        if not s.modelo:
+            mudancas["modelo"] = m.modelo
+        if s.status != status:
+            mudancas["status"] = status
+        if (s.printed_count or 0) < impressoes:
+            mudancas["printed_count"] = impressoes
+        if mudancas:
+            mudancas["id"] = s.id
+            alteracoes.append(mudancas)
+        else:
+            r["sem_alteracao"] += 1
+
+    if novos:
+        sess.execute(insert(Serial), novos)
+        ids = dict(
+            sess.execute(
+                select(Serial.numero_serie, Serial.id).where(
+                    Serial.numero_serie.in_([n["numero_serie"] for n in novos])
+                )
+            ).all()
+        )
+        eventos = []
+        for n in novos:
+            m = por_serial[n["numero_serie"]]
+            eventos.append(
+                {
+                    "serial_id": ids[n["numero_serie"]],
+                    "kind": "mounted",
+                    "payload": {
+                        "from": "backfill",
+                        "montagem_id": m.id,
+                        "data_hora": (
+                            m.data_hora.strftime("%Y-%m-%d %H:%M:%S") if m.data_hora else None
+                        ),
+                    },
+                    "created_by": n["created_by"],
+                }
+            )
+        sess.execute(insert(SerialEvent), eventos)
+        r["criados"] = len(novos)
+
+    # UPDATE em lote por chave primária; linhas com colunas diferentes viram grupos separados
+    grupos: Dict[tuple, List[Dict[str, Any]]] = {}
+    for alt in alteracoes:
+        grupos.setdefault(tuple(sorted(alt)), []).append(alt)
+    for grupo in grupos.values():
+        sess.execute(update(Serial), grupo)
+    r["atualizados"] = len(alteracoes)
+    return r
+
+
+# ====================================================================
+# [FIM BLOCO] _reconciliar_lote
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] reconciliar_seriais
+# [RESPONSABILIDADE] Rodar a reconciliação em lotes com commit e checkpoint por lote (retomável)
+# ====================================================================
+def reconciliar_seriais(
+    lote: int = LOTE_PADRAO,
+    retomar: bool = True,
+    desde_id: Optional[int] = None,
+    max_lotes: Optional[int] = None,
+    progresso: Optional[Callable[[Dict[str, Any]], None]] = None,
+    session: Optional[Session] = None,
+) -> Dict[str, Any]:
+    """
+    Faz commit a cada lote (não usar dentro de outra transação).
+    - retomar=True: começa depois do checkpoint; False: do início.
+    - desde_id: força o ponto de partida (montagens com id > desde_id).
+    - max_lotes: para após N lotes (o checkpoint fica no último gravado).
+    - progresso: recebe o resumo parcial após cada lote.
+    - Sem cadastro de séries: CadastroSeriesIndisponivel antes de qualquer lote.
+    """
+    Serial, SerialEvent = _modelos_series()
+
+    sess = session or db.session
+    lote = max(1, int(lote))
+    if desde_id is not None:
+        ultimo = int(desde_id)
+    else:
+        ultimo = ler_checkpoint(sess) if retomar else 0
+
+    resumo: Dict[str, Any] = {
+        "inicio_id": ultimo,
+        "ultimo_id": ultimo,
+        "pendentes": int(
+            sess.execute(select(func.count(Montagem.id)).where(Montagem.id > ultimo)).scalar() or 0
+        ),
+        "processadas": 0,
+        "lotes": 0,
+        "criados": 0,
+        "atualizados": 0,
+        "sem_alteracao": 0,
+        "ignorados": 0,
+    }
+    inicio = datetime.now()
+    while max_lotes is None or resumo["lotes"] < max_lotes:
+        linhas = sess.execute(
+            select(
+                Montagem.id,
+                Montagem.serial,
+                Montagem.modelo,
+                Montagem.status,
+                Montagem.usuario,
+                Montagem.data_hora,
+                Montagem.created_at,
+                Montagem.label_printed,
+                Montagem.label_print_count,
+            )
+            .where(Montagem.id > ultimo)
+            .order_by(Montagem.id)
+            .limit(lote)
+        ).all()
+        if not linhas:
+            break
+        parcial = _reconciliar_lote(linhas, Serial, SerialEvent, sess)
+        ultimo = linhas[-1].id
+        _gravar_checkpoint(ultimo, sess)
+        sess.commit()
+
+        for k, v in parcial.items():
+            resumo[k] += v
+        resumo["processadas"] += len(linhas)
+        resumo["lotes"] += 1
+        resumo["ultimo_id"] = ultimo
+        resumo["tempo_s"] = round((datetime.now() - inicio).total_seconds(), 2)
+        logger.info(
+            "[SERIAIS] reconciliação: %d/%d montagem(ns), até id %d (+%d novas, ~%d atualizadas)",
+            resumo["processadas"], resumo["pendentes"], ultimo,
+            parcial["criados"], parcial["atualizados"],
+        )
+        if progresso:
+            progresso(dict(resumo))
+
+    resumo["concluido"] = resumo["processadas"] >= resumo["pendentes"]
+    resumo["tempo_s"] = round((datetime.now() - inicio).total_seconds(), 2)
+    return resumo
+
+
+# ====================================================================
+# [FIM BLOCO] reconciliar_seriais
+# ====================================================================
+
+# ====================================================================
+# MAPA DO ARQUIVO
+# --------------------------------------------------------------------
+# BLOCO_UTIL: config_reconciliacao
+# CLASSE: CadastroSeriesIndisponivel
+# FUNÇÃO: _modelos_series
+# FUNÇÃO: ler_checkpoint
+# FUNÇÃO: _gravar_checkpoint
+# FUNÇÃO: _reconciliar_lote
+# BLOCO_DB: reconciliar_seriais
+# ====================================================================
@@ -0,0 +1,641 @@
+# app/services/movimentacao_service.py
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import and_, case, delete, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models_sqla import (
+    EstoqueDiario,
+    EstoqueSnapshot,
+    JobCheckpoint,
+    MovimentacaoEstoque,
+    Peca,
+)
+from app.utils.db_utils import upsert
+
+# ====================================================================
+# [BLOCO] CONFIG_LOGGER
+# [NOME] logger
+# [RESPONSABILIDADE] Inicializar logger do módulo para rastreamento do livro-razão de estoque
+# ====================================================================
+logger = logging.getLogger(__name__)
+# ====================================================================
+# [FIM BLOCO] logger
+# ====================================================================
+
+# ====================================================================
+# [BLOCO] BLOCO_UTIL
+# [NOME] tipos_movimentacao
+# [RESPONSABILIDADE] Centralizar os tipos de movimentação gravados no livro-razão
+# ====================================================================
+TIPO_RESERVA = "reserva"  # baixa de componentes na abertura da montagem
+TIPO_ESTORNO_RESERVA = "estorno_reserva"  # devolução de componentes (cancelamento)
+TIPO_ENTRADA_PA = "entrada_pa"  # entrada de produto acabado (conjunto)
+TIPO_ESTORNO_PA = "estorno_pa"  # estorno de produto acabado
+TIPO_AJUSTE = "ajuste"  # edição manual de estoque_atual
+TIPO_CADASTRO = "cadastro"  # estoque inicial informado no cadastro
+TIPO_SYNC_OMIE = "sync_omie"  # saldo corrigido pela sincronização com o OMIE
+
+# Tipos que compõem o consumo líquido de componentes pela produção
+TIPOS_CONSUMO = (TIPO_RESERVA, TIPO_ESTORNO_RESERVA)
+
+# Dias que o job diário recupera sozinho quando ficou sem rodar
+ESTOQUE_DIARIO_MAX_RECUPERAR = 31
+# Linha em job_checkpoints com o último dia já fechado pelo job diário
+CHECKPOINT_ESTOQUE_DIARIO = "estoque_diario"
+
+# Chave em Session.info com os peca_ids cujo estoque mudou na transação corrente
+# (consumida pelo avaliador de ROP no commit)
+INFO_PECAS_TOCADAS = "pecas_estoque_tocadas"
+# ====================================================================
+# [FIM BLOCO] tipos_movimentacao
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_UTIL
+# [NOME] __all__
+# [RESPONSABILIDADE] Definir API pública do módulo (exports)
+# ====================================================================
+__all__ = [
+    "TIPO_RESERVA",
+    "TIPO_ESTORNO_RESERVA",
+    "TIPO_ENTRADA_PA",
+    "TIPO_ESTORNO_PA",
+    "TIPO_AJUSTE",
+    "TIPO_CADASTRO",
+    "TIPO_SYNC_OMIE",
+    "TIPOS_CONSUMO",
+    "INFO_PECAS_TOCADAS",
+    "usuario_corrente",
+    "marcar_pecas_tocadas",
+    "registrar_movimentacoes",
+    "registrar_ajuste",
+    "tirar_snapshot",
+    "gravar_estoque_diario",
+    "gravar_estoque_diario_pendentes",
+    "saldo_em",
+    "historico_consumo",
+    "consumo_por_peca",
+]
+# ====================================================================
+# [FIM BLOCO] __all__
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] usuario_corrente
+# [RESPONSABILIDADE] Obter o username logado (Flask-Login) para carimbar movimentações manuais
+# ====================================================================
+def usuario_corrente(padrao: str = "Sistema") -> str:
+    try:
+        from flask_login import current_user
+
+        if current_user and current_user.is_authenticated:
+            return getattr(current_user, "username", None) or padrao
+    except Exception:
+        pass
+    return padrao
+
+
+# ====================================================================
+# [FIM BLOCO] usuario_corrente
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] marcar_pecas_tocadas
+# [RESPONSABILIDADE] Anotar na sessão os peca_ids com estoque/parâmetros alterados na transação
+# ====================================================================
+def marcar_pecas_tocadas(
+    peca_ids: Iterable[int], session: Optional[Session] = None
+) -> None:
+    """Os ids acumulam em session.info até o commit (ver rop_service)."""
+    sess = session or db.session
+    sess.info.setdefault(INFO_PECAS_TOCADAS, set()).update(
+        int(pid) for pid in peca_ids if pid is not None
+    )
+
+
+# ====================================================================
+# [FIM BLOCO] marcar_pecas_tocadas
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] registrar_movimentacoes
+# [RESPONSABILIDADE] Inserir lote de movimentações em um único INSERT (executemany), sem commit
+# ====================================================================
+def registrar_movimentacoes(
+    linhas: Iterable[Dict],
+    session: Optional[Session] = None,
+) -> int:
+    """
+    Grava movimentações no livro-razão. Cada linha:
+      { "peca_id": int, "codigo_peca": str, "tipo_mov": str,
+        "quantidade": int (com sinal), "referencia": str|None, "usuario": str|None }
+    - Linhas com quantidade 0 são descartadas.
+    - Roda na transação de quem chama (não faz commit).
+    - Marca as peças na sessão para reavaliação de ROP no commit.
+    Retorna a quantidade de linhas inseridas.
+    """
+    agora = datetime.utcnow()
+    registros = []
+    for ln in linhas:
+        qtd = int(round(float(ln.get("quantidade") or 0)))
+        if qtd == 0:
+            continue
+        ref = ln.get("referencia")
+        registros.append(
+            {
+                "peca_id": int(ln["peca_id"]),
+                "codigo_peca": ln.get("codigo_peca"),
+                "tipo_mov": ln["tipo_mov"],
+                "quantidade": qtd,
+                "referencia": str(ref)[:120] if ref else None,
+                "usuario": ln.get("usuario"),
+                "criado_em": ln.get("criado_em") or agora,
+            }
+        )
+
+    if registros:
+        sess = session or db.session
+        sess.execute(insert(MovimentacaoEstoque), registros)
+        marcar_pecas_tocadas((r["peca_id"] for r in registros), sess)
+    return len(registros)
+
+
+# ====================================================================
+# [FIM BLOCO] registrar_movimentacoes
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] registrar_ajuste
+# [RESPONSABILIDADE] Registrar diferença entre estoque anterior e atual de uma peça editada manualmente
+# ====================================================================
+def registrar_ajuste(
+    peca: Peca,
+    estoque_anterior: Optional[float],
+    usuario: Optional[str] = None,
+    tipo_mov: str = TIPO_AJUSTE,
+    referencia: Optional[str] = None,
+    session: Optional[Session] = None,
+) -> int:
+    """
+    Usar logo após sobrescrever peca.estoque_atual (antes do commit).
+    Não grava nada se o valor não mudou.
+    """
+    delta = float(peca.estoque_atual or 0) - float(estoque_anterior or 0)
+    if not delta:
+        return 0
+
+    sess = session or db.session
+    if peca.id is None:
+        sess.flush()
+    return registrar_movimentacoes(
+        [
+            {
+                "peca_id": peca.id,
+                "codigo_peca": peca.codigo_pneumark,
+                "tipo_mov": tipo_mov,
+                "quantidade": delta,
+                "referencia": referencia,
+                "usuario": usuario or usuario_corrente(),
+            }
+        ],
+        session=sess,
+    )
+
+
+# ====================================================================
+# [FIM BLOCO] registrar_ajuste
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] tirar_snapshot
+# [RESPONSABILIDADE] Fotografar estoque_atual de todas as peças com um único INSERT ... SELECT
+# ====================================================================
+def tirar_snapshot(
+    momento: Optional[datetime] = None,
+    session: Optional[Session] = None,
+) -> int:
+    """
+    Copia estoque_atual de todas as peças para estoque_snapshots junto com o
+    id da última movimentação já refletida. Um único comando, portanto
+    consistente com o livro-razão no mesmo instante. Não faz commit.
+    Retorna o número de peças fotografadas.
+    """
+    sess = session or db.session
+    tirado_em = momento or datetime.utcnow()
+
+    ultimo_mov = select(
+        func.coalesce(func.max(MovimentacaoEstoque.id), 0)
+    ).scalar_subquery()
+
+    result = sess.execute(
+        insert(EstoqueSnapshot).from_select(
+            ["peca_id", "estoque", "ultimo_mov_id", "tirado_em"],
+            select(
+                Peca.id,
+                func.coalesce(Peca.estoque_atual, 0),
+                ultimo_mov,
+                literal(tirado_em, type_=EstoqueSnapshot.tirado_em.type),
+            ),
+        )
+    )
+    total = result.rowcount or 0
+    logger.info("[estoque] Snapshot de %s peças em %s", total, tirado_em)
+    return total
+
+
+# ====================================================================
+# [FIM BLOCO] tirar_snapshot
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _saldos_fim_do_dia
+# [RESPONSABILIDADE] Saldo no fim de um dia passado partindo da véspera gravada em estoque_diario
+# ====================================================================
+def _saldos_fim_do_dia(
+    dia: date, anteriores: Dict[int, int], sess: Session
+) -> Dict[int, int]:
+    """
+    Peças com linha anterior: valor da véspera + movimentações do dia.
+    Peças sem linha nenhuma: saldo_em pelo último snapshot do dia; sem
+    snapshot, estoque_atual menos o que foi movimentado depois do dia (nunca
+    parte de zero, que ignoraria o estoque anterior ao livro-razão).
+    """
+    inicio = datetime.combine(dia, time.min)
+    fim = inicio + timedelta(days=1)
+    delta = {
+        pid: int(q or 0)
+        for pid, q in sess.execute(
+            select(MovimentacaoEstoque.peca_id, func.sum(MovimentacaoEstoque.quantidade))
+            .where(MovimentacaoEstoque.criado_em >= inicio, MovimentacaoEstoque.criado_em < fim)
+            .group_by(MovimentacaoEstoque.peca_id)
+        )
+    }
+    saldos = {pid: int(est or 0) + delta.get(pid, 0) for pid, est in anteriores.items()}
+
+    faltam = (set(sess.scalars(select(Peca.id))) | set(delta)) - set(anteriores)
+    if not faltam:
+        return saldos
+    tem_snapshot = sess.execute(
+        select(EstoqueSnapshot.id).where(EstoqueSnapshot.tirado_em < fim).limit(1)
+    ).first()
+    if tem_snapshot is not None:
+        base = saldo_em(datetime.combine(dia, datetime.max.time()), list(faltam), session=sess)
+        saldos.update({pid: base.get(pid, 0) for pid in faltam})
+        return saldos
+
+    atuais = dict(
+        sess.execute(
+            select(Peca.id, func.coalesce(Peca.estoque_atual, 0)).where(Peca.id.in_(faltam))
+        ).all()
+    )
+    depois = dict(
+        sess.execute(
+            select(MovimentacaoEstoque.peca_id, func.sum(MovimentacaoEstoque.quantidade))
+            .where(
+                MovimentacaoEstoque.criado_em >= fim,
+                MovimentacaoEstoque.peca_id.in_(faltam),
+            )
+            .group_by(MovimentacaoEstoque.peca_id)
+        ).all()
+    )
+    for pid in faltam:
+        saldos[pid] = int(atuais.get(pid, 0)) - int(depois.get(pid) or 0)
+    return saldos
+
+
+# ====================================================================
+# [FIM BLOCO] _saldos_fim_do_dia
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] gravar_estoque_diario
+# [RESPONSABILIDADE] Gravar o saldo do dia em estoque_diario só para as peças que mudaram
+# ====================================================================
+def gravar_estoque_diario(
+    dia: Optional[date] = None,
+    session: Optional[Session] = None,
+) -> int:
+    """
+    Grava o estoque de `dia` (padrão: hoje, UTC) em estoque_diario, com um
+    único INSERT em lote e apenas das peças cujo saldo difere da última
+    linha anterior a `dia`.
+    - hoje: estoque_atual das peças;
+    - dias passados (recuperação): última linha anterior + movimentações do
+      dia (ver _saldos_fim_do_dia). Supõe os dias anteriores já fechados,
+      como faz gravar_estoque_diario_pendentes.
+    Refazer o mesmo dia substitui as linhas dele. Não faz commit.
+    Retorna o número de linhas gravadas.
+    """
+    sess = session or db.session
+    hoje = datetime.utcnow().date()
+    dia = dia or hoje
+    if dia > hoje:
+        raise ValueError(f"Dia futuro: {dia.isoformat()}")
+
+    # último valor de cada peça antes do dia
+    ultima = (
+        select(EstoqueDiario.peca_id, func.max(EstoqueDiario.dia).label("dia"))
+        .where(EstoqueDiario.dia < dia)
+        .group_by(EstoqueDiario.peca_id)
+        .subquery()
+    )
+    anteriores = dict(
+        sess.execute(
+            select(EstoqueDiario.peca_id, EstoqueDiario.estoque).join(
+                ultima,
+                and_(
+                    EstoqueDiario.peca_id == ultima.c.peca_id,
+                    EstoqueDiario.dia == ultima.c.dia,
+                ),
+            )
+        ).all()
+    )
+
+    if dia == hoje:
+        atuais = dict(
+            sess.execute(select(Peca.id, func.coalesce(Peca.estoque_atual, 0))).all()
+        )
+    else:
+        atuais = _saldos_fim_do_dia(dia, anteriores, sess)
+
+    linhas = [
+        {"peca_id": pid, "dia": dia, "estoque": int(est or 0)}
+        for pid, est in atuais.items()
+        if anteriores.get(pid) != int(est or 0)
+    ]
+    sess.execute(delete(EstoqueDiario).where(EstoqueDiario.dia == dia))
+    if linhas:
+        sess.execute(insert(EstoqueDiario), linhas)
+    logger.info("[estoque] Estoque diário de %s: %s peça(s) mudaram", dia, len(linhas))
+    return len(linhas)
+
+
+# ====================================================================
+# [FIM BLOCO] gravar_estoque_diario
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] gravar_estoque_diario_pendentes
+# [RESPONSABILIDADE] Rodar o job diário para hoje e para os dias perdidos desde a última execução
+# ====================================================================
+def gravar_estoque_diario_pendentes(
+    desde: Optional[date] = None,
+    session: Optional[Session] = None,
+) -> Dict[str, int]:
+    """
+    Sem `desde`: continua do dia seguinte ao último dia fechado (checkpoint
+    em job_checkpoints; no máximo ESTOQUE_DIARIO_MAX_RECUPERAR dias para
+    trás) e sempre refaz hoje.
+    Com `desde`: regrava todos os dias de `desde` até hoje (carga inicial).
+    Hoje fica aberto: o checkpoint marca ontem, e a próxima execução fecha
+    hoje pelo livro-razão. Não faz commit. Retorna {"dias": n, "linhas": n}.
+    """
+    sess = session or db.session
+    hoje = datetime.utcnow().date()
+    if desde is None:
+        fechado = sess.execute(
+            select(JobCheckpoint.ultimo_dia).where(
+                JobCheckpoint.nome == CHECKPOINT_ESTOQUE_DIARIO
+            )
+        ).scalar()
+        if fechado is None:
+            # bancos anteriores ao checkpoint: última linha gravada
+            fechado = sess.execute(select(func.max(EstoqueDiario.dia))).scalar()
+        if isinstance(fechado, str):  # SQLite sem tipo na agregação
+            fechado = date.fromisoformat(fechado)
+        desde = hoje if fechado is None else min(fechado + timedelta(days=1), hoje)
+        limite = hoje - timedelta(days=ESTOQUE_DIARIO_MAX_RECUPERAR)
+        if desde < limite:
+            logger.warning(
+                "[estoque] Estoque diário parado desde %s; recuperando só a partir de %s",
+                fechado, limite,
+            )
+            desde = limite
+
+    dias = linhas = 0
+    dia = desde
+    while dia <= hoje:
+        linhas += gravar_estoque_diario(dia, session=sess)
+        dias += 1
+        dia += timedelta(days=1)
+
+    upsert(
+        JobCheckpoint,
+        [
+            {
+                "nome": CHECKPOINT_ESTOQUE_DIARIO,
+                "ultimo_dia": hoje - timedelta(days=1),
+                "atualizado_em": datetime.utcnow(),
+            }
+        ],
+        chaves=["nome"],
+        session=sess,
+    )
+    return {"dias": dias, "linhas": linhas}
+
+
+# ====================================================================
+# [FIM BLOCO] gravar_estoque_diario_pendentes
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] saldo_em
+# [RESPONSABILIDADE] Calcular o estoque de uma ou mais peças em uma data (snapshot + delta do livro-razão)
+# ====================================================================
+def saldo_em(
+    momento: datetime,
+    peca_ids: Optional[Sequence[int]] = None,
+    session: Optional[Session] = None,
+) -> Dict[int, int]:
+    """
+    Estoque "em momento" = último snapshot <= momento + soma das
+    movimentações posteriores a ele até o momento. Três queries, qualquer
+    que seja o número de peças.
+    Peças que não existiam no snapshot partem de zero (o estoque inicial
+    delas está no livro-razão como 'cadastro').
+    Retorna {peca_id: estoque}.
+    """
+    sess = session or db.session
+    ids = list(peca_ids) if peca_ids is not None else None
+    if ids is not None and not ids:
+        return {}
+
+    # 1) último snapshot até o momento
+    base = sess.execute(
+        select(EstoqueSnapshot.tirado_em, EstoqueSnapshot.ultimo_mov_id)
+        .where(EstoqueSnapshot.tirado_em <= momento)
+        .order_by(EstoqueSnapshot.tirado_em.desc())
+        .limit(1)
+    ).first()
+
+    saldos: Dict[int, int] = {}
+    corte = 0
+    if base is not None:
+        tirado_em, corte = base
+        q = select(EstoqueSnapshot.peca_id, EstoqueSnapshot.estoque).where(
+            EstoqueSnapshot.tirado_em == tirado_em
+        )
+        if ids is not None:
+            q = q.where(EstoqueSnapshot.peca_id.in_(ids))
+        saldos = {pid: int(est or 0) for pid, est in sess.execute(q)}
+
+    # 2) delta das movimentações após o snapshot
+    q = (
+        select(MovimentacaoEstoque.peca_id, func.sum(MovimentacaoEstoque.quantidade))
+        .where(
+            MovimentacaoEstoque.id > corte,
+            MovimentacaoEstoque.criado_em <= momento,
+        )
+        .group_by(MovimentacaoEstoque.peca_id)
+    )
+    if ids is not None:
+        q = q.where(MovimentacaoEstoque.peca_id.in_(ids))
+    for pid, delta in sess.execute(q):
+        saldos[pid] = saldos.get(pid, 0) + int(delta or 0)
+
+    return saldos
+
+
+# ====================================================================
+# [FIM BLOCO] saldo_em
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] historico_consumo
+# [RESPONSABILIDADE] Montar série diária de entradas, saídas e saldo de uma peça em um período
+# ====================================================================
+def historico_consumo(
+    peca_id: int,
+    inicio: datetime,
+    fim: datetime,
+    session: Optional[Session] = None,
+) -> Dict:
+    """
+    Retorna:
+      {
+        "peca_id": int,
+        "saldo_inicial": int,
+        "dias": [ { "dia": "YYYY-MM-DD", "entradas": int, "saidas": int, "saldo": int }, ... ]
+      }
+    Dias sem movimentação são omitidos.
+    """
+    sess = session or db.session
+    saldo = saldo_em(inicio, [peca_id], session=sess).get(peca_id, 0)
+    saldo_inicial = saldo
+
+    qtd = MovimentacaoEstoque.quantidade
+    dia = func.date(MovimentacaoEstoque.criado_em)
+    rows = sess.execute(
+        select(
+            dia,
+            func.sum(case((qtd > 0, qtd), else_=0)),
+            func.sum(case((qtd < 0, -qtd), else_=0)),
+        )
+        .where(
+            MovimentacaoEstoque.peca_id == peca_id,
+            MovimentacaoEstoque.criado_em > inicio,
+            MovimentacaoEstoque.criado_em <= fim,
+        )
+        .group_by(dia)
+        .order_by(dia)
+    ).all()
+
+    dias: List[Dict] = []
+    for d, entradas, saidas in rows:
+        saldo += int(entradas or 0) - int(saidas or 0)
+        dias.append(
+            {
+                "dia": str(d),
+                "entradas": int(entradas or 0),
+                "saidas": int(saidas or 0),
+                "saldo": saldo,
+            }
+        )
+
+    return {"peca_id": peca_id, "saldo_inicial": saldo_inicial, "dias": dias}
+
+
+# ====================================================================
+# [FIM BLOCO] historico_consumo
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] consumo_por_peca
+# [RESPONSABILIDADE] Somar consumo líquido (reservas - estornos) por peça em um período, em uma query
+# ====================================================================
+def consumo_por_peca(
+    inicio: datetime,
+    fim: datetime,
+    peca_ids: Optional[Sequence[int]] = None,
+    session: Optional[Session] = None,
+) -> Dict[int, int]:
+    """Base para taxa de consumo: {peca_id: unidades consumidas no período}."""
+    sess = session or db.session
+    q = (
+        select(
+            MovimentacaoEstoque.peca_id,
+            -func.sum(MovimentacaoEstoque.quantidade),
+        )
+        .where(
+            MovimentacaoEstoque.tipo_mov.in_(TIPOS_CONSUMO),
+            MovimentacaoEstoque.criado_em > inicio,
+            MovimentacaoEstoque.criado_em <= fim,
+        )
+        .group_by(MovimentacaoEstoque.peca_id)
+    )
+    if peca_ids is not None:
+        q = q.where(MovimentacaoEstoque.peca_id.in_(list(peca_ids)))
+    return {pid: int(total or 0) for pid, total in sess.execute(q)}
+
+
+# ====================================================================
+# [FIM BLOCO] consumo_por_peca
+# ====================================================================
+
+# ====================================================================
+# MAPA DO ARQUIVO
+# --------------------------------------------------------------------
+# CONFIG_LOGGER: logger
+# BLOCO_UTIL: tipos_movimentacao
+# BLOCO_UTIL: __all__
+# FUNÇÃO: usuario_corrente
+# FUNÇÃO: marcar_pecas_tocadas
+# BLOCO_DB: registrar_movimentacoes
+# BLOCO_DB: registrar_ajuste
+# BLOCO_DB: tirar_snapshot
+# FUNÇÃO: _saldos_fim_do_dia
+# BLOCO_DB: gravar_estoque_diario
+# FUNÇÃO: gravar_estoque_diario_pendentes
+# FUNÇÃO: saldo_em
+# FUNÇÃO: historico_consumo
+# FUNÇÃO: consumo_por_peca
+# ====================================================================
@@ -0,0 +1,536 @@
+# app/services/omie_requisicao_service.py
+"""
+Fila de requisições de compra OMIE.
+
+Peças que entram em ROP viram linhas 'pendente' em omie_requisicoes; após uma
+janela de agrupamento, as linhas são enviadas em UMA requisição por fornecedor
+(IncluirRequisicaoCompra com vários itens). O status fica por linha.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import func, or_, text, update
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models_sqla import FornecedoresPorPeca, OmieRequisicao, Peca
+from app.services.omie_sync_service import FAULT_SEM_REGISTROS
+from app.utils.db_utils import upsert
+from app.utils.omie_client import OmieErro
+
+# ====================================================================
+# [BLOCO] CONFIG_LOGGER
+# [NOME] logger
+# [RESPONSABILIDADE] Inicializar logger do módulo da fila de requisições OMIE
+# ====================================================================
+logger = logging.getLogger(__name__)
+# ====================================================================
+# [FIM BLOCO] logger
+# ====================================================================
+
+# ====================================================================
+# [BLOCO] BLOCO_UTIL
+# [NOME] constantes_fila
+# [RESPONSABILIDADE] Centralizar status de linha e parâmetros da fila de requisições
+# ====================================================================
+STATUS_PENDENTE = "pendente"  # aguardando a janela de agrupamento
+STATUS_ENVIANDO = "enviando"  # reservada por um envio em andamento
+STATUS_ENVIADO = "enviado"
+STATUS_ERRO = "erro"
+
+# Linhas que bloqueiam nova requisição da mesma peça
+STATUS_ABERTOS = (STATUS_PENDENTE, STATUS_ENVIANDO)
+# Predicado literal do índice único parcial uq_omie_requisicoes_peca_aberta (ON CONFLICT)
+PREDICADO_ABERTOS = text(
+    "status IN ({})".format(", ".join(f"'{st}'" for st in STATUS_ABERTOS))
+)
+
+FORNECEDOR_PADRAO = "Fornecedor Padrão"
+JANELA_PADRAO_SEG = 60
+# Reserva 'enviando' mais velha que isso é de um envio que morreu (volta a 'pendente')
+ENVIO_TIMEOUT_PADRAO_SEG = 600
+
+_timer_lock = threading.Lock()
+_timer: Optional[threading.Timer] = None
+# ====================================================================
+# [FIM BLOCO] constantes_fila
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] janela_agrupamento
+# [RESPONSABILIDADE] Ler a janela de agrupamento (segundos) da configuração da app
+# ====================================================================
+def janela_agrupamento() -> int:
+    if has_app_context():
+        return int(current_app.config.get("OMIE_REQUISICAO_JANELA_SEG", JANELA_PADRAO_SEG))
+    return JANELA_PADRAO_SEG
+
+
+# ====================================================================
+# [FIM BLOCO] janela_agrupamento
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] timeout_envio
+# [RESPONSABILIDADE] Ler o tempo máximo (segundos) de uma reserva 'enviando' da configuração da app
+# ====================================================================
+def timeout_envio() -> int:
+    if has_app_context():
+        return int(
+            current_app.config.get("OMIE_REQUISICAO_ENVIO_TIMEOUT_SEG", ENVIO_TIMEOUT_PADRAO_SEG)
+        )
+    return ENVIO_TIMEOUT_PADRAO_SEG
+
+
+# ====================================================================
+# [FIM BLOCO] timeout_envio
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _fornecedores_preferenciais
+# [RESPONSABILIDADE] Resolver o fornecedor principal (primeiro vínculo) de várias peças em uma consulta
+# ====================================================================
+def _fornecedores_preferenciais(peca_ids: List[int], sess: Session) -> Dict[int, str]:
+    if not peca_ids:
+        return {}
+    primeiro = (
+        sess.query(func.min(FornecedoresPorPeca.id))
+        .filter(FornecedoresPorPeca.peca_id.in_(peca_ids))
+        .group_by(FornecedoresPorPeca.peca_id)
+    )
+    linhas = (
+        sess.query(FornecedoresPorPeca.peca_id, FornecedoresPorPeca.fornecedor)
+        .filter(FornecedoresPorPeca.id.in_(primeiro))
+        .all()
+    )
+    return {pid: forn for pid, forn in linhas if forn}
+
+
+# ====================================================================
+# [FIM BLOCO] _fornecedores_preferenciais
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] enfileirar_requisicoes
+# [RESPONSABILIDADE] Criar linhas pendentes de requisição, ignorando peças com requisição em aberto
+# ====================================================================
+def enfileirar_requisicoes(
+    itens: Iterable[Dict[str, Any]], session: Optional[Session] = None
+) -> List[int]:
+    """
+    itens: [{ "peca_id": int, "quantidade": int, "fornecedor": str|None }]
+    - Quantidade <= 0 é descartada.
+    - Peça com linha 'pendente'/'enviando' não é enfileirada de novo: o índice
+      único parcial (uq_omie_requisicoes_peca_aberta) + ON CONFLICT DO NOTHING
+      resolvem também enfileiramentos concorrentes da mesma peça.
+    - Não faz commit. Retorna os ids das linhas criadas.
+    """
+    sess = session or db.session
+    por_peca: Dict[int, Dict[str, Any]] = {}
+    for it in itens:
+        qtd = int(it.get("quantidade") or 0)
+        if qtd > 0:
+            por_peca[int(it["peca_id"])] = {**it, "quantidade": qtd}
+    if not por_peca:
+        return []
+
+    fornecedores = _fornecedores_preferenciais(
+        [pid for pid, it in por_peca.items() if not it.get("fornecedor")], sess
+    )
+    agora = datetime.utcnow()
+    upsert(
+        OmieRequisicao,
+        [
+            {
+                "peca_id": pid,
+                "fornecedor": it.get("fornecedor") or fornecedores.get(pid) or FORNECEDOR_PADRAO,
+                "quantidade": it["quantidade"],
+                "status": STATUS_PENDENTE,
+                "created_at": agora,
+            }
+            for pid, it in por_peca.items()
+        ],
+        chaves=["peca_id"],
+        atualizar={},
+        session=sess,
+        onde=PREDICADO_ABERTOS,
+    )
+    criadas = [
+        rid
+        for (rid,) in sess.query(OmieRequisicao.id).filter(
+            OmieRequisicao.peca_id.in_(list(por_peca)),
+            OmieRequisicao.status == STATUS_PENDENTE,
+            OmieRequisicao.created_at == agora,
+        )
+    ]
+
+    if len(criadas) < len(por_peca):
+        logger.info(
+            "[OMIE] %d peça(s) já com requisição em aberto.", len(por_peca) - len(criadas)
+        )
+    return criadas
+
+
+# ====================================================================
+# [FIM BLOCO] enfileirar_requisicoes
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _eh_cod_fornecedor
+# [RESPONSABILIDADE] Dizer se o cod_int é a chave de uma requisição de fornecedor (POST já iniciado)
+# ====================================================================
+def _eh_cod_fornecedor(cod_int: Optional[str]) -> bool:
+    # reserva do lote: "SGP-<hex>"; requisição do fornecedor: "SGP-<hex>-<seq>"
+    return bool(cod_int) and cod_int.count("-") >= 2
+
+
+# ====================================================================
+# [FIM BLOCO] _eh_cod_fornecedor
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _payload_consulta
+# [RESPONSABILIDADE] Montar o payload ConsultarRequisicaoCompra pela chave de integração (cod_int)
+# ====================================================================
+def _payload_consulta(cod_int: str) -> Dict[str, Any]:
+    return {
+        "call": "ConsultarRequisicaoCompra",
+        "param": [{"codigo_interno": cod_int}],
+    }
+
+
+# ====================================================================
+# [FIM BLOCO] _payload_consulta
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] liberar_envios_travados
+# [RESPONSABILIDADE] Devolver a 'pendente' linhas presas em 'enviando' além do timeout
+# ====================================================================
+def liberar_envios_travados(
+    timeout_segundos: Optional[int] = None, session: Optional[Session] = None
+) -> int:
+    """
+    Processo que caiu entre a reserva e a resposta do OMIE deixa linhas em
+    'enviando' para sempre (e a peça nunca mais é enfileirada). Linhas sem
+    claimed_at (reservadas antes da coluna existir) também são liberadas.
+    Linha cujo POST já tinha começado (cod_int do fornecedor gravado) só volta
+    depois de o OMIE confirmar que a requisição não existe; se existir, fica
+    'enviado'. Sem resposta do OMIE ela continua presa até a próxima tentativa.
+    Não faz commit. Retorna quantas linhas voltaram.
+    """
+    from app.utils.omie_utils import _make_omie_request
+
+    sess = session or db.session
+    if timeout_segundos is None:
+        timeout_segundos = timeout_envio()
+    limite = datetime.utcnow() - timedelta(seconds=max(0, int(timeout_segundos)))
+    presas = (
+        sess.query(OmieRequisicao.id, OmieRequisicao.cod_int)
+        .filter(
+            OmieRequisicao.status == STATUS_ENVIANDO,
+            or_(OmieRequisicao.claimed_at.is_(None), OmieRequisicao.claimed_at < limite),
+        )
+        .all()
+    )
+    if not presas:
+        return 0
+
+    por_cod: Dict[str, List[int]] = {}
+    liberar: List[int] = []
+    for rid, cod in presas:
+        if _eh_cod_fornecedor(cod):
+            por_cod.setdefault(cod, []).append(rid)
+        else:
+            liberar.append(rid)
+
+    for cod, linha_ids in por_cod.items():
+        try:
+            _make_omie_request("produtos/requisicao/", _payload_consulta(cod))
+        except OmieErro as e:
+            if str(getattr(e, "codigo", None) or "").endswith(FAULT_SEM_REGISTROS):
+                liberar.extend(linha_ids)
+            else:
+                logger.warning("[OMIE] Requisição %s não confirmada, segue reservada: %s", cod, e)
+            continue
+        logger.info("[OMIE] Requisição %s já existia no OMIE; marcada como enviada.", cod)
+        sess.execute(
+            update(OmieRequisicao)
+            .where(OmieRequisicao.id.in_(linha_ids), OmieRequisicao.status == STATUS_ENVIANDO)
+            .values(status=STATUS_ENVIADO, sent_at=datetime.utcnow(), erro_msg=None)
+            .execution_options(synchronize_session=False)
+        )
+
+    if not liberar:
+        return 0
+    res = sess.execute(
+        update(OmieRequisicao)
+        .where(OmieRequisicao.id.in_(liberar), OmieRequisicao.status == STATUS_ENVIANDO)
+        .values(status=STATUS_PENDENTE, cod_int=None, claimed_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    if res.rowcount:
+        logger.warning("[OMIE] %d requisição(ões) presas em 'enviando' voltaram à fila.", res.rowcount)
+    return res.rowcount or 0
+
+
+# ====================================================================
+# [FIM BLOCO] liberar_envios_travados
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _payload_requisicao
+# [RESPONSABILIDADE] Montar o payload IncluirRequisicaoCompra com todos os itens de um fornecedor
+# ====================================================================
+def _payload_requisicao(
+    cod_int: str, fornecedor: str, linhas: List[Any]
+) -> Dict[str, Any]:
+    return {
+        "call": "IncluirRequisicaoCompra",
+        "param": [
+            {
+                "cabecalho": {
+                    "codigo_interno": cod_int,
+                    "descricao": f"Requisição automática - {fornecedor} ({len(linhas)} itens)",
+                    "observacoes": "Gerada automaticamente pelo sistema SGP (ponto de pedido)",
+                },
+                "itens": [
+                    {
+                        "codigo_produto": ln.codigo_omie or ln.codigo_pneumark,
+                        "descricao": ln.descricao,
+                        "quantidade": ln.quantidade,
+                        "observacoes": (
+                            f"Estoque atual: {ln.estoque_atual}, "
+                            f"Ponto de pedido: {ln.ponto_pedido}"
+                        ),
+                    }
+                    for ln in linhas
+                ],
+                "fornecedor": {"nome": fornecedor},
+            }
+        ],
+    }
+
+
+# ====================================================================
+# [FIM BLOCO] _payload_requisicao
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] enviar_requisicoes_pendentes
+# [RESPONSABILIDADE] Reservar linhas pendentes e enviar uma requisição OMIE por fornecedor
+# ====================================================================
+def enviar_requisicoes_pendentes(
+    ids: Optional[Iterable[int]] = None,
+    janela_segundos: int = 0,
+    session: Optional[Session] = None,
+) -> Dict[str, Any]:
+    """
+    - ids: restringe às linhas informadas (envio imediato).
+    - janela_segundos > 0: só envia se a linha pendente mais antiga já
+      passou da janela (deixa o lote acumular).
+    - Reserva as linhas com UPDATE condicional (status='pendente'), então
+      workers concorrentes nunca enviam a mesma linha duas vezes; antes,
+      reservas de envios mortos (liberar_envios_travados) voltam à fila.
+    - Faz commit da reserva e de cada fornecedor enviado.
+    """
+    from app.utils.omie_utils import _make_omie_request
+
+    sess = session or db.session
+    resumo: Dict[str, Any] = {"linhas": 0, "requisicoes": 0, "erros": 0, "grupos": []}
+    resumo["liberadas"] = liberar_envios_travados(session=sess)
+    if resumo["liberadas"]:
+        sess.commit()
+
+    filtro = [OmieRequisicao.status == STATUS_PENDENTE]
+    if ids is not None:
+        ids = [int(i) for i in ids]
+        if not ids:
+            return resumo
+        filtro.append(OmieRequisicao.id.in_(ids))
+
+    if ids is None and janela_segundos > 0:
+        mais_antiga = sess.query(func.min(OmieRequisicao.created_at)).filter(*filtro).scalar()
+        if mais_antiga is None:
+            return resumo
+        if datetime.utcnow() - mais_antiga < timedelta(seconds=janela_segundos):
+            resumo["adiado"] = True
+            return resumo
+
+    lote = f"SGP-{uuid.uuid4().hex[:12]}"
+    sess.execute(
+        update(OmieRequisicao)
+        .where(*filtro)
+        .values(status=STATUS_ENVIANDO, cod_int=lote, claimed_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    sess.commit()
+
+    reservadas = (
+        sess.query(
+            OmieRequisicao.id,
+            OmieRequisicao.fornecedor,
+            OmieRequisicao.quantidade,
+            Peca.codigo_omie,
+            Peca.codigo_pneumark,
+            Peca.descricao,
+            Peca.estoque_atual,
+            Peca.ponto_pedido,
+        )
+        .join(Peca, Peca.id == OmieRequisicao.peca_id)
+        .filter(OmieRequisicao.cod_int == lote, OmieRequisicao.status == STATUS_ENVIANDO)
+        .order_by(OmieRequisicao.fornecedor, OmieRequisicao.id)
+        .all()
+    )
+    grupos: "OrderedDict[str, List[Any]]" = OrderedDict()
+    for ln in reservadas:
+        grupos.setdefault(ln.fornecedor or FORNECEDOR_PADRAO, []).append(ln)
+
+    for seq, (fornecedor, linhas) in enumerate(grupos.items(), start=1):
+        cod_int = f"{lote}-{seq}"
+        linha_ids = [ln.id for ln in linhas]
+        grupo = {"fornecedor": fornecedor, "cod_int": cod_int, "itens": len(linhas)}
+        # grava a chave antes do POST: se o processo cair, a liberação consulta o OMIE por ela
+        sess.execute(
+            update(OmieRequisicao)
+            .where(OmieRequisicao.id.in_(linha_ids))
+            .values(cod_int=cod_int)
+            .execution_options(synchronize_session=False)
+        )
+        sess.commit()
+        try:
+            resposta = _make_omie_request(
+                "produtos/requisicao/", _payload_requisicao(cod_int, fornecedor, linhas)
+            )
+            valores = {
+                "status": STATUS_ENVIADO,
+                "sent_at": datetime.utcnow(),
+                "cod_int": str(resposta.get("codigo_interno") or cod_int)[:50],
+                "erro_msg": None,
+            }
+            grupo["ok"] = True
+            resumo["requisicoes"] += 1
+        except Exception as e:
+            valores = {"status": STATUS_ERRO, "cod_int": cod_int, "erro_msg": str(e)}
+            grupo.update({"ok": False, "erro": str(e)})
+            resumo["erros"] += 1
+            logger.error(f"[OMIE] Falha ao enviar requisição {cod_int} ({fornecedor}): {e}")
+
+        sess.execute(
+            update(OmieRequisicao)
+            .where(OmieRequisicao.id.in_(linha_ids))
+            .values(**valores)
+            .execution_options(synchronize_session=False)
+        )
+        sess.commit()
+        grupo["requisicao_ids"] = linha_ids
+        resumo["grupos"].append(grupo)
+        resumo["linhas"] += len(linhas)
+
+    if grupos:
+        logger.info(
+            "[OMIE] Lote %s: %d linha(s) em %d requisição(ões), %d erro(s).",
+            lote,
+            resumo["linhas"],
+            len(grupos),
+            resumo["erros"],
+        )
+    return resumo
+
+
+# ====================================================================
+# [FIM BLOCO] enviar_requisicoes_pendentes
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _enviar_em_contexto
+# [RESPONSABILIDADE] Disparar o envio da fila dentro de um app context (timer em segundo plano)
+# ====================================================================
+def _enviar_em_contexto(app) -> None:
+    global _timer
+    with _timer_lock:
+        _timer = None
+    with app.app_context():
+        try:
+            enviar_requisicoes_pendentes()
+        except Exception:
+            db.session.rollback()
+            logger.exception("[OMIE] Falha ao enviar fila de requisições")
+
+
+# ====================================================================
+# [FIM BLOCO] _enviar_em_contexto
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] agendar_envio
+# [RESPONSABILIDADE] Agendar um único envio da fila ao fim da janela de agrupamento
+# ====================================================================
+def agendar_envio(app=None) -> None:
+    """
+    Várias chamadas dentro da mesma janela compartilham o mesmo timer;
+    o envio junta tudo que estiver pendente quando ele disparar.
+    """
+    global _timer
+    app = app or current_app._get_current_object()
+    with _timer_lock:
+        if _timer is not None and _timer.is_alive():
+            return
+        _timer = threading.Timer(
+            janela_agrupamento(), _enviar_em_contexto, args=(app,)
+        )
+        _timer.name = "omie-requisicoes"
+        _timer.daemon = True
+        _timer.start()
+
+
+# ====================================================================
+# [FIM BLOCO] agendar_envio
+# ====================================================================
+
+# ====================================================================
+# MAPA DO ARQUIVO
+# --------------------------------------------------------------------
+# CONFIG_LOGGER: logger
+# BLOCO_UTIL: constantes_fila
+# FUNÇÃO: janela_agrupamento
+# FUNÇÃO: timeout_envio
+# FUNÇÃO: _fornecedores_preferenciais
+# BLOCO_DB: enfileirar_requisicoes
+# FUNÇÃO: _eh_cod_fornecedor
+# FUNÇÃO: _payload_consulta
+# BLOCO_DB: liberar_envios_travados
+# FUNÇÃO: _payload_requisicao
+# BLOCO_DB: enviar_requisicoes_pendentes
+# FUNÇÃO: _enviar_em_contexto
+# FUNÇÃO: agendar_envio
+# ====================================================================
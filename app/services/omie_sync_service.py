@@ -0,0 +1,396 @@
+# app/services/omie_sync_service.py
+"""
+Sincronização incremental do catálogo e do estoque com o OMIE.
+
+- Produtos: ListarProdutos filtrado pela data/hora da última sincronização
+  concluída (checkpoint 'produtos'); só produtos alterados voltam do OMIE.
+- Estoque: ListarPosEstoque não tem filtro por alteração, então as páginas
+  são lidas inteiras, mas só saldos diferentes são gravados (com livro-razão).
+- Diferença calculada em memória contra 'pecas'; gravação em lote por página,
+  com commit e checkpoint por página (uma queda retoma da página seguinte).
+
+Uso: flask --app run omie-sync [--so produtos|estoque] [--completo] [--criar-pecas]
+"""
+from __future__ import annotations
+
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models_sqla import OmieSyncCheckpoint, Peca
+from app.services.movimentacao_service import TIPO_SYNC_OMIE, registrar_movimentacoes
+from app.utils.omie_client import OmieClient, OmieErro, get_omie_client
+from app.utils.texto_utils import normalizar_busca
+
+# ====================================================================
+# [BLOCO] CONFIG_LOGGER
+# [NOME] logger
+# [RESPONSABILIDADE] Inicializar logger do módulo de sincronização OMIE
+# ====================================================================
+logger = logging.getLogger(__name__)
+# ====================================================================
+# [FIM BLOCO] logger
+# ====================================================================
+
+# ====================================================================
+# [BLOCO] BLOCO_UTIL
+# [NOME] constantes_sync
+# [RESPONSABILIDADE] Centralizar endpoints, chamadas e parâmetros de paginação do OMIE
+# ====================================================================
+CHECKPOINT_PRODUTOS = "produtos"
+CHECKPOINT_ESTOQUE = "estoque"
+
+ENDPOINT_PRODUTOS = "geral/produtos/"
+CALL_PRODUTOS = "ListarProdutos"
+ENDPOINT_ESTOQUE = "estoque/consulta/"
+CALL_ESTOQUE = "ListarPosEstoque"
+
+POR_PAGINA = 500  # máximo aceito pelo OMIE
+# margem para alterações gravadas no OMIE durante a execução anterior
+SOBREPOSICAO = timedelta(minutes=5)
+# "Não existem registros para a página [N]!": filtro sem resultado ou página além do fim
+FAULT_SEM_REGISTROS = "5113"
+# ====================================================================
+# [FIM BLOCO] constantes_sync
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] _checkpoint
+# [RESPONSABILIDADE] Obter (ou criar) o checkpoint de uma sincronização
+# ====================================================================
+def _checkpoint(nome: str, sess: Session) -> OmieSyncCheckpoint:
+    ck = sess.query(OmieSyncCheckpoint).filter_by(nome=nome).one_or_none()
+    if ck is None:
+        ck = OmieSyncCheckpoint(nome=nome, pagina=0)
+        sess.add(ck)
+        sess.flush()
+    return ck
+
+
+# ====================================================================
+# [FIM BLOCO] _checkpoint
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _iniciar_execucao
+# [RESPONSABILIDADE] Abrir nova execução ou retomar a interrompida; retorna a página inicial
+# ====================================================================
+def _iniciar_execucao(ck: OmieSyncCheckpoint, completo: bool) -> int:
+    em_andamento = ck.iniciado_em is not None and (
+        ck.concluido_em is None or ck.concluido_em < ck.iniciado_em
+    )
+    if em_andamento and ck.pagina > 0 and not completo:
+        logger.info("[OMIE-SYNC] %s: retomando após a página %d.", ck.nome, ck.pagina)
+        return ck.pagina + 1
+    ck.iniciado_em = datetime.now()
+    ck.pagina = 0
+    if completo:
+        ck.marca_desde = None
+    return 1
+
+
+# ====================================================================
+# [FIM BLOCO] _iniciar_execucao
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _concluir_execucao
+# [RESPONSABILIDADE] Avançar o checkpoint para o início da execução concluída
+# ====================================================================
+def _concluir_execucao(ck: OmieSyncCheckpoint, resumo: Dict[str, Any]) -> None:
+    ck.marca_desde = ck.iniciado_em
+    ck.pagina = 0
+    ck.concluido_em = datetime.now()
+    ck.resumo = json.dumps(resumo, ensure_ascii=False)
+
+
+# ====================================================================
+# [FIM BLOCO] _concluir_execucao
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _paginas
+# [RESPONSABILIDADE] Percorrer páginas de uma listagem OMIE a partir de uma página inicial
+# ====================================================================
+def _paginas(
+    cliente: OmieClient,
+    endpoint: str,
+    call: str,
+    montar_param: Callable[[int], Dict[str, Any]],
+    chave_lista: str,
+    chave_total: str,
+    pagina_inicial: int = 1,
+) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """
+    O OMIE responde página vazia com erro (faultcode ...-5113) em vez de
+    lista vazia; isso encerra a listagem como uma última página sem itens.
+    """
+    pagina = pagina_inicial
+    while True:
+        try:
+            resp = cliente.chamar(endpoint, call, montar_param(pagina))
+        except OmieErro as e:
+            if not str(getattr(e, "codigo", None) or "").endswith(FAULT_SEM_REGISTROS):
+                raise
+            logger.info("[OMIE-SYNC] %s: sem registros a partir da página %d.", call, pagina)
+            yield pagina, []
+            return
+        total = int(resp.get(chave_total) or 0)
+        yield pagina, list(resp.get(chave_lista) or [])
+        if pagina >= total:
+            return
+        pagina += 1
+
+
+# ====================================================================
+# [FIM BLOCO] _paginas
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] sincronizar_produtos
+# [RESPONSABILIDADE] Vincular produtos OMIE alterados desde o checkpoint às peças locais
+# ====================================================================
+def sincronizar_produtos(
+    cliente: Optional[OmieClient] = None,
+    completo: bool = False,
+    criar: bool = False,
+    session: Optional[Session] = None,
+) -> Dict[str, Any]:
+    """
+    Casa o produto OMIE com a peça por codigo_omie; sem vínculo, tenta
+    codigo_pneumark == codigo_produto_integracao/codigo e grava o codigo_omie.
+    Descrição local só é preenchida quando está vazia (cadastro manual manda).
+    criar=True cadastra produtos sem peça correspondente (tipo 'peca').
+    """
+    sess = session or db.session
+    cliente = cliente or get_omie_client()
+    ck = _checkpoint(CHECKPOINT_PRODUTOS, sess)
+    pagina_inicial = _iniciar_execucao(ck, completo)
+    desde = ck.marca_desde - SOBREPOSICAO if ck.marca_desde else None
+    sess.commit()
+
+    # índice em memória das peças (uma consulta)
+    por_omie: Dict[str, Dict[str, Any]] = {}
+    por_pneumark: Dict[str, Dict[str, Any]] = {}
+    for pid, cod_pm, cod_omie, desc in sess.query(
+        Peca.id, Peca.codigo_pneumark, Peca.codigo_omie, Peca.descricao
+    ):
+        reg = {"id": pid, "codigo_pneumark": cod_pm, "codigo_omie": cod_omie, "descricao": desc}
+        if cod_omie:
+            por_omie[str(cod_omie).strip()] = reg
+        if cod_pm:
+            por_pneumark.setdefault(str(cod_pm).strip(), reg)
+
+    def montar_param(pagina: int) -> Dict[str, Any]:
+        param = {
+            "pagina": pagina,
+            "registros_por_pagina": POR_PAGINA,
+            "apenas_importado_api": "N",
+            "filtrar_apenas_omiepdv": "N",
+        }
+        if desde:
+            param["filtrar_por_data_de"] = desde.strftime("%d/%m/%Y")
+            param["filtrar_por_hora_de"] = desde.strftime("%H:%M:%S")
+        return param
+
+    resumo = {"lidos": 0, "vinculados": 0, "atualizados": 0, "criados": 0, "sem_vinculo": 0}
+    for pagina, produtos in _paginas(
+        cliente,
+        ENDPOINT_PRODUTOS,
+        CALL_PRODUTOS,
+        montar_param,
+        "produto_servico_cadastro",
+        "total_de_paginas",
+        pagina_inicial,
+    ):
+        atualizacoes: List[Dict[str, Any]] = []
+        novas: List[Dict[str, Any]] = []
+        for prod in produtos:
+            codigo = str(prod.get("codigo") or "").strip()
+            if not codigo or prod.get("inativo") == "S":
+                continue
+            resumo["lidos"] += 1
+            descricao = (prod.get("descricao") or "")[:100] or None
+
+            reg = por_omie.get(codigo)
+            if reg is None:
+                integ = str(prod.get("codigo_produto_integracao") or "").strip()
+                reg = por_pneumark.get(integ) or por_pneumark.get(codigo)
+            if reg is None:
+                if criar:
+                    novas.append(
+                        {
+                            "tipo": "peca",
+                            "codigo_pneumark": codigo,
+                            "codigo_omie": codigo,
+                            "descricao": descricao,
+                            "estoque_atual": 0,
+                        }
+                    )
+                else:
+                    resumo["sem_vinculo"] += 1
+                continue
+
+            mudou: Dict[str, Any] = {}
+            if reg["codigo_omie"] != codigo:
+                mudou["codigo_omie"] = codigo
+                resumo["vinculados"] += 1
+            if not reg["descricao"] and descricao:
+                mudou["descricao"] = descricao
+                mudou["busca_normalizada"] = normalizar_busca(reg.get("codigo_pneumark"), descricao)[:200]
+            if mudou:
+                reg.update(mudou)
+                por_omie[codigo] = reg
+                atualizacoes.append({"id": reg["id"], **mudou})
+
+        if atualizacoes:
+            sess.execute(update(Peca), atualizacoes)
+            resumo["atualizados"] += len(atualizacoes)
+        if novas:
+            sess.execute(insert(Peca), novas)
+            resumo["criados"] += len(novas)
+            for n in novas:
+                por_omie[n["codigo_omie"]] = {"id": None, **n}
+        ck.pagina = pagina
+        sess.commit()
+
+    _concluir_execucao(ck, resumo)
+    sess.commit()
+    logger.info("[OMIE-SYNC] produtos: %s", resumo)
+    return resumo
+
+
+# ====================================================================
+# [FIM BLOCO] sincronizar_produtos
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] sincronizar_estoque
+# [RESPONSABILIDADE] Aplicar saldos do OMIE que diferem de estoque_atual, com registro no livro-razão
+# ====================================================================
+def sincronizar_estoque(
+    cliente: Optional[OmieClient] = None,
+    completo: bool = False,
+    session: Optional[Session] = None,
+    usuario: str = "omie-sync",
+) -> Dict[str, Any]:
+    """
+    Por página: compara nSaldo com o índice em memória; só as peças com
+    diferença são travadas (ordem de id), relidas e atualizadas em lote.
+    A diferença vira movimentação 'sync_omie' (e reavaliação de ROP no commit).
+    """
+    sess = session or db.session
+    cliente = cliente or get_omie_client()
+    ck = _checkpoint(CHECKPOINT_ESTOQUE, sess)
+    pagina_inicial = _iniciar_execucao(ck, completo)
+    data_posicao = (ck.iniciado_em or datetime.now()).strftime("%d/%m/%Y")
+    sess.commit()
+
+    saldo_local: Dict[str, Tuple[int, int]] = {
+        str(cod).strip(): (pid, int(est or 0))
+        for pid, cod, est in sess.query(Peca.id, Peca.codigo_omie, Peca.estoque_atual)
+        .filter(Peca.codigo_omie.isnot(None))
+    }
+
+    def montar_param(pagina: int) -> Dict[str, Any]:
+        return {
+            "nPagina": pagina,
+            "nRegPorPagina": POR_PAGINA,
+            "dDataPosicao": data_posicao,
+            "cExibeTodos": "S",  # inclui saldo zero (peça que zerou também muda)
+        }
+
+    referencia = f"OMIE-SYNC {data_posicao}"
+    resumo = {"lidos": 0, "alterados": 0, "sem_vinculo": 0}
+    for pagina, posicoes in _paginas(
+        cliente,
+        ENDPOINT_ESTOQUE,
+        CALL_ESTOQUE,
+        montar_param,
+        "produtos",
+        "nTotPaginas",
+        pagina_inicial,
+    ):
+        alvo: Dict[int, int] = {}
+        for pos in posicoes:
+            codigo = str(pos.get("cCodigo") or "").strip()
+            resumo["lidos"] += 1
+            local = saldo_local.get(codigo)
+            if local is None:
+                resumo["sem_vinculo"] += 1
+                continue
+            novo = int(round(float(pos.get("nSaldo") or 0)))
+            if novo != local[1]:
+                alvo[local[0]] = novo
+
+        if alvo:
+            travadas = (
+                sess.query(Peca.id, Peca.codigo_pneumark, Peca.codigo_omie, Peca.estoque_atual)
+                .filter(Peca.id.in_(sorted(alvo)))
+                .order_by(Peca.id)
+                .with_for_update()
+                .all()
+            )
+            atualizacoes, movimentos = [], []
+            for pid, cod_pm, cod_omie, atual in travadas:
+                delta = alvo[pid] - int(atual or 0)
+                if delta == 0:
+                    continue
+                atualizacoes.append({"id": pid, "estoque_atual": alvo[pid]})
+                movimentos.append(
+                    {
+                        "peca_id": pid,
+                        "codigo_peca": cod_pm,
+                        "tipo_mov": TIPO_SYNC_OMIE,
+                        "quantidade": delta,
+                        "referencia": referencia,
+                        "usuario": usuario,
+                    }
+                )
+                saldo_local[str(cod_omie).strip()] = (pid, alvo[pid])
+            if atualizacoes:
+                sess.execute(update(Peca), atualizacoes)
+                registrar_movimentacoes(movimentos, session=sess)
+                resumo["alterados"] += len(atualizacoes)
+        ck.pagina = pagina
+        sess.commit()
+
+    _concluir_execucao(ck, resumo)
+    sess.commit()
+    logger.info("[OMIE-SYNC] estoque: %s", resumo)
+    return resumo
+
+
+# ====================================================================
+# [FIM BLOCO] sincronizar_estoque
+# ====================================================================
+
+# ====================================================================
+# MAPA DO ARQUIVO
+# --------------------------------------------------------------------
+# CONFIG_LOGGER: logger
+# BLOCO_UTIL: constantes_sync
+# BLOCO_DB: _checkpoint
+# FUNÇÃO: _iniciar_execucao
+# FUNÇÃO: _concluir_execucao
+# FUNÇÃO: _paginas
+# FUNÇÃO: sincronizar_produtos
+# FUNÇÃO: sincronizar_estoque
+# ====================================================================
@@ -18,6 +18,7 @@ from datetime import datetime
 from app import db
 from app.models.producao_models.gp_modelos import GPModel, GPBenchConfig
 from app.models.producao_models.gp_execucao import GPWorkOrder, GPWorkStage
+from app.services.producao.ordem_cache import ordem_por_serial
 
 # ====================================================================
 # [BLOCO] CONFIG_LOGGER
@@ -250,7 +251,7 @@ def set_current_bench_on_scan(session, serial: str, bench_id: str) -> Dict[str,
     Se a bancada nao estiver no roteiro, realinha para a primeira valida.
     """
     bench_id = _norm_bench_id(bench_id)
-    order = GPWorkOrder.query.filter_by(serial=serial).first()
+    order = ordem_por_serial(serial, session)
     if not order:
         return {"ok": "false", "error": "order_not_found"}
 
@@ -296,7 +297,7 @@ def advance_after_finish(session, serial: str) -> Dict[str, str]:
     """
     Chamado ao finalizar uma etapa. Calcula a proxima e atualiza a ordem.
     """
-    order = GPWorkOrder.query.filter_by(serial=serial).first()
+    order = ordem_por_serial(serial, session)
     if not order:
         return {"ok": "false", "error": "order_not_found"}
 
@@ -331,7 +332,7 @@ def debug_route(modelo: str) -> List[str]:
 # [RESPONSABILIDADE] Expor próxima bancada calculada para uma ordem (por serial) para fins de depuração
 # ====================================================================
 def debug_next(serial: str) -> str:
-    order = GPWorkOrder.query.filter_by(serial=serial).first()
+    order = ordem_por_serial(serial)
     if not order:
         return "order_not_found"
     return next_bench_for_order(order)
@@ -0,0 +1,186 @@
+# app/services/producao/etiqueta_cache.py
+"""
+Cache em disco das etiquetas renderizadas (PNG e PDF), endereçado por conteúdo.
+
+- A chave é o sha256 de tudo que aparece na etiqueta (modelo, serial, data/hora
+  impressa) dentro de uma pasta por layout: <cache>/<layout>/<ab>/<chave>.png|pdf.
+  O layout é um hash da versão e das constantes de desenho (imprimir_etiqueta);
+  mudou o layout, as chaves antigas deixam de ser usadas.
+- Acerto devolve os bytes gravados sem QR/PIL/reportlab; gravação atômica
+  (tmp por processo e thread + os.replace), segura entre workers e threads.
+- limpar_cache_etiquetas() apaga pastas de outros layouts e arquivos sem uso
+  há mais de N dias (a leitura atualiza o mtime).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Optional
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+# ====================================================================
+# [BLOCO] BLOCO_UTIL
+# [NOME] config_etiqueta_cache
+# [RESPONSABILIDADE] Padrões de retenção e extensões guardadas no cache de etiquetas
+# ====================================================================
+ETIQUETA_CACHE_DIAS_PADRAO = 30
+FORMATOS_ETIQUETA = ("png", "pdf")
+# ====================================================================
+# [FIM BLOCO] config_etiqueta_cache
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] diretorio_cache_etiquetas
+# [RESPONSABILIDADE] Resolver (e criar) a pasta do cache de etiquetas
+# ====================================================================
+def diretorio_cache_etiquetas() -> str:
+    pasta = current_app.config.get("ETIQUETA_CACHE_DIR") or os.path.join(
+        current_app.instance_path, "etiquetas_cache"
+    )
+    os.makedirs(pasta, exist_ok=True)
+    return pasta
+
+
+# ====================================================================
+# [FIM BLOCO] diretorio_cache_etiquetas
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] chave_etiqueta
+# [RESPONSABILIDADE] Gerar a chave de conteúdo (sha256) a partir dos textos impressos na etiqueta
+# ====================================================================
+def chave_etiqueta(*partes: object) -> str:
+    bruto = json.dumps([str(p) for p in partes], ensure_ascii=False)
+    return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+
+# ====================================================================
+# [FIM BLOCO] chave_etiqueta
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _caminho
+# [RESPONSABILIDADE] Caminho de um formato da etiqueta dentro da pasta do layout
+# ====================================================================
+def _caminho(layout: str, chave: str, formato: str) -> str:
+    return os.path.join(diretorio_cache_etiquetas(), layout, chave[:2], f"{chave}.{formato}")
+
+
+# ====================================================================
+# [FIM BLOCO] _caminho
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] ler_etiqueta
+# [RESPONSABILIDADE] Devolver {'png','pdf'} em bytes do cache (None se o PNG não estiver lá)
+# ====================================================================
+def ler_etiqueta(layout: str, chave: str) -> Optional[Dict[str, Optional[bytes]]]:
+    """'pdf' vem None quando a etiqueta foi gravada sem reportlab."""
+    dados: Dict[str, Optional[bytes]] = {}
+    for formato in FORMATOS_ETIQUETA:
+        caminho = _caminho(layout, chave, formato)
+        try:
+            with open(caminho, "rb") as fh:
+                dados[formato] = fh.read()
+            os.utime(caminho)  # em uso: fica fora da limpeza por idade
+        except OSError:
+            dados[formato] = None
+    return dados if dados["png"] is not None else None
+
+
+# ====================================================================
+# [FIM BLOCO] ler_etiqueta
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] gravar_etiqueta
+# [RESPONSABILIDADE] Gravar os bytes da etiqueta de forma atômica (PDF antes do PNG, que marca o acerto)
+# ====================================================================
+def gravar_etiqueta(layout: str, chave: str, png: bytes, pdf: Optional[bytes] = None) -> None:
+    for formato, dados in (("pdf", pdf), ("png", png)):
+        if dados is None:
+            continue
+        caminho = _caminho(layout, chave, formato)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        tmp = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as fh:
+                fh.write(dados)
+            os.replace(tmp, caminho)
+        except OSError:
+            # cache é opcional: sem disco, a etiqueta só é renderizada de novo
+            logger.warning("[ETIQUETA] Falha ao gravar cache %s", caminho, exc_info=True)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+
+
+# ====================================================================
+# [FIM BLOCO] gravar_etiqueta
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] limpar_cache_etiquetas
+# [RESPONSABILIDADE] Remover layouts antigos e etiquetas sem uso há mais de N dias
+# ====================================================================
+def limpar_cache_etiquetas(layout_atual: str, dias: int = ETIQUETA_CACHE_DIAS_PADRAO) -> Dict[str, int]:
+    raiz = diretorio_cache_etiquetas()
+    limite = time.time() - max(0, dias) * 86400
+    r = {"layouts_removidos": 0, "arquivos_removidos": 0, "arquivos_mantidos": 0}
+    for nome in os.listdir(raiz):
+        pasta = os.path.join(raiz, nome)
+        if not os.path.isdir(pasta):
+            continue
+        if nome != layout_atual:
+            shutil.rmtree(pasta, ignore_errors=True)
+            r["layouts_removidos"] += 1
+            continue
+        for dirpath, _, arquivos in os.walk(pasta):
+            for arq in arquivos:
+                caminho = os.path.join(dirpath, arq)
+                try:
+                    if os.path.getmtime(caminho) < limite:
+                        os.remove(caminho)
+                        r["arquivos_removidos"] += 1
+                    else:
+                        r["arquivos_mantidos"] += 1
+                except OSError:
+                    continue
+    return r
+
+
+# ====================================================================
+# [FIM BLOCO] limpar_cache_etiquetas
+# ====================================================================
+
+# ====================================================================
+# MAPA DO ARQUIVO
+# --------------------------------------------------------------------
+# BLOCO_UTIL: config_etiqueta_cache
+# FUNÇÃO: diretorio_cache_etiquetas
+# FUNÇÃO: chave_etiqueta
+# FUNÇÃO: _caminho
+# FUNÇÃO: ler_etiqueta
+# FUNÇÃO: gravar_etiqueta
+# FUNÇÃO: limpar_cache_etiquetas
+# ====================================================================
@@ -2,7 +2,8 @@ import logging
 from datetime import datetime
 
 from app import db
-from app.models.producao_models.gp_execucao import GPWorkOrder, GPWorkStage
+from app.models.producao_models.gp_execucao import GPWorkStage
+from app.services.producao.ordem_cache import ordem_por_serial
 from app.services.producao.bench_flow_service import advance_after_finish
 
 # ====================================================================
@@ -38,7 +39,7 @@ def aplicar_resultado_hipot(payload: dict) -> dict:
             "Payload inválido: é necessário 'serial' e 'status' em {APR|OK|REP}"
         )
 
-    order = GPWorkOrder.query.filter_by(serial=serial).first()
+    order = ordem_por_serial(serial)
     if not order:
         logger.error(f"[hipot_service] Série não encontrada: {serial}")
         raise ValueError(f"Série não encontrada no SGP: {serial}")
@@ -0,0 +1,364 @@
+# app/services/producao/ordem_cache.py
+"""
+Resolução serial -> GPWorkOrder com cache em dois níveis.
+
+- Requisição: mapa serial -> objeto em flask.g; o scan/HiPot/trace que resolve
+  o mesmo serial várias vezes na mesma requisição vai ao banco uma vez só.
+- Processo: LRU limitado serial -> (order_id, modelo); o acerto vira
+  session.get() (mapa de identidade da sessão ou busca pela PK).
+
+Criação, exclusão e troca de serial de uma ordem invalidam a entrada no
+commit. Entre workers a entrada é conferida na leitura: se a ordem sumiu ou
+mudou de serial, o LRU é corrigido e a busca cai no banco.
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from flask import current_app, g, has_app_context, has_request_context
+from sqlalchemy import event, inspect, select
+
+from app import db
+from app.models_sqla import GPWorkOrder
+
+# ====================================================================
+# [BLOCO] BLOCO_UTIL
+# [NOME] config_cache_ordens
+# [RESPONSABILIDADE] Parâmetros, estado do LRU e contadores do cache serial -> ordem
+# ====================================================================
+ORDEM_CACHE_MAX_PADRAO = 4096
+# Chaves em session.info com o que a transação alterou
+INFO_SERIAIS_ALTERADOS = "ordem_cache_seriais"
+INFO_LIMPAR_TUDO = "ordem_cache_limpar"
+
+_LOCK = threading.Lock()
+_lru: "OrderedDict[str, Tuple[int, str]]" = OrderedDict()
+_metricas: Dict[str, int] = {
+    "acertos_requisicao": 0,
+    "acertos_processo": 0,
+    "buscas_banco": 0,
+    "nao_encontradas": 0,
+    "invalidacoes": 0,
+}
+# ====================================================================
+# [FIM BLOCO] config_cache_ordens
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _contar
+# [RESPONSABILIDADE] Incrementar um contador de métricas do cache
+# ====================================================================
+def _contar(nome: str, n: int = 1) -> None:
+    with _LOCK:
+        _metricas[nome] += n
+
+
+# ====================================================================
+# [FIM BLOCO] _contar
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _tamanho_maximo
+# [RESPONSABILIDADE] Ler ORDEM_CACHE_MAX da configuração (padrão fora de contexto de app)
+# ====================================================================
+def _tamanho_maximo() -> int:
+    if has_app_context():
+        return int(current_app.config.get("ORDEM_CACHE_MAX", ORDEM_CACHE_MAX_PADRAO))
+    return ORDEM_CACHE_MAX_PADRAO
+
+
+# ====================================================================
+# [FIM BLOCO] _tamanho_maximo
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _mapa_requisicao
+# [RESPONSABILIDADE] Devolver o mapa serial -> ordem da requisição atual (None fora de requisição)
+# ====================================================================
+def _mapa_requisicao() -> Optional[Dict[str, GPWorkOrder]]:
+    if not has_request_context():
+        return None
+    if "ordens_por_serial" not in g:
+        g.ordens_por_serial = {}
+    return g.ordens_por_serial
+
+
+# ====================================================================
+# [FIM BLOCO] _mapa_requisicao
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _guardar
+# [RESPONSABILIDADE] Registrar serial -> (id, modelo) no LRU, descartando o menos usado
+# ====================================================================
+def _guardar(serial: str, order: GPWorkOrder) -> None:
+    limite = _tamanho_maximo()
+    if limite <= 0:
+        return
+    with _LOCK:
+        _lru[serial] = (order.id, order.modelo)
+        _lru.move_to_end(serial)
+        while len(_lru) > limite:
+            _lru.popitem(last=False)
+
+
+# ====================================================================
+# [FIM BLOCO] _guardar
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] invalidar_serial
+# [RESPONSABILIDADE] Remover seriais do LRU e do mapa da requisição
+# ====================================================================
+def invalidar_serial(*seriais: str) -> None:
+    mapa = _mapa_requisicao()
+    with _LOCK:
+        for s in seriais:
+            if _lru.pop(s, None) is not None:
+                _metricas["invalidacoes"] += 1
+    if mapa:
+        for s in seriais:
+            mapa.pop(s, None)
+
+
+# ====================================================================
+# [FIM BLOCO] invalidar_serial
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] limpar_cache_ordens
+# [RESPONSABILIDADE] Esvaziar o LRU (escrita em lote em gp_work_order)
+# ====================================================================
+def limpar_cache_ordens() -> None:
+    mapa = _mapa_requisicao()
+    with _LOCK:
+        _metricas["invalidacoes"] += len(_lru)
+        _lru.clear()
+    if mapa:
+        mapa.clear()
+
+
+# ====================================================================
+# [FIM BLOCO] limpar_cache_ordens
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] ordem_por_serial
+# [RESPONSABILIDADE] Resolver a ordem do serial: requisição -> LRU do processo -> banco
+# ====================================================================
+def ordem_por_serial(serial: str, session=None) -> Optional[GPWorkOrder]:
+    """
+    Substitui GPWorkOrder.query.filter_by(serial=...).first(). Devolve o
+    objeto da sessão (alterações nele são gravadas normalmente).
+    """
+    serial = (serial or "").strip()
+    if not serial:
+        return None
+    sess = session or db.session
+
+    mapa = _mapa_requisicao()
+    if mapa is not None:
+        order = mapa.get(serial)
+        if order is not None and order in sess and not inspect(order).deleted:
+            _contar("acertos_requisicao")
+            return order
+
+    with _LOCK:
+        entrada = _lru.get(serial)
+        if entrada is not None:
+            _lru.move_to_end(serial)
+    if entrada is not None:
+        order = sess.get(GPWorkOrder, entrada[0])
+        if order is not None and order.serial == serial:
+            _contar("acertos_processo")
+            if mapa is not None:
+                mapa[serial] = order
+            return order
+        invalidar_serial(serial)  # apagada ou renomeada por outro worker
+
+    _contar("buscas_banco")
+    order = sess.scalars(select(GPWorkOrder).where(GPWorkOrder.serial == serial)).first()
+    if order is None:
+        _contar("nao_encontradas")
+        return None
+    _guardar(serial, order)
+    if mapa is not None:
+        mapa[serial] = order
+    return order
+
+
+# ====================================================================
+# [FIM BLOCO] ordem_por_serial
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] metricas_cache_ordens
+# [RESPONSABILIDADE] Expor contadores e taxa de acerto do cache deste processo
+# ====================================================================
+def metricas_cache_ordens() -> Dict[str, object]:
+    with _LOCK:
+        m: Dict[str, object] = dict(_metricas)
+        m["tamanho"] = len(_lru)
+    m["maximo"] = _tamanho_maximo()
+    consultas = m["acertos_requisicao"] + m["acertos_processo"] + m["buscas_banco"]
+    m["consultas"] = consultas
+    m["taxa_acerto"] = (
+        round((m["acertos_requisicao"] + m["acertos_processo"]) / consultas, 4)
+        if consultas
+        else None
+    )
+    return m
+
+
+# ====================================================================
+# [FIM BLOCO] metricas_cache_ordens
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _depois_do_flush
+# [RESPONSABILIDADE] Anotar seriais de ordens criadas, apagadas ou com serial alterado
+# ====================================================================
+def _depois_do_flush(session, flush_context) -> None:
+    seriais = set()
+    for obj in session.new:
+        if isinstance(obj, GPWorkOrder) and obj.serial:
+            seriais.add(obj.serial)
+    for obj in session.deleted:
+        if isinstance(obj, GPWorkOrder) and obj.serial:
+            seriais.add(obj.serial)
+    for obj in session.dirty:
+        if isinstance(obj, GPWorkOrder):
+            hist = inspect(obj).attrs.serial.history
+            if hist.has_changes():
+                seriais.update(s for s in (hist.deleted or ()) if s)
+                seriais.update(s for s in (hist.added or ()) if s)
+    if seriais:
+        session.info.setdefault(INFO_SERIAIS_ALTERADOS, set()).update(seriais)
+        # o mapa da requisição não pode devolver a ordem antiga nem no resto da transação
+        mapa = _mapa_requisicao()
+        if mapa:
+            for s in seriais:
+                mapa.pop(s, None)
+
+
+# ====================================================================
+# [FIM BLOCO] _depois_do_flush
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _ao_executar
+# [RESPONSABILIDADE] Marcar limpeza total quando gp_work_order é gravada em lote
+# ====================================================================
+def _ao_executar(estado) -> None:
+    if estado.is_update or estado.is_delete:
+        tabela = getattr(estado.statement, "table", None)
+        if getattr(tabela, "name", None) == GPWorkOrder.__tablename__:
+            estado.session.info[INFO_LIMPAR_TUDO] = True
+
+
+# ====================================================================
+# [FIM BLOCO] _ao_executar
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _depois_do_commit
+# [RESPONSABILIDADE] Aplicar no LRU as invalidações anotadas na transação
+# ====================================================================
+def _depois_do_commit(session) -> None:
+    seriais = session.info.pop(INFO_SERIAIS_ALTERADOS, None)
+    if session.info.pop(INFO_LIMPAR_TUDO, False):
+        limpar_cache_ordens()
+    elif seriais:
+        invalidar_serial(*seriais)
+
+
+# ====================================================================
+# [FIM BLOCO] _depois_do_commit
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _descartar_pendencias
+# [RESPONSABILIDADE] Desfazer anotações e entradas da transação desfeita
+# ====================================================================
+def _descartar_pendencias(session, previous_transaction) -> None:
+    if previous_transaction.parent is not None:
+        # savepoint: as anotações da transação externa seguem valendo até o commit
+        seriais = session.info.get(INFO_SERIAIS_ALTERADOS)
+    else:
+        seriais = session.info.pop(INFO_SERIAIS_ALTERADOS, None)
+        session.info.pop(INFO_LIMPAR_TUDO, None)
+    if seriais:
+        # uma ordem criada e desfeita pode ter entrado no LRU durante a transação
+        invalidar_serial(*seriais)
+
+
+# ====================================================================
+# [FIM BLOCO] _descartar_pendencias
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] registrar_cache_ordens
+# [RESPONSABILIDADE] Ligar os eventos de sessão que invalidam o cache (idempotente)
+# ====================================================================
+def registrar_cache_ordens() -> None:
+    alvo = db.session
+    for nome, fn in (
+        ("after_flush", _depois_do_flush),
+        ("do_orm_execute", _ao_executar),
+        ("after_commit", _depois_do_commit),
+        ("after_soft_rollback", _descartar_pendencias),
+    ):
+        if not event.contains(alvo, nome, fn):
+            event.listen(alvo, nome, fn)
+
+
+# ====================================================================
+# [FIM BLOCO] registrar_cache_ordens
+# ====================================================================
+
+# ====================================================================
+# MAPA DO ARQUIVO
+# --------------------------------------------------------------------
+# BLOCO_UTIL: config_cache_ordens
+# FUNÇÃO: _contar
+# FUNÇÃO: _tamanho_maximo
+# FUNÇÃO: _mapa_requisicao
+# FUNÇÃO: _guardar
+# FUNÇÃO: invalidar_serial
+# FUNÇÃO: limpar_cache_ordens
+# BLOCO_DB: ordem_por_serial
+# FUNÇÃO: metricas_cache_ordens
+# FUNÇÃO: _depois_do_flush
+# FUNÇÃO: _ao_executar
+# FUNÇÃO: _depois_do_commit
+# FUNÇÃO: _descartar_pendencias
+# FUNÇÃO: registrar_cache_ordens
+# ====================================================================
@@ -1,9 +1,18 @@
 # app/services/serials.py
 from __future__ import annotations
-from datetime import datetime
+import os
+import threading
+from datetime import date, datetime, time, timedelta
 from pathlib import Path
 from typing import Dict, List
 
+from flask import current_app, has_app_context
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models_sqla import SerialAuditoria, SerialContador
+
 # ====================================================================
 # [BLOCO] BLOCO_UTIL
 # [NOME] MODEL_CODE
@@ -26,7 +35,7 @@ MODEL_CODE: Dict[str, str] = {
 # [NOME] LOG_DIR
 # [RESPONSABILIDADE] Definir e garantir diretório para logs do gerador de seriais
 # ====================================================================
-# Pasta dos logs + arquivo do contador global
+# Pasta dos logs (arquivos legados: contador e serials_YYYY.txt)
 LOG_DIR = Path("logs")
 LOG_DIR.mkdir(parents=True, exist_ok=True)
 # ====================================================================
@@ -36,13 +45,41 @@ LOG_DIR.mkdir(parents=True, exist_ok=True)
 # ====================================================================
 # [BLOCO] BLOCO_UTIL
 # [NOME] COUNTER_FILE
-# [RESPONSABILIDADE] Definir arquivo persistente do contador global de números de série
+# [RESPONSABILIDADE] Definir arquivo do contador legado (migrado para serial_contadores)
 # ====================================================================
-COUNTER_FILE = LOG_DIR / "serial_counter.txt"  # contador GLOBAL e persistente
+# contador legado: só é lido para semear serial_contadores (a fonte agora é o banco)
+COUNTER_FILE = LOG_DIR / "serial_counter.txt"
 # ====================================================================
 # [FIM BLOCO] COUNTER_FILE
 # ====================================================================
 
+# ====================================================================
+# [BLOCO] BLOCO_UTIL
+# [NOME] bloco_do_worker
+# [RESPONSABILIDADE] Guardar a faixa de números reservada por este processo (hi/lo)
+# ====================================================================
+CONTADOR_GLOBAL = "global"
+SERIAL_BLOCO_PADRAO = 10
+
+# faixa [proximo, limite] já reservada no banco e ainda não entregue
+_bloco = {"pid": None, "proximo": 1, "limite": 0}
+_lock_bloco = threading.Lock()
+# ====================================================================
+# [FIM BLOCO] bloco_do_worker
+# ====================================================================
+
+# ====================================================================
+# [BLOCO] BLOCO_UTIL
+# [NOME] auditoria_config
+# [RESPONSABILIDADE] Limites da consulta e do import da auditoria de seriais
+# ====================================================================
+AUDITORIA_LIMITE_PADRAO = 100
+AUDITORIA_LIMITE_MAX = 1000
+AUDITORIA_LOTE_IMPORTACAO = 1000
+# ====================================================================
+# [FIM BLOCO] auditoria_config
+# ====================================================================
+
 # --- Helpers --------------------------------------------------------------
 
 
@@ -96,7 +133,7 @@ def _model_code(modelo: str) -> str:
 # ====================================================================
 # [BLOCO] FUNÇÃO
 # [NOME] _load_global_counter
-# [RESPONSABILIDADE] Carregar contador global persistente a partir do arquivo de contador
+# [RESPONSABILIDADE] Ler o contador legado do arquivo (semente de serial_contadores)
 # ====================================================================
 def _load_global_counter() -> int:
     if not COUNTER_FILE.exists():
@@ -115,47 +152,112 @@ def _load_global_counter() -> int:
 
 # ====================================================================
 # [BLOCO] FUNÇÃO
-# [NOME] _save_global_counter
-# [RESPONSABILIDADE] Persistir o valor atualizado do contador global no arquivo de contador
+# [NOME] _tamanho_bloco
+# [RESPONSABILIDADE] Ler SERIAL_BLOCO da configuração (padrão fora de contexto de app)
 # ====================================================================
-def _save_global_counter(value: int) -> None:
-    COUNTER_FILE.write_text(str(value), encoding="utf-8")
+def _tamanho_bloco() -> int:
+    if has_app_context():
+        return max(1, int(current_app.config.get("SERIAL_BLOCO", SERIAL_BLOCO_PADRAO)))
+    return SERIAL_BLOCO_PADRAO
 
 
 # ====================================================================
-# [FIM BLOCO] _save_global_counter
+# [FIM BLOCO] _tamanho_bloco
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] _reservar_no_banco
+# [RESPONSABILIDADE] Avançar o contador global em 'qtd' numa transação própria e devolver o novo topo
+# ====================================================================
+def _reservar_no_banco(qtd: int) -> int:
+    """
+    UPDATE valor = valor + qtd: a trava de linha (escrita, no SQLite) serializa
+    os workers, então cada um recebe uma faixa exclusiva. Conexão própria,
+    com commit imediato: a faixa não volta se a montagem for desfeita
+    (buraco na numeração, nunca serial repetido).
+    """
+    tabela = SerialContador.__table__
+    filtro = tabela.c.nome == CONTADOR_GLOBAL
+    for _ in range(2):
+        with db.engine.begin() as conn:
+            stmt = update(tabela).where(filtro).values(
+                valor=tabela.c.valor + qtd, atualizado_em=datetime.utcnow()
+            )
+            if conn.dialect.update_returning:
+                topo = conn.execute(stmt.returning(tabela.c.valor)).scalar()
+            elif conn.execute(stmt).rowcount:
+                topo = conn.execute(select(tabela.c.valor).where(filtro)).scalar()
+            else:
+                topo = None
+        if topo is not None:
+            return int(topo)
+
+        # primeira reserva sem migração: semeia com o valor do arquivo legado
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(
+                    insert(tabela).values(
+                        nome=CONTADOR_GLOBAL,
+                        valor=_load_global_counter(),
+                        atualizado_em=datetime.utcnow(),
+                    )
+                )
+        except IntegrityError:
+            pass  # outro worker semeou primeiro
+    raise RuntimeError("Contador de seriais indisponível (serial_contadores)")
+
+
+# ====================================================================
+# [FIM BLOCO] _reservar_no_banco
 # ====================================================================
 
 
 # ====================================================================
 # [BLOCO] FUNÇÃO
-# [NOME] _audit_log_path
-# [RESPONSABILIDADE] Determinar caminho do arquivo de auditoria anual para geração de seriais
+# [NOME] _alocar_faixa
+# [RESPONSABILIDADE] Entregar 'qtd' números consecutivos do bloco do worker, reservando outro se faltar
 # ====================================================================
-def _audit_log_path(dt: datetime) -> Path:
-    # um arquivo por ano para auditoria
-    return LOG_DIR / f"serials_{dt.year}.txt"
+def _alocar_faixa(qtd: int) -> int:
+    """
+    Retorna o primeiro número da faixa. Um lote sempre sai contíguo:
+    - lote >= SERIAL_BLOCO: faixa exata só para ele (o bloco atual fica);
+    - senão, se a sobra do bloco não cobre o lote, ela é descartada e um
+      bloco novo é reservado.
+    """
+    tamanho = _tamanho_bloco()
+    with _lock_bloco:
+        # após fork (gunicorn --preload) cada worker precisa do próprio bloco
+        if _bloco["pid"] != os.getpid():
+            _bloco.update(pid=os.getpid(), proximo=1, limite=0)
+        if _bloco["limite"] - _bloco["proximo"] + 1 < qtd:
+            if qtd >= tamanho:
+                return _reservar_no_banco(qtd) - qtd + 1
+            topo = _reservar_no_banco(tamanho)
+            _bloco.update(proximo=topo - tamanho + 1, limite=topo)
+        inicio = _bloco["proximo"]
+        _bloco["proximo"] += qtd
+    return inicio
 
 
 # ====================================================================
-# [FIM BLOCO] _audit_log_path
+# [FIM BLOCO] _alocar_faixa
 # ====================================================================
 
 
 # ====================================================================
-# [BLOCO] FUNÇÃO
-# [NOME] _append_audit
-# [RESPONSABILIDADE] Registrar linhas de auditoria no arquivo anual de seriais (append-only)
+# [BLOCO] BLOCO_DB
+# [NOME] _registrar_auditoria
+# [RESPONSABILIDADE] Inserir linhas de auditoria em lote (executemany) na transação de quem chama
 # ====================================================================
-def _append_audit(lines: List[str], dt: datetime) -> None:
-    p = _audit_log_path(dt)
-    with p.open("a", encoding="utf-8") as f:
-        for line in lines:
-            f.write(line + "\n")
+def _registrar_auditoria(linhas: List[Dict], session=None) -> None:
+    if linhas:
+        (session or db.session).execute(insert(SerialAuditoria), linhas)
 
 
 # ====================================================================
-# [FIM BLOCO] _append_audit
+# [FIM BLOCO] _registrar_auditoria
 # ====================================================================
 
 # --- API pública ----------------------------------------------------------
@@ -167,7 +269,11 @@ def _append_audit(lines: List[str], dt: datetime) -> None:
 # [RESPONSABILIDADE] Gerar lista de números de série com contador global persistente e registrar auditoria
 # ====================================================================
 def generate_serials(
-    modelo: str, qty: int, usuario: str = "Operador", now: datetime | None = None
+    modelo: str,
+    qty: int,
+    usuario: str = "Operador",
+    now: datetime | None = None,
+    session=None,
 ) -> List[str]:
     """
     Gera números de série no formato: A + M + C(modelo) + SSS
@@ -176,8 +282,13 @@ def generate_serials(
       - M: mês (1..12, sem zero à esquerda)
       - C(modelo): conforme MODEL_CODE
       - SSS: sequencial GLOBAL (mínimo 3 dígitos com zero-pad). NÃO reseta.
+        Vem de serial_contadores em blocos por worker: único entre processos,
+        mas sem garantia de ordem cronológica entre workers diferentes.
 
-    Também registra auditoria em logs/serials_YYYY.txt (append-only).
+    Também registra auditoria em serial_auditoria, na sessão informada (padrão
+    db.session) e sem commit: o commit da montagem grava as duas coisas.
+    No SQLite, chamar antes de gravar na sessão: a reserva de bloco usa outra
+    conexão e esperaria pela trava de escrita da própria transação.
 
     Retorna: lista de strings de tamanho 'qty'
     """
@@ -189,23 +300,22 @@ def generate_serials(
     M = _month_no_leading_zero(dt)
     C = _model_code(modelo)
 
-    # contador GLOBAL persistente
-    counter = _load_global_counter()
-
-    serials: List[str] = []
-    for _ in range(qty):
-        counter += 1
-        serials.append(
-            f"{A}{M}{C}{counter:03d}"
-        )  # >=1000 vira 1000, 1001... normalmente
+    # contador GLOBAL persistente (faixa contígua do bloco deste worker)
+    inicio = _alocar_faixa(qty)
 
-    # Salva novo valor do contador
-    _save_global_counter(counter)
+    serials: List[str] = [
+        f"{A}{M}{C}{n:03d}"  # >=1000 vira 1000, 1001... normalmente
+        for n in range(inicio, inicio + qty)
+    ]
 
-    # Auditoria paralela (uma linha por série)
-    stamp = dt.strftime("%Y-%m-%d %H:%M:%S")
-    lines = [f"{stamp};{modelo};{s};usr={usuario}" for s in serials]
-    _append_audit(lines, dt)
+    # Auditoria (uma linha por série; hora local, como nos arquivos antigos).
+    # Objetos pendentes: o flush do commit da montagem insere todos em lote.
+    (session or db.session).add_all(
+        SerialAuditoria(
+            serial=s, modelo=modelo, usuario=usuario, emitido_em=dt, origem="gerador"
+        )
+        for s in serials
+    )
 
     return serials
 
@@ -214,18 +324,161 @@ def generate_serials(
 # [FIM BLOCO] generate_serials
 # ====================================================================
 
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] consultar_auditoria
+# [RESPONSABILIDADE] Listar emissões de serial filtradas, mais recentes primeiro (paginação por cursor)
+# ====================================================================
+def consultar_auditoria(
+    serial: str | None = None,
+    modelo: str | None = None,
+    usuario: str | None = None,
+    inicio: date | None = None,
+    fim: date | None = None,
+    limite: int = AUDITORIA_LIMITE_PADRAO,
+    cursor: str | None = None,
+) -> Dict:
+    """
+    Filtros exatos (serial, modelo, usuario) e período [inicio, fim] em dias.
+    'cursor' é o 'proximo' da página anterior ("<emitido_em ISO>|<id>").
+    Levanta ValueError para cursor inválido.
+    """
+    T = SerialAuditoria
+    limite = max(1, min(int(limite or AUDITORIA_LIMITE_PADRAO), AUDITORIA_LIMITE_MAX))
+    q = db.session.query(T)
+    if serial:
+        q = q.filter(T.serial == serial)
+    if modelo:
+        q = q.filter(T.modelo == modelo)
+    if usuario:
+        q = q.filter(T.usuario == usuario)
+    if inicio:
+        q = q.filter(T.emitido_em >= datetime.combine(inicio, time.min))
+    if fim:
+        q = q.filter(T.emitido_em < datetime.combine(fim + timedelta(days=1), time.min))
+    if cursor:
+        try:
+            marca, ultimo_id = cursor.rsplit("|", 1)
+            marca, ultimo_id = datetime.fromisoformat(marca), int(ultimo_id)
+        except ValueError:
+            raise ValueError("Cursor inválido.")
+        q = q.filter(
+            or_(T.emitido_em < marca, and_(T.emitido_em == marca, T.id < ultimo_id))
+        )
+
+    linhas = q.order_by(T.emitido_em.desc(), T.id.desc()).limit(limite + 1).all()
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo = f"{linhas[-1].emitido_em.isoformat()}|{linhas[-1].id}"
+    itens = [
+        ln.as_dict() | {"emitido_em": ln.emitido_em.strftime("%Y-%m-%d %H:%M:%S")}
+        for ln in linhas
+    ]
+    return {"itens": itens, "proximo": proximo}
+
+
+# ====================================================================
+# [FIM BLOCO] consultar_auditoria
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _ler_linha_legada
+# [RESPONSABILIDADE] Interpretar uma linha de logs/serials_YYYY.txt ("data;modelo;serial;usr=...")
+# ====================================================================
+def _ler_linha_legada(linha: str) -> Dict | None:
+    partes = linha.strip().split(";", 3)
+    if len(partes) < 3 or not partes[2].strip():
+        return None
+    try:
+        emitido_em = datetime.strptime(partes[0].strip(), "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None
+    usuario = partes[3].strip() if len(partes) > 3 else ""
+    if usuario.startswith("usr="):
+        usuario = usuario[4:]
+    return {
+        "serial": partes[2].strip(),
+        "modelo": partes[1].strip(),
+        "usuario": usuario or None,
+        "emitido_em": emitido_em,
+        "origem": "arquivo",
+    }
+
+
+# ====================================================================
+# [FIM BLOCO] _ler_linha_legada
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] importar_auditoria_arquivos
+# [RESPONSABILIDADE] Carregar os arquivos anuais antigos em serial_auditoria (idempotente)
+# ====================================================================
+def importar_auditoria_arquivos(pasta: Path | None = None, session=None) -> Dict[str, int]:
+    """
+    Lê <pasta>/serials_*.txt (padrão: logs/). Linhas já importadas (mesmo
+    serial e data/hora) são puladas, então rodar de novo não duplica.
+    Não faz commit.
+    """
+    sess = session or db.session
+    T = SerialAuditoria
+    existentes = set(
+        sess.query(T.serial, T.emitido_em).filter(T.origem == "arquivo").all()
+    )
+    resumo = {"arquivos": 0, "importadas": 0, "existentes": 0, "invalidas": 0}
+    lote: List[Dict] = []
+    for arquivo in sorted(Path(pasta or LOG_DIR).glob("serials_*.txt")):
+        resumo["arquivos"] += 1
+        with arquivo.open(encoding="utf-8", errors="replace") as f:
+            for linha in f:
+                if not linha.strip():
+                    continue
+                registro = _ler_linha_legada(linha)
+                if registro is None:
+                    resumo["invalidas"] += 1
+                    continue
+                chave = (registro["serial"], registro["emitido_em"])
+                if chave in existentes:
+                    resumo["existentes"] += 1
+                    continue
+                existentes.add(chave)
+                lote.append(registro)
+                if len(lote) >= AUDITORIA_LOTE_IMPORTACAO:
+                    _registrar_auditoria(lote, sess)
+                    resumo["importadas"] += len(lote)
+                    lote = []
+    _registrar_auditoria(lote, sess)
+    resumo["importadas"] += len(lote)
+    return resumo
+
+
+# ====================================================================
+# [FIM BLOCO] importar_auditoria_arquivos
+# ====================================================================
+
 # ====================================================================
 # MAPA DO ARQUIVO
 # --------------------------------------------------------------------
 # BLOCO_UTIL: MODEL_CODE
 # BLOCO_UTIL: LOG_DIR
 # BLOCO_UTIL: COUNTER_FILE
+# BLOCO_UTIL: bloco_do_worker
+# BLOCO_UTIL: auditoria_config
 # FUNÇÃO: _year_last_digit
 # FUNÇÃO: _month_no_leading_zero
 # FUNÇÃO: _model_code
 # FUNÇÃO: _load_global_counter
-# FUNÇÃO: _save_global_counter
-# FUNÇÃO: _audit_log_path
-# FUNÇÃO: _append_audit
+# FUNÇÃO: _tamanho_bloco
+# BLOCO_DB: _reservar_no_banco
+# FUNÇÃO: _alocar_faixa
+# BLOCO_DB: _registrar_auditoria
 # FUNÇÃO: generate_serials
+# BLOCO_DB: consultar_auditoria
+# FUNÇÃO: _ler_linha_legada
+# BLOCO_DB: importar_auditoria_arquivos
 # ====================================================================
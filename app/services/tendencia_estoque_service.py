@@ -0,0 +1,560 @@
+# app/services/tendencia_estoque_service.py
+"""
+Tendência, cobertura e giro de estoque em intervalos arbitrários.
+
+- estoque_diario guarda só as mudanças; aqui vira uma matriz densa
+  dia × peça (pivot + ffill), semeada pela última linha antes do início;
+- consumo (reservas − estornos) vem do livro-razão já somado no banco: por
+  peça para as métricas, por peça e dia só quando há séries;
+- as métricas são calculadas por coluna com NumPy (sem laço por peça).
+"""
+from __future__ import annotations
+
+import logging
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import String, and_, case, func, select, type_coerce
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models_sqla import EstoqueDiario, MovimentacaoEstoque, Peca
+from app.services.montagem.bom_service import listar_bom
+from app.services.montagem.capacidade_service import to_codigo_maquina
+from app.services.movimentacao_service import TIPOS_CONSUMO
+
+# ====================================================================
+# [BLOCO] CONFIG_LOGGER
+# [NOME] logger
+# [RESPONSABILIDADE] Inicializar logger do módulo de tendências de estoque
+# ====================================================================
+logger = logging.getLogger(__name__)
+# ====================================================================
+# [FIM BLOCO] logger
+# ====================================================================
+
+# ====================================================================
+# [BLOCO] BLOCO_UTIL
+# [NOME] config_tendencias
+# [RESPONSABILIDADE] Parâmetros padrão (janela de consumo, agrupamento das séries)
+# ====================================================================
+# Dias de consumo médio usados na cobertura ("dura quantos dias no ritmo recente")
+JANELA_PADRAO = 30
+# Agrupamento das séries: regra de resample do pandas (rótulo = início do período)
+AGRUPAMENTOS = {"dia": "D", "semana": "W-MON", "mes": "MS"}
+# Acima disso as séries por peça só saem se pedidas explicitamente
+SERIE_MAX_PECAS = 50
+# ====================================================================
+# [FIM BLOCO] config_tendencias
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_UTIL
+# [NOME] __all__
+# [RESPONSABILIDADE] Definir API pública do módulo (exports)
+# ====================================================================
+__all__ = [
+    "JANELA_PADRAO",
+    "AGRUPAMENTOS",
+    "agrupamento_padrao",
+    "tendencias_estoque",
+    "tendencias_modelo",
+]
+# ====================================================================
+# [FIM BLOCO] __all__
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _num
+# [RESPONSABILIDADE] Converter número NumPy em float/int JSON (NaN/inf viram None)
+# ====================================================================
+def _num(valor, casas: int = 2):
+    if valor is None:
+        return None
+    v = float(valor)
+    if not np.isfinite(v):
+        return None
+    return int(v) if casas == 0 else round(v, casas)
+
+
+# ====================================================================
+# [FIM BLOCO] _num
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] agrupamento_padrao
+# [RESPONSABILIDADE] Escolher dia/semana/mês conforme o tamanho do intervalo
+# ====================================================================
+def agrupamento_padrao(inicio: date, fim: date) -> str:
+    dias = (fim - inicio).days + 1
+    if dias <= 120:
+        return "dia"
+    if dias <= 730:
+        return "semana"
+    return "mes"
+
+
+# ====================================================================
+# [FIM BLOCO] agrupamento_padrao
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] _matriz_estoque
+# [RESPONSABILIDADE] Montar matriz densa dia × peça a partir das linhas só-mudança de estoque_diario
+# ====================================================================
+def _matriz_estoque(
+    sess: Session,
+    peca_ids: Optional[Sequence[int]],
+    dias: pd.DatetimeIndex,
+) -> pd.DataFrame:
+    inicio, fim = dias[0].date(), dias[-1].date()
+
+    # semente: última linha de cada peça até o início (vale no primeiro dia)
+    ultima = select(
+        EstoqueDiario.peca_id, func.max(EstoqueDiario.dia).label("dia")
+    ).where(EstoqueDiario.dia <= inicio)
+    if peca_ids is not None:
+        ultima = ultima.where(EstoqueDiario.peca_id.in_(peca_ids))
+    ultima = ultima.group_by(EstoqueDiario.peca_id).subquery()
+    semente = sess.execute(
+        select(EstoqueDiario.peca_id, EstoqueDiario.estoque).join(
+            ultima,
+            and_(
+                EstoqueDiario.peca_id == ultima.c.peca_id,
+                EstoqueDiario.dia == ultima.c.dia,
+            ),
+        )
+    ).all()
+
+    # dia sem conversão por linha (texto ISO ou date, conforme o banco):
+    # o pandas converte a coluna inteira de uma vez
+    q = select(
+        EstoqueDiario.peca_id,
+        type_coerce(EstoqueDiario.dia, String),
+        EstoqueDiario.estoque,
+    ).where(EstoqueDiario.dia > inicio, EstoqueDiario.dia <= fim)
+    if peca_ids is not None:
+        q = q.where(EstoqueDiario.peca_id.in_(peca_ids))
+    mudancas = sess.connection().execute(q).fetchall()
+
+    linhas = pd.DataFrame(
+        [(pid, inicio.isoformat(), est) for pid, est in semente] + mudancas,
+        columns=["peca_id", "dia", "estoque"],
+    )
+    colunas = list(peca_ids) if peca_ids is not None else sorted(set(linhas["peca_id"]))
+    if linhas.empty:
+        return pd.DataFrame(np.nan, index=dias, columns=colunas, dtype=float)
+
+    linhas["dia"] = pd.to_datetime(linhas["dia"].astype(str), format="%Y-%m-%d")
+    matriz = linhas.pivot(index="dia", columns="peca_id", values="estoque")
+    return matriz.reindex(index=dias, columns=colunas).ffill().astype(float)
+
+
+# ====================================================================
+# [FIM BLOCO] _matriz_estoque
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] _consumo_totais
+# [RESPONSABILIDADE] Somar no banco o consumo do período e o das últimas `janela` datas, por peça
+# ====================================================================
+def _consumo_totais(
+    sess: Session,
+    colunas: Sequence[int],
+    dias: pd.DatetimeIndex,
+    janela: int,
+    filtrar: bool,
+):
+    """Métricas não precisam do consumo dia a dia: uma linha por peça basta."""
+    corte = dias[max(0, len(dias) - janela)].to_pydatetime()
+    qtd = MovimentacaoEstoque.quantidade
+    q = (
+        select(
+            MovimentacaoEstoque.peca_id,
+            -func.sum(qtd),
+            -func.sum(case((MovimentacaoEstoque.criado_em >= corte, qtd), else_=0)),
+        )
+        .where(
+            MovimentacaoEstoque.tipo_mov.in_(TIPOS_CONSUMO),
+            MovimentacaoEstoque.criado_em >= dias[0].to_pydatetime(),
+            MovimentacaoEstoque.criado_em < (dias[-1] + pd.Timedelta(days=1)).to_pydatetime(),
+        )
+        .group_by(MovimentacaoEstoque.peca_id)
+    )
+    if filtrar:
+        q = q.where(MovimentacaoEstoque.peca_id.in_(list(colunas)))
+    somas = {pid: (total, recente) for pid, total, recente in sess.execute(q)}
+    total = np.array([float(somas.get(p, (0, 0))[0] or 0) for p in colunas])
+    recente = np.array([float(somas.get(p, (0, 0))[1] or 0) for p in colunas])
+    return total, recente / min(janela, len(dias))
+
+
+# ====================================================================
+# [FIM BLOCO] _consumo_totais
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] _matriz_consumo
+# [RESPONSABILIDADE] Somar consumo líquido por peça e dia no livro-razão (só para as séries)
+# ====================================================================
+def _matriz_consumo(
+    sess: Session,
+    colunas: Sequence[int],
+    dias: pd.DatetimeIndex,
+    filtrar: bool,
+) -> pd.DataFrame:
+    dia = func.date(MovimentacaoEstoque.criado_em)
+    q = (
+        select(
+            MovimentacaoEstoque.peca_id,
+            dia,
+            -func.sum(MovimentacaoEstoque.quantidade),
+        )
+        .where(
+            MovimentacaoEstoque.tipo_mov.in_(TIPOS_CONSUMO),
+            MovimentacaoEstoque.criado_em >= dias[0].to_pydatetime(),
+            MovimentacaoEstoque.criado_em < (dias[-1] + pd.Timedelta(days=1)).to_pydatetime(),
+        )
+        .group_by(MovimentacaoEstoque.peca_id, dia)
+    )
+    if filtrar:
+        q = q.where(MovimentacaoEstoque.peca_id.in_(list(colunas)))
+    linhas = pd.DataFrame(sess.execute(q).all(), columns=["peca_id", "dia", "consumo"])
+    if linhas.empty:
+        return pd.DataFrame(0.0, index=dias, columns=list(colunas))
+
+    linhas["dia"] = pd.to_datetime(linhas["dia"])
+    matriz = linhas.pivot_table(
+        index="dia", columns="peca_id", values="consumo", aggfunc="sum"
+    )
+    return matriz.reindex(index=dias, columns=list(colunas)).fillna(0.0).astype(float)
+
+
+# ====================================================================
+# [FIM BLOCO] _matriz_consumo
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _metricas
+# [RESPONSABILIDADE] Calcular métricas por coluna (saldo, consumo, giro, cobertura, tendência) de uma vez
+# ====================================================================
+def _metricas(
+    E: np.ndarray, consumo_total: np.ndarray, consumo_recente: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """
+    E: matriz dias × peças (NaN antes do 1º registro); consumos: um valor por peça.
+    - giro = consumo do período / estoque médio
+    - cobertura = estoque final / consumo médio diário recente (janela)
+    - tendencia_dia = inclinação (mínimos quadrados) do estoque, em unidades/dia
+    """
+    n_dias = E.shape[0]
+    valido = ~np.isnan(E)
+    qtd = valido.sum(axis=0)
+    com_dados = qtd > 0
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        medio = np.where(com_dados, np.nansum(E, axis=0) / np.maximum(qtd, 1), np.nan)
+        giro = np.where(medio > 0, consumo_total / medio, np.nan)
+        cobertura = np.where(consumo_recente > 0, E[-1] / consumo_recente, np.inf)
+
+        x = np.arange(n_dias, dtype=float)[:, None]
+        x_medio = (x * valido).sum(axis=0) / np.maximum(qtd, 1)
+        dx = (x - x_medio) * valido
+        dy = np.where(valido, E - medio, 0.0)
+        variancia = (dx * dx).sum(axis=0)
+        tendencia = np.where(variancia > 0, (dx * dy).sum(axis=0) / variancia, 0.0)
+
+    primeiro = np.where(com_dados, E[np.argmax(valido, axis=0), np.arange(E.shape[1])], np.nan)
+    return {
+        "estoque_inicial": primeiro,
+        "estoque_final": E[-1],
+        "estoque_minimo": np.where(com_dados, np.where(valido, E, np.inf).min(axis=0, initial=np.inf), np.nan),
+        "estoque_maximo": np.where(com_dados, np.where(valido, E, -np.inf).max(axis=0, initial=-np.inf), np.nan),
+        "estoque_medio": medio,
+        "dias_sem_estoque": ((E <= 0) & valido).sum(axis=0),
+        "consumo_total": consumo_total,
+        "consumo_medio_dia": consumo_total / n_dias,
+        "giro": giro,
+        "giro_anual": giro * (365.0 / n_dias),
+        "dias_cobertura": np.where(com_dados, cobertura, np.nan),
+        "tendencia_dia": np.where(com_dados, tendencia, np.nan),
+    }
+
+
+# ====================================================================
+# [FIM BLOCO] _metricas
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _series
+# [RESPONSABILIDADE] Reamostrar estoque/consumo/cobertura por dia, semana ou mês para cada peça
+# ====================================================================
+def _series(
+    estoque: pd.DataFrame, consumo: pd.DataFrame, janela: int, agrupar: str
+) -> Dict[int, List[Dict]]:
+    ritmo = consumo.rolling(janela, min_periods=1).mean()
+    cobertura = (estoque / ritmo.where(ritmo > 0)).round(1)
+    regra = AGRUPAMENTOS[agrupar]
+    if agrupar != "dia":
+        estoque = estoque.resample(regra, label="left", closed="left").last()
+        consumo = consumo.resample(regra, label="left", closed="left").sum()
+        cobertura = cobertura.resample(regra, label="left", closed="left").last()
+
+    rotulos = [d.date().isoformat() for d in estoque.index]
+    saida: Dict[int, List[Dict]] = {}
+    for pid in estoque.columns:
+        e, c, cob = estoque[pid].to_numpy(), consumo[pid].to_numpy(), cobertura[pid].to_numpy()
+        saida[pid] = [
+            {
+                "dia": rotulos[i],
+                "estoque": _num(e[i], 0),
+                "consumo": _num(c[i], 0),
+                "cobertura_dias": _num(cob[i], 1),
+            }
+            for i in range(len(rotulos))
+        ]
+    return saida
+
+
+# ====================================================================
+# [FIM BLOCO] _series
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _intervalo
+# [RESPONSABILIDADE] Validar datas e montar o índice diário do período
+# ====================================================================
+def _intervalo(inicio: date, fim: date) -> pd.DatetimeIndex:
+    if fim < inicio:
+        raise ValueError("'fim' anterior a 'inicio'.")
+    return pd.date_range(inicio, fim, freq="D")
+
+
+# ====================================================================
+# [FIM BLOCO] _intervalo
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] tendencias_estoque
+# [RESPONSABILIDADE] Retornar métricas (e séries opcionais) de estoque por peça em um intervalo
+# ====================================================================
+def tendencias_estoque(
+    inicio: date,
+    fim: date,
+    peca_ids: Optional[Sequence[int]] = None,
+    janela: int = JANELA_PADRAO,
+    agrupar: Optional[str] = None,
+    com_serie: Optional[bool] = None,
+    session: Optional[Session] = None,
+) -> Dict:
+    """
+    peca_ids=None: todas as peças com histórico (só métricas, salvo com_serie=True).
+    Retorna {"inicio", "fim", "dias", "janela", "agrupar", "pecas": [...]},
+    cada peça com código, descrição, métricas e, se pedido, "serie".
+    """
+    resultado, _ = _tendencias(
+        session or db.session, inicio, fim, peca_ids, janela, agrupar, com_serie
+    )
+    return resultado
+
+
+# ====================================================================
+# [FIM BLOCO] tendencias_estoque
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _tendencias
+# [RESPONSABILIDADE] Calcular o resultado por peça e devolver também a matriz de estoque usada
+# ====================================================================
+def _tendencias(
+    sess: Session,
+    inicio: date,
+    fim: date,
+    peca_ids: Optional[Sequence[int]],
+    janela: int,
+    agrupar: Optional[str],
+    com_serie: Optional[bool],
+):
+    dias = _intervalo(inicio, fim)
+    janela = max(1, int(janela or JANELA_PADRAO))
+    agrupar = agrupar or agrupamento_padrao(inicio, fim)
+    if agrupar not in AGRUPAMENTOS:
+        raise ValueError(f"agrupar deve ser um de {sorted(AGRUPAMENTOS)}.")
+
+    ids = list(dict.fromkeys(int(i) for i in peca_ids)) if peca_ids is not None else None
+    estoque = _matriz_estoque(sess, ids, dias)
+    colunas = list(estoque.columns)
+    total, recente = _consumo_totais(sess, colunas, dias, janela, filtrar=ids is not None)
+    metricas = _metricas(estoque.to_numpy(), total, recente)
+
+    if com_serie is None:
+        com_serie = len(colunas) <= SERIE_MAX_PECAS
+    series = {}
+    if com_serie:
+        consumo = _matriz_consumo(sess, colunas, dias, filtrar=ids is not None)
+        series = _series(estoque, consumo, janela, agrupar)
+
+    info = {}
+    for i in range(0, len(colunas), 500):
+        lote = colunas[i : i + 500]
+        info.update(
+            {
+                r.id: r
+                for r in sess.execute(
+                    select(Peca.id, Peca.codigo_pneumark, Peca.descricao).where(Peca.id.in_(lote))
+                )
+            }
+        )
+
+    casas = dict.fromkeys(
+        ("estoque_inicial", "estoque_final", "estoque_minimo", "estoque_maximo", "dias_sem_estoque"), 0
+    )
+    pecas = []
+    for j, pid in enumerate(colunas):
+        p = info.get(pid)
+        item = {
+            "peca_id": int(pid),
+            "codigo": p.codigo_pneumark if p else None,
+            "descricao": p.descricao if p else None,
+        }
+        item.update({k: _num(v[j], casas.get(k, 2)) for k, v in metricas.items()})
+        if com_serie:
+            item["serie"] = series.get(pid, [])
+        pecas.append(item)
+    pecas.sort(key=lambda x: (x["codigo"] is None, x["codigo"] or ""))
+
+    resultado = {
+        "inicio": inicio.isoformat(),
+        "fim": fim.isoformat(),
+        "dias": len(dias),
+        "janela": janela,
+        "agrupar": agrupar,
+        "pecas": pecas,
+    }
+    return resultado, estoque
+
+
+# ====================================================================
+# [FIM BLOCO] _tendencias
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] tendencias_modelo
+# [RESPONSABILIDADE] Agregar tendências das peças da BOM de um modelo (capacidade de montagem no tempo)
+# ====================================================================
+def tendencias_modelo(
+    modelo: str,
+    inicio: date,
+    fim: date,
+    janela: int = JANELA_PADRAO,
+    agrupar: Optional[str] = None,
+    explodir: bool = True,
+    com_serie: Optional[bool] = None,
+    session: Optional[Session] = None,
+) -> Dict:
+    """
+    Aceita nome do modelo (PM2100) ou código do conjunto (7-000).
+    Além das métricas por peça, devolve a capacidade (máquinas montáveis só
+    com o estoque) dia a dia: min(estoque // qtd_por_unidade) entre as peças.
+    Levanta LookupError se o modelo não tiver estrutura.
+    """
+    sess = session or db.session
+    codigo = to_codigo_maquina(modelo) or (modelo or "").strip()
+    bom = dict(listar_bom(codigo, explodir=explodir))
+    if not bom:
+        raise LookupError(f"Modelo sem estrutura: {modelo}")
+
+    por_codigo = {
+        c: pid
+        for pid, c in sess.execute(
+            select(Peca.id, Peca.codigo_pneumark).where(Peca.codigo_pneumark.in_(list(bom)))
+        )
+    }
+    ids = list(por_codigo.values())
+    resultado, estoque = _tendencias(sess, inicio, fim, ids, janela, agrupar, com_serie)
+
+    # capacidade dia a dia (vetorizada): estoque // qtd, mínimo entre as peças
+    # (peças ainda sem nenhum registro ficam de fora e são listadas)
+    qtds = np.array([max(1, int(bom[c])) for c in por_codigo], dtype=float)
+    cap_pecas = np.floor(np.clip(estoque.to_numpy(), 0, None) / qtds)
+    sem_historico = np.isnan(cap_pecas).all(axis=0)
+    usar = np.where(np.isnan(cap_pecas), np.inf, cap_pecas)[:, ~sem_historico]
+    if usar.shape[1]:
+        minimo = usar.min(axis=1)
+        capacidade = pd.Series(np.where(np.isinf(minimo), np.nan, minimo), index=estoque.index)
+        gargalo_idx = int(np.argmin(usar[-1])) if np.isfinite(usar[-1]).any() else None
+    else:
+        capacidade = pd.Series(np.nan, index=estoque.index)
+        gargalo_idx = None
+
+    agrupar = resultado["agrupar"]
+    serie_cap = capacidade
+    if agrupar != "dia":
+        serie_cap = capacidade.resample(AGRUPAMENTOS[agrupar], label="left", closed="left").min()
+
+    codigos_validos = [c for c, sem in zip(por_codigo, sem_historico) if not sem]
+    resultado["modelo"] = {
+        "modelo": modelo,
+        "codigo_conjunto": codigo,
+        "pecas_bom": len(bom),
+        "pecas_sem_cadastro": sorted(set(bom) - set(por_codigo)),
+        "pecas_sem_historico": [c for c, sem in zip(por_codigo, sem_historico) if sem],
+        "capacidade_inicial": _num(capacidade.iloc[0], 0),
+        "capacidade_final": _num(capacidade.iloc[-1], 0),
+        "capacidade_minima": _num(capacidade.min(), 0),
+        "capacidade_media": _num(capacidade.mean(), 1),
+        "gargalo_final": codigos_validos[gargalo_idx] if gargalo_idx is not None else None,
+        "serie": [
+            {"dia": d.date().isoformat(), "capacidade": _num(v, 0)} for d, v in serie_cap.items()
+        ],
+    }
+    return resultado
+
+
+# ====================================================================
+# [FIM BLOCO] tendencias_modelo
+# ====================================================================
+
+# ====================================================================
+# MAPA DO ARQUIVO
+# --------------------------------------------------------------------
+# CONFIG_LOGGER: logger
+# BLOCO_UTIL: config_tendencias
+# BLOCO_UTIL: __all__
+# FUNÇÃO: _num
+# FUNÇÃO: agrupamento_padrao
+# BLOCO_DB: _matriz_estoque
+# BLOCO_DB: _consumo_totais
+# BLOCO_DB: _matriz_consumo
+# FUNÇÃO: _metricas
+# FUNÇÃO: _series
+# FUNÇÃO: _intervalo
+# FUNÇÃO: tendencias_estoque
+# FUNÇÃO: _tendencias
+# FUNÇÃO: tendencias_modelo
+# ====================================================================
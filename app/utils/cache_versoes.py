@@ -0,0 +1,213 @@
+# app/utils/cache_versoes.py
+"""
+Versão por tabela para invalidar caches em arquivo (exportações etc.).
+
+Toda transação que grava em uma tabela de TABELAS_VERSIONADAS incrementa a
+versão dela no commit (tabela cache_versoes); as demais tabelas não geram
+escrita extra. Chaves lógicas (ex.: o índice de peças) são marcadas
+explicitamente com marcar_alterado(). Um cache guarda as versões das tabelas de origem na
+própria chave: mudou a versão, a chave muda e o arquivo antigo deixa de ser usado.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Dict, Iterable
+
+from sqlalchemy import event
+
+from app import db
+from app.models_sqla import CacheVersao
+from app.utils.db_utils import upsert
+
+logger = logging.getLogger(__name__)
+
+# Chave em session.info com o conjunto de tabelas gravadas na transação
+INFO_TABELAS_ALTERADAS = "cache_tabelas_alteradas"
+
+# Tabelas de origem dos caches (exportacao_service.EXPORTACOES[...]["tabelas"]);
+# exportação nova que lê outra tabela precisa entrar aqui
+TABELAS_VERSIONADAS = frozenset(
+    {"pecas", "fornecedores", "fornecedores_por_peca", "omie_requisicoes"}
+)
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _anotar
+# [RESPONSABILIDADE] Acumular na sessão as tabelas alteradas que algum cache acompanha
+# ====================================================================
+def _anotar(session, tabelas: Iterable[str]) -> None:
+    nomes = {t for t in tabelas if t in TABELAS_VERSIONADAS}
+    if nomes:
+        session.info.setdefault(INFO_TABELAS_ALTERADAS, set()).update(nomes)
+
+
+# ====================================================================
+# [FIM BLOCO] _anotar
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] marcar_alterado
+# [RESPONSABILIDADE] Agendar o incremento de uma chave de versão no próximo commit da sessão
+# ====================================================================
+def marcar_alterado(session, chave: str) -> None:
+    session.info.setdefault(INFO_TABELAS_ALTERADAS, set()).add(chave)
+
+
+# ====================================================================
+# [FIM BLOCO] marcar_alterado
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _tabelas_pendentes
+# [RESPONSABILIDADE] Listar tabelas dos objetos novos/alterados/removidos ainda na sessão
+# ====================================================================
+def _tabelas_pendentes(session):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        tabela = getattr(obj, "__tablename__", None)
+        if tabela:
+            yield tabela
+
+
+# ====================================================================
+# [FIM BLOCO] _tabelas_pendentes
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _depois_do_flush
+# [RESPONSABILIDADE] Registrar tabelas gravadas via ORM (objetos) em cada flush
+# ====================================================================
+def _depois_do_flush(session, flush_context) -> None:
+    _anotar(session, _tabelas_pendentes(session))
+
+
+# ====================================================================
+# [FIM BLOCO] _depois_do_flush
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _ao_executar
+# [RESPONSABILIDADE] Registrar tabelas gravadas por insert()/update()/delete() em lote
+# ====================================================================
+def _ao_executar(estado) -> None:
+    if estado.is_insert or estado.is_update or estado.is_delete:
+        tabela = getattr(estado.statement, "table", None)
+        _anotar(estado.session, [getattr(tabela, "name", None)])
+
+
+# ====================================================================
+# [FIM BLOCO] _ao_executar
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _antes_do_commit
+# [RESPONSABILIDADE] Incrementar a versão das tabelas alteradas na mesma transação do commit
+# ====================================================================
+def _antes_do_commit(session) -> None:
+    # erros do flush do próprio chamador sobem normalmente (fora do savepoint)
+    session.flush()
+    tabelas = session.info.pop(INFO_TABELAS_ALTERADAS, None)
+    if not tabelas:
+        return
+    agora = datetime.utcnow()
+    try:
+        with session.begin_nested():
+            upsert(
+                CacheVersao,
+                [{"tabela": t, "versao": 1, "atualizado_em": agora} for t in sorted(tabelas)],
+                chaves=["tabela"],
+                atualizar={"versao": CacheVersao.versao + 1, "atualizado_em": agora},
+                session=session,
+            )
+    except Exception as e:
+        # sem a tabela (migração pendente) o cache só deixa de ser invalidado
+        logger.error(f"[CACHE] Falha ao versionar {sorted(tabelas)}: {e}")
+    session.info.pop(INFO_TABELAS_ALTERADAS, None)
+
+
+# ====================================================================
+# [FIM BLOCO] _antes_do_commit
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _descartar_pendencias
+# [RESPONSABILIDADE] Esquecer tabelas anotadas quando a transação externa é desfeita
+# ====================================================================
+def _descartar_pendencias(session, previous_transaction) -> None:
+    # savepoint desfeito (ex.: avaliação de ROP) não desfaz o que a transação externa gravou
+    if previous_transaction.parent is None:
+        session.info.pop(INFO_TABELAS_ALTERADAS, None)
+
+
+# ====================================================================
+# [FIM BLOCO] _descartar_pendencias
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] registrar_versionamento_cache
+# [RESPONSABILIDADE] Ligar os eventos de sessão que mantêm cache_versoes (idempotente)
+# ====================================================================
+def registrar_versionamento_cache() -> None:
+    alvo = db.session
+    for nome, fn in (
+        ("after_flush", _depois_do_flush),
+        ("do_orm_execute", _ao_executar),
+        ("before_commit", _antes_do_commit),
+        ("after_soft_rollback", _descartar_pendencias),
+    ):
+        if not event.contains(alvo, nome, fn):
+            event.listen(alvo, nome, fn)
+
+
+# ====================================================================
+# [FIM BLOCO] registrar_versionamento_cache
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] versoes
+# [RESPONSABILIDADE] Ler a versão atual das tabelas informadas (0 = nunca alterada)
+# ====================================================================
+def versoes(tabelas: Iterable[str]) -> Dict[str, int]:
+    nomes = sorted(set(tabelas))
+    atuais = dict(
+        db.session.query(CacheVersao.tabela, CacheVersao.versao)
+        .filter(CacheVersao.tabela.in_(nomes))
+        .all()
+    )
+    return {t: int(atuais.get(t) or 0) for t in nomes}
+
+
+# ====================================================================
+# [FIM BLOCO] versoes
+# ====================================================================
+
+# ====================================================================
+# MAPA DO ARQUIVO
+# --------------------------------------------------------------------
+# FUNÇÃO: _anotar
+# FUNÇÃO: marcar_alterado
+# FUNÇÃO: _tabelas_pendentes
+# FUNÇÃO: _depois_do_flush
+# FUNÇÃO: _ao_executar
+# FUNÇÃO: _antes_do_commit
+# FUNÇÃO: _descartar_pendencias
+# FUNÇÃO: registrar_versionamento_cache
+# BLOCO_DB: versoes
+# ====================================================================
@@ -0,0 +1,129 @@
+# app/utils/db_utils.py
+"""
+Utilitários de banco compartilhados entre serviços (operações em lote).
+"""
+from __future__ import annotations
+
+import logging
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Union
+
+from sqlalchemy import ColumnElement, insert, tuple_, update
+from sqlalchemy.orm import Session
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _insert_do_dialeto
+# [RESPONSABILIDADE] Retornar a construção insert() com suporte a ON CONFLICT do dialeto (ou None)
+# ====================================================================
+def _insert_do_dialeto(nome_dialeto: str):
+    if nome_dialeto == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+        return pg_insert
+    if nome_dialeto == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+        return sqlite_insert
+    return None
+
+
+# ====================================================================
+# [FIM BLOCO] _insert_do_dialeto
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] BLOCO_DB
+# [NOME] upsert
+# [RESPONSABILIDADE] Inserir ou atualizar linhas em lote pela chave única informada
+# ====================================================================
+def upsert(
+    model,
+    linhas: Iterable[Dict],
+    chaves: Sequence[str],
+    atualizar: Optional[Union[Sequence[str], Mapping[str, object]]] = None,
+    session: Optional[Session] = None,
+    onde: Optional[ColumnElement] = None,
+) -> int:
+    """
+    INSERT ... ON CONFLICT (chaves) DO UPDATE em um único statement.
+    - 'chaves' precisa ter índice/constraint UNIQUE no banco.
+    - 'atualizar': colunas sobrescritas no conflito (padrão: todas as não-chave),
+      ou dict coluna -> expressão SQL (ex.: {"versao": Model.versao + 1}).
+    - 'atualizar' vazio ({} ou []): ON CONFLICT DO NOTHING.
+    - 'onde': predicado do índice UNIQUE parcial que cobre as chaves
+      (ex.: Model.status.in_(("aberto",))).
+    - Dialetos sem ON CONFLICT: SELECT das chaves existentes + UPDATE/INSERT em lote.
+    - Roda na transação de quem chama (não faz commit).
+    Retorna a quantidade de linhas processadas.
+    """
+    linhas = [dict(ln) for ln in linhas]
+    if not linhas:
+        return 0
+
+    sess = session or db.session
+    if atualizar is None:
+        atualizar = [c for c in linhas[0] if c not in chaves]
+
+    insert_dialeto = _insert_do_dialeto(sess.get_bind().dialect.name)
+    if insert_dialeto is not None:
+        stmt = insert_dialeto(model)
+        if isinstance(atualizar, Mapping):
+            set_ = dict(atualizar)
+        else:
+            set_ = {c: stmt.excluded[c] for c in atualizar}
+        if set_:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(chaves), index_where=onde, set_=set_
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=list(chaves), index_where=onde)
+        sess.execute(stmt, linhas)
+        return len(linhas)
+
+    # Fallback genérico: separa existentes de novas com uma consulta
+    colunas_chave = [getattr(model, c) for c in chaves]
+    valores = [tuple(ln[c] for c in chaves) for ln in linhas]
+    if len(colunas_chave) == 1:
+        filtro = colunas_chave[0].in_([v[0] for v in valores])
+    else:
+        filtro = tuple_(*colunas_chave).in_(valores)
+    consulta = sess.query(*colunas_chave).filter(filtro)
+    if onde is not None:
+        consulta = consulta.filter(onde)
+    existentes = {tuple(r) for r in consulta.all()}
+
+    novas: List[Dict] = []
+    for ln, chave in zip(linhas, valores):
+        if chave in existentes:
+            if atualizar:
+                cond = [col == v for col, v in zip(colunas_chave, chave)]
+                if onde is not None:
+                    cond.append(onde)
+                if isinstance(atualizar, Mapping):
+                    valores_upd = dict(atualizar)
+                else:
+                    valores_upd = {c: ln[c] for c in atualizar}
+                sess.execute(update(model).where(*cond).values(valores_upd))
+        else:
+            novas.append(ln)
+    if novas:
+        sess.execute(insert(model), novas)
+    return len(linhas)
+
+
+# ====================================================================
+# [FIM BLOCO] upsert
+# ====================================================================
+
+# ====================================================================
+# MAPA DO ARQUIVO
+# --------------------------------------------------------------------
+# FUNÇÃO: _insert_do_dialeto
+# BLOCO_DB: upsert
+# ====================================================================
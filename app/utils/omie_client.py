@@ -0,0 +1,440 @@
+# app/utils/omie_client.py
+"""
+Cliente HTTP da API OMIE (um por processo).
+
+- requests.Session com pool keep-alive (sem handshake TLS a cada chamada)
+- token bucket: limita a taxa de chamadas ao OMIE
+- novas tentativas com backoff exponencial + jitter (rede, 429, 5xx)
+- circuit breaker: com o OMIE fora, falha na hora em vez de prender o worker
+- métricas de latência/contagem por endpoint
+
+Configuração por variáveis de ambiente (OMIE_APP_KEY, OMIE_APP_SECRET,
+OMIE_BASE_URL, OMIE_TIMEOUT_CONEXAO, OMIE_TIMEOUT_LEITURA, OMIE_TAXA_POR_SEG,
+OMIE_RAJADA, OMIE_MAX_TENTATIVAS, OMIE_CIRCUITO_FALHAS, OMIE_CIRCUITO_ABERTO_SEG).
+Para testes offline: scripts/omie_stub_server.py.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# ====================================================================
+# [BLOCO] CONFIG_LOGGER
+# [NOME] logger
+# [RESPONSABILIDADE] Inicializar logger do módulo do cliente OMIE
+# ====================================================================
+logger = logging.getLogger(__name__)
+# ====================================================================
+# [FIM BLOCO] logger
+# ====================================================================
+
+# Status HTTP que valem nova tentativa
+_STATUS_RETENTAVEIS = {429, 500, 502, 503, 504}
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _falha_de_negocio
+# [RESPONSABILIDADE] Extrair (faultcode, faultstring) de erros de validação do OMIE (faultcode SOAP-ENV:Client)
+# ====================================================================
+def _falha_de_negocio(resp) -> Optional[Tuple[str, str]]:
+    if resp.status_code < 400:
+        return None
+    try:
+        corpo = resp.json()
+    except ValueError:
+        return None
+    if not isinstance(corpo, dict):
+        return None
+    codigo = str(corpo.get("faultcode") or "")
+    if codigo.startswith("SOAP-ENV:Client"):
+        return codigo, str(corpo.get("faultstring") or codigo)
+    return None
+
+
+# ====================================================================
+# [FIM BLOCO] _falha_de_negocio
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] CLASSE
+# [NOME] OmieErro
+# [RESPONSABILIDADE] Erro de comunicação/negócio retornado na chamada ao OMIE
+# ====================================================================
+class OmieErro(Exception):
+    """'codigo' traz o faultcode do OMIE (ex.: 'SOAP-ENV:Client-5113') quando houver."""
+
+    def __init__(self, mensagem: str, codigo: Optional[str] = None) -> None:
+        super().__init__(mensagem)
+        self.codigo = codigo
+
+
+# ====================================================================
+# [FIM BLOCO] OmieErro
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] CLASSE
+# [NOME] OmieIndisponivel
+# [RESPONSABILIDADE] Falha rápida: circuito aberto ou limite de taxa esgotado
+# ====================================================================
+class OmieIndisponivel(OmieErro):
+    pass
+
+
+# ====================================================================
+# [FIM BLOCO] OmieIndisponivel
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] CLASSE
+# [NOME] TokenBucket
+# [RESPONSABILIDADE] Limitar a taxa de chamadas (tokens/segundo com rajada máxima)
+# ====================================================================
+class TokenBucket:
+    def __init__(self, taxa_por_seg: float, capacidade: int) -> None:
+        self.taxa = float(taxa_por_seg)
+        self.capacidade = max(1, int(capacidade))
+        self._tokens = float(self.capacidade)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _repor(self) -> None:
+        agora = time.monotonic()
+        self._tokens = min(
+            self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa
+        )
+        self._ultimo = agora
+
+    def adquirir(self, espera_max: float) -> bool:
+        """Bloqueia até haver token ou estourar espera_max (False)."""
+        limite = time.monotonic() + espera_max
+        while True:
+            with self._lock:
+                self._repor()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                falta = (1 - self._tokens) / self.taxa if self.taxa > 0 else espera_max
+            if time.monotonic() + falta > limite:
+                return False
+            time.sleep(falta)
+
+
+# ====================================================================
+# [FIM BLOCO] TokenBucket
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] CLASSE
+# [NOME] CircuitBreaker
+# [RESPONSABILIDADE] Abrir o circuito após falhas seguidas e testar o retorno com uma chamada
+# ====================================================================
+class CircuitBreaker:
+    FECHADO = "fechado"
+    ABERTO = "aberto"
+    MEIO_ABERTO = "meio_aberto"
+
+    def __init__(self, limite_falhas: int, tempo_aberto_seg: float) -> None:
+        self.limite_falhas = max(1, int(limite_falhas))
+        self.tempo_aberto = float(tempo_aberto_seg)
+        self.estado = self.FECHADO
+        self._falhas = 0
+        self._aberto_em = 0.0
+        self._teste_em_andamento = False
+        self._lock = threading.Lock()
+
+    def permitir(self) -> bool:
+        with self._lock:
+            if self.estado == self.FECHADO:
+                return True
+            if self.estado == self.ABERTO:
+                if time.monotonic() - self._aberto_em < self.tempo_aberto:
+                    return False
+                self.estado = self.MEIO_ABERTO
+                self._teste_em_andamento = False
+            # meio aberto: só uma chamada de teste por vez
+            if self._teste_em_andamento:
+                return False
+            self._teste_em_andamento = True
+            return True
+
+    def liberar_teste(self) -> None:
+        """Devolve a vaga de teste (meio aberto) quando a chamada nem saiu."""
+        with self._lock:
+            self._teste_em_andamento = False
+
+    def registrar_sucesso(self) -> None:
+        with self._lock:
+            self._falhas = 0
+            self._teste_em_andamento = False
+            if self.estado != self.FECHADO:
+                logger.info("[OMIE] Circuito fechado (OMIE respondeu).")
+            self.estado = self.FECHADO
+
+    def registrar_falha(self) -> None:
+        with self._lock:
+            self._falhas += 1
+            self._teste_em_andamento = False
+            if self.estado == self.MEIO_ABERTO or self._falhas >= self.limite_falhas:
+                if self.estado != self.ABERTO:
+                    logger.warning(
+                        "[OMIE] Circuito aberto por %.0fs após %d falha(s).",
+                        self.tempo_aberto,
+                        self._falhas,
+                    )
+                self.estado = self.ABERTO
+                self._aberto_em = time.monotonic()
+
+
+# ====================================================================
+# [FIM BLOCO] CircuitBreaker
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] CLASSE
+# [NOME] _Metricas
+# [RESPONSABILIDADE] Acumular contagens e latências recentes por endpoint (thread-safe)
+# ====================================================================
+class _Metricas:
+    def __init__(self, janela: int = 500) -> None:
+        self._lock = threading.Lock()
+        self._latencias: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=janela))
+        self._contagem: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"sucesso": 0, "falha": 0, "retentativas": 0, "rejeitadas": 0}
+        )
+
+    def registrar(self, endpoint: str, campo: str, latencia: Optional[float] = None) -> None:
+        with self._lock:
+            self._contagem[endpoint][campo] += 1
+            if latencia is not None:
+                self._latencias[endpoint].append(latencia)
+
+    def resumo(self) -> Dict[str, Any]:
+        with self._lock:
+            out = {}
+            for ep, cont in self._contagem.items():
+                lat = sorted(self._latencias.get(ep) or [])
+                item = dict(cont)
+                if lat:
+                    item.update(
+                        {
+                            "latencia_ms_p50": round(lat[len(lat) // 2] * 1000, 1),
+                            "latencia_ms_p95": round(
+                                lat[min(len(lat) - 1, int(len(lat) * 0.95))] * 1000, 1
+                            ),
+                            "latencia_ms_max": round(lat[-1] * 1000, 1),
+                        }
+                    )
+                out[ep] = item
+            return out
+
+
+# ====================================================================
+# [FIM BLOCO] _Metricas
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] CLASSE
+# [NOME] OmieClient
+# [RESPONSABILIDADE] Executar chamadas à API OMIE com pool, limite de taxa, retentativas e circuito
+# ====================================================================
+class OmieClient:
+    def __init__(
+        self,
+        app_key: str,
+        app_secret: str,
+        base_url: str = "https://app.omie.com.br/api/v1/",
+        timeout_conexao: float = 3.05,
+        timeout_leitura: float = 10.0,
+        taxa_por_seg: float = 3.0,
+        rajada: int = 5,
+        max_tentativas: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        circuito_falhas: int = 5,
+        circuito_aberto_seg: float = 30.0,
+        pool: int = 10,
+    ) -> None:
+        self.app_key = app_key
+        self.app_secret = app_secret
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.timeout = (timeout_conexao, timeout_leitura)
+        self.max_tentativas = max(1, int(max_tentativas))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limitador = TokenBucket(taxa_por_seg, rajada)
+        self.circuito = CircuitBreaker(circuito_falhas, circuito_aberto_seg)
+        self.metricas = _Metricas()
+
+        self.sessao = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=pool, pool_maxsize=pool, max_retries=0)
+        self.sessao.mount("http://", adaptador)
+        self.sessao.mount("https://", adaptador)
+        self.sessao.headers.update(
+            {"Content-Type": "application/json", "Accept": "application/json"}
+        )
+
+    # ----------------------------------------------------------------
+    def _espera(self, tentativa: int, retry_after: Optional[str] = None) -> float:
+        """Backoff exponencial com jitter total; respeita Retry-After quando vier."""
+        if retry_after:
+            try:
+                return min(self.backoff_max, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** tentativa)))
+
+    # ----------------------------------------------------------------
+    def post(self, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        POST {base_url}{endpoint} com as credenciais no corpo.
+        Levanta OmieIndisponivel (circuito aberto / sem token) ou OmieErro.
+        """
+        if not self.app_key or not self.app_secret:
+            raise OmieErro(
+                "Credenciais OMIE não configuradas (OMIE_APP_KEY/OMIE_APP_SECRET)"
+            )
+        corpo = {**data, "app_key": self.app_key, "app_secret": self.app_secret}
+        url = f"{self.base_url}{endpoint}"
+
+        ultimo_erro: Optional[str] = None
+        for tentativa in range(self.max_tentativas):
+            if not self.circuito.permitir():
+                self.metricas.registrar(endpoint, "rejeitadas")
+                raise OmieIndisponivel("OMIE indisponível (circuito aberto).")
+            if not self.limitador.adquirir(espera_max=self.timeout[1]):
+                self.circuito.liberar_teste()
+                self.metricas.registrar(endpoint, "rejeitadas")
+                raise OmieIndisponivel("Limite de chamadas ao OMIE esgotado.")
+
+            inicio = time.monotonic()
+            retry_after = None
+            try:
+                resp = self.sessao.post(url, json=corpo, timeout=self.timeout)
+                latencia = time.monotonic() - inicio
+                falha_cliente = _falha_de_negocio(resp)
+                if falha_cliente:
+                    # OMIE responde erro de validação como HTTP 500 + faultcode Client:
+                    # o serviço está de pé e repetir não muda o resultado
+                    self.circuito.registrar_sucesso()
+                    self.metricas.registrar(endpoint, "falha", latencia)
+                    raise OmieErro(
+                        f"OMIE recusou a chamada: {falha_cliente[1]}", codigo=falha_cliente[0]
+                    )
+                if resp.status_code in _STATUS_RETENTAVEIS:
+                    retry_after = resp.headers.get("Retry-After")
+                    ultimo_erro = f"HTTP {resp.status_code}"
+                    if resp.status_code >= 500:
+                        self.circuito.registrar_falha()
+                    else:
+                        # 429 é o OMIE vivo pedindo calma: não abre circuito
+                        self.circuito.registrar_sucesso()
+                else:
+                    resp.raise_for_status()
+                    self.circuito.registrar_sucesso()
+                    self.metricas.registrar(endpoint, "sucesso", latencia)
+                    return resp.json()
+            except requests.exceptions.HTTPError as e:
+                # 4xx não retentável: erro de negócio/credencial, OMIE está de pé
+                self.circuito.registrar_sucesso()
+                self.metricas.registrar(endpoint, "falha", time.monotonic() - inicio)
+                raise OmieErro(f"Falha na comunicação com OMIE: {e}") from e
+            except requests.exceptions.RequestException as e:
+                self.circuito.registrar_falha()
+                ultimo_erro = str(e)
+
+            self.metricas.registrar(endpoint, "falha", time.monotonic() - inicio)
+            if tentativa + 1 < self.max_tentativas:
+                self.metricas.registrar(endpoint, "retentativas")
+                espera = self._espera(tentativa, retry_after)
+                logger.warning(
+                    "[OMIE] %s falhou (%s); nova tentativa em %.2fs.",
+                    endpoint,
+                    ultimo_erro,
+                    espera,
+                )
+                time.sleep(espera)
+
+        raise OmieErro(f"Falha na comunicação com OMIE: {ultimo_erro}")
+
+    # ----------------------------------------------------------------
+    def chamar(self, endpoint: str, call: str, param: Dict[str, Any]) -> Dict[str, Any]:
+        """Atalho para o formato {"call": ..., "param": [ ... ]} do OMIE."""
+        return self.post(endpoint, {"call": call, "param": [param]})
+
+    # ----------------------------------------------------------------
+    def status(self) -> Dict[str, Any]:
+        return {
+            "circuito": self.circuito.estado,
+            "base_url": self.base_url,
+            "endpoints": self.metricas.resumo(),
+        }
+
+
+# ====================================================================
+# [FIM BLOCO] OmieClient
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] get_omie_client
+# [RESPONSABILIDADE] Retornar o cliente OMIE do processo (criado sob demanda a partir do ambiente)
+# ====================================================================
+_cliente: Optional[OmieClient] = None
+_cliente_lock = threading.Lock()
+
+
+def get_omie_client() -> OmieClient:
+    global _cliente
+    if _cliente is None:
+        with _cliente_lock:
+            if _cliente is None:
+                env = os.environ.get
+                _cliente = OmieClient(
+                    app_key=env("OMIE_APP_KEY", ""),
+                    app_secret=env("OMIE_APP_SECRET", ""),
+                    base_url=env("OMIE_BASE_URL", "https://app.omie.com.br/api/v1/"),
+                    timeout_conexao=float(env("OMIE_TIMEOUT_CONEXAO", "3.05")),
+                    timeout_leitura=float(env("OMIE_TIMEOUT_LEITURA", "10")),
+                    taxa_por_seg=float(env("OMIE_TAXA_POR_SEG", "3")),
+                    rajada=int(env("OMIE_RAJADA", "5")),
+                    max_tentativas=int(env("OMIE_MAX_TENTATIVAS", "3")),
+                    circuito_falhas=int(env("OMIE_CIRCUITO_FALHAS", "5")),
+                    circuito_aberto_seg=float(env("OMIE_CIRCUITO_ABERTO_SEG", "30")),
+                )
+    return _cliente
+
+
+# ====================================================================
+# [FIM BLOCO] get_omie_client
+# ====================================================================
+
+# ====================================================================
+# MAPA DO ARQUIVO
+# --------------------------------------------------------------------
+# CONFIG_LOGGER: logger
+# FUNÇÃO: _falha_de_negocio
+# CLASSE: OmieErro
+# CLASSE: OmieIndisponivel
+# CLASSE: TokenBucket
+# CLASSE: CircuitBreaker
+# CLASSE: _Metricas
+# CLASSE: OmieClient
+# FUNÇÃO: get_omie_client
+# ====================================================================
@@ -3,57 +3,27 @@ Utilitários para integração com OMIE ERP.
 Implementa funções para requisições de compra e exportações.
 """
 
-import os
-import json
 import logging
-import requests
-import pandas as pd
 from datetime import datetime
 from typing import Dict, List, Optional, Any
-from io import BytesIO
+
+from sqlalchemy import func, or_
 
 from app import db
-from app.models_sqla import Peca, Fornecedor, FornecedoresPorPeca, OmieRequisicao
+from app.models_sqla import Peca, OmieRequisicao
+from app.utils.omie_client import OmieErro, get_omie_client
 
 logger = logging.getLogger(__name__)
 
-# ====================================================================
-# [BLOCO] BLOCO_UTIL
-# [NOME] Configurações OMIE (env)
-# [RESPONSABILIDADE] Carregar credenciais e base URL da API OMIE via variáveis de ambiente
-# ====================================================================
-# Configurações OMIE (via variáveis de ambiente)
-OMIE_APP_KEY = os.environ.get("OMIE_APP_KEY", "")
-OMIE_APP_SECRET = os.environ.get("OMIE_APP_SECRET", "")
-OMIE_BASE_URL = os.environ.get("OMIE_BASE_URL", "https://app.omie.com.br/api/v1/")
-# ====================================================================
-# [FIM BLOCO] Configurações OMIE (env)
-# ====================================================================
-
-
-# ====================================================================
-# [BLOCO] FUNÇÃO
-# [NOME] _get_omie_headers
-# [RESPONSABILIDADE] Retornar headers padrão para requisições HTTP para a API OMIE
-# ====================================================================
-def _get_omie_headers() -> Dict[str, str]:
-    """Retorna headers padrão para requisições OMIE."""
-    return {"Content-Type": "application/json", "Accept": "application/json"}
-
-
-# ====================================================================
-# [FIM BLOCO] _get_omie_headers
-# ====================================================================
-
-
 # ====================================================================
 # [BLOCO] FUNÇÃO
 # [NOME] _make_omie_request
-# [RESPONSABILIDADE] Montar payload com credenciais e executar POST na API OMIE com tratamento de erro
+# [RESPONSABILIDADE] Executar POST na API OMIE pelo cliente compartilhado (pool, taxa, circuito)
 # ====================================================================
 def _make_omie_request(endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Faz uma requisição para a API OMIE.
+    Faz uma requisição para a API OMIE pelo cliente compartilhado do processo
+    (pool keep-alive, limite de taxa, retentativas e circuit breaker).
 
     Args:
         endpoint: Endpoint da API (ex: "produtos/requisicao/")
@@ -63,27 +33,13 @@ def _make_omie_request(endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
         Resposta da API OMIE
 
     Raises:
-        Exception: Se a requisição falhar
+        OmieErro: Se a requisição falhar (OmieIndisponivel com o circuito aberto)
     """
-    if not OMIE_APP_KEY or not OMIE_APP_SECRET:
-        raise Exception(
-            "Credenciais OMIE não configuradas (OMIE_APP_KEY/OMIE_APP_SECRET)"
-        )
-
-    # Adiciona credenciais aos dados
-    data.update({"app_key": OMIE_APP_KEY, "app_secret": OMIE_APP_SECRET})
-
-    url = f"{OMIE_BASE_URL}{endpoint}"
-
     try:
-        response = requests.post(
-            url, json=data, headers=_get_omie_headers(), timeout=30
-        )
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        return get_omie_client().post(endpoint, data)
+    except OmieErro as e:
         logger.error(f"[OMIE] Erro na requisição para {endpoint}: {e}")
-        raise Exception(f"Falha na comunicação com OMIE: {e}")
+        raise
 
 
 # ====================================================================
@@ -101,6 +57,8 @@ def solicitar_requisicao_compra(
 ) -> Dict[str, Any]:
     """
     Solicita uma requisição de compra no OMIE para uma peça específica.
+    Envio imediato pela fila de requisições (omie_requisicao_service); o fluxo
+    automático de ROP enfileira e agrupa por fornecedor em vez de chamar aqui.
 
     Args:
         peca: Objeto Peca que precisa ser comprada
@@ -110,81 +68,34 @@ def solicitar_requisicao_compra(
     Returns:
         Dicionário com resultado da operação
     """
+    from app.services.omie_requisicao_service import (
+        enfileirar_requisicoes,
+        enviar_requisicoes_pendentes,
+    )
+
     try:
-        # Se fornecedor não especificado, busca o primeiro fornecedor da peça
-        if not fornecedor:
-            fornecedor_obj = (
-                db.session.query(FornecedoresPorPeca).filter_by(peca_id=peca.id).first()
-            )
-            if fornecedor_obj:
-                fornecedor = fornecedor_obj.fornecedor
-            else:
-                fornecedor = "Fornecedor Padrão"
-
-        # Cria registro na tabela local
-        requisicao = OmieRequisicao(
-            peca_id=peca.id,
-            fornecedor=fornecedor,
-            quantidade=quantidade,
-            status="pendente",
-            created_at=datetime.utcnow(),
+        ids = enfileirar_requisicoes(
+            [{"peca_id": peca.id, "quantidade": quantidade, "fornecedor": fornecedor}]
         )
-        db.session.add(requisicao)
-        db.session.flush()  # Para obter o ID
-
-        # Prepara dados para OMIE
-        omie_data = {
-            "call": "IncluirRequisicaoCompra",
-            "param": [
-                {
-                    "cabecalho": {
-                        "codigo_interno": f"REQ_{requisicao.id}",
-                        "descricao": f"Requisição automática - {peca.descricao}",
-                        "observacoes": f"Gerada automaticamente pelo sistema SGP - Peca ID: {peca.id}",
-                    },
-                    "itens": [
-                        {
-                            "codigo_produto": peca.codigo_omie or peca.codigo_pneumark,
-                            "descricao": peca.descricao,
-                            "quantidade": quantidade,
-                            "observacoes": f"Estoque atual: {peca.estoque_atual}, Ponto de pedido: {peca.ponto_pedido}",
-                        }
-                    ],
-                    "fornecedor": {"nome": fornecedor},
-                }
-            ],
-        }
-
-        try:
-            # Envia para OMIE
-            response = _make_omie_request("produtos/requisicao/", omie_data)
-
-            # Atualiza registro com sucesso
-            requisicao.status = "enviado"
-            requisicao.sent_at = datetime.utcnow()
-            requisicao.cod_int = response.get("codigo_interno", f"REQ_{requisicao.id}")
-
-            db.session.commit()
-
-            logger.info(
-                f"[OMIE] Requisição criada com sucesso para peça {peca.codigo_pneumark}"
-            )
+        db.session.commit()
+        if not ids:
             return {
-                "success": True,
-                "requisicao_id": requisicao.id,
-                "omie_response": response,
+                "success": False,
+                "error": "Peça já possui requisição em aberto ou quantidade inválida.",
             }
 
-        except Exception as e:
-            # Atualiza registro com erro
-            requisicao.status = "erro"
-            requisicao.erro_msg = str(e)
-            db.session.commit()
-
-            logger.error(
-                f"[OMIE] Falha ao enviar requisição para peça {peca.codigo_pneumark}: {e}"
+        resumo = enviar_requisicoes_pendentes(ids=ids)
+        grupo = resumo["grupos"][0] if resumo["grupos"] else {}
+        if grupo.get("ok"):
+            logger.info(
+                f"[OMIE] Requisição criada com sucesso para peça {peca.codigo_pneumark}"
             )
-            return {"success": False, "requisicao_id": requisicao.id, "error": str(e)}
+            return {"success": True, "requisicao_id": ids[0], "cod_int": grupo["cod_int"]}
+        return {
+            "success": False,
+            "requisicao_id": ids[0],
+            "error": grupo.get("erro", "Requisição não enviada."),
+        }
 
     except Exception as e:
         db.session.rollback()
@@ -199,52 +110,36 @@ def solicitar_requisicao_compra(
 
 # ====================================================================
 # [BLOCO] FUNÇÃO
-# [NOME] exportar_produtos_excel
-# [RESPONSABILIDADE] Exportar catálogo de peças (produtos) do banco para Excel em memória
+# [NOME] _exportar_bytes
+# [RESPONSABILIDADE] Gerar (ou reaproveitar do cache) a exportação xlsx e devolver seus bytes
 # ====================================================================
-def exportar_produtos_excel() -> bytes:
+def _exportar_bytes(nome: str) -> bytes:
     """
-    Exporta catálogo de produtos para Excel.
-
-    Returns:
-        Bytes do arquivo Excel
+    Compatibilidade: as rotas servem o arquivo direto do disco
+    (app.services.exportacao_service); aqui só para quem ainda espera bytes.
     """
+    from app.services.exportacao_service import gerar_arquivo
+
     try:
-        # Busca todas as peças
-        pecas = db.session.query(Peca).all()
-
-        # Converte para DataFrame
-        data = []
-        for peca in pecas:
-            data.append(
-                {
-                    "ID": peca.id,
-                    "Tipo": peca.tipo,
-                    "Descrição": peca.descricao,
-                    "Código Pneumark": peca.codigo_pneumark,
-                    "Código OMIE": peca.codigo_omie,
-                    "Estoque Atual": peca.estoque_atual,
-                    "Estoque Mínimo": peca.estoque_minimo,
-                    "Ponto de Pedido": peca.ponto_pedido,
-                    "Estoque Máximo": peca.estoque_maximo,
-                    "Custo": peca.custo,
-                    "Margem": peca.margem,
-                }
-            )
+        with open(gerar_arquivo(nome, "xlsx"), "rb") as fh:
+            return fh.read()
+    except Exception as e:
+        logger.error(f"[OMIE] Erro ao exportar {nome}: {e}")
+        raise
 
-        df = pd.DataFrame(data)
 
-        # Gera Excel em memória
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine="openpyxl") as writer:
-            df.to_excel(writer, sheet_name="Produtos", index=False)
+# ====================================================================
+# [FIM BLOCO] _exportar_bytes
+# ====================================================================
 
-        output.seek(0)
-        return output.getvalue()
 
-    except Exception as e:
-        logger.error(f"[OMIE] Erro ao exportar produtos: {e}")
-        raise
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] exportar_produtos_excel
+# [RESPONSABILIDADE] Exportar catálogo de peças (produtos) para Excel
+# ====================================================================
+def exportar_produtos_excel() -> bytes:
+    return _exportar_bytes("produtos")
 
 
 # ====================================================================
@@ -255,167 +150,226 @@ def exportar_produtos_excel() -> bytes:
 # ====================================================================
 # [BLOCO] FUNÇÃO
 # [NOME] exportar_fornecedores_excel
-# [RESPONSABILIDADE] Exportar catálogo de fornecedores do banco para Excel em memória
+# [RESPONSABILIDADE] Exportar catálogo de fornecedores para Excel
 # ====================================================================
 def exportar_fornecedores_excel() -> bytes:
-    """
-    Exporta catálogo de fornecedores para Excel.
+    return _exportar_bytes("fornecedores")
 
-    Returns:
-        Bytes do arquivo Excel
-    """
-    try:
-        # Busca todos os fornecedores
-        fornecedores = db.session.query(Fornecedor).all()
-
-        # Converte para DataFrame
-        data = []
-        for fornecedor in fornecedores:
-            data.append(
-                {
-                    "ID": fornecedor.id,
-                    "Nome Empresa": fornecedor.nome_empresa,
-                    "Nome Contato": fornecedor.nome_contato,
-                    "Telefone 1": fornecedor.telefone1,
-                    "Telefone 2": fornecedor.telefone2,
-                    "Email 1": fornecedor.email1,
-                    "Email 2": fornecedor.email2,
-                }
-            )
 
-        df = pd.DataFrame(data)
-
-        # Gera Excel em memória
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine="openpyxl") as writer:
-            df.to_excel(writer, sheet_name="Fornecedores", index=False)
+# ====================================================================
+# [FIM BLOCO] exportar_fornecedores_excel
+# ====================================================================
 
-        output.seek(0)
-        return output.getvalue()
 
-    except Exception as e:
-        logger.error(f"[OMIE] Erro ao exportar fornecedores: {e}")
-        raise
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] exportar_produtos_fornecedores_excel
+# [RESPONSABILIDADE] Exportar relacionamento peças x fornecedores para Excel
+# ====================================================================
+def exportar_produtos_fornecedores_excel() -> bytes:
+    return _exportar_bytes("produtos_fornecedores")
 
 
 # ====================================================================
-# [FIM BLOCO] exportar_fornecedores_excel
+# [FIM BLOCO] exportar_produtos_fornecedores_excel
 # ====================================================================
 
 
 # ====================================================================
 # [BLOCO] FUNÇÃO
-# [NOME] exportar_produtos_fornecedores_excel
-# [RESPONSABILIDADE] Exportar relacionamento peças x fornecedores via JOIN para Excel em memória
+# [NOME] exportar_snapshot_ponto_pedido_excel
+# [RESPONSABILIDADE] Exportar snapshot de ponto de pedido (ROP) com status para Excel
 # ====================================================================
-def exportar_produtos_fornecedores_excel() -> bytes:
-    """
-    Exporta relacionamento produtos x fornecedores para Excel.
+def exportar_snapshot_ponto_pedido_excel() -> bytes:
+    return _exportar_bytes("snapshot_ponto_pedido")
 
-    Returns:
-        Bytes do arquivo Excel
-    """
-    try:
-        # Busca relacionamentos com JOIN
-        query = (
-            db.session.query(
-                Peca.codigo_pneumark,
-                Peca.descricao,
-                FornecedoresPorPeca.fornecedor,
-                FornecedoresPorPeca.etapa,
-                FornecedoresPorPeca.preco,
-            )
-            .join(FornecedoresPorPeca, Peca.id == FornecedoresPorPeca.peca_id)
-            .all()
-        )
 
-        # Converte para DataFrame
-        data = []
-        for row in query:
-            data.append(
-                {
-                    "Código Peça": row.codigo_pneumark,
-                    "Descrição": row.descricao,
-                    "Fornecedor": row.fornecedor,
-                    "Etapa": row.etapa,
-                    "Preço": row.preco,
-                }
+# ====================================================================
+# [FIM BLOCO] exportar_snapshot_ponto_pedido_excel
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _filtros_requisicoes
+# [RESPONSABILIDADE] Montar filtros SQL de requisições (status, fornecedor, período e busca livre)
+# ====================================================================
+def _filtros_requisicoes(
+    status: Optional[str] = None,
+    fornecedor: Optional[str] = None,
+    de: Optional[datetime] = None,
+    ate: Optional[datetime] = None,
+    q: Optional[str] = None,
+) -> List[Any]:
+    filtros: List[Any] = []
+    if status:
+        filtros.append(OmieRequisicao.status == status)
+    if fornecedor:
+        filtros.append(OmieRequisicao.fornecedor.ilike(f"%{fornecedor}%"))
+    if de:
+        filtros.append(OmieRequisicao.created_at >= de)
+    if ate:
+        filtros.append(OmieRequisicao.created_at <= ate)
+    if q:
+        termo = f"%{q}%"
+        filtros.append(
+            or_(
+                OmieRequisicao.fornecedor.ilike(termo),
+                OmieRequisicao.cod_int.ilike(termo),
+                Peca.codigo_pneumark.ilike(termo),
+                Peca.descricao.ilike(termo),
             )
+        )
+    return filtros
 
-        df = pd.DataFrame(data)
 
-        # Gera Excel em memória
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine="openpyxl") as writer:
-            df.to_excel(writer, sheet_name="Produtos x Fornecedores", index=False)
+# ====================================================================
+# [FIM BLOCO] _filtros_requisicoes
+# ====================================================================
 
-        output.seek(0)
-        return output.getvalue()
 
-    except Exception as e:
-        logger.error(f"[OMIE] Erro ao exportar produtos x fornecedores: {e}")
-        raise
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _linha_requisicao
+# [RESPONSABILIDADE] Converter linha (requisição + peça) no formato exibido na tela OMIE
+# ====================================================================
+def _linha_requisicao(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "data_hora": row.created_at.strftime("%d/%m/%Y %H:%M") if row.created_at else "",
+        "fornecedor": row.fornecedor or "",
+        "cod_int": row.cod_int or "",
+        "codIntReqCompra": row.cod_int or "-",
+        "itens": 1,  # cada linha é um item; a requisição OMIE agrupa por cod_int
+        "qtde_total": row.quantidade,
+        "status": row.status,
+        "email_enviado": False,
+        "peca_codigo": row.codigo_pneumark or "",
+        "peca_descricao": row.descricao or "",
+        "erro_msg": row.erro_msg,
+    }
 
 
 # ====================================================================
-# [FIM BLOCO] exportar_produtos_fornecedores_excel
+# [FIM BLOCO] _linha_requisicao
 # ====================================================================
 
 
 # ====================================================================
 # [BLOCO] FUNÇÃO
-# [NOME] exportar_snapshot_ponto_pedido_excel
-# [RESPONSABILIDADE] Exportar snapshot de ponto de pedido (ROP) com status e timestamp para Excel
-# ====================================================================
-def exportar_snapshot_ponto_pedido_excel() -> bytes:
+# [NOME] consultar_requisicoes
+# [RESPONSABILIDADE] Listar requisições com JOIN na peça, paginação por cursor e contagem por status
+# ====================================================================
+def consultar_requisicoes(
+    status: Optional[str] = None,
+    fornecedor: Optional[str] = None,
+    de: Optional[datetime] = None,
+    ate: Optional[datetime] = None,
+    q: Optional[str] = None,
+    cursor: Optional[int] = None,
+    limite: int = 50,
+) -> Dict[str, Any]:
     """
-    Exporta snapshot do ponto de pedido para Excel.
-
-    Returns:
-        Bytes do arquivo Excel
+    - Ordem: id decrescente (mais recentes primeiro); cursor = último id da
+      página anterior (WHERE id < cursor), custo constante em qualquer página.
+    - 'contagens' por status respeita os demais filtros (não o de status),
+      em uma única consulta agregada.
     """
-    try:
-        # Busca todas as peças com informações de estoque
-        pecas = db.session.query(Peca).filter(Peca.ponto_pedido.isnot(None)).all()
-
-        # Converte para DataFrame
-        data = []
-        for peca in pecas:
-            status = "OK"
-            if peca.estoque_atual is not None and peca.ponto_pedido is not None:
-                if peca.estoque_atual <= peca.ponto_pedido:
-                    status = "ALERTA"
-
-            data.append(
-                {
-                    "Código": peca.codigo_pneumark,
-                    "Descrição": peca.descricao,
-                    "Tipo": peca.tipo,
-                    "Estoque Atual": peca.estoque_atual,
-                    "Ponto de Pedido": peca.ponto_pedido,
-                    "Estoque Máximo": peca.estoque_maximo,
-                    "Status": status,
-                    "Data Snapshot": datetime.now().strftime("%d/%m/%Y %H:%M"),
-                }
-            )
+    limite = max(1, min(int(limite or 50), 500))
+    base = (
+        db.session.query(
+            OmieRequisicao.id,
+            OmieRequisicao.created_at,
+            OmieRequisicao.fornecedor,
+            OmieRequisicao.cod_int,
+            OmieRequisicao.quantidade,
+            OmieRequisicao.status,
+            OmieRequisicao.erro_msg,
+            Peca.codigo_pneumark,
+            Peca.descricao,
+        )
+        .outerjoin(Peca, Peca.id == OmieRequisicao.peca_id)
+        .filter(*_filtros_requisicoes(status, fornecedor, de, ate, q))
+    )
+    if cursor:
+        base = base.filter(OmieRequisicao.id < int(cursor))
+    linhas = base.order_by(OmieRequisicao.id.desc()).limit(limite + 1).all()
 
-        df = pd.DataFrame(data)
+    tem_mais = len(linhas) > limite
+    linhas = linhas[:limite]
 
-        # Gera Excel em memória
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine="openpyxl") as writer:
-            df.to_excel(writer, sheet_name="Snapshot Ponto de Pedido", index=False)
+    cont_q = db.session.query(OmieRequisicao.status, func.count(OmieRequisicao.id))
+    if q:
+        cont_q = cont_q.outerjoin(Peca, Peca.id == OmieRequisicao.peca_id)
+    contagens = dict(
+        cont_q.filter(*_filtros_requisicoes(None, fornecedor, de, ate, q))
+        .group_by(OmieRequisicao.status)
+        .all()
+    )
 
-        output.seek(0)
-        return output.getvalue()
+    return {
+        "items": [_linha_requisicao(r) for r in linhas],
+        "next_cursor": linhas[-1].id if tem_mais and linhas else None,
+        "contagens": contagens,
+    }
 
-    except Exception as e:
-        logger.error(f"[OMIE] Erro ao exportar snapshot ponto de pedido: {e}")
-        raise
+
+# ====================================================================
+# [FIM BLOCO] consultar_requisicoes
+# ====================================================================
 
 
 # ====================================================================
-# [FIM BLOCO] exportar_snapshot_ponto_pedido_excel
+# [BLOCO] FUNÇÃO
+# [NOME] detalhar_requisicao
+# [RESPONSABILIDADE] Retornar cabeçalho e itens de uma requisição (linhas com o mesmo cod_int)
+# ====================================================================
+def detalhar_requisicao(cod: str) -> Optional[Dict[str, Any]]:
+    """'cod' é o cod_int da requisição; linhas ainda sem cod_int usam o id."""
+    base = db.session.query(
+        OmieRequisicao.id,
+        OmieRequisicao.created_at,
+        OmieRequisicao.fornecedor,
+        OmieRequisicao.cod_int,
+        OmieRequisicao.quantidade,
+        OmieRequisicao.status,
+        OmieRequisicao.erro_msg,
+        Peca.codigo_pneumark,
+        Peca.codigo_omie,
+        Peca.descricao,
+    ).outerjoin(Peca, Peca.id == OmieRequisicao.peca_id)
+
+    linhas = base.filter(OmieRequisicao.cod_int == cod).order_by(OmieRequisicao.id).all()
+    if not linhas and cod.isdigit():
+        linhas = base.filter(OmieRequisicao.id == int(cod)).all()
+    if not linhas:
+        return None
+
+    primeira = linhas[0]
+    return {
+        "cab": {
+            "fornecedor": primeira.fornecedor or "",
+            "cod": primeira.cod_int or str(primeira.id),
+            "data_hora": primeira.created_at.strftime("%d/%m/%Y %H:%M"),
+            "status": primeira.status,
+            "email_enviado": False,
+            "link_omie": None,
+        },
+        "itens": [
+            {
+                "codigo_interno": ln.codigo_pneumark or "",
+                "descricao": ln.descricao or "",
+                "codProd": ln.codigo_omie,
+                "qtde": ln.quantidade,
+                "obs": ln.erro_msg or "",
+            }
+            for ln in linhas
+        ],
+    }
+
+
+# ====================================================================
+# [FIM BLOCO] detalhar_requisicao
 # ====================================================================
 
 
@@ -426,7 +380,8 @@ def exportar_snapshot_ponto_pedido_excel() -> bytes:
 # ====================================================================
 def get_requisicoes_recentes(limit: int = 20) -> List[Dict[str, Any]]:
     """
-    Retorna as requisições OMIE mais recentes.
+    Retorna as requisições OMIE mais recentes (primeira página de
+    consultar_requisicoes, no formato legado).
 
     Args:
         limit: Número máximo de requisições a retornar
@@ -435,33 +390,9 @@ def get_requisicoes_recentes(limit: int = 20) -> List[Dict[str, Any]]:
         Lista de dicionários com dados das requisições
     """
     try:
-        requisicoes = (
-            db.session.query(OmieRequisicao)
-            .order_by(OmieRequisicao.created_at.desc())
-            .limit(limit)
-            .all()
-        )
-
-        result = []
-        for req in requisicoes:
-            # Busca dados da peça
-            peca = db.session.query(Peca).get(req.peca_id)
-
-            result.append(
-                {
-                    "id": req.id,
-                    "data_hora": req.created_at.strftime("%d/%m/%Y %H:%M"),
-                    "fornecedor": req.fornecedor or "",
-                    "codIntReqCompra": req.cod_int or "-",
-                    "itens": 1,  # Uma peça por requisição
-                    "qtde_total": req.quantidade,
-                    "status": req.status.capitalize(),
-                    "peca_codigo": peca.codigo_pneumark if peca else "",
-                    "peca_descricao": peca.descricao if peca else "",
-                    "erro_msg": req.erro_msg,
-                }
-            )
-
+        result = consultar_requisicoes(limite=limit)["items"]
+        for item in result:
+            item["status"] = (item["status"] or "").capitalize()
         return result
 
     except Exception as e:
@@ -477,13 +408,16 @@ def get_requisicoes_recentes(limit: int = 20) -> List[Dict[str, Any]]:
 # ====================================================================
 # MAPA DO ARQUIVO
 # --------------------------------------------------------------------
-# BLOCO_UTIL: Configurações OMIE (env)
-# FUNÇÃO: _get_omie_headers
 # FUNÇÃO: _make_omie_request
 # FUNÇÃO: solicitar_requisicao_compra
+# FUNÇÃO: _exportar_bytes
 # FUNÇÃO: exportar_produtos_excel
 # FUNÇÃO: exportar_fornecedores_excel
 # FUNÇÃO: exportar_produtos_fornecedores_excel
 # FUNÇÃO: exportar_snapshot_ponto_pedido_excel
+# FUNÇÃO: _filtros_requisicoes
+# FUNÇÃO: _linha_requisicao
+# FUNÇÃO: consultar_requisicoes
+# FUNÇÃO: detalhar_requisicao
 # FUNÇÃO: get_requisicoes_recentes
 # ====================================================================
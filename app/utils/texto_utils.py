@@ -0,0 +1,48 @@
+# app/utils/texto_utils.py
+"""
+Normalização de texto para busca (minúsculo, sem acento, espaços simples).
+"""
+from __future__ import annotations
+
+import unicodedata
+from typing import Any
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] sem_acento
+# [RESPONSABILIDADE] Remover acentos e diacríticos mantendo as letras base
+# ====================================================================
+def sem_acento(texto: Any) -> str:
+    s = str(texto or "")
+    if s.isascii():
+        return s
+    s = unicodedata.normalize("NFKD", s)
+    return "".join(c for c in s if not unicodedata.combining(c))
+
+
+# ====================================================================
+# [FIM BLOCO] sem_acento
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] normalizar_busca
+# [RESPONSABILIDADE] Juntar partes (código, descrição...) em texto de busca normalizado
+# ====================================================================
+def normalizar_busca(*partes: Any) -> str:
+    """normalizar_busca("2-007-B", "Braço das Lâminas") -> '2-007-b braco das laminas'"""
+    return " ".join(sem_acento(" ".join(str(p) for p in partes if p)).lower().split())
+
+
+# ====================================================================
+# [FIM BLOCO] normalizar_busca
+# ====================================================================
+
+# ====================================================================
+# MAPA DO ARQUIVO
+# --------------------------------------------------------------------
+# FUNÇÃO: sem_acento
+# FUNÇÃO: normalizar_busca
+# ====================================================================
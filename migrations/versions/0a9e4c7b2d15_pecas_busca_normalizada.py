@@ -0,0 +1,106 @@
+"""pecas.busca_normalizada (search column) + listing indexes
+
+Revision ID: 0a9e4c7b2d15
+Revises: f7c3a9e1d5b8
+Create Date: 2026-10-19 14:05:41.903127
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.texto_utils import normalizar_busca
+
+
+# revision identifiers, used by Alembic.
+revision = '0a9e4c7b2d15'
+down_revision = 'f7c3a9e1d5b8'
+branch_labels = None
+depends_on = None
+
+LOTE = 2000
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'pecas' not in set(inspector.get_table_names()):
+        return
+
+    colunas = {c['name'] for c in inspector.get_columns('pecas')}
+    if 'busca_normalizada' not in colunas:
+        with op.batch_alter_table('pecas', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('busca_normalizada', sa.String(length=200), nullable=True))
+
+    # backfill em lotes (normalização de acento é feita em Python, igual à aplicação)
+    pecas = sa.table(
+        'pecas',
+        sa.column('id', sa.Integer),
+        sa.column('codigo_pneumark', sa.String),
+        sa.column('descricao', sa.String),
+        sa.column('busca_normalizada', sa.String),
+    )
+    ultimo = total = 0
+    while True:
+        linhas = bind.execute(
+            sa.select(pecas.c.id, pecas.c.codigo_pneumark, pecas.c.descricao)
+            .where(pecas.c.id > ultimo)
+            .order_by(pecas.c.id)
+            .limit(LOTE)
+        ).all()
+        if not linhas:
+            break
+        bind.execute(
+            pecas.update()
+            .where(pecas.c.id == sa.bindparam('_id'))
+            .values(busca_normalizada=sa.bindparam('_busca')),
+            [
+                {'_id': pid, '_busca': normalizar_busca(cod, desc)[:200]}
+                for pid, cod, desc in linhas
+            ],
+        )
+        ultimo = linhas[-1][0]
+        total += len(linhas)
+    logger.info('pecas.busca_normalizada preenchida em %d linha(s)', total)
+
+    existing = {ix['name'] for ix in inspector.get_indexes('pecas')}
+    with op.batch_alter_table('pecas', schema=None) as batch_op:
+        if 'ix_pecas_busca_normalizada' not in existing:
+            batch_op.create_index('ix_pecas_busca_normalizada', ['busca_normalizada'], unique=False)
+        if 'ix_pecas_codigo_pneumark' not in existing:
+            batch_op.create_index('ix_pecas_codigo_pneumark', ['codigo_pneumark'], unique=False)
+        if 'ix_pecas_descricao' not in existing:
+            batch_op.create_index('ix_pecas_descricao', ['descricao'], unique=False)
+
+    # PostgreSQL: índice trigram atende LIKE '%termo%' (busca por trecho)
+    if bind.dialect.name == 'postgresql' and 'ix_pecas_busca_trgm' not in existing:
+        try:
+            with bind.begin_nested():
+                bind.exec_driver_sql('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+                bind.exec_driver_sql(
+                    'CREATE INDEX IF NOT EXISTS ix_pecas_busca_trgm '
+                    'ON pecas USING gin (busca_normalizada gin_trgm_ops)'
+                )
+        except Exception as e:  # sem permissão para a extensão: fica o btree
+            logger.warning('pg_trgm indisponível, índice trigram não criado: %s', e)
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'pecas' not in set(inspector.get_table_names()):
+        return
+
+    if bind.dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_pecas_busca_trgm')
+    existing = {ix['name'] for ix in inspector.get_indexes('pecas')}
+    colunas = {c['name'] for c in inspector.get_columns('pecas')}
+    with op.batch_alter_table('pecas', schema=None) as batch_op:
+        for nome in ('ix_pecas_descricao', 'ix_pecas_codigo_pneumark', 'ix_pecas_busca_normalizada'):
+            if nome in existing:
+                batch_op.drop_index(nome)
+        if 'busca_normalizada' in colunas:
+            batch_op.drop_column('busca_normalizada')
@@ -0,0 +1,37 @@
+"""estoque_diario: daily stock series stored only on change
+
+Revision ID: 1b7d3e9f2a46
+Revises: 0a9e4c7b2d15
+Create Date: 2026-10-19 16:05:41.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b7d3e9f2a46'
+down_revision = '0a9e4c7b2d15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    if 'estoque_diario' not in existing_tables:
+        op.create_table(
+            'estoque_diario',
+            sa.Column('peca_id', sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column('dia', sa.Date(), nullable=False),
+            sa.Column('estoque', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('peca_id', 'dia')
+        )
+        op.create_index('ix_estoque_diario_dia', 'estoque_diario', ['dia'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_estoque_diario_dia', table_name='estoque_diario')
+    op.drop_table('estoque_diario')
@@ -0,0 +1,71 @@
+"""serial_contadores: global serial counter moved from logs/serial_counter.txt
+
+Revision ID: 2c8f4a1e6b37
+Revises: 1b7d3e9f2a46
+Create Date: 2026-10-19 17:12:09.384511
+
+"""
+from datetime import datetime
+from pathlib import Path
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c8f4a1e6b37'
+down_revision = '1b7d3e9f2a46'
+branch_labels = None
+depends_on = None
+
+# contador legado (mesmo caminho relativo usado por app/services/serials.py)
+COUNTER_FILE = Path("logs") / "serial_counter.txt"
+
+
+def _valor_do_arquivo():
+    try:
+        return int(COUNTER_FILE.read_text(encoding="utf-8").strip() or "0")
+    except (OSError, ValueError):
+        return 0
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    if 'serial_contadores' not in existing_tables:
+        op.create_table(
+            'serial_contadores',
+            sa.Column('nome', sa.String(length=32), nullable=False),
+            sa.Column('valor', sa.BigInteger(), nullable=False),
+            sa.Column('atualizado_em', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('nome')
+        )
+
+    # importa o contador do arquivo uma única vez (não recua um contador já no banco)
+    tabela = sa.table(
+        'serial_contadores',
+        sa.column('nome', sa.String),
+        sa.column('valor', sa.BigInteger),
+        sa.column('atualizado_em', sa.DateTime),
+    )
+    atual = bind.execute(
+        sa.select(tabela.c.valor).where(tabela.c.nome == 'global')
+    ).scalar()
+    if atual is None:
+        op.bulk_insert(
+            tabela,
+            [{'nome': 'global', 'valor': _valor_do_arquivo(), 'atualizado_em': datetime.utcnow()}],
+        )
+
+
+def downgrade():
+    # devolve o contador ao arquivo para o gerador antigo não repetir seriais
+    valor = op.get_bind().execute(
+        sa.text("SELECT valor FROM serial_contadores WHERE nome = 'global'")
+    ).scalar()
+    if valor is not None:
+        COUNTER_FILE.parent.mkdir(parents=True, exist_ok=True)
+        COUNTER_FILE.write_text(str(max(int(valor), _valor_do_arquivo())), encoding="utf-8")
+    op.drop_table('serial_contadores')
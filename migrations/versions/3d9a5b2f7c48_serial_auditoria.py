@@ -0,0 +1,46 @@
+"""serial_auditoria: serial issue audit trail (replaces logs/serials_YYYY.txt)
+
+Revision ID: 3d9a5b2f7c48
+Revises: 2c8f4a1e6b37
+Create Date: 2026-10-19 18:02:44.905127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d9a5b2f7c48'
+down_revision = '2c8f4a1e6b37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    if 'serial_auditoria' not in existing_tables:
+        op.create_table(
+            'serial_auditoria',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('serial', sa.String(length=32), nullable=False),
+            sa.Column('modelo', sa.String(length=32), nullable=False),
+            sa.Column('usuario', sa.String(length=100), nullable=True),
+            sa.Column('emitido_em', sa.DateTime(), nullable=False),
+            sa.Column('origem', sa.String(length=20), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_serial_auditoria_serial', 'serial_auditoria', ['serial'], unique=False)
+        op.create_index('ix_serial_auditoria_emitido_em', 'serial_auditoria', ['emitido_em'], unique=False)
+        op.create_index('ix_serial_auditoria_modelo_emitido', 'serial_auditoria', ['modelo', 'emitido_em'], unique=False)
+        op.create_index('ix_serial_auditoria_usuario_emitido', 'serial_auditoria', ['usuario', 'emitido_em'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_serial_auditoria_usuario_emitido', table_name='serial_auditoria')
+    op.drop_index('ix_serial_auditoria_modelo_emitido', table_name='serial_auditoria')
+    op.drop_index('ix_serial_auditoria_emitido_em', table_name='serial_auditoria')
+    op.drop_index('ix_serial_auditoria_serial', table_name='serial_auditoria')
+    op.drop_table('serial_auditoria')
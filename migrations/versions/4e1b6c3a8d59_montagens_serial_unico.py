@@ -0,0 +1,47 @@
+"""montagens.serial unique index on databases created without it
+
+Revision ID: 4e1b6c3a8d59
+Revises: 3d9a5b2f7c48
+Create Date: 2026-10-19 18:47:12.230518
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e1b6c3a8d59'
+down_revision = '3d9a5b2f7c48'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'montagens' not in set(inspector.get_table_names()):
+        return
+    existing_indexes = {ix['name'] for ix in inspector.get_indexes('montagens')}
+    if 'ix_montagens_serial' in existing_indexes:
+        return
+
+    # montagens são registros reais: serial repetido precisa de revisão manual
+    repetidos = bind.execute(sa.text(
+        "SELECT serial FROM montagens GROUP BY serial HAVING COUNT(*) > 1"
+    )).scalars().all()
+    if repetidos:
+        logger.warning(
+            'ix_montagens_serial não criado; seriais repetidos em montagens: %s',
+            ', '.join(repetidos[:20]),
+        )
+        return
+    op.create_index('ix_montagens_serial', 'montagens', ['serial'], unique=True)
+
+
+def downgrade():
+    # o índice já existia nos bancos criados pela migração 6b352c4c533b
+    pass
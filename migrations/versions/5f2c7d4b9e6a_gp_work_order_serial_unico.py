@@ -0,0 +1,81 @@
+"""gp_work_order.serial unique (merges duplicate orders first)
+
+Revision ID: 5f2c7d4b9e6a
+Revises: 4e1b6c3a8d59
+Create Date: 2026-10-19 19:21:37.604119
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f2c7d4b9e6a'
+down_revision = '4e1b6c3a8d59'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+def _deduplicar(bind):
+    """
+    Para cada serial repetido fica a ordem atualizada por último (estado mais
+    recente do Painel), com o created_at mais antigo do grupo; as etapas
+    (gp_work_stage) das demais passam para ela e as demais são apagadas.
+    """
+    linhas = bind.execute(sa.text(
+        "SELECT id, serial, created_at, updated_at FROM gp_work_order "
+        "WHERE serial IN (SELECT serial FROM gp_work_order GROUP BY serial HAVING COUNT(*) > 1) "
+        "ORDER BY serial, id"
+    )).all()
+    grupos = {}
+    for ln in linhas:
+        grupos.setdefault(ln.serial, []).append(ln)
+
+    tem_etapas = 'gp_work_stage' in set(sa.inspect(bind).get_table_names())
+    for serial, ordens in grupos.items():
+        fica = max(ordens, key=lambda o: (o.updated_at is not None, o.updated_at, o.id))
+        saem = [o.id for o in ordens if o.id != fica.id]
+        criado = min((o.created_at for o in ordens if o.created_at), default=fica.created_at)
+        if tem_etapas:
+            bind.execute(
+                sa.text("UPDATE gp_work_stage SET order_id = :fica WHERE order_id IN :saem")
+                .bindparams(sa.bindparam('saem', expanding=True)),
+                {'fica': fica.id, 'saem': saem},
+            )
+        bind.execute(
+            sa.text("UPDATE gp_work_order SET created_at = :criado WHERE id = :fica"),
+            {'criado': criado, 'fica': fica.id},
+        )
+        bind.execute(
+            sa.text("DELETE FROM gp_work_order WHERE id IN :saem")
+            .bindparams(sa.bindparam('saem', expanding=True)),
+            {'saem': saem},
+        )
+    if grupos:
+        logger.info('gp_work_order: %d serial(is) repetido(s) unificado(s)', len(grupos))
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'gp_work_order' not in set(inspector.get_table_names()):
+        return
+    existing_indexes = {ix['name'] for ix in inspector.get_indexes('gp_work_order')}
+    if 'ix_gp_work_order_serial' in existing_indexes:
+        return
+
+    _deduplicar(bind)
+    op.create_index('ix_gp_work_order_serial', 'gp_work_order', ['serial'], unique=True)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'gp_work_order' not in set(inspector.get_table_names()):
+        return
+    existing_indexes = {ix['name'] for ix in inspector.get_indexes('gp_work_order')}
+    if 'ix_gp_work_order_serial' in existing_indexes:
+        op.drop_index('ix_gp_work_order_serial', table_name='gp_work_order')
@@ -0,0 +1,42 @@
+"""montagens indexes for the keyset-paginated history (data_hora, modelo, usuario)
+
+Revision ID: 6a3e9d5c1f7b
+Revises: 5f2c7d4b9e6a
+Create Date: 2026-10-19 20:06:44.918237
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a3e9d5c1f7b'
+down_revision = '5f2c7d4b9e6a'
+branch_labels = None
+depends_on = None
+
+INDICES = (
+    ('ix_montagens_data_hora', ['data_hora']),
+    ('ix_montagens_modelo_data_hora', ['modelo', 'data_hora']),
+    ('ix_montagens_usuario_data_hora', ['usuario', 'data_hora']),
+)
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'montagens' not in set(inspector.get_table_names()):
+        return
+    existing_indexes = {ix['name'] for ix in inspector.get_indexes('montagens')}
+    for nome, colunas in INDICES:
+        if nome not in existing_indexes:
+            op.create_index(nome, 'montagens', colunas, unique=False)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'montagens' not in set(inspector.get_table_names()):
+        return
+    existing_indexes = {ix['name'] for ix in inspector.get_indexes('montagens')}
+    for nome, _ in reversed(INDICES):
+        if nome in existing_indexes:
+            op.drop_index(nome, table_name='montagens')
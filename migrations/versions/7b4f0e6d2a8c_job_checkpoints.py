@@ -0,0 +1,38 @@
+"""job_checkpoints: resume points of daily/batched jobs (estoque_diario, ...)
+
+Revision ID: 7b4f0e6d2a8c
+Revises: 6a3e9d5c1f7b
+Create Date: 2026-10-20 10:14:26.507193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b4f0e6d2a8c'
+down_revision = '6a3e9d5c1f7b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    if 'job_checkpoints' not in existing_tables:
+        op.create_table(
+            'job_checkpoints',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('nome', sa.String(length=50), nullable=False),
+            sa.Column('ultimo_dia', sa.Date(), nullable=True),
+            sa.Column('ultimo_id', sa.BigInteger(), nullable=True),
+            sa.Column('atualizado_em', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('nome')
+        )
+
+
+def downgrade():
+    op.drop_table('job_checkpoints')
@@ -0,0 +1,38 @@
+"""omie_requisicoes.claimed_at: when a send claimed the row (stale claims are released)
+
+Revision ID: 8c5a1f3e7d90
+Revises: 7b4f0e6d2a8c
+Create Date: 2026-10-20 11:02:48.913604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c5a1f3e7d90'
+down_revision = '7b4f0e6d2a8c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    if 'omie_requisicoes' in existing_tables:
+        columns = {c['name'] for c in inspector.get_columns('omie_requisicoes')}
+        if 'claimed_at' not in columns:
+            with op.batch_alter_table('omie_requisicoes', schema=None) as batch_op:
+                batch_op.add_column(sa.Column('claimed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'omie_requisicoes' not in set(inspector.get_table_names()):
+        return
+    columns = {c['name'] for c in inspector.get_columns('omie_requisicoes')}
+    if 'claimed_at' in columns:
+        with op.batch_alter_table('omie_requisicoes', schema=None) as batch_op:
+            batch_op.drop_column('claimed_at')
@@ -0,0 +1,63 @@
+"""movimentacoes_estoque and estoque_snapshots
+
+Revision ID: 9a4c2e71b0d3
+Revises: 3cf93bffeffe
+Create Date: 2026-10-19 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4c2e71b0d3'
+down_revision = '3cf93bffeffe'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    if 'movimentacoes_estoque' not in existing_tables:
+        op.create_table(
+            'movimentacoes_estoque',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('peca_id', sa.Integer(), nullable=False),
+            sa.Column('codigo_peca', sa.String(length=50), nullable=True),
+            sa.Column('tipo_mov', sa.String(length=20), nullable=False),
+            sa.Column('quantidade', sa.Integer(), nullable=False),
+            sa.Column('referencia', sa.String(length=120), nullable=True),
+            sa.Column('usuario', sa.String(length=64), nullable=True),
+            sa.Column('criado_em', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('movimentacoes_estoque', schema=None) as batch_op:
+            batch_op.create_index('ix_mov_estoque_peca_criado', ['peca_id', 'criado_em'], unique=False)
+            batch_op.create_index(batch_op.f('ix_movimentacoes_estoque_criado_em'), ['criado_em'], unique=False)
+
+    if 'estoque_snapshots' not in existing_tables:
+        op.create_table(
+            'estoque_snapshots',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('peca_id', sa.Integer(), nullable=False),
+            sa.Column('estoque', sa.Integer(), nullable=False),
+            sa.Column('ultimo_mov_id', sa.Integer(), nullable=False),
+            sa.Column('tirado_em', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('estoque_snapshots', schema=None) as batch_op:
+            batch_op.create_index('ix_estoque_snapshot_tirado_peca', ['tirado_em', 'peca_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('estoque_snapshots', schema=None) as batch_op:
+        batch_op.drop_index('ix_estoque_snapshot_tirado_peca')
+    op.drop_table('estoque_snapshots')
+
+    with op.batch_alter_table('movimentacoes_estoque', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_movimentacoes_estoque_criado_em'))
+        batch_op.drop_index('ix_mov_estoque_peca_criado')
+    op.drop_table('movimentacoes_estoque')
@@ -0,0 +1,65 @@
+"""omie_requisicoes: one open request (pendente/enviando) per part, enforced by a partial unique index
+
+Revision ID: 9e7b2c4d6f18
+Revises: 8c5a1f3e7d90
+Create Date: 2026-10-21 09:17:26.384051
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e7b2c4d6f18'
+down_revision = '8c5a1f3e7d90'
+branch_labels = None
+depends_on = None
+
+INDICE = 'uq_omie_requisicoes_peca_aberta'
+ABERTAS = "status IN ('pendente', 'enviando')"
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'omie_requisicoes' not in set(inspector.get_table_names()):
+        return
+    if bind.dialect.name not in ('postgresql', 'sqlite'):
+        # sem índice parcial: a aplicação segue evitando duplicatas pela consulta
+        return
+
+    existing = {ix['name'] for ix in inspector.get_indexes('omie_requisicoes')}
+    if INDICE in existing:
+        return
+
+    # duplicatas em aberto de antes do índice: fica a mais antiga de cada peça
+    res = bind.execute(sa.text(
+        "UPDATE omie_requisicoes SET status = 'erro', "
+        "erro_msg = 'Requisição duplicada (mantida a mais antiga da peça)' "
+        f"WHERE {ABERTAS} AND id NOT IN ("
+        f"SELECT MIN(id) FROM omie_requisicoes WHERE {ABERTAS} GROUP BY peca_id)"
+    ))
+    if res.rowcount:
+        logger.info('omie_requisicoes: %d requisição(ões) duplicada(s) marcadas como erro', res.rowcount)
+
+    op.create_index(
+        INDICE,
+        'omie_requisicoes',
+        ['peca_id'],
+        unique=True,
+        postgresql_where=sa.text(ABERTAS),
+        sqlite_where=sa.text(ABERTAS),
+    )
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'omie_requisicoes' not in set(inspector.get_table_names()):
+        return
+    existing = {ix['name'] for ix in inspector.get_indexes('omie_requisicoes')}
+    if INDICE in existing:
+        op.drop_index(INDICE, table_name='omie_requisicoes')
@@ -0,0 +1,67 @@
+"""reservas_montagem snapshot tables and montagens.reserva_id
+
+Revision ID: b5e18d9f4a62
+Revises: 9a4c2e71b0d3
+Create Date: 2026-10-19 10:02:11.537810
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e18d9f4a62'
+down_revision = '9a4c2e71b0d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    if 'reservas_montagem' not in existing_tables:
+        op.create_table(
+            'reservas_montagem',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('modelo', sa.String(length=32), nullable=True),
+            sa.Column('codigo_conjunto', sa.String(length=50), nullable=False),
+            sa.Column('unidades', sa.Integer(), nullable=False),
+            sa.Column('unidades_estornadas', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('referencia', sa.String(length=120), nullable=True),
+            sa.Column('usuario', sa.String(length=64), nullable=True),
+            sa.Column('criado_em', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+    if 'reservas_montagem_itens' not in existing_tables:
+        op.create_table(
+            'reservas_montagem_itens',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('reserva_id', sa.Integer(), nullable=False),
+            sa.Column('peca_id', sa.Integer(), nullable=False),
+            sa.Column('codigo_peca', sa.String(length=50), nullable=True),
+            sa.Column('quantidade_por_unidade', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('reservas_montagem_itens', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_reservas_montagem_itens_reserva_id'), ['reserva_id'], unique=False)
+
+    if 'montagens' in existing_tables:
+        columns = {c['name'] for c in inspector.get_columns('montagens')}
+        if 'reserva_id' not in columns:
+            with op.batch_alter_table('montagens', schema=None) as batch_op:
+                batch_op.add_column(sa.Column('reserva_id', sa.Integer(), nullable=True))
+                batch_op.create_index(batch_op.f('ix_montagens_reserva_id'), ['reserva_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('montagens', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_montagens_reserva_id'))
+        batch_op.drop_column('reserva_id')
+
+    with op.batch_alter_table('reservas_montagem_itens', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_reservas_montagem_itens_reserva_id'))
+    op.drop_table('reservas_montagem_itens')
+    op.drop_table('reservas_montagem')
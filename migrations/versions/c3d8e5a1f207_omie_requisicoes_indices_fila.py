@@ -0,0 +1,36 @@
+"""omie_requisicoes indexes for the batched requisition queue
+
+Revision ID: c3d8e5a1f207
+Revises: b5e18d9f4a62
+Create Date: 2026-10-19 11:20:34.902117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3d8e5a1f207'
+down_revision = 'b5e18d9f4a62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'omie_requisicoes' not in set(inspector.get_table_names()):
+        return
+
+    existing = {ix['name'] for ix in inspector.get_indexes('omie_requisicoes')}
+    with op.batch_alter_table('omie_requisicoes', schema=None) as batch_op:
+        if 'ix_omie_requisicoes_status_created' not in existing:
+            batch_op.create_index('ix_omie_requisicoes_status_created', ['status', 'created_at'], unique=False)
+        if 'ix_omie_requisicoes_peca_status' not in existing:
+            batch_op.create_index('ix_omie_requisicoes_peca_status', ['peca_id', 'status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('omie_requisicoes', schema=None) as batch_op:
+        batch_op.drop_index('ix_omie_requisicoes_peca_status')
+        batch_op.drop_index('ix_omie_requisicoes_status_created')
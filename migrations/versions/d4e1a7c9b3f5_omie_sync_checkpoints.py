@@ -0,0 +1,40 @@
+"""omie_sync_checkpoints for incremental OMIE catalog/stock sync
+
+Revision ID: d4e1a7c9b3f5
+Revises: c3d8e5a1f207
+Create Date: 2026-10-19 12:05:47.316420
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4e1a7c9b3f5'
+down_revision = 'c3d8e5a1f207'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    if 'omie_sync_checkpoints' not in existing_tables:
+        op.create_table(
+            'omie_sync_checkpoints',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('nome', sa.String(length=50), nullable=False),
+            sa.Column('marca_desde', sa.DateTime(), nullable=True),
+            sa.Column('pagina', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('iniciado_em', sa.DateTime(), nullable=True),
+            sa.Column('concluido_em', sa.DateTime(), nullable=True),
+            sa.Column('resumo', sa.Text(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('nome')
+        )
+
+
+def downgrade():
+    op.drop_table('omie_sync_checkpoints')
@@ -0,0 +1,33 @@
+"""omie_requisicoes (status, id) index for keyset listing
+
+Revision ID: e6b2f8d0c4a1
+Revises: d4e1a7c9b3f5
+Create Date: 2026-10-19 12:48:03.551902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b2f8d0c4a1'
+down_revision = 'd4e1a7c9b3f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'omie_requisicoes' not in set(inspector.get_table_names()):
+        return
+
+    existing = {ix['name'] for ix in inspector.get_indexes('omie_requisicoes')}
+    if 'ix_omie_requisicoes_status_id' not in existing:
+        with op.batch_alter_table('omie_requisicoes', schema=None) as batch_op:
+            batch_op.create_index('ix_omie_requisicoes_status_id', ['status', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('omie_requisicoes', schema=None) as batch_op:
+        batch_op.drop_index('ix_omie_requisicoes_status_id')
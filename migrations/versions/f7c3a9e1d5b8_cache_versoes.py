@@ -0,0 +1,35 @@
+"""cache_versoes for export cache invalidation
+
+Revision ID: f7c3a9e1d5b8
+Revises: e6b2f8d0c4a1
+Create Date: 2026-10-19 13:30:12.284615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7c3a9e1d5b8'
+down_revision = 'e6b2f8d0c4a1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    if 'cache_versoes' not in existing_tables:
+        op.create_table(
+            'cache_versoes',
+            sa.Column('tabela', sa.String(length=64), nullable=False),
+            sa.Column('versao', sa.Integer(), nullable=False, server_default='1'),
+            sa.Column('atualizado_em', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('tabela')
+        )
+
+
+def downgrade():
+    op.drop_table('cache_versoes')
@@ -0,0 +1,325 @@
+# scripts/omie_stub_server.py
+"""
+Servidor OMIE falso para testar a integração offline.
+
+Uso:
+    python scripts/omie_stub_server.py --porta 8765 [--latencia-ms 200]
+        [--taxa-erro 0.2] [--limite-por-seg 3] [--fora]
+
+E no SGP:
+    OMIE_BASE_URL=http://127.0.0.1:8765/api/v1/ OMIE_APP_KEY=x OMIE_APP_SECRET=y
+
+Simula:
+- catálogo de N produtos com saldo (--catalogo N), M deles alterados "agora"
+  (--alterados M): ListarProdutos (filtro por data/hora) e ListarPosEstoque
+- latência fixa por chamada (--latencia-ms)
+- fração de respostas 500 aleatórias (--taxa-erro)
+- HTTP 429 com Retry-After acima de N chamadas/segundo (--limite-por-seg)
+- indisponibilidade total, 503 em tudo (--fora)
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ====================================================================
+# [BLOCO] BLOCO_UTIL
+# [NOME] estado_stub
+# [RESPONSABILIDADE] Guardar opções da linha de comando e contadores do servidor falso
+# ====================================================================
+OPCOES = argparse.Namespace(latencia_ms=0, taxa_erro=0.0, limite_por_seg=0, fora=False)
+_lock = threading.Lock()
+_janela = {"segundo": 0, "chamadas": 0}
+_contador_req = {"n": 0}
+CATALOGO = []  # [{"codigo", "descricao", "alterado_em": datetime, "saldo"}]
+# ====================================================================
+# [FIM BLOCO] estado_stub
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _acima_do_limite
+# [RESPONSABILIDADE] Contar chamadas por segundo e indicar quando responder 429
+# ====================================================================
+def _acima_do_limite():
+    if not OPCOES.limite_por_seg:
+        return False
+    with _lock:
+        agora = int(time.time())
+        if _janela["segundo"] != agora:
+            _janela.update({"segundo": agora, "chamadas": 0})
+        _janela["chamadas"] += 1
+        return _janela["chamadas"] > OPCOES.limite_por_seg
+
+
+# ====================================================================
+# [FIM BLOCO] _acima_do_limite
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] incluir_requisicao_compra
+# [RESPONSABILIDADE] Simular IncluirRequisicaoCompra devolvendo o código interno recebido
+# ====================================================================
+def incluir_requisicao_compra(param):
+    cab = param.get("cabecalho") or {}
+    with _lock:
+        _contador_req["n"] += 1
+        numero = _contador_req["n"]
+    return {
+        "codReqCompra": numero,
+        "codigo_interno": cab.get("codigo_interno"),
+        "cCodStatus": "0",
+        "cDesStatus": f"Requisição incluída com {len(param.get('itens') or [])} item(ns)",
+    }
+
+
+# ====================================================================
+# [FIM BLOCO] incluir_requisicao_compra
+# ====================================================================
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] gerar_catalogo
+# [RESPONSABILIDADE] Criar catálogo sintético determinístico (códigos STUB-00001...)
+# ====================================================================
+def gerar_catalogo(total, alterados):
+    rnd = random.Random(42)
+    agora = datetime.now()
+    CATALOGO[:] = [
+        {
+            "codigo": f"STUB-{i:05d}",
+            "descricao": f"Produto stub {i}",
+            "alterado_em": agora - timedelta(days=rnd.randint(1, 60)),
+            "saldo": rnd.randint(0, 200),
+        }
+        for i in range(1, total + 1)
+    ]
+    for prod in rnd.sample(CATALOGO, min(alterados, total)):
+        prod["alterado_em"] = agora
+        prod["saldo"] = rnd.randint(0, 200)
+
+
+# ====================================================================
+# [FIM BLOCO] gerar_catalogo
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] _pagina
+# [RESPONSABILIDADE] Fatiar uma lista em página (base 1) e devolver também o total de páginas
+# ====================================================================
+def _pagina(itens, pagina, por_pagina):
+    por_pagina = max(1, int(por_pagina or 50))
+    total_paginas = max(1, -(-len(itens) // por_pagina))
+    inicio = (int(pagina or 1) - 1) * por_pagina
+    return itens[inicio : inicio + por_pagina], total_paginas
+
+
+# ====================================================================
+# [FIM BLOCO] _pagina
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] listar_produtos
+# [RESPONSABILIDADE] Simular ListarProdutos com filtrar_por_data_de/filtrar_por_hora_de
+# ====================================================================
+def listar_produtos(param):
+    itens = CATALOGO
+    if param.get("filtrar_por_data_de"):
+        desde = datetime.strptime(
+            f"{param['filtrar_por_data_de']} {param.get('filtrar_por_hora_de') or '00:00:00'}",
+            "%d/%m/%Y %H:%M:%S",
+        )
+        itens = [p for p in CATALOGO if p["alterado_em"] >= desde]
+    fatia, total_paginas = _pagina(itens, param.get("pagina"), param.get("registros_por_pagina"))
+    return {
+        "pagina": int(param.get("pagina") or 1),
+        "total_de_paginas": total_paginas,
+        "registros": len(fatia),
+        "total_de_registros": len(itens),
+        "produto_servico_cadastro": [
+            {
+                "codigo": p["codigo"],
+                "codigo_produto": 1000 + i,
+                "codigo_produto_integracao": p["codigo"],
+                "descricao": p["descricao"],
+                "inativo": "N",
+                "info": {
+                    "dAlt": p["alterado_em"].strftime("%d/%m/%Y"),
+                    "hAlt": p["alterado_em"].strftime("%H:%M:%S"),
+                },
+            }
+            for i, p in enumerate(fatia)
+        ],
+    }
+
+
+# ====================================================================
+# [FIM BLOCO] listar_produtos
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] listar_pos_estoque
+# [RESPONSABILIDADE] Simular ListarPosEstoque (saldo de todos os produtos, paginado)
+# ====================================================================
+def listar_pos_estoque(param):
+    itens = CATALOGO
+    if param.get("cExibeTodos") == "N":
+        itens = [p for p in CATALOGO if p["saldo"]]
+    fatia, total_paginas = _pagina(itens, param.get("nPagina"), param.get("nRegPorPagina"))
+    return {
+        "nPagina": int(param.get("nPagina") or 1),
+        "nTotPaginas": total_paginas,
+        "nRegistros": len(fatia),
+        "nTotRegistros": len(itens),
+        "produtos": [
+            {"cCodigo": p["codigo"], "cDescricao": p["descricao"], "nSaldo": p["saldo"]}
+            for p in fatia
+        ],
+    }
+
+
+# ====================================================================
+# [FIM BLOCO] listar_pos_estoque
+# ====================================================================
+
+# Chamadas suportadas: nome do "call" -> função(param) -> dict
+CHAMADAS = {
+    "IncluirRequisicaoCompra": incluir_requisicao_compra,
+    "ListarProdutos": listar_produtos,
+    "ListarPosEstoque": listar_pos_estoque,
+}
+
+
+# ====================================================================
+# [BLOCO] CLASSE
+# [NOME] StubHandler
+# [RESPONSABILIDADE] Atender POSTs no formato OMIE ({"call", "param", "app_key", "app_secret"})
+# ====================================================================
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, como o OMIE real
+    wbufsize = 64 * 1024  # cabeçalho + corpo em um único envio (sem atraso de Nagle)
+
+    def _responder(self, status, corpo, cabecalhos=None):
+        dados = json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(dados)))
+        for k, v in (cabecalhos or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_POST(self):
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        try:
+            corpo = json.loads(self.rfile.read(tamanho) or b"{}")
+        except ValueError:
+            return self._responder(
+                500, {"faultcode": "SOAP-ENV:Client-1", "faultstring": "JSON inválido"}
+            )
+
+        if OPCOES.latencia_ms:
+            time.sleep(OPCOES.latencia_ms / 1000.0)
+        if OPCOES.fora:
+            return self._responder(
+                503, {"faultcode": "SOAP-ENV:Server", "faultstring": "Serviço indisponível"}
+            )
+        if _acima_do_limite():
+            return self._responder(
+                429,
+                {"faultcode": "SOAP-ENV:Server", "faultstring": "Consumo excessivo"},
+                {"Retry-After": "1"},
+            )
+        if OPCOES.taxa_erro and random.random() < OPCOES.taxa_erro:
+            return self._responder(
+                500, {"faultcode": "SOAP-ENV:Server", "faultstring": "Erro interno simulado"}
+            )
+        if not corpo.get("app_key") or not corpo.get("app_secret"):
+            return self._responder(
+                500, {"faultcode": "SOAP-ENV:Client-101", "faultstring": "Credenciais ausentes"}
+            )
+
+        fn = CHAMADAS.get(corpo.get("call"))
+        if fn is None:
+            # o OMIE real devolve erros de validação como HTTP 500 + faultcode Client
+            return self._responder(
+                500,
+                {
+                    "faultcode": "SOAP-ENV:Client-8",
+                    "faultstring": f"Método não suportado: {corpo.get('call')}",
+                },
+            )
+        param = (corpo.get("param") or [{}])[0]
+        return self._responder(200, fn(param))
+
+    def log_message(self, fmt, *args):
+        print("[OMIE-STUB] " + fmt % args)
+
+
+# ====================================================================
+# [FIM BLOCO] StubHandler
+# ====================================================================
+
+
+# ====================================================================
+# [BLOCO] FUNÇÃO
+# [NOME] main
+# [RESPONSABILIDADE] Ler opções e subir o servidor falso
+# ====================================================================
+def main():
+    parser = argparse.ArgumentParser(description="Servidor OMIE falso (testes offline)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--latencia-ms", type=int, default=0)
+    parser.add_argument("--taxa-erro", type=float, default=0.0)
+    parser.add_argument("--limite-por-seg", type=int, default=0)
+    parser.add_argument("--fora", action="store_true")
+    parser.add_argument("--catalogo", type=int, default=50)
+    parser.add_argument("--alterados", type=int, default=5)
+    args = parser.parse_args()
+    for k in ("latencia_ms", "taxa_erro", "limite_por_seg", "fora"):
+        setattr(OPCOES, k, getattr(args, k))
+    gerar_catalogo(args.catalogo, args.alterados)
+
+    servidor = ThreadingHTTPServer((args.host, args.porta), StubHandler)
+    print(f"[OMIE-STUB] Ouvindo em http://{args.host}:{args.porta}/api/v1/")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+# ====================================================================
+# [FIM BLOCO] main
+# ====================================================================
+
+if __name__ == "__main__":
+    main()
+
+# ====================================================================
+# MAPA DO ARQUIVO
+# --------------------------------------------------------------------
+# BLOCO_UTIL: estado_stub
+# FUNÇÃO: _acima_do_limite
+# FUNÇÃO: incluir_requisicao_compra
+# FUNÇÃO: gerar_catalogo
+# FUNÇÃO: _pagina
+# FUNÇÃO: listar_produtos
+# FUNÇÃO: listar_pos_estoque
+# CLASSE: StubHandler
+# FUNÇÃO: main
+# ====================================================================
@@ -0,0 +1,112 @@
+"""
+Teste de estresse do gerador de seriais (app/services/serials.py).
+
+Sobe N processos, cada um com o próprio create_app() (como os workers do
+gunicorn), pedindo lotes de tamanho aleatório ao mesmo tempo. No fim confere
+que nenhum número foi entregue duas vezes e que o contador do banco cobre
+todos eles.
+
+Uso:
+    python scripts/stress_seriais.py                      # SQLite temporário
+    python scripts/stress_seriais.py --processos 8 --pedidos 200
+    python scripts/stress_seriais.py --db postgresql://.../banco_de_teste
+
+ATENÇÃO: consome números do contador do banco informado; use um banco de teste.
+"""
+import argparse
+import multiprocessing as mp
+import os
+import random
+import sys
+import tempfile
+from collections import Counter
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _preparar(db_url, pasta):
+    # logs/ de auditoria e contador legado ficam na pasta temporária
+    os.environ["DATABASE_URL"] = db_url
+    os.chdir(pasta)
+    sys.path.insert(0, RAIZ)
+    from app import create_app
+
+    return create_app()
+
+
+def _worker(db_url, pasta, pedidos, bloco, semente, saida):
+    app = _preparar(db_url, pasta)
+    app.config["SERIAL_BLOCO"] = bloco
+    from app import db
+    from app.services.serials import generate_serials
+
+    rnd = random.Random(semente)
+    data_fixa = datetime(2025, 1, 1)  # prefixo sempre "511" (A + M + C)
+    numeros = []
+    with app.app_context():
+        for _ in range(pedidos):
+            qtd = rnd.choice((1, 1, 1, 2, 5, 12))
+            lote = generate_serials("PM2100", qtd, "stress", now=data_fixa)
+            numeros.extend(int(s[3:]) for s in lote)
+            db.session.commit()  # grava a auditoria, como o commit da montagem
+    saida.put(numeros)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    ap.add_argument("--db", help="URL do banco (padrão: SQLite temporário)")
+    ap.add_argument("--processos", type=int, default=6)
+    ap.add_argument("--pedidos", type=int, default=100, help="chamadas por processo")
+    ap.add_argument("--bloco", type=int, default=10, help="SERIAL_BLOCO dos workers")
+    args = ap.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix="stress_seriais_")
+    db_url = args.db or "sqlite:///" + os.path.join(pasta, "stress.db")
+
+    app = _preparar(db_url, pasta)
+    from app import db
+    from app.models_sqla import SerialAuditoria, SerialContador
+
+    with app.app_context():
+        db.create_all()
+        antes = (db.session.get(SerialContador, "global") or SerialContador(valor=0)).valor
+
+    ctx = mp.get_context("spawn")
+    saida = ctx.Queue()
+    procs = [
+        ctx.Process(target=_worker, args=(db_url, pasta, args.pedidos, args.bloco, i, saida))
+        for i in range(args.processos)
+    ]
+    for p in procs:
+        p.start()
+    numeros = []
+    for _ in procs:
+        numeros.extend(saida.get())
+    for p in procs:
+        p.join()
+    if any(p.exitcode for p in procs):
+        print("FALHA: algum processo terminou com erro")
+        sys.exit(1)
+
+    with app.app_context():
+        depois = db.session.get(SerialContador, "global").valor
+        auditados = SerialAuditoria.query.filter_by(usuario="stress").count()
+
+    repetidos = [n for n, c in Counter(numeros).items() if c > 1]
+    print(f"{len(numeros)} seriais em {args.processos} processos; contador {antes} -> {depois}")
+    print(f"descartados (sobras de bloco): {depois - antes - len(numeros)}")
+    if auditados < len(numeros):
+        print(f"FALHA: só {auditados} de {len(numeros)} seriais na auditoria")
+        sys.exit(1)
+    if repetidos:
+        print(f"FALHA: {len(repetidos)} número(s) repetido(s), ex.: {repetidos[:10]}")
+        sys.exit(1)
+    if numeros and (min(numeros) <= antes or max(numeros) > depois):
+        print("FALHA: número fora da faixa reservada no banco")
+        sys.exit(1)
+    print("OK: nenhum serial repetido.")
+
+
+if __name__ == "__main__":
+    main()
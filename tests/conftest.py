@@ -0,0 +1,33 @@
+# tests/conftest.py
+"""
+Fixtures comuns: aplicação com SQLite temporário e banco recriado a cada teste.
+
+Rodar da raiz do projeto:  python -m pytest -q
+"""
+import logging
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    caminho = tmp_path_factory.mktemp("db") / "teste.db"
+    os.environ["DATABASE_URL"] = f"sqlite:///{caminho}"
+    logging.disable(logging.WARNING)  # [BOOT] de blueprints opcionais
+    from app import create_app
+
+    app = create_app()
+    app.config.update(TESTING=True, LOGIN_DISABLED=True)
+    return app
+
+
+@pytest.fixture
+def db(app):
+    from app import db as _db
+
+    with app.app_context():
+        _db.drop_all()
+        _db.create_all()
+        yield _db
+        _db.session.remove()
@@ -0,0 +1,37 @@
+# tests/test_cache_versoes.py
+from app.models_sqla import CacheVersao, JobCheckpoint, Peca
+from app.services.exportacao_service import EXPORTACOES
+from app.utils.cache_versoes import TABELAS_VERSIONADAS
+
+
+def test_exportacoes_so_dependem_de_tabelas_versionadas():
+    for nome, spec in EXPORTACOES.items():
+        assert set(spec["tabelas"]) <= TABELAS_VERSIONADAS, nome
+
+
+def test_so_tabelas_versionadas_incrementam_versao(db):
+    db.session.add(JobCheckpoint(nome="qualquer"))
+    db.session.commit()
+    assert db.session.query(CacheVersao).count() == 0
+
+    db.session.add(Peca(codigo_pneumark="P-1", descricao="Peça", tipo="peca"))
+    db.session.commit()
+    versoes = dict(db.session.query(CacheVersao.tabela, CacheVersao.versao))
+    assert versoes == {"pecas": 1, "indice_pecas": 1}  # chave lógica do índice de peças
+
+
+def test_savepoint_desfeito_nao_perde_a_versao_da_transacao(db):
+    peca = Peca(codigo_pneumark="P-1", descricao="Peça", tipo="peca", estoque_atual=1)
+    db.session.add(peca)
+    db.session.commit()
+
+    peca.estoque_atual = 2
+    db.session.flush()
+    try:
+        with db.session.begin_nested():  # ex.: avaliação de ROP que falha
+            raise RuntimeError("falha no savepoint")
+    except RuntimeError:
+        pass
+    db.session.commit()
+
+    assert db.session.query(CacheVersao.versao).filter_by(tabela="pecas").scalar() == 2
@@ -0,0 +1,60 @@
+# tests/test_estoque_diario.py
+from datetime import datetime, time, timedelta
+
+from app.models_sqla import EstoqueDiario, MovimentacaoEstoque, Peca
+from app.services.movimentacao_service import (
+    gravar_estoque_diario,
+    gravar_estoque_diario_pendentes,
+)
+
+
+def _serie(db, peca_id):
+    return [
+        (ln.dia, ln.estoque)
+        for ln in db.session.query(EstoqueDiario)
+        .filter_by(peca_id=peca_id)
+        .order_by(EstoqueDiario.dia)
+    ]
+
+
+def _movimentar(db, peca, qtd, dia):
+    peca.estoque_atual += qtd
+    db.session.add(
+        MovimentacaoEstoque(
+            peca_id=peca.id,
+            tipo_mov="reserva",
+            quantidade=qtd,
+            criado_em=datetime.combine(dia, time(12)),
+        )
+    )
+
+
+def test_dias_sem_movimento_nao_gravam_saldo_errado(db):
+    """Estoque anterior ao livro-razão e vários dias parados entre execuções."""
+    hoje = datetime.utcnow().date()
+    peca = Peca(codigo_pneumark="P-1", descricao="Peça", tipo="peca", estoque_atual=100)
+    db.session.add(peca)
+    db.session.flush()
+
+    # dia -6: consumo de 5 e o job rodou naquele dia
+    _movimentar(db, peca, -5, hoje - timedelta(days=6))
+    gravar_estoque_diario(hoje - timedelta(days=6))
+    db.session.commit()
+    assert _serie(db, peca.id) == [(hoje - timedelta(days=6), 95)]
+
+    # dias -5..-3 parados, consumo de 10 no dia -2, job volta a rodar hoje
+    _movimentar(db, peca, -10, hoje - timedelta(days=2))
+    db.session.commit()
+    r = gravar_estoque_diario_pendentes()
+    db.session.commit()
+
+    assert r["dias"] == 6
+    assert _serie(db, peca.id) == [
+        (hoje - timedelta(days=6), 95),
+        (hoje - timedelta(days=2), 85),
+    ]
+
+    # segunda execução no mesmo dia: só refaz hoje, nada muda
+    assert gravar_estoque_diario_pendentes()["dias"] == 1
+    db.session.commit()
+    assert _serie(db, peca.id)[-1] == (hoje - timedelta(days=2), 85)
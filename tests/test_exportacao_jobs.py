@@ -0,0 +1,47 @@
+# tests/test_exportacao_jobs.py
+import os
+import subprocess
+import sys
+import time
+
+from app.services import exportacao_service as exp
+
+
+def _job_travado(app, tmp_path, **extra):
+    app.config["EXPORT_DIR"] = str(tmp_path)
+    _, chave = exp.chave_cache("fornecedores", "csv", {})
+    job_id = f"{chave}.csv"
+    exp._gravar_job(job_id, {"id": job_id, "status": exp.JOB_EXECUTANDO, **extra})
+    return job_id
+
+
+def _aguardar(job_id):
+    for _ in range(100):
+        if exp.estado_job(job_id)["status"] != exp.JOB_EXECUTANDO:
+            return exp.estado_job(job_id)
+        time.sleep(0.05)
+    raise AssertionError("job não terminou")
+
+
+def test_job_vivo_e_reaproveitado(app, db, tmp_path):
+    job_id = _job_travado(
+        app, tmp_path, iniciado_ts=time.time(), pid=os.getpid(), host=exp.socket.gethostname()
+    )
+    assert exp.iniciar_job("fornecedores", "csv")["pid"] == os.getpid()
+    assert exp.estado_job(job_id)["status"] == exp.JOB_EXECUTANDO  # nada foi disparado
+
+
+def test_job_de_processo_morto_e_refeito(app, db, tmp_path):
+    morto = subprocess.Popen([sys.executable, "-c", "pass"])
+    morto.wait()
+    job_id = _job_travado(
+        app, tmp_path, iniciado_ts=time.time(), pid=morto.pid, host=exp.socket.gethostname()
+    )
+    assert exp.iniciar_job("fornecedores", "csv")["pid"] == os.getpid()
+    assert _aguardar(job_id)["status"] == exp.JOB_CONCLUIDO
+
+
+def test_job_sem_marca_de_inicio_e_refeito(app, db, tmp_path):
+    job_id = _job_travado(app, tmp_path)  # formato antigo: só status
+    exp.iniciar_job("fornecedores", "csv")
+    assert _aguardar(job_id)["status"] == exp.JOB_CONCLUIDO
@@ -0,0 +1,52 @@
+# tests/test_indice_pecas.py
+from sqlalchemy import update
+
+from app.models_sqla import Peca
+from app.routes.producao_routes.maquinas_routes.consumo_service import (
+    _baixar_estoque_em_lote,
+)
+from app.services.indice_pecas_service import INDICE, _versao_indice, reconstruir_indice
+
+
+def test_baixa_de_estoque_nao_invalida_o_indice(db):
+    peca = Peca(codigo_pneumark="P-1", descricao="Parafuso", tipo="peca", estoque_atual=10)
+    db.session.add(peca)
+    db.session.commit()
+    reconstruir_indice()
+    versao = _versao_indice()
+
+    # baixa em lote (consumo) e ajuste pelo ORM: só estoque
+    assert _baixar_estoque_em_lote(db.session, {peca.id: 2})
+    db.session.commit()
+    peca.estoque_atual = 5
+    db.session.commit()
+    assert not INDICE.sujo
+    assert _versao_indice() == versao
+
+    # descrição alterada em lote: índice reconstrói e a versão sobe
+    db.session.execute(
+        update(Peca).where(Peca.id == peca.id).values(descricao="Porca")
+    )
+    db.session.commit()
+    assert INDICE.sujo
+    assert _versao_indice() == versao + 1
+
+    reconstruir_indice()
+    assert INDICE.buscar("porca", 5)[0]["codigo"] == "P-1"
+
+
+def test_peca_criada_sobrevive_a_savepoint_desfeito(db):
+    reconstruir_indice()
+    versao = _versao_indice()
+
+    db.session.add(Peca(codigo_pneumark="P-9", descricao="Arruela lisa", tipo="peca"))
+    db.session.flush()
+    try:
+        with db.session.begin_nested():  # ex.: avaliação de ROP que falha
+            raise RuntimeError("falha no savepoint")
+    except RuntimeError:
+        pass
+    db.session.commit()
+
+    assert [s["codigo"] for s in INDICE.buscar("arruela", 5)] == ["P-9"]
+    assert _versao_indice() == versao + 1
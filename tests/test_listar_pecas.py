@@ -0,0 +1,76 @@
+# tests/test_listar_pecas.py
+import pytest
+
+from app.models_sqla import Peca
+from app.routes.estoque_routes.listar_pecas import ORDENACOES
+
+
+def _todas_as_paginas(client, **params):
+    ids, cursor, total = [], None, None
+    while True:
+        args = dict(params, por_pagina=3, **({"cursor": cursor} if cursor else {}))
+        dados = client.get("/api/pecas", query_string=args).get_json()
+        if total is None:
+            total = dados["total"]
+        ids += [p["id"] for p in dados["itens"]]
+        cursor = dados["proximo"]
+        if not dados["tem_mais"]:
+            assert cursor is None
+            return ids, total
+
+
+@pytest.fixture
+def pecas(db):
+    # empates, NULLs e um conjunto para exercitar todas as chaves do cursor
+    dados = [
+        ("conjunto", "PM-1", "Motor completo", 5, 1.5),
+        ("peca", "A-1", "Arruela", None, None),
+        ("peca", "A-2", "Arruela", 5, 2.0),
+        ("peca", "B-1", None, 0, 2.0),
+        ("peca", "C-1", "Correia", 5, None),
+        ("conjunto", "PM-2", None, 2, 1.0),
+        ("peca", "D-1", "Disco", None, 3.0),
+        ("peca", "E-1", "Eixo", 9, 0.5),
+    ]
+    for tipo, cod, desc, atual, custo in dados:
+        db.session.add(
+            Peca(tipo=tipo, codigo_pneumark=cod, descricao=desc, estoque_atual=atual, custo=custo)
+        )
+    db.session.commit()
+    return db.session.query(Peca).all()
+
+
+@pytest.mark.parametrize("ordem", ["padrao", *ORDENACOES])
+@pytest.mark.parametrize("direcao", ["asc", "desc"])
+def test_cursor_percorre_todas_as_pecas_na_ordem(app, pecas, ordem, direcao):
+    if ordem == "padrao":
+        esperado = sorted(
+            pecas,
+            key=lambda p: (p.tipo != "conjunto", p.descricao is None, p.descricao or "", p.id),
+        )
+    else:
+        attr = ORDENACOES[ordem].key
+        por_id = sorted(pecas, key=lambda p: p.id)
+        # sort estável: empates ficam por id crescente nos dois sentidos; NULLs por último
+        esperado = sorted(
+            (p for p in por_id if getattr(p, attr) is not None),
+            key=lambda p: getattr(p, attr),
+            reverse=direcao == "desc",
+        ) + [p for p in por_id if getattr(p, attr) is None]
+
+    ids, total = _todas_as_paginas(app.test_client(), ordem=ordem, dir=direcao)
+    assert ids == [p.id for p in esperado]
+    assert total == len(pecas)
+
+
+def test_busca_e_cursor_invalido(app, pecas):
+    cliente = app.test_client()
+    ids, total = _todas_as_paginas(cliente, q="arruela")
+    assert total == 2 and len(ids) == 2
+
+    primeira = cliente.get("/api/pecas", query_string={"por_pagina": 2}).get_json()
+    outra_ordem = cliente.get(
+        "/api/pecas", query_string={"ordem": "codigo", "cursor": primeira["proximo"]}
+    )
+    assert outra_ordem.status_code == 400
+    assert cliente.get("/api/pecas", query_string={"cursor": "@@"}).status_code == 400
@@ -0,0 +1,110 @@
+# tests/test_omie_requisicoes.py
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.models_sqla import OmieRequisicao
+from app.services.omie_requisicao_service import (
+    STATUS_ENVIADO,
+    STATUS_ENVIANDO,
+    STATUS_ERRO,
+    STATUS_PENDENTE,
+    enfileirar_requisicoes,
+    liberar_envios_travados,
+)
+from app.utils import omie_utils
+from app.utils.omie_client import OmieErro
+
+
+def test_reserva_de_envio_morto_volta_para_a_fila(db):
+    agora = datetime.utcnow()
+    velha = OmieRequisicao(
+        peca_id=1, quantidade=5, status=STATUS_ENVIANDO, cod_int="SGP-a",
+        claimed_at=agora - timedelta(hours=1),
+    )
+    recente = OmieRequisicao(
+        peca_id=2, quantidade=5, status=STATUS_ENVIANDO, cod_int="SGP-b", claimed_at=agora
+    )
+    db.session.add_all([velha, recente])
+    db.session.commit()
+
+    # enquanto presa, a peça 1 não entra de novo na fila
+    assert enfileirar_requisicoes([{"peca_id": 1, "quantidade": 5, "fornecedor": "F"}]) == []
+
+    assert liberar_envios_travados(timeout_segundos=600) == 1
+    db.session.commit()
+    db.session.expire_all()
+    assert (velha.status, velha.cod_int, velha.claimed_at) == (STATUS_PENDENTE, None, None)
+    assert recente.status == STATUS_ENVIANDO
+
+
+def test_peca_tem_no_maximo_uma_requisicao_em_aberto(db):
+    ids = enfileirar_requisicoes([{"peca_id": 1, "quantidade": 3, "fornecedor": "F"}])
+    assert len(ids) == 1
+    db.session.add(OmieRequisicao(peca_id=1, quantidade=3, status=STATUS_ERRO))
+    db.session.commit()
+
+    # mesmo sem a checagem da aplicação, o banco recusa a segunda linha em aberto
+    db.session.add(OmieRequisicao(peca_id=1, quantidade=3, status=STATUS_PENDENTE))
+    with pytest.raises(IntegrityError):
+        db.session.flush()
+    db.session.rollback()
+
+    novas = enfileirar_requisicoes(
+        [{"peca_id": 1, "quantidade": 3, "fornecedor": "F"}, {"peca_id": 2, "quantidade": 1}]
+    )
+    assert len(novas) == 1
+    assert db.session.get(OmieRequisicao, novas[0]).peca_id == 2
+
+
+def test_reserva_com_post_iniciado_consulta_o_omie_antes_de_voltar(db, monkeypatch):
+    velho = datetime.utcnow() - timedelta(hours=1)
+    criada = OmieRequisicao(
+        peca_id=1, quantidade=5, status=STATUS_ENVIANDO, cod_int="SGP-a-1", claimed_at=velho
+    )
+    ausente = OmieRequisicao(
+        peca_id=2, quantidade=5, status=STATUS_ENVIANDO, cod_int="SGP-a-2", claimed_at=velho
+    )
+    db.session.add_all([criada, ausente])
+    db.session.commit()
+
+    consultas = []
+
+    def falso_omie(endpoint, payload):
+        cod = payload["param"][0]["codigo_interno"]
+        consultas.append((payload["call"], cod))
+        if cod == "SGP-a-2":
+            raise OmieErro("Não existem registros", codigo="SOAP-ENV:Client-5113")
+        return {"codigo_interno": cod}
+
+    monkeypatch.setattr(omie_utils, "_make_omie_request", falso_omie)
+
+    assert liberar_envios_travados(timeout_segundos=600) == 1
+    db.session.commit()
+    db.session.expire_all()
+    assert sorted(consultas) == [
+        ("ConsultarRequisicaoCompra", "SGP-a-1"),
+        ("ConsultarRequisicaoCompra", "SGP-a-2"),
+    ]
+    assert (criada.status, criada.cod_int) == (STATUS_ENVIADO, "SGP-a-1")
+    assert (ausente.status, ausente.cod_int) == (STATUS_PENDENTE, None)
+
+
+def test_reserva_fica_presa_se_o_omie_nao_responde(db, monkeypatch):
+    linha = OmieRequisicao(
+        peca_id=1, quantidade=5, status=STATUS_ENVIANDO, cod_int="SGP-a-1",
+        claimed_at=datetime.utcnow() - timedelta(hours=1),
+    )
+    db.session.add(linha)
+    db.session.commit()
+
+    def fora_do_ar(endpoint, payload):
+        raise OmieErro("timeout")
+
+    monkeypatch.setattr(omie_utils, "_make_omie_request", fora_do_ar)
+
+    assert liberar_envios_travados(timeout_segundos=600) == 0
+    db.session.commit()
+    db.session.expire_all()
+    assert linha.status == STATUS_ENVIANDO
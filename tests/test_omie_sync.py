@@ -0,0 +1,29 @@
+# tests/test_omie_sync.py
+from app.models_sqla import OmieSyncCheckpoint
+from app.services.omie_sync_service import CHECKPOINT_PRODUTOS, sincronizar_produtos
+from app.utils.omie_client import OmieClient
+
+
+class _Resposta:
+    status_code = 500
+    headers = {}
+
+    def json(self):
+        return {
+            "faultstring": "ERROR: Não existem registros para a página [1]!",
+            "faultcode": "SOAP-ENV:Client-5113",
+        }
+
+
+def test_listagem_sem_registros_conclui_a_sincronizacao(db):
+    """Filtro por data sem alterações: o OMIE responde 5113 na página 1."""
+    cliente = OmieClient("chave", "segredo", max_tentativas=1)
+    chamadas = []
+    cliente.sessao.post = lambda url, **kw: chamadas.append(kw["json"]) or _Resposta()
+
+    resumo = sincronizar_produtos(cliente=cliente)
+
+    assert len(chamadas) == 1
+    assert resumo["lidos"] == 0
+    ck = db.session.query(OmieSyncCheckpoint).filter_by(nome=CHECKPOINT_PRODUTOS).one()
+    assert ck.marca_desde is not None and ck.pagina == 0
@@ -0,0 +1,31 @@
+# tests/test_ordem_cache.py
+from datetime import datetime
+
+from sqlalchemy import update
+
+from app.models_sqla import GPWorkOrder
+from app.services.producao import ordem_cache
+
+
+def test_limpeza_em_lote_sobrevive_a_savepoint_desfeito(db):
+    agora = datetime.utcnow()
+    db.session.add(
+        GPWorkOrder(
+            serial="S1", modelo="7-000", current_bench="b1", status="queued",
+            created_at=agora, updated_at=agora, hipot_flag=False, hipot_status="PENDING",
+        )
+    )
+    db.session.commit()
+    ordem_cache.limpar_cache_ordens()
+    assert ordem_cache.ordem_por_serial("S1") is not None
+    assert "S1" in ordem_cache._lru
+
+    db.session.execute(update(GPWorkOrder).values(status="done"))
+    try:
+        with db.session.begin_nested():  # ex.: avaliação de ROP que falha
+            raise RuntimeError("falha no savepoint")
+    except RuntimeError:
+        pass
+    db.session.commit()
+
+    assert "S1" not in ordem_cache._lru
@@ -0,0 +1,51 @@
+# tests/test_projecao.py
+from datetime import datetime
+
+from app.models_sqla import EstruturaMaquina, GPWorkOrder, Montagem, Peca, ReservaMontagem
+from app.services.montagem.bom_service import invalidar_cache_bom
+from app.services.montagem.projecao_service import invalidar_cache_projecao, projetar_estoque
+
+
+def _ordem(db, serial, status_montagem, reserva_id):
+    agora = datetime.utcnow()
+    db.session.add(
+        Montagem(
+            modelo="7-000", serial=serial, data_hora=agora, usuario="op",
+            status=status_montagem, label_printed=False, label_print_count=0,
+            reserva_id=reserva_id,
+        )
+    )
+    db.session.add(
+        GPWorkOrder(
+            serial=serial, modelo="7-000", current_bench="b1", status="queued",
+            created_at=agora, updated_at=agora, hipot_flag=False, hipot_status="PENDING",
+        )
+    )
+
+
+def test_canceladas_e_reservas_estornadas_na_projecao(db):
+    invalidar_cache_bom()
+    invalidar_cache_projecao()
+    db.session.add_all(
+        [
+            Peca(codigo_pneumark="7-000", descricao="Conjunto", tipo="conjunto", estoque_atual=0),
+            Peca(codigo_pneumark="C-1", descricao="Componente", tipo="peca", estoque_atual=10),
+            EstruturaMaquina(codigo_maquina="7-000", codigo_peca="C-1", quantidade=2),
+            # lote 1: 2 unidades, uma cancelada (estornada); lote 2: totalmente estornado
+            ReservaMontagem(id=1, codigo_conjunto="7-000", unidades=2, unidades_estornadas=1),
+            ReservaMontagem(id=2, codigo_conjunto="7-000", unidades=1, unidades_estornadas=1),
+        ]
+    )
+    _ordem(db, "S1", "OK", 1)
+    _ordem(db, "S2", "CANCELADA", 1)
+    _ordem(db, "S3", "OK", 2)
+    db.session.commit()
+
+    r = projetar_estoque(horizonte=3, todos=True)
+    por_codigo = {i["codigo"]: i for i in r["itens"]}
+
+    assert r["fila"] == 2  # S2 fora da fila
+    # só S3 deve componentes (reserva do lote 2 devolvida): 10 - 2
+    assert por_codigo["C-1"]["projetado"][0] == 8
+    # S1 e S3 entram como conjunto no horizonte; S2 não
+    assert por_codigo["7-000"]["projetado"][-1] == 2
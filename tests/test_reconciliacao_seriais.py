@@ -0,0 +1,111 @@
+# tests/test_reconciliacao_seriais.py
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import JSON, Column, DateTime, Integer, String
+from sqlalchemy.orm import declarative_base
+
+from app.commands import seriais_reconciliar_cmd
+from app.models_sqla import JobCheckpoint, SerialContador
+from app.services.montagem.reconciliacao_seriais import (
+    CadastroSeriesIndisponivel,
+    _gravar_checkpoint,
+    _reconciliar_lote,
+    ler_checkpoint,
+    reconciliar_seriais,
+)
+
+# Tabelas mínimas com as colunas que o job usa (o cadastro real não está nesta base)
+Base = declarative_base()
+
+
+class Serial(Base):
+    __tablename__ = "t_serials"
+    id = Column(Integer, primary_key=True)
+    montagem_id = Column(Integer)
+    modelo = Column(String(32))
+    numero_serie = Column(String(32), unique=True, nullable=False)
+    status = Column(String(16))
+    printed_count = Column(Integer)
+    created_at = Column(DateTime)
+    created_by = Column(String(64))
+
+
+class SerialEvent(Base):
+    __tablename__ = "t_serial_events"
+    id = Column(Integer, primary_key=True)
+    serial_id = Column(Integer, nullable=False)
+    kind = Column(String(32))
+    payload = Column(JSON)
+    created_by = Column(String(64))
+
+
+def _montagem(id, serial, status="OK", impressoes=0, modelo="PM2100"):
+    quando = datetime(2026, 1, 1, 8, 0, id)
+    return SimpleNamespace(
+        id=id, serial=serial, modelo=modelo, status=status, usuario="ana",
+        data_hora=quando, created_at=quando,
+        label_printed=impressoes > 0, label_print_count=impressoes,
+    )
+
+
+def test_checkpoint_fica_em_job_checkpoints(db):
+    db.session.add(JobCheckpoint(nome="estoque_diario", ultimo_dia=date(2026, 1, 1)))
+    db.session.commit()
+    assert ler_checkpoint() == 0
+
+    _gravar_checkpoint(10, db.session)
+    _gravar_checkpoint(25, db.session)
+    db.session.commit()
+
+    assert ler_checkpoint() == 25
+    assert db.session.query(SerialContador).count() == 0
+    outro = db.session.query(JobCheckpoint).filter_by(nome="estoque_diario").one()
+    assert outro.ultimo_dia == date(2026, 1, 1) and outro.ultimo_id is None
+
+
+def test_lote_cria_atualiza_e_ignora(db):
+    Base.metadata.create_all(db.engine)
+    try:
+        db.session.add_all([
+            Serial(numero_serie="S1", modelo=None, status="invalid", printed_count=3),
+            Serial(numero_serie="S2", montagem_id=2, modelo="PM2100", status="valid", printed_count=1),
+        ])
+        db.session.commit()
+
+        r = _reconciliar_lote(
+            [
+                _montagem(1, "S1", impressoes=1),
+                _montagem(2, "S2", impressoes=1),
+                _montagem(3, "S3", status="CANCELADA", impressoes=2),
+                _montagem(4, "  "),
+            ],
+            Serial, SerialEvent, db.session,
+        )
+        db.session.commit()
+
+        assert r == {"criados": 1, "atualizados": 1, "sem_alteracao": 1, "ignorados": 1}
+        s1, s2, s3 = db.session.query(Serial).order_by(Serial.numero_serie).all()
+        # montagem/modelo só preenchem vazio e impressões nunca diminuem
+        assert (s1.montagem_id, s1.modelo, s1.status, s1.printed_count) == (1, "PM2100", "valid", 3)
+        assert (s2.status, s2.printed_count) == ("valid", 1)
+        assert (s3.montagem_id, s3.status, s3.printed_count, s3.created_by) == (3, "invalid", 2, "ana")
+        (ev,) = db.session.query(SerialEvent).all()
+        assert (ev.serial_id, ev.kind, ev.payload["montagem_id"]) == (s3.id, "mounted", 3)
+    finally:
+        db.session.remove()
+        Base.metadata.drop_all(db.engine)
+
+
+def test_sem_cadastro_de_series_falha_antes_do_primeiro_lote(db, app):
+    _gravar_checkpoint(7, db.session)
+    db.session.commit()
+
+    with pytest.raises(CadastroSeriesIndisponivel):
+        reconciliar_seriais()
+    assert ler_checkpoint() == 7
+
+    res = app.test_cli_runner().invoke(seriais_reconciliar_cmd, [])
+    assert res.exit_code == 1
+    assert "Cadastro de séries indisponível" in res.output
@@ -0,0 +1,23 @@
+# tests/test_rop.py
+from app.models_sqla import Peca
+from app.routes.producao_routes.painel_routes.rop_service import avaliar_rop, list_rop_needs
+
+
+def test_necessidades_antes_e_depois_da_primeira_avaliacao(db):
+    db.session.add_all(
+        [
+            Peca(codigo_pneumark="7-000", descricao="PM2100", tipo="conjunto",
+                 estoque_atual=1, ponto_pedido=2, estoque_maximo=5),
+            Peca(codigo_pneumark="7-001", descricao="PM2200", tipo="conjunto",
+                 estoque_atual=9, ponto_pedido=2, estoque_maximo=10),
+        ]
+    )
+    db.session.commit()
+
+    # rop-avaliar ainda não rodou: cálculo direto do estoque
+    needs = list_rop_needs(db.session)
+    assert [(n["codigo_conjunto"], n["sugerido"]) for n in needs] == [("7-000", 4)]
+
+    avaliar_rop()
+    db.session.commit()
+    assert list_rop_needs(db.session) == needs